@@ -0,0 +1,95 @@
+"""
+Feed de eventos del calendario de mantenciones.
+
+FullCalendar pide solo el rango visible (`start`/`end`); se filtra por el
+índice de `start_datetime`, `has_ingreso` se resuelve en SQL y cada evento
+se arma desde `values()` sin instanciar modelos.
+"""
+import hashlib
+import json
+from datetime import datetime, time, timedelta
+
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from documents.models import Ingreso, MaintenanceSchedule
+
+# Ventana máxima aceptada por consulta (la vista de mes de FullCalendar pide ~6 semanas)
+MAX_RANGE_DAYS = 93
+
+
+def parse_range_bound(value):
+    """Convierte un parámetro de FullCalendar (fecha o fecha-hora ISO) en datetime aware"""
+    if not value:
+        return None
+    # En la query string el '+' del offset llega como espacio
+    value = value.strip().replace(' ', '+')
+    parsed = parse_datetime(value)
+    if parsed is None:
+        parsed_date = parse_date(value)
+        if parsed_date is None:
+            return None
+        parsed = datetime.combine(parsed_date, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def calendar_events(start, end):
+    """Eventos compactos de las agendas con start <= start_datetime < end"""
+    schedules = MaintenanceSchedule.objects.filter(
+        start_datetime__gte=start, start_datetime__lt=end
+    ).annotate(
+        has_ingreso=Exists(Ingreso.objects.filter(schedule=OuterRef('pk')))
+    ).values(
+        'id_schedule', 'start_datetime', 'observations', 'patent__patent',
+        'assigned_user__name', 'status__name', 'has_ingreso'
+    ).order_by('start_datetime', 'id_schedule')
+    schedules = list(schedules)
+
+    incidents_by_schedule = {}
+    if schedules:
+        links = MaintenanceSchedule.related_incidents.through.objects.filter(
+            maintenanceschedule_id__in=[s['id_schedule'] for s in schedules]
+        ).values(
+            'maintenanceschedule_id', 'incident__id_incident', 'incident__name', 'incident__incident_type',
+            'incident__description', 'incident__priority', 'incident__is_emergency', 'incident__reported_at'
+        ).order_by('incident__id_incident')
+        for link in links:
+            incidents_by_schedule.setdefault(link['maintenanceschedule_id'], []).append({
+                'id': link['incident__id_incident'],
+                'name': link['incident__name'],
+                'type': link['incident__incident_type'],
+                'description': link['incident__description'] or '',
+                'priority': link['incident__priority'] or 'Normal',
+                'is_emergency': link['incident__is_emergency'],
+                'reported_at': link['incident__reported_at'].strftime('%Y-%m-%d %H:%M'),
+            })
+
+    # El título se arma en el cliente a partir de la patente
+    return [
+        {
+            'id': schedule['id_schedule'],
+            'start': schedule['start_datetime'].isoformat(),
+            'patent': schedule['patent__patent'],
+            'description': schedule['observations'] or '',
+            'assigned_user': schedule['assigned_user__name'] or '',
+            'status': schedule['status__name'] or '',
+            'related_incidents': incidents_by_schedule.get(schedule['id_schedule'], []),
+            'has_ingreso': schedule['has_ingreso'],
+        } for schedule in schedules
+    ]
+
+
+def events_etag(body):
+    """ETag fuerte a partir del contenido serializado del feed"""
+    return '"%s"' % hashlib.md5(body.encode('utf-8')).hexdigest()
+
+
+def serialize_events(events):
+    return json.dumps(events, ensure_ascii=True, separators=(',', ':'), default=str)
+
+
+def range_is_valid(start, end):
+    return start is not None and end is not None and start < end and end - start <= timedelta(days=MAX_RANGE_DAYS)
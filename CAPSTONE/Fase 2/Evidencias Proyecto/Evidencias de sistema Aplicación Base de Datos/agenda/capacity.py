@@ -0,0 +1,236 @@
+"""
+Planificador de capacidad del taller.
+
+Arma en una sola llamada, para un rango de días, dos líneas de tiempo:
+
+* por mecánico: horas comprometidas en tareas (inicio/fin de Task, o el
+  término real/tentativo de la OT si la tarea no tiene fin), descontando las
+  pausas globales de la OT y las personales de su asignación, contra las horas
+  de jornada de su sucursal;
+* por sucursal: horas-bahía ocupadas por las OTs en curso contra
+  workshop_bays × horas de jornada.
+
+Todo sale de cinco consultas con `values_list` y se entrega como arreglos
+alineados con la lista de días (comprometido, capacidad, utilización) más las
+barras de cada tarea u OT en segundos epoch, listo para dibujar un Gantt.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db.models import DateTimeField, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from documents.models import Site, TaskAssignment, WorkOrder, WorkOrderMechanic
+from pausas.models import WorkOrderPause
+
+from .pause_timeline import merge_intervals
+from .work_calendar import get_work_calendar
+
+# Un mes completo con margen para semanas que cruzan meses
+MAX_RANGE_DAYS = 62
+# Holgura antes de considerar que un día está sobrecargado (horas)
+OVERLOAD_TOLERANCE = 0.01
+
+
+def subtract_intervals(intervals, removed):
+    """Partes de `intervals` que no caen en `removed` (ambas listas ordenadas y fusionadas)"""
+    result = []
+    index = 0
+    for start, end in intervals:
+        while index < len(removed) and removed[index][1] <= start:
+            index += 1
+        cursor = start
+        position = index
+        while position < len(removed) and removed[position][0] < end:
+            removed_start, removed_end = removed[position]
+            if removed_start > cursor:
+                result.append([cursor, removed_start])
+            cursor = max(cursor, removed_end)
+            position += 1
+        if cursor < end:
+            result.append([cursor, end])
+    return result
+
+
+class _Range:
+    """Días del rango con sus límites aware, para repartir intervalos por día"""
+
+    def __init__(self, first_day, last_day):
+        self.first_day = first_day
+        self.days = [first_day + timedelta(days=offset) for offset in range((last_day - first_day).days + 1)]
+        self.bounds = [
+            timezone.make_aware(datetime.combine(first_day + timedelta(days=offset), time.min))
+            for offset in range(len(self.days) + 1)
+        ]
+        self.start = self.bounds[0]
+        self.end = self.bounds[-1]
+
+    def _index(self, moment):
+        return (timezone.localtime(moment).date() - self.first_day).days
+
+    def daily_hours(self, calendar, intervals):
+        """Horas laborales de los intervalos que caen en cada día del rango"""
+        hours = [0.0] * len(self.days)
+        for start, end in intervals:
+            start, end = max(start, self.start), min(end, self.end)
+            if end <= start:
+                continue
+            for index in range(max(self._index(start), 0), min(self._index(end), len(self.days) - 1) + 1):
+                hours[index] += calendar.elapsed(max(start, self.bounds[index]), min(end, self.bounds[index + 1]))
+        return hours
+
+    def shift_hours(self, calendar):
+        """Horas de jornada de cada día del rango según el calendario"""
+        hours = []
+        for day in self.days:
+            shift = calendar.shift_for(day)
+            hours.append(shift[1] if shift else 0.0)
+        return hours
+
+    def overloads(self, committed, capacity):
+        """Tramos consecutivos de días con más horas comprometidas que disponibles: [[desde, hasta], ...]"""
+        windows = []
+        for index, day in enumerate(self.days):
+            if committed[index] > capacity[index] + OVERLOAD_TOLERANCE:
+                if windows and windows[-1][1] == index - 1:
+                    windows[-1][1] = index
+                else:
+                    windows.append([index, index])
+        return [[self.days[first].isoformat(), self.days[last].isoformat()] for first, last in windows]
+
+
+def _epoch(moment):
+    return int(moment.timestamp())
+
+
+def _timeline(period, committed, capacity):
+    return {
+        'committed': [round(hours, 2) for hours in committed],
+        'capacity': [round(hours, 2) for hours in capacity],
+        'utilisation': [
+            round(used / available, 3) if available else None for used, available in zip(committed, capacity)
+        ],
+        'overloads': period.overloads(committed, capacity),
+    }
+
+
+def capacity_plan(first_day, last_day, site_id=None):
+    """
+    Líneas de tiempo de mecánicos y sucursales entre first_day y last_day
+    (ambos incluidos), opcionalmente de una sola sucursal.
+    """
+    if last_day < first_day or (last_day - first_day).days >= MAX_RANGE_DAYS:
+        raise ValueError(f'El rango debe tener entre 1 y {MAX_RANGE_DAYS} días')
+    period = _Range(first_day, last_day)
+    now = timezone.now()
+    # Sin fin conocido, una tarea u OT abierta se cuenta hasta ahora
+    effective_end = Coalesce(
+        'task__end_datetime', 'task__work_order__actual_completion', 'task__work_order__tentative_completion',
+        Value(now), output_field=DateTimeField(),
+    )
+
+    # Tareas asignadas que se cruzan con el rango
+    tasks = TaskAssignment.objects.annotate(effective_end=effective_end).filter(
+        task__start_datetime__lt=period.end, effective_end__gt=period.start
+    )
+    if site_id:
+        tasks = tasks.filter(user__patent__site_id=site_id)
+    task_rows = list(tasks.values_list(
+        'user_id', 'user__name', 'user__patent__site_id',
+        'task_id', 'task__work_order_id', 'task__start_datetime', 'effective_end',
+    ).order_by('task__start_datetime', 'task_id'))
+    work_order_ids = {row[4] for row in task_rows if row[4]}
+
+    # Mecánicos del rango: los que tienen tareas y los asignados a OTs abiertas
+    mechanics = {row[0]: (row[1], row[2]) for row in task_rows}
+    assignments = WorkOrderMechanic.objects.filter(
+        Q(work_order_id__in=work_order_ids) | Q(is_active=True, work_order__actual_completion__isnull=True)
+    )
+    if site_id:
+        assignments = assignments.filter(mechanic__patent__site_id=site_id)
+    assignment_ids = defaultdict(set)
+    for assignment_id, work_order_id, mechanic_id, name, mechanic_site_id in assignments.values_list(
+        'id_assignment', 'work_order_id', 'mechanic_id', 'mechanic__name', 'mechanic__patent__site_id'
+    ):
+        mechanics[mechanic_id] = (name, mechanic_site_id)
+        assignment_ids[(mechanic_id, work_order_id)].add(assignment_id)
+
+    # Pausas de las OTs con tareas en el rango: globales por OT y personales por asignación
+    global_pauses = defaultdict(list)
+    personal_pauses = defaultdict(list)
+    for work_order_id, assignment_id, start, end in WorkOrderPause.objects.filter(
+        work_order_id__in=work_order_ids, is_active=True, start_datetime__lt=period.end
+    ).filter(Q(end_datetime__isnull=True) | Q(end_datetime__gt=period.start)).values_list(
+        'work_order_id', 'mechanic_assignment_id', 'start_datetime', 'end_datetime'
+    ):
+        interval = (start, max(start, end or now))
+        if assignment_id is None:
+            global_pauses[work_order_id].append(interval)
+        else:
+            personal_pauses[assignment_id].append(interval)
+
+    # OTs que ocupan bahía en el rango
+    work_orders = WorkOrder.objects.annotate(
+        effective_end=Coalesce('actual_completion', 'tentative_completion', Value(now), output_field=DateTimeField())
+    ).filter(
+        work_started_at__isnull=False, work_started_at__lt=period.end, effective_end__gt=period.start,
+        ingreso__isnull=False,
+    )
+    sites = Site.objects.order_by('id_site')
+    if site_id:
+        work_orders = work_orders.filter(ingreso__patent__site_id=site_id)
+        sites = sites.filter(id_site=site_id)
+    bay_rows = defaultdict(list)
+    for work_order_id, work_order_site_id, start, end in work_orders.values_list(
+        'id_work_order', 'ingreso__patent__site_id', 'work_started_at', 'effective_end'
+    ).order_by('work_started_at', 'id_work_order'):
+        bay_rows[work_order_site_id].append((work_order_id, start, end))
+
+    # Línea de tiempo por mecánico
+    tasks_by_mechanic = defaultdict(lambda: defaultdict(list))
+    bars_by_mechanic = defaultdict(list)
+    for mechanic_id, _, _, task_id, work_order_id, start, end in task_rows:
+        end = max(start, end)
+        tasks_by_mechanic[mechanic_id][work_order_id].append((start, end))
+        bars_by_mechanic[mechanic_id].append([task_id, work_order_id, _epoch(start), _epoch(end)])
+
+    mechanic_timelines = []
+    for mechanic_id, (name, mechanic_site_id) in sorted(mechanics.items(), key=lambda item: (item[1][0], item[0])):
+        calendar = get_work_calendar(mechanic_site_id)
+        working = []
+        for work_order_id, intervals in tasks_by_mechanic[mechanic_id].items():
+            pauses = list(global_pauses[work_order_id])
+            for assignment_id in assignment_ids[(mechanic_id, work_order_id)]:
+                pauses += personal_pauses[assignment_id]
+            working += subtract_intervals(merge_intervals(intervals), merge_intervals(pauses))
+        mechanic_timelines.append({
+            'id': mechanic_id,
+            'name': name,
+            'site_id': mechanic_site_id,
+            **_timeline(period, period.daily_hours(calendar, working), period.shift_hours(calendar)),
+            'bars': bars_by_mechanic[mechanic_id],
+        })
+
+    # Línea de tiempo por sucursal (bahías)
+    site_timelines = []
+    for current_site_id, name, bays in sites.values_list('id_site', 'name', 'workshop_bays'):
+        calendar = get_work_calendar(current_site_id)
+        rows = bay_rows.get(current_site_id, [])
+        occupied = period.daily_hours(calendar, [(start, end) for _, start, end in rows])
+        capacity = [hours * bays for hours in period.shift_hours(calendar)]
+        site_timelines.append({
+            'id': current_site_id,
+            'name': name,
+            'bays': bays,
+            **_timeline(period, occupied, capacity),
+            'bars': [[work_order_id, _epoch(start), _epoch(end)] for work_order_id, start, end in rows],
+        })
+
+    return {
+        'days': [day.isoformat() for day in period.days],
+        'start': _epoch(period.start),
+        'end': _epoch(period.end),
+        'sites': site_timelines,
+        'mechanics': mechanic_timelines,
+    }
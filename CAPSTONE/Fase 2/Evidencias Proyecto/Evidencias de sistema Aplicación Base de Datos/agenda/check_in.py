@@ -0,0 +1,80 @@
+"""
+Registro en bloque de ingresos desde agendamientos (check-in de portería).
+
+Al inicio del turno el guardia recibe decenas de camiones agendados. En lugar
+de un POST por camión, los agendamientos seleccionados se validan juntos con
+unas pocas consultas y los ingresos válidos se crean con un solo bulk_create,
+ya con quien registró la entrada, dentro de una transacción.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from documents.models import Ingreso, MaintenanceSchedule
+from .home_counters import adjust_counter
+from .pending_schedules import refresh_pending_days
+
+
+def _result(schedule_id, ok, **data):
+    return {'schedule_id': schedule_id, 'ok': ok, **data}
+
+
+def bulk_check_in(schedule_ids, registered_by=None):
+    """
+    Crea los ingresos de los agendamientos dados. Retorna un resultado por
+    agendamiento, en el mismo orden: {'schedule_id', 'ok', 'ingreso_id'} o
+    {'schedule_id', 'ok', 'error'}.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        schedules = MaintenanceSchedule.objects.select_for_update().filter(
+            id_schedule__in=schedule_ids
+        ).select_related('patent', 'expected_chofer').in_bulk()
+        checked_in = set(Ingreso.objects.filter(
+            schedule_id__in=schedules
+        ).values_list('schedule_id', flat=True))
+        inside = set(Ingreso.objects.filter(
+            patent_id__in=[schedule.patent_id for schedule in schedules.values()],
+            exit_datetime__isnull=True,
+        ).values_list('patent_id', flat=True))
+
+        results = []
+        pending = []
+        for schedule_id in schedule_ids:
+            schedule = schedules.get(schedule_id)
+            if schedule is None:
+                results.append(_result(schedule_id, False, error='Agendamiento no encontrado.'))
+            elif schedule_id in checked_in:
+                results.append(_result(schedule_id, False, error='El agendamiento ya tiene un ingreso.'))
+            elif not schedule.expected_chofer_id:
+                results.append(_result(
+                    schedule_id, False, error=f'El agendamiento {schedule.patent} no tiene un vendedor asignado.'
+                ))
+            elif schedule.patent_id in inside:
+                results.append(_result(
+                    schedule_id, False, error=f'El vehículo {schedule.patent} ya tiene un ingreso abierto.'
+                ))
+            else:
+                # También evita dos ingresos del mismo agendamiento o vehículo en el lote
+                checked_in.add(schedule_id)
+                inside.add(schedule.patent_id)
+                results.append(_result(schedule_id, True, patent=schedule.patent_id))
+                pending.append(Ingreso(
+                    patent_id=schedule.patent_id,
+                    entry_datetime=now,
+                    chofer_id=schedule.expected_chofer_id,
+                    observations=schedule.observations,
+                    schedule=schedule,
+                    authorization=False,
+                    entry_registered_by=registered_by,
+                ))
+
+        created = iter(Ingreso.objects.bulk_create(pending))
+        for result in results:
+            if result['ok']:
+                result['ingreso_id'] = next(created).id_ingreso
+
+        # bulk_create no dispara los signals que mantienen el contador de la portada
+        # ni el índice de agendamientos pendientes
+        adjust_counter('ingresos_count', len(pending))
+        refresh_pending_days([ingreso.schedule_id for ingreso in pending])
+    return results
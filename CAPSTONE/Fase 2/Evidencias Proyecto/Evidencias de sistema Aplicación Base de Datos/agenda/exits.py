@@ -0,0 +1,57 @@
+"""
+Registro en bloque de salidas de camiones.
+
+Al cierre del día la portería despacha muchos camiones a la vez: los ingresos
+seleccionados se autorizan y cierran con un solo UPDATE en lugar de un
+save() por ingreso. La lista de pendientes se pagina y trae en la misma
+consulta el vehículo, su sucursal y el chofer.
+"""
+from datetime import datetime
+
+from django.core.paginator import Paginator
+from django.utils import timezone
+
+from documents.models import Ingreso
+from .home_counters import adjust_counter
+
+PENDING_EXITS_PER_PAGE = 50
+
+
+def pending_exits_page(page_number=None):
+    """Página de ingresos abiertos, del más antiguo al más reciente"""
+    pending = Ingreso.objects.filter(exit_datetime__isnull=True).select_related(
+        'patent', 'patent__site', 'chofer'
+    ).order_by('entry_datetime', 'id_ingreso')
+    return Paginator(pending, PENDING_EXITS_PER_PAGE).get_page(page_number)
+
+
+def parse_exit_datetime(value):
+    """Fecha de salida del formulario (datetime-local) con zona horaria, o None si no es válida"""
+    try:
+        exit_datetime = datetime.fromisoformat(value or '')
+    except ValueError:
+        return None
+    if timezone.is_naive(exit_datetime):
+        exit_datetime = timezone.make_aware(exit_datetime)
+    return exit_datetime
+
+
+def register_exits(ingreso_ids, exit_datetime, registered_by=None):
+    """
+    Autoriza y cierra los ingresos abiertos dados con un solo UPDATE. Se omiten
+    los ya cerrados y los que entraron después de la hora de salida.
+    Retorna la cantidad de ingresos cerrados.
+    """
+    closed = Ingreso.objects.filter(
+        id_ingreso__in=ingreso_ids,
+        exit_datetime__isnull=True,
+        entry_datetime__lte=exit_datetime,
+    ).update(
+        authorization=True,
+        exit_datetime=exit_datetime,
+        exit_registered_by=registered_by,
+        updated_at=timezone.now(),
+    )
+    # update() no dispara los signals que mantienen el contador de la portada
+    adjust_counter('ingresos_count', -closed)
+    return closed
@@ -1,6 +1,7 @@
 from django import forms
 from documents.models import Ingreso, Vehicle, ServiceType, FlotaUser, Route, Site, MaintenanceSchedule, UserStatus, WorkOrder, WorkOrderStatus, WorkOrderMechanic, SparePartUsage, Repuesto, Incident
 from repuestos.models import SparePartStock
+from .scheduling import check_schedule_conflicts
 
 class IngresoForm(forms.ModelForm):
     route = forms.ModelChoiceField(queryset=Route.objects.all(), required=False, label="Ruta")
@@ -86,6 +87,19 @@ class AgendarIngresoForm(forms.ModelForm):
                 self.fields['expected_chofer'].widget.attrs['readonly'] = True
                 self.fields['expected_chofer'].help_text = "Este campo se registra automáticamente con tu usuario."
 
+    def clean(self):
+        cleaned_data = super().clean()
+        vehicle = cleaned_data.get('patent')
+        start_datetime = cleaned_data.get('start_datetime')
+
+        # Rechazar horarios que se superponen con la agenda del vehículo o sin bahías libres en la sucursal
+        if vehicle and start_datetime:
+            conflicts = check_schedule_conflicts(vehicle, start_datetime, exclude_id=self.instance.pk)
+            if conflicts:
+                raise forms.ValidationError([conflict['message'] for conflict in conflicts])
+
+        return cleaned_data
+
     def save(self, commit=True):
         instance = super().save(commit=False)
         
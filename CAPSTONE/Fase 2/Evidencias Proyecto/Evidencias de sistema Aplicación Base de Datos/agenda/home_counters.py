@@ -0,0 +1,96 @@
+"""
+Contadores de la portada (vehículos, ingresos abiertos, OTs activas e
+incidentes abiertos).
+
+Cada contador vive en la caché con su propia llave. Los signals de agenda/models.py
+los ajustan en +1/-1 cuando una fila entra o sale del conjunto contado (al
+confirmarse la transacción); el conteo de incidentes, que depende de la
+relación con diagnósticos, solo se descarta. Un contador se recalcula con su
+consulta únicamente cuando no está en la caché.
+
+Los contadores viven en la caché compartida (settings.CACHES, Redis o
+Memcached en producción), cuyo `incr` es atómico, y no expiran. Un ajuste que
+encuentra el contador ausente, o un descarte, avanza la época del contador:
+si la época cambió mientras se contaba, el conteo recién guardado se descarta
+porque pudo quedar atrás de ese cambio.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+from documents.models import Incident, Ingreso, Vehicle, WorkOrder, WorkOrderStatus
+
+ACTIVE_WORK_ORDER_STATUSES = ['En Progreso', 'Pendiente']
+OPEN_INCIDENT_STATUSES = ['Reportada', 'En Progreso']
+
+_QUERIES = {
+    'vehicles_count': lambda: Vehicle.objects.count(),
+    'ingresos_count': lambda: Ingreso.objects.filter(exit_datetime__isnull=True).count(),
+    'workorders_count': lambda: WorkOrder.objects.filter(status__name__in=ACTIVE_WORK_ORDER_STATUSES).count(),
+    'incidents_count': lambda: Incident.objects.filter(
+        diagnostics__status__in=OPEN_INCIDENT_STATUSES
+    ).distinct().count(),
+}
+
+
+def _key(name):
+    return f'home_counters:{name}'
+
+
+def _epoch_key(name):
+    return f'home_counters:{name}:epoch'
+
+
+def _bump_epoch(name):
+    cache.add(_epoch_key(name), 0, None)
+    cache.incr(_epoch_key(name))
+
+
+def get_home_counters():
+    """Contadores de la portada, recalculando solo los que faltan en la caché"""
+    keys = [_key(name) for name in _QUERIES] + [_epoch_key(name) for name in _QUERIES]
+    cached = cache.get_many(keys)
+    counters = {}
+    for name, query in _QUERIES.items():
+        value = cached.get(_key(name))
+        if value is None:
+            value = query()
+            # add no pisa un contador que otro proceso ya guardó (y quizás ajustó)
+            if not cache.add(_key(name), value, None):
+                value = cache.get(_key(name), value)
+            elif cache.get(_epoch_key(name)) != cached.get(_epoch_key(name)):
+                cache.delete(_key(name))
+        counters[name] = value
+    return counters
+
+
+def _apply_delta(name, delta):
+    try:
+        cache.incr(_key(name), delta)
+    except ValueError:
+        # Sin valor cacheado: un conteo en curso pudo no ver este cambio
+        _bump_epoch(name)
+
+
+def adjust_counter(name, delta):
+    """Suma delta al contador cuando se confirme la transacción en curso"""
+    if delta:
+        transaction.on_commit(lambda: _apply_delta(name, delta))
+
+
+def invalidate_counter(name):
+    """Descarta el contador para que se recalcule en la próxima visita"""
+    def discard():
+        cache.delete(_key(name))
+        _bump_epoch(name)
+
+    transaction.on_commit(discard)
+
+
+def active_status_ids(status_ids):
+    """Subconjunto de los estados de OT dados que cuentan como activos"""
+    status_ids = {status_id for status_id in status_ids if status_id is not None}
+    if not status_ids:
+        return set()
+    return set(WorkOrderStatus.objects.filter(
+        id_status__in=status_ids, name__in=ACTIVE_WORK_ORDER_STATUSES
+    ).values_list('id_status', flat=True))
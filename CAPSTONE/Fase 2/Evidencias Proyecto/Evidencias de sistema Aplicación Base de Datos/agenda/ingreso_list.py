@@ -0,0 +1,128 @@
+"""
+Motor de listado de ingresos.
+
+Los ingresos se ordenan por (entry_datetime, id_ingreso) descendente y se
+paginan por cursor: cada página continúa desde la última fila de la anterior,
+así el costo no crece con la antigüedad de la página como con OFFSET. Los
+filtros se aplican en la base de datos apoyados en los índices compuestos de
+Ingreso, y "tiene OT" / "tiene diagnóstico" salen como subconsultas de la
+misma consulta en lugar de un prefetch por tarjeta.
+"""
+import base64
+import binascii
+from datetime import datetime, time, timedelta
+
+from django.db.models import Exists, OuterRef, Q, Subquery
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from documents.models import Diagnostics, WorkOrder
+
+INGRESOS_PER_PAGE = 24
+
+
+def _parse_date(value, fmt='%Y-%m-%d'):
+    try:
+        return datetime.strptime(value, fmt).date() if value else None
+    except ValueError:
+        return None
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def filter_ingresos(ingresos, params):
+    """Aplica en la base de datos los filtros de la lista de ingresos"""
+    patent = (params.get('patent') or '').strip().upper()
+    if patent:
+        ingresos = ingresos.filter(patent__patent__icontains=patent)
+
+    status = params.get('status')
+    if status == 'open':
+        ingresos = ingresos.filter(exit_datetime__isnull=True)
+    elif status == 'closed':
+        ingresos = ingresos.filter(exit_datetime__isnull=False)
+
+    site = params.get('site')
+    if site and site.isdigit():
+        ingresos = ingresos.filter(patent__site_id=int(site))
+
+    # Rango de fechas de entrada; el filtro de mes es un rango del mes completo
+    date_from = _parse_date(params.get('date_from'))
+    date_to = _parse_date(params.get('date_to'))
+    month = _parse_date(params.get('month'), '%Y-%m')
+    if month:
+        date_from = month
+        date_to = (month.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    if date_from:
+        ingresos = ingresos.filter(entry_datetime__gte=_day_start(date_from))
+    if date_to:
+        ingresos = ingresos.filter(entry_datetime__lt=_day_start(date_to + timedelta(days=1)))
+
+    exit_date = _parse_date(params.get('exit_date'))
+    if exit_date:
+        ingresos = ingresos.filter(
+            exit_datetime__gte=_day_start(exit_date),
+            exit_datetime__lt=_day_start(exit_date + timedelta(days=1)),
+        )
+
+    scheduled = params.get('scheduled')
+    if scheduled in ('true', 'false'):
+        ingresos = ingresos.filter(schedule__isnull=scheduled == 'false')
+
+    authorization = params.get('authorization')
+    if authorization in ('true', 'false'):
+        ingresos = ingresos.filter(authorization=authorization == 'true')
+
+    for param, lookup in (
+        ('chofer', 'chofer__name__icontains'),
+        ('entry_registered_by', 'entry_registered_by__name__icontains'),
+        ('exit_registered_by', 'exit_registered_by__name__icontains'),
+    ):
+        value = (params.get(param) or '').strip()
+        if value:
+            ingresos = ingresos.filter(**{lookup: value})
+
+    return ingresos
+
+
+def encode_cursor(ingreso):
+    raw = f'{ingreso.entry_datetime.isoformat()}|{ingreso.id_ingreso}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(token):
+    """(entry_datetime, id_ingreso) del cursor, o None si no es válido"""
+    try:
+        entry, ingreso_id = base64.urlsafe_b64decode(token.encode()).decode().split('|')
+        entry_datetime = parse_datetime(entry)
+        return (entry_datetime, int(ingreso_id)) if entry_datetime else None
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+def build_ingresos_page(ingresos, cursor=None, per_page=None):
+    """
+    Página de ingresos que sigue al cursor (o la primera).
+    Retorna (ingresos de la página, cursor de la siguiente o None).
+    """
+    per_page = per_page or INGRESOS_PER_PAGE
+    ingresos = ingresos.annotate(
+        first_work_order_id=Subquery(
+            WorkOrder.objects.filter(ingreso=OuterRef('pk')).order_by('pk').values('pk')[:1]
+        ),
+        has_diagnostics=Exists(Diagnostics.objects.filter(related_ingreso=OuterRef('pk'))),
+    ).order_by('-entry_datetime', '-id_ingreso')
+
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        entry_datetime, ingreso_id = position
+        ingresos = ingresos.filter(
+            Q(entry_datetime__lt=entry_datetime) | Q(entry_datetime=entry_datetime, id_ingreso__lt=ingreso_id)
+        )
+
+    # Una fila extra indica si hay otra página
+    rows = list(ingresos[:per_page + 1])
+    next_cursor = encode_cursor(rows[per_page - 1]) if len(rows) > per_page else None
+    return rows[:per_page], next_cursor
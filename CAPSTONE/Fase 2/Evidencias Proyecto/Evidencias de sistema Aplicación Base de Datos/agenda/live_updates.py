@@ -0,0 +1,146 @@
+"""
+Actualizaciones en vivo del detalle de una OT (server-sent events).
+
+Los signals de agenda/models.py incrementan una versión por OT en la caché
+cada vez que cambia una pausa, un mecánico asignado, una tarea o la propia OT
+(estado, inicio o término). El stream de cada navegador solo lee esa versión
+una vez por segundo y, cuando cambia, arma una instantánea liviana (estado,
+pausas fusionadas y mecánicos) y la envía como evento; el JS del detalle
+reemplaza sus datos y los cronómetros siguen sin recargar la página.
+
+La versión vive en la caché por defecto: con varios procesos debe ser una
+caché compartida. Como respaldo, cada FULL_REFRESH_SECONDS la instantánea se
+recalcula igual y se envía solo si cambió.
+
+Servido con ASGI (pepsico_app/asgi.py) la conexión queda abierta hasta
+STREAM_SECONDS y el navegador reconecta solo. Con WSGI (runserver) un stream
+largo bloquearía un worker, así que se responde una sola instantánea y el
+campo `retry` hace que EventSource vuelva a consultar cada pocos segundos.
+"""
+import asyncio
+import hashlib
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Min
+from django.utils import timezone
+
+from documents.models import TaskAssignment, WorkOrder
+
+from .pause_timeline import PauseTimeline
+
+POLL_INTERVAL = 1
+HEARTBEAT_SECONDS = 15
+FULL_REFRESH_SECONDS = 30
+STREAM_SECONDS = 5 * 60
+# Milisegundos que espera EventSource antes de reconectar
+RECONNECT_MS = 3000
+WSGI_RECONNECT_MS = 5000
+
+
+def _version_key(work_order_id):
+    return f'work_order_live:{work_order_id}'
+
+
+def notify_work_order(work_order_id):
+    """Marca la OT como modificada para los streams abiertos"""
+    if not work_order_id:
+        return
+    key = _version_key(work_order_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def work_order_version(work_order_id):
+    return cache.get(_version_key(work_order_id), 0)
+
+
+def work_order_snapshot(work_order_id):
+    """
+    Estado que necesitan los cronómetros del detalle: estado de la OT, pausas
+    fusionadas por mecánico y mecánicos activos con el inicio de su primera
+    tarea. Retorna None si la OT no existe.
+    """
+    work_order = WorkOrder.objects.select_related('status').filter(id_work_order=work_order_id).first()
+    if work_order is None:
+        return None
+    timeline = PauseTimeline.for_work_order(work_order, until=work_order.actual_completion or timezone.now())
+    first_task = dict(
+        TaskAssignment.objects.filter(task__work_order_id=work_order_id).values('user_id')
+        .annotate(first=Min('assigned_at')).values_list('user_id', 'first').order_by()
+    )
+
+    mechanics = []
+    for assignment_id, mechanic_id, name, assigned in work_order.mechanic_assignments.filter(
+        is_active=True
+    ).order_by('assigned_datetime', 'id_assignment').values_list(
+        'id_assignment', 'mechanic_id', 'mechanic__name', 'assigned_datetime'
+    ):
+        has_tasks = mechanic_id in first_task
+        mechanics.append({
+            'id': assignment_id,
+            'name': name,
+            'hasTasks': has_tasks,
+            'taskStartTime': first_task[mechanic_id] if has_tasks and work_order.work_started_at else assigned,
+            'paused': timeline.active_pause_for(assignment_id) is not None,
+        })
+
+    return {
+        'id': work_order.id_work_order,
+        'status': {'name': work_order.status.name, 'color': work_order.status.color},
+        'workStartedAt': work_order.work_started_at,
+        'completed': work_order.actual_completion is not None,
+        'globalPause': timeline.global_active_pause is not None,
+        'mechanics': mechanics,
+        'pauses': timeline.pauses_payload(mechanic['id'] for mechanic in mechanics),
+    }
+
+
+def _event(snapshot):
+    """(id, texto) del evento SSE; el id es un hash del contenido para Last-Event-ID"""
+    data = json.dumps(snapshot, cls=DjangoJSONEncoder, separators=(',', ':'))
+    event_id = hashlib.md5(data.encode()).hexdigest()
+    return event_id, f'id: {event_id}\nevent: work_order\ndata: {data}\n\n'
+
+
+def snapshot_event(work_order_id, retry=RECONNECT_MS):
+    """Una sola instantánea como respuesta SSE completa (modo WSGI)"""
+    snapshot = work_order_snapshot(work_order_id)
+    return f'retry: {retry}\n\n' + (_event(snapshot)[1] if snapshot else 'event: deleted\ndata: {}\n\n')
+
+
+async def work_order_events(work_order_id, last_event_id=None):
+    """
+    Generador asíncrono del stream: una instantánea al conectar (salvo que
+    coincida con Last-Event-ID) y luego una por cada cambio de versión.
+    """
+    load_snapshot = sync_to_async(work_order_snapshot)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    sent_id = last_event_id
+    version = None
+    last_refresh = last_write = started - FULL_REFRESH_SECONDS
+
+    yield f'retry: {RECONNECT_MS}\n\n'
+    while loop.time() - started < STREAM_SECONDS:
+        now = loop.time()
+        current = await cache.aget(_version_key(work_order_id), 0)
+        if current != version or now - last_refresh >= FULL_REFRESH_SECONDS:
+            version, last_refresh = current, now
+            snapshot = await load_snapshot(work_order_id)
+            if snapshot is None:
+                yield 'event: deleted\ndata: {}\n\n'
+                return
+            event_id, event = _event(snapshot)
+            if event_id != sent_id:
+                sent_id, last_write = event_id, now
+                yield event
+        if now - last_write >= HEARTBEAT_SECONDS:
+            # Comentario SSE: mantiene viva la conexión a través de proxies
+            last_write = now
+            yield ': ping\n\n'
+        await asyncio.sleep(POLL_INTERVAL)
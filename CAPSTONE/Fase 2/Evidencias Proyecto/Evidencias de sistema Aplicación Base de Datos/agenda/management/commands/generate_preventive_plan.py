@@ -0,0 +1,33 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from agenda.preventive_plan import PLAN_HORIZON_DAYS, generate_preventive_plan
+
+
+class Command(BaseCommand):
+    help = 'Genera los agendamientos de mantención preventiva de los vehículos con plan'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Primer día del plan (AAAA-MM-DD); por defecto mañana')
+        parser.add_argument('--dias', type=int, default=PLAN_HORIZON_DAYS, help='Días del horizonte del plan')
+        parser.add_argument('--sucursal', type=int, help='Generar solo para esta sucursal (id)')
+        parser.add_argument('--dry-run', action='store_true', help='Calcular el plan sin guardar agendamientos')
+
+    def handle(self, *args, **options):
+        try:
+            start_day = datetime.strptime(options['desde'], '%Y-%m-%d').date() if options['desde'] else None
+            if options['dias'] < 1:
+                raise ValueError('El horizonte debe ser de al menos un día')
+            result = generate_preventive_plan(
+                start_day=start_day, horizon_days=options['dias'],
+                site_id=options['sucursal'], dry_run=options['dry_run'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        action = 'Se calcularían' if options['dry_run'] else 'Se crearon'
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} {len(result['schedules'])} agendamientos preventivos "
+            f"({result['due']} vehículos con mantención vencida, {result['unscheduled']} sin cupo en el horizonte)"
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from agenda.pending_schedules import rebuild_pending_days
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el día pendiente de los agendamientos sin ingreso'
+
+    def handle(self, *args, **options):
+        count = rebuild_pending_days()
+        self.stdout.write(self.style.SUCCESS(f'Índice de agendamientos pendientes regenerado: {count} pendientes'))
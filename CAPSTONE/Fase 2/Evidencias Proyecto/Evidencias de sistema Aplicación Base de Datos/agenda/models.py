@@ -1,3 +1,163 @@
 from django.db import models
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from documents.models import (
+    Diagnostics, Incident, Ingreso, MaintenanceSchedule, Task, Vehicle, WorkOrder, WorkOrderMechanic,
+    WorkOrderStatus,
+)
+from pausas.models import WorkOrderPause
 
 # Create your models here.
+
+
+@receiver([post_save, post_delete], sender=MaintenanceSchedule)
+def invalidate_slot_occupancy(sender, instance, **kwargs):
+    """
+    Signal para recalcular la ocupación de bahías de la sucursal cuando cambia su agenda.
+    """
+    from agenda.slot_finder import invalidate_site_occupancy
+    invalidate_site_occupancy(instance.patent.site_id)
+
+
+@receiver(post_save, sender=MaintenanceSchedule)
+def index_pending_schedule(sender, instance, **kwargs):
+    """
+    Signal para mantener el día pendiente del agendamiento al crearlo o cambiarlo.
+    """
+    from agenda.pending_schedules import refresh_pending_days
+    refresh_pending_days([instance.pk])
+
+
+@receiver(post_delete, sender=MaintenanceSchedule)
+def unindex_pending_schedule(sender, instance, **kwargs):
+    from agenda.pending_schedules import invalidate_available_dates
+    invalidate_available_dates()
+
+
+@receiver(post_save, sender=Vehicle)
+def count_vehicle_created(sender, instance, created, **kwargs):
+    """
+    Signal para sumar el vehículo nuevo al contador de la portada.
+    """
+    if created:
+        from agenda.home_counters import adjust_counter
+        adjust_counter('vehicles_count', 1)
+
+
+@receiver(post_delete, sender=Vehicle)
+def count_vehicle_deleted(sender, instance, **kwargs):
+    from agenda.home_counters import adjust_counter
+    adjust_counter('vehicles_count', -1)
+
+
+@receiver(pre_save, sender=Ingreso)
+def remember_ingreso_open(sender, instance, **kwargs):
+    """
+    Signal para recordar si el ingreso estaba abierto y su agendamiento antes de guardarlo.
+    """
+    if not instance._state.adding:
+        previous = list(Ingreso.objects.filter(pk=instance.pk).values_list('exit_datetime', 'schedule_id'))
+        instance._was_open = bool(previous) and previous[0][0] is None
+        instance._previous_schedule_id = previous[0][1] if previous else None
+
+
+@receiver(post_save, sender=Ingreso)
+def count_ingreso_saved(sender, instance, created, **kwargs):
+    """
+    Signal para ajustar el contador de ingresos abiertos cuando se registra una entrada o salida.
+    """
+    from agenda.home_counters import adjust_counter
+    is_open = instance.exit_datetime is None
+    was_open = False if created else getattr(instance, '_was_open', is_open)
+    adjust_counter('ingresos_count', int(is_open) - int(was_open))
+
+
+@receiver(post_save, sender=Ingreso)
+def index_ingreso_schedule(sender, instance, created, **kwargs):
+    """
+    Signal para sacar el agendamiento de los pendientes al registrar su ingreso
+    (o devolverlo si el ingreso cambia de agendamiento).
+    """
+    previous_schedule_id = None if created else getattr(instance, '_previous_schedule_id', instance.schedule_id)
+    if previous_schedule_id != instance.schedule_id:
+        from agenda.pending_schedules import refresh_pending_days
+        refresh_pending_days([previous_schedule_id, instance.schedule_id])
+
+
+@receiver(post_delete, sender=Ingreso)
+def unindex_ingreso_schedule(sender, instance, **kwargs):
+    if instance.schedule_id:
+        from agenda.pending_schedules import refresh_pending_days
+        refresh_pending_days([instance.schedule_id])
+
+
+@receiver(post_delete, sender=Ingreso)
+def count_ingreso_deleted(sender, instance, **kwargs):
+    if instance.exit_datetime is None:
+        from agenda.home_counters import adjust_counter
+        adjust_counter('ingresos_count', -1)
+
+
+@receiver(pre_save, sender=WorkOrder)
+def remember_work_order_status(sender, instance, **kwargs):
+    """
+    Signal para recordar el estado previo de la OT antes de guardarla.
+    """
+    if not instance._state.adding:
+        instance._previous_status_id = WorkOrder.objects.filter(pk=instance.pk).values_list(
+            'status_id', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=WorkOrder)
+def count_work_order_saved(sender, instance, created, **kwargs):
+    """
+    Signal para ajustar el contador de OTs activas cuando una OT se crea o cambia de estado.
+    """
+    from agenda.home_counters import active_status_ids, adjust_counter
+    previous = None if created else getattr(instance, '_previous_status_id', instance.status_id)
+    if previous == instance.status_id and not created:
+        return
+    active = active_status_ids({previous, instance.status_id})
+    adjust_counter('workorders_count', int(instance.status_id in active) - int(previous in active))
+
+
+@receiver(post_delete, sender=WorkOrder)
+def count_work_order_deleted(sender, instance, **kwargs):
+    from agenda.home_counters import active_status_ids, adjust_counter
+    if instance.status_id in active_status_ids({instance.status_id}):
+        adjust_counter('workorders_count', -1)
+
+
+@receiver([post_save, post_delete], sender=WorkOrderStatus)
+def invalidate_work_orders_counter(sender, **kwargs):
+    """
+    Signal para recalcular las OTs activas si se renombra o elimina un estado.
+    """
+    from agenda.home_counters import invalidate_counter
+    invalidate_counter('workorders_count')
+
+
+@receiver([post_save, post_delete], sender=Diagnostics)
+@receiver(m2m_changed, sender=Diagnostics.incidents.through)
+@receiver(post_delete, sender=Incident)
+def invalidate_incidents_counter(sender, **kwargs):
+    """
+    Signal para recalcular los incidentes abiertos cuando cambian sus diagnósticos.
+    """
+    from agenda.home_counters import invalidate_counter
+    invalidate_counter('incidents_count')
+
+
+@receiver([post_save, post_delete], sender=WorkOrder)
+@receiver([post_save, post_delete], sender=WorkOrderPause)
+@receiver([post_save, post_delete], sender=WorkOrderMechanic)
+@receiver([post_save, post_delete], sender=Task)
+def notify_work_order_detail(sender, instance, **kwargs):
+    """
+    Signal para avisar a los detalles abiertos de la OT (stream SSE) que cambió su estado,
+    sus pausas, sus mecánicos o sus tareas.
+    """
+    from agenda.live_updates import notify_work_order
+    notify_work_order(instance.pk if sender is WorkOrder else instance.work_order_id)
@@ -0,0 +1,88 @@
+"""
+Mapa de calor de ocupación del calendario.
+
+Para un rango (mes o trimestre) entrega, por sucursal y día, la cantidad de
+agendamientos, de ingresos y de OTs abiertas. Cada métrica sale de una
+consulta agrupada por (día, sucursal); las OTs abiertas se obtienen sumando
+las creadas y restando las completadas día a día a partir de las que ya
+estaban abiertas al inicio del rango, sin recorrer OT por OT. Una OT en
+estado terminal (completada o cancelada) sin fecha de término no cuenta como
+abierta: no se sabe cuándo se cerró.
+"""
+from datetime import timedelta
+
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from documents.models import Ingreso, MaintenanceSchedule, Site, WorkOrder
+
+CLOSED_WORK_ORDER_STATUSES = ['Completada', 'Cancelada']
+
+
+def _grouped(queryset, datetime_field, site_field):
+    """{(día, sucursal): cantidad} con un GROUP BY por día local y sucursal"""
+    rows = queryset.annotate(day=TruncDate(datetime_field)).values('day', site_field).annotate(
+        total=Count('pk')
+    ).values_list('day', site_field, 'total').order_by()
+    return {(day, site_id): total for day, site_id, total in rows}
+
+
+def occupancy_heatmap(start, end, site_id=None):
+    """
+    Conteos diarios por sucursal entre start (incluido) y end (excluido).
+    Retorna {'days': [...], 'sites': [{'id', 'name', 'schedules', 'ingresos',
+    'open_work_orders'}]} con un arreglo alineado con 'days' por métrica.
+    """
+    first_day = timezone.localtime(start).date()
+    last_day = timezone.localtime(end - timedelta(microseconds=1)).date()
+    days = [first_day + timedelta(days=offset) for offset in range((last_day - first_day).days + 1)]
+
+    schedules = MaintenanceSchedule.objects.filter(start_datetime__gte=start, start_datetime__lt=end)
+    ingresos = Ingreso.objects.filter(entry_datetime__gte=start, entry_datetime__lt=end)
+    work_orders = WorkOrder.objects.filter(ingreso__isnull=False).exclude(
+        status__name__in=CLOSED_WORK_ORDER_STATUSES, actual_completion__isnull=True
+    )
+    sites = Site.objects.order_by('name', 'id_site')
+    if site_id:
+        schedules = schedules.filter(patent__site_id=site_id)
+        ingresos = ingresos.filter(patent__site_id=site_id)
+        work_orders = work_orders.filter(ingreso__patent__site_id=site_id)
+        sites = sites.filter(id_site=site_id)
+
+    schedule_counts = _grouped(schedules, 'start_datetime', 'patent__site_id')
+    ingreso_counts = _grouped(ingresos, 'entry_datetime', 'patent__site_id')
+    created_counts = _grouped(
+        work_orders.filter(created_datetime__gte=start, created_datetime__lt=end),
+        'created_datetime', 'ingreso__patent__site_id',
+    )
+    completed_counts = _grouped(
+        work_orders.filter(actual_completion__gte=start, actual_completion__lt=end),
+        'actual_completion', 'ingreso__patent__site_id',
+    )
+    # OTs abiertas al comenzar el rango
+    open_at_start = dict(
+        work_orders.filter(created_datetime__lt=start).filter(
+            Q(actual_completion__isnull=True) | Q(actual_completion__gte=start)
+        ).values('ingreso__patent__site_id').annotate(total=Count('pk'))
+        .values_list('ingreso__patent__site_id', 'total').order_by()
+    )
+
+    heatmap_sites = []
+    for current_site_id, name in sites.values_list('id_site', 'name'):
+        open_work_orders = []
+        # Abiertas durante el día: las que venían abiertas más las creadas ese día
+        open_now = open_at_start.get(current_site_id, 0)
+        for day in days:
+            open_now += created_counts.get((day, current_site_id), 0)
+            open_work_orders.append(open_now)
+            open_now -= completed_counts.get((day, current_site_id), 0)
+        heatmap_sites.append({
+            'id': current_site_id,
+            'name': name,
+            'schedules': [schedule_counts.get((day, current_site_id), 0) for day in days],
+            'ingresos': [ingreso_counts.get((day, current_site_id), 0) for day in days],
+            'open_work_orders': open_work_orders,
+        })
+
+    return {'days': [day.isoformat() for day in days], 'sites': heatmap_sites}
@@ -0,0 +1,163 @@
+"""
+Línea de tiempo de pausas de una orden de trabajo.
+
+Carga todas las pausas de una OT una sola vez y, fusionando los intervalos
+personales de cada mecánico con las pausas globales (O(n log n)), entrega el
+tiempo real de trabajo, el tiempo en pausa y la pausa activa de cada mecánico.
+La usan el detalle de la OT, el payload `pauses_data` del JS y los reportes.
+"""
+from django.utils import timezone
+
+from pausas.models import WorkOrderPause
+
+from .work_calendar import get_work_calendar
+
+
+def merge_intervals(intervals):
+    """Fusiona intervalos (inicio, fin) que se solapan o tocan. Retorna la lista ordenada"""
+    merged = []
+    for start, end in sorted(intervals, key=lambda interval: interval[0]):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class PauseTimeline:
+    """Pausas de una OT agrupadas en globales (sin mecánico) y personales por asignación"""
+
+    def __init__(self, pauses, until=None, calendar=None):
+        self.until = until or timezone.now()
+        self.calendar = calendar or get_work_calendar()
+        self.pauses = [pause for pause in pauses if pause.is_active]
+        self.global_pauses = []
+        self.personal_pauses = {}
+        for pause in self.pauses:
+            if pause.mechanic_assignment_id is None:
+                self.global_pauses.append(pause)
+            else:
+                self.personal_pauses.setdefault(pause.mechanic_assignment_id, []).append(pause)
+        self._merged_cache = {}
+
+    @classmethod
+    def for_work_order(cls, work_order, until=None):
+        """Construye la línea de tiempo con una única consulta de pausas"""
+        pauses = WorkOrderPause.objects.filter(
+            work_order=work_order, is_active=True
+        ).select_related(
+            'mechanic_assignment__mechanic', 'pause_type', 'created_by'
+        ).order_by('start_datetime')
+        return cls(pauses, until=until, calendar=get_work_calendar(work_order.calendar_site_id))
+
+    @classmethod
+    def from_prefetched(cls, work_order, calendar=None):
+        """Usa `work_order.pauses.all()` (idealmente prefetcheado), hasta el término de la OT o ahora"""
+        return cls(work_order.pauses.all(), until=work_order.actual_completion, calendar=calendar)
+
+    def _interval(self, pause):
+        end = pause.end_datetime or self.until
+        return pause.start_datetime, max(pause.start_datetime, end)
+
+    def merged_intervals(self, assignment_id=None):
+        """Intervalos fusionados que detienen a un mecánico (sus pausas + las globales)"""
+        if assignment_id not in self._merged_cache:
+            pauses = list(self.global_pauses)
+            if assignment_id is not None:
+                pauses += self.personal_pauses.get(assignment_id, [])
+            self._merged_cache[assignment_id] = merge_intervals(self._interval(p) for p in pauses)
+        return self._merged_cache[assignment_id]
+
+    @property
+    def global_active_pause(self):
+        return next((p for p in self.global_pauses if p.end_datetime is None), None)
+
+    @property
+    def has_active_pause(self):
+        return any(p.end_datetime is None for p in self.pauses)
+
+    def active_personal_pause(self, assignment_id):
+        return next(
+            (p for p in self.personal_pauses.get(assignment_id, []) if p.end_datetime is None),
+            None
+        )
+
+    def has_active_personal_pause(self, assignment_id):
+        """Si el mecánico registró una pausa personal que sigue abierta (aunque tenga otras activas)"""
+        return any(
+            p.end_datetime is None and p.is_personal_pause
+            for p in self.personal_pauses.get(assignment_id, [])
+        )
+
+    def active_pause_for(self, assignment_id):
+        """Pausa activa que afecta al mecánico (personal o global), o None"""
+        return self.active_personal_pause(assignment_id) or self.global_active_pause
+
+    def mechanic_times(self, assignment_id, start, end=None):
+        """
+        Tiempo de trabajo y de pausa (en horas laborales) de un mecánico entre
+        start y end, descontando la unión de sus pausas personales y globales.
+        """
+        end = end or self.until
+        work_hours = 0
+        pause_hours = 0
+        if start is None or end <= start:
+            return {'work_hours': 0, 'pause_hours': 0, 'active_pause': self.active_pause_for(assignment_id)}
+
+        cursor = start
+        for pause_start, pause_end in self.merged_intervals(assignment_id):
+            if pause_end <= cursor:
+                continue
+            if pause_start >= end:
+                break
+            pause_start = max(pause_start, cursor)
+            pause_end = min(pause_end, end)
+            if cursor < pause_start:
+                work_hours += self.calendar.elapsed(cursor, pause_start)
+            pause_hours += self.calendar.elapsed(pause_start, pause_end)
+            cursor = pause_end
+        if cursor < end:
+            work_hours += self.calendar.elapsed(cursor, end)
+
+        return {
+            'work_hours': work_hours,
+            'pause_hours': pause_hours,
+            'active_pause': self.active_pause_for(assignment_id),
+        }
+
+    def mechanic_pause_hours(self, assignment_id):
+        """Horas en que el mecánico estuvo detenido (pausas personales y globales fusionadas)"""
+        return sum(self.calendar.elapsed_many(self.merged_intervals(assignment_id)))
+
+    def total_pause_hours(self):
+        """
+        Horas de pausa de la OT sin contar dos veces los solapamientos: la unión de
+        las pausas globales más, por mecánico, lo que sus pausas personales agregan.
+        """
+        global_hours = self.mechanic_pause_hours(None)
+        total = global_hours
+        for assignment_id in self.personal_pauses:
+            total += self.mechanic_pause_hours(assignment_id) - global_hours
+        return total
+
+    def pauses_payload(self, assignment_ids):
+        """Datos para el JS del detalle: intervalos ya fusionados por mecánico y pausas globales"""
+        payload = {}
+        for assignment_id in assignment_ids:
+            is_paused = self.active_pause_for(assignment_id) is not None
+            intervals = self.merged_intervals(assignment_id)
+            payload[str(assignment_id)] = [
+                {
+                    'start': start.isoformat(),
+                    # El último intervalo queda abierto si el mecánico sigue en pausa
+                    'end': None if is_paused and index == len(intervals) - 1 else end.isoformat(),
+                } for index, (start, end) in enumerate(intervals)
+            ]
+        payload['global'] = [
+            {
+                'start': pause.start_datetime.isoformat(),
+                'end': pause.end_datetime.isoformat() if pause.end_datetime else None,
+            } for pause in self.global_pauses
+        ]
+        return payload
@@ -0,0 +1,64 @@
+"""
+Agendamientos pendientes de ingreso, por día.
+
+Cada agendamiento sin ingreso guarda su día local en `pending_day` (NULL una
+vez que se registra el ingreso). Los signals de agenda/models.py lo recalculan
+cuando se crea, cambia o elimina un ingreso o un agendamiento, así la lista
+del día es una búsqueda en el índice (pending_day, start_datetime) en lugar
+del anti-join `ingresos__isnull=True` sobre toda la tabla. Las fechas con
+pendientes del selector se cachean y se descartan con cada recálculo.
+"""
+from django.core.cache import cache
+from django.db.models.functions import TruncDate
+
+from documents.models import MaintenanceSchedule
+
+AVAILABLE_DATES_TIMEOUT = 60 * 60
+
+_VERSION_KEY = 'pending_schedules_version'
+
+
+def refresh_pending_days(schedule_ids):
+    """Recalcula pending_day de los agendamientos dados con dos UPDATE"""
+    schedule_ids = [schedule_id for schedule_id in set(schedule_ids) if schedule_id is not None]
+    if not schedule_ids:
+        return
+    schedules = MaintenanceSchedule.objects.filter(id_schedule__in=schedule_ids)
+    schedules.filter(ingresos__isnull=False).exclude(pending_day=None).update(pending_day=None)
+    schedules.filter(ingresos__isnull=True).update(pending_day=TruncDate('start_datetime'))
+    invalidate_available_dates()
+
+
+def rebuild_pending_days():
+    """Recalcula el índice completo. Retorna la cantidad de agendamientos pendientes"""
+    MaintenanceSchedule.objects.filter(ingresos__isnull=False).exclude(pending_day=None).update(pending_day=None)
+    pending = MaintenanceSchedule.objects.filter(ingresos__isnull=True).update(pending_day=TruncDate('start_datetime'))
+    invalidate_available_dates()
+    return pending
+
+
+def invalidate_available_dates():
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        cache.set(_VERSION_KEY, 1, None)
+
+
+def available_dates():
+    """Fechas con agendamientos pendientes, en orden"""
+    key = f'pending_schedules:{cache.get(_VERSION_KEY, 0)}:dates'
+    dates = cache.get(key)
+    if dates is None:
+        dates = list(
+            MaintenanceSchedule.objects.filter(pending_day__isnull=False)
+            .order_by('pending_day').values_list('pending_day', flat=True).distinct()
+        )
+        cache.set(key, dates, AVAILABLE_DATES_TIMEOUT)
+    return dates
+
+
+def pending_schedules_for_day(day):
+    """Agendamientos sin ingreso del día, con los datos que muestran las tarjetas"""
+    return MaintenanceSchedule.objects.filter(pending_day=day).select_related(
+        'patent', 'patent__site', 'expected_chofer', 'assigned_user'
+    ).order_by('start_datetime')
@@ -0,0 +1,184 @@
+"""
+Generador del plan de mantención preventiva de la flota.
+
+Para cada vehículo con `plan=True` (operativo y no en remate) calcula cuándo
+le toca la próxima mantención: desde su último agendamiento o ingreso, lo que
+se cumpla primero entre la pauta en días de su VehicleType y la pauta en
+kilómetros, estimando los km diarios con su kilometraje y antigüedad. Los
+vehículos que ya tienen una mantención agendada a futuro se omiten.
+
+Los vencidos se ubican, del más atrasado al más reciente, en el primer bloque
+de SLOT_DURATION con bahía libre de su sucursal a partir de su fecha, contando
+los agendamientos existentes. Los días llenos se saltan con un union-find, así
+cada vehículo se ubica en tiempo casi constante, y todo se inserta con
+bulk_create: unas pocas consultas para cualquier tamaño de flota.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from documents.models import Ingreso, MaintenanceSchedule, Site, UserStatus, Vehicle
+
+from .pending_schedules import invalidate_available_dates
+from .scheduling import SLOT_DURATION
+from .slot_finder import invalidate_site_occupancy
+from .work_calendar import get_work_calendar
+
+PLAN_HORIZON_DAYS = 30
+PLAN_OBSERVATIONS = 'Mantención preventiva (plan automático)'
+PLAN_STATUS_NAME = 'Activo'
+BULK_BATCH_SIZE = 1000
+
+
+def _local(value):
+    return timezone.make_naive(value) if timezone.is_aware(value) else value
+
+
+def due_date(last_service, interval_days, interval_km=None, mileage=None, age=None):
+    """Fecha de la próxima mantención según la pauta en días o en km (lo que ocurra primero)"""
+    days = interval_days
+    if interval_km and mileage:
+        daily_km = mileage / (max(age or 0, 1) * 365)
+        days = min(days, int(interval_km / daily_km))
+    return last_service + timedelta(days=days)
+
+
+class SiteSlots:
+    """Bahías libres por día y bloque de SLOT_DURATION de una sucursal en el horizonte"""
+
+    def __init__(self, calendar, bays, days):
+        self.first_day = days[0]
+        self.slots = []
+        for day in days:
+            shift = calendar.shift_for(day)
+            day_slots = []
+            if shift:
+                start = datetime.combine(day, time.min) + timedelta(hours=shift[0])
+                count = int(timedelta(hours=shift[1]) / SLOT_DURATION)
+                day_slots = [[start + SLOT_DURATION * index, bays] for index in range(count)]
+            self.slots.append(day_slots)
+        # _next[i] apunta a un día >= i con bahías libres (len(days) = ninguno)
+        self._next = list(range(len(days) + 1))
+        for index in range(len(days)):
+            self._refresh(index)
+
+    def _refresh(self, index):
+        if not any(free > 0 for _, free in self.slots[index]):
+            self._next[index] = index + 1
+
+    def _find(self, index):
+        root = index
+        while self._next[root] != root:
+            root = self._next[root]
+        while self._next[index] != root:
+            self._next[index], index = root, self._next[index]
+        return root
+
+    def occupy(self, start):
+        """Descuenta un agendamiento existente (hora local) de los bloques que toca"""
+        end = start + SLOT_DURATION
+        for day in {start.date(), end.date()}:
+            index = (day - self.first_day).days
+            if not 0 <= index < len(self.slots):
+                continue
+            for day_slot in self.slots[index]:
+                if start < day_slot[0] + SLOT_DURATION and day_slot[0] < end and day_slot[1] > 0:
+                    day_slot[1] -= 1
+            self._refresh(index)
+
+    def take(self, day):
+        """Reserva el primer bloque libre desde `day`. Retorna su inicio (hora local) o None"""
+        index = self._find(max((day - self.first_day).days, 0))
+        if index >= len(self.slots):
+            return None
+        day_slot = next(day_slot for day_slot in self.slots[index] if day_slot[1] > 0)
+        day_slot[1] -= 1
+        self._refresh(index)
+        return day_slot[0]
+
+
+def generate_preventive_plan(start_day=None, horizon_days=PLAN_HORIZON_DAYS, site_id=None, dry_run=False):
+    """
+    Genera los agendamientos preventivos de la flota entre start_day (por
+    defecto mañana) y start_day + horizon_days. Retorna un resumen con los
+    agendamientos ('schedules', sin guardar si dry_run), cuántos vehículos
+    vencían ('due') y cuántos no cupieron en el horizonte ('unscheduled').
+    """
+    status = UserStatus.objects.filter(name=PLAN_STATUS_NAME).first()
+    if status is None:
+        raise ValueError(f'No existe el estado "{PLAN_STATUS_NAME}" para los agendamientos')
+
+    start_day = start_day or timezone.localdate() + timedelta(days=1)
+    days = [start_day + timedelta(days=offset) for offset in range(horizon_days)]
+    window_start = timezone.make_aware(datetime.combine(start_day, time.min))
+    window_end = timezone.make_aware(datetime.combine(days[-1] + timedelta(days=1), time.min))
+    now = timezone.now()
+
+    vehicles = Vehicle.objects.filter(plan=True, out_of_service=False, auction=False)
+    if site_id:
+        vehicles = vehicles.filter(site_id=site_id)
+    vehicle_rows = list(vehicles.values_list(
+        'patent', 'site_id', 'mileage', 'age',
+        'type__maintenance_interval_days', 'type__maintenance_interval_km',
+    ))
+
+    # Último agendamiento e ingreso por vehículo, en dos agregaciones
+    last_schedule = dict(
+        MaintenanceSchedule.objects.filter(patent__in=vehicles).values('patent')
+        .annotate(last=Max('start_datetime')).values_list('patent', 'last')
+    )
+    last_entry = dict(
+        Ingreso.objects.filter(patent__in=vehicles).values('patent')
+        .annotate(last=Max('entry_datetime')).values_list('patent', 'last')
+    )
+
+    due = []
+    for patent, vehicle_site_id, mileage, age, interval_days, interval_km in vehicle_rows:
+        scheduled = last_schedule.get(patent)
+        if scheduled and scheduled >= now:
+            continue  # Ya tiene una mantención agendada
+        history = [moment for moment in (scheduled, last_entry.get(patent)) if moment]
+        if history:
+            next_day = due_date(_local(max(history)).date(), interval_days, interval_km, mileage, age)
+        else:
+            next_day = start_day
+        if next_day <= days[-1]:
+            due.append((max(next_day, start_day), patent, vehicle_site_id))
+    due.sort()
+
+    # Capacidad de cada sucursal descontando lo ya agendado en el horizonte
+    site_ids = {vehicle_site_id for _, _, vehicle_site_id in due}
+    site_slots = {
+        current_site_id: SiteSlots(get_work_calendar(current_site_id), bays, days)
+        for current_site_id, bays in Site.objects.filter(id_site__in=site_ids).values_list('id_site', 'workshop_bays')
+    }
+    for schedule_site_id, start in MaintenanceSchedule.objects.filter(
+        patent__site_id__in=site_ids,
+        start_datetime__gt=window_start - SLOT_DURATION, start_datetime__lt=window_end,
+    ).values_list('patent__site_id', 'start_datetime'):
+        site_slots[schedule_site_id].occupy(_local(start))
+
+    schedules = []
+    for next_day, patent, vehicle_site_id in due:
+        start = site_slots[vehicle_site_id].take(next_day)
+        if start is None:
+            continue
+        schedules.append(MaintenanceSchedule(
+            patent_id=patent,
+            start_datetime=timezone.make_aware(start),
+            status=status,
+            observations=PLAN_OBSERVATIONS,
+            pending_day=start.date(),
+        ))
+
+    if not dry_run and schedules:
+        with transaction.atomic():
+            MaintenanceSchedule.objects.bulk_create(schedules, batch_size=BULK_BATCH_SIZE)
+        # bulk_create no dispara los signals de ocupación ni del índice de pendientes
+        for current_site_id in site_ids:
+            invalidate_site_occupancy(current_site_id)
+        invalidate_available_dates()
+
+    return {'schedules': schedules, 'due': len(due), 'unscheduled': len(due) - len(schedules)}
@@ -0,0 +1,147 @@
+"""
+Detección de conflictos de agenda de mantenciones.
+
+Cada agendamiento ocupa una bahía del taller durante SLOT_DURATION. Los
+agendamientos se indexan como listas ordenadas de inicios por vehículo y por
+sucursal, así las reservas que se solapan con un horario propuesto se ubican
+por búsqueda binaria (O(log n)) en lugar de recorrer toda la agenda.
+"""
+import bisect
+import sys
+from datetime import timedelta
+
+from django.db.models import Q
+
+from documents.models import MaintenanceSchedule, Site, Vehicle
+
+# Duración que bloquea cada agendamiento en el taller
+SLOT_DURATION = timedelta(hours=2)
+
+_MAX_ID = sys.maxsize
+
+
+class ScheduleIndex:
+    """Índice de intervalos (inicio, id) ordenados por vehículo y por sucursal"""
+
+    def __init__(self, slot_duration=SLOT_DURATION):
+        self.slot = slot_duration
+        self.by_vehicle = {}
+        self.by_site = {}
+        self.site_bays = {}
+        self._next_proposal_id = -1
+
+    @classmethod
+    def load(cls, window_start, window_end, patents=(), site_ids=(), slot_duration=SLOT_DURATION):
+        """Carga en una consulta los agendamientos que pueden chocar con el rango [window_start, window_end]"""
+        index = cls(slot_duration)
+        patents = set(patents)
+        site_ids = set(site_ids)
+        if not patents and not site_ids:
+            return index
+
+        schedules = MaintenanceSchedule.objects.filter(
+            Q(patent_id__in=patents) | Q(patent__site_id__in=site_ids),
+            start_datetime__gt=window_start - index.slot,
+            start_datetime__lt=window_end + index.slot,
+        ).values_list('id_schedule', 'patent_id', 'patent__site_id', 'start_datetime')
+        for schedule_id, patent, site_id, start in schedules:
+            index.add(patent, site_id, start, schedule_id)
+
+        index.site_bays = dict(
+            Site.objects.filter(id_site__in=site_ids).values_list('id_site', 'workshop_bays')
+        )
+        return index
+
+    def add(self, patent, site_id, start, schedule_id=None):
+        """Agrega una reserva; las propuestas sin id reciben ids negativos"""
+        if schedule_id is None:
+            schedule_id = self._next_proposal_id
+            self._next_proposal_id -= 1
+        bisect.insort(self.by_vehicle.setdefault(patent, []), (start, schedule_id))
+        if site_id is not None:
+            bisect.insort(self.by_site.setdefault(site_id, []), (start, schedule_id))
+        return schedule_id
+
+    def _overlapping(self, entries, start, exclude_id=None):
+        """Reservas cuyo intervalo se cruza con [start, start + slot)"""
+        low = bisect.bisect_right(entries, (start - self.slot, _MAX_ID))
+        high = bisect.bisect_left(entries, (start + self.slot, -_MAX_ID))
+        return [entry for entry in entries[low:high] if entry[1] != exclude_id]
+
+    def vehicle_conflicts(self, patent, start, exclude_id=None):
+        return self._overlapping(self.by_vehicle.get(patent, []), start, exclude_id)
+
+    def site_conflicts(self, site_id, start, exclude_id=None):
+        """
+        Reservas de la sucursal que se cruzan con el horario cuando, sumando la
+        propuesta, en algún momento se superan las bahías disponibles.
+        """
+        overlapping = self._overlapping(self.by_site.get(site_id, []), start, exclude_id)
+        bays = self.site_bays.get(site_id, 1)
+        if len(overlapping) < bays:
+            return []
+
+        starts = [entry[0] for entry in overlapping]
+        # La ocupación solo cambia al inicio de la propuesta o al inicio de otra reserva
+        checkpoints = [start] + [s for s in starts if s > start]
+        busiest = max(
+            bisect.bisect_right(starts, point) - bisect.bisect_right(starts, point - self.slot)
+            for point in checkpoints
+        )
+        return overlapping if busiest >= bays else []
+
+    def check(self, patent, site_id, start, exclude_id=None):
+        """Lista de conflictos (vacía si el horario está libre)"""
+        conflicts = []
+        vehicle_conflicts = self.vehicle_conflicts(patent, start, exclude_id)
+        if vehicle_conflicts:
+            conflicts.append({
+                'type': 'vehicle',
+                'schedule_ids': [schedule_id for _, schedule_id in vehicle_conflicts],
+                'message': f'El vehículo {patent} ya tiene un agendamiento que se superpone con este horario.',
+            })
+        site_conflicts = self.site_conflicts(site_id, start, exclude_id)
+        if site_conflicts:
+            conflicts.append({
+                'type': 'site',
+                'schedule_ids': [schedule_id for _, schedule_id in site_conflicts],
+                'message': 'El taller de la sucursal no tiene bahías disponibles en este horario.',
+            })
+        return conflicts
+
+
+def check_schedule_conflicts(vehicle, start, exclude_id=None):
+    """Conflictos de un agendamiento puntual contra la agenda existente"""
+    index = ScheduleIndex.load(start, start, patents=[vehicle.patent], site_ids=[vehicle.site_id])
+    return index.check(vehicle.patent, vehicle.site_id, start, exclude_id)
+
+
+def validate_slots(slots):
+    """
+    Valida en bloque una lista de horarios propuestos [{'patent', 'start'}].
+    Cada propuesta válida se agrega al índice, así también se detectan choques
+    entre las propias propuestas (p. ej. al agendar una ruta completa).
+    """
+    if not slots:
+        return []
+
+    patents = {slot['patent'] for slot in slots}
+    vehicle_sites = dict(Vehicle.objects.filter(patent__in=patents).values_list('patent', 'site_id'))
+    starts = [slot['start'] for slot in slots]
+    index = ScheduleIndex.load(
+        min(starts), max(starts), patents=vehicle_sites.keys(), site_ids=set(vehicle_sites.values())
+    )
+
+    results = []
+    for slot in slots:
+        patent = slot['patent']
+        if patent not in vehicle_sites:
+            results.append({'valid': False, 'conflicts': [
+                {'type': 'vehicle', 'schedule_ids': [], 'message': f'Vehículo {patent} no encontrado.'}
+            ]})
+            continue
+        conflicts = index.check(patent, vehicle_sites[patent], slot['start'])
+        if not conflicts:
+            index.add(patent, vehicle_sites[patent], slot['start'])
+        results.append({'valid': not conflicts, 'conflicts': conflicts})
+    return results
@@ -0,0 +1,183 @@
+"""
+Búsqueda de los próximos horarios libres para agendar una mantención.
+
+Cada jornada se divide en celdas de SLOT_STEP. Por sucursal y día se
+precalcula (y guarda en caché) cuántas bahías están ocupadas en cada celda;
+de ahí sale un mapa de bits con las celdas llenas, y encontrar un horario
+libre se reduce a desplazar y enmascarar enteros junto al mapa de bits de las
+reservas del propio vehículo.
+"""
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from documents.models import Ingreso, MaintenanceSchedule
+
+from .scheduling import SLOT_DURATION
+from .work_calendar import get_work_calendar
+
+SLOT_STEP = timedelta(minutes=30)
+SEARCH_HORIZON_DAYS = 60
+OCCUPANCY_CACHE_TIMEOUT = 60 * 60
+# Un ingreso abierto más antiguo que esto se considera no cerrado y no ocupa bahía
+IN_WORKSHOP_WINDOW = timedelta(days=7)
+
+_SLOT_CELLS = int(SLOT_DURATION / SLOT_STEP)
+_SLOT_MASK = (1 << _SLOT_CELLS) - 1
+
+
+def _version_key(site_id):
+    return f'slot_occupancy_version:{site_id}'
+
+
+def invalidate_site_occupancy(site_id):
+    """Descarta los mapas de ocupación cacheados de una sucursal"""
+    try:
+        cache.incr(_version_key(site_id))
+    except ValueError:
+        cache.set(_version_key(site_id), 1, None)
+
+
+def _day_grid(calendar, day):
+    """(inicio de la primera celda, cantidad de celdas) de la jornada, o None"""
+    shift = calendar.shift_for(day)
+    if shift is None:
+        return None
+    shift_start, shift_hours = shift
+    cells = int(timedelta(hours=shift_hours) / SLOT_STEP)
+    return datetime.combine(day, time.min) + timedelta(hours=shift_start), cells
+
+
+def _cell_range(start, end, grid):
+    """Celdas [first, last) de la jornada que toca el intervalo [start, end)"""
+    grid_start, cells = grid
+    first = max(0, int((start - grid_start) / SLOT_STEP))
+    last = min(cells, -int(-(end - grid_start) // SLOT_STEP))
+    return first, last
+
+
+def _local(value):
+    return timezone.make_naive(value) if timezone.is_aware(value) else value
+
+
+def _site_occupancy(site_id, days, calendar):
+    """Ocupación de bahías por celda para cada día, usando la caché y una sola consulta para lo faltante"""
+    version = cache.get(_version_key(site_id), 0)
+    keys = {day: f'slot_occupancy:{site_id}:{version}:{day.isoformat()}' for day in days}
+    grids = {day: _day_grid(calendar, day) for day in days}
+    cached = cache.get_many(keys.values())
+    # Si cambió la jornada desde que se cacheó, la cantidad de celdas ya no coincide
+    occupancy = {
+        day: cached[key] for day, key in keys.items()
+        if key in cached and len(cached[key]) == (grids[day][1] if grids[day] else 0)
+    }
+
+    missing = [day for day in days if day not in occupancy]
+    if not missing:
+        return occupancy
+
+    counts = {day: [0] * grids[day][1] if grids[day] else [] for day in missing}
+    window_start = timezone.make_aware(datetime.combine(min(missing), time.min)) - SLOT_DURATION
+    window_end = timezone.make_aware(datetime.combine(max(missing) + timedelta(days=1), time.min))
+    starts = MaintenanceSchedule.objects.filter(
+        patent__site_id=site_id, start_datetime__gt=window_start, start_datetime__lt=window_end
+    ).values_list('start_datetime', flat=True)
+
+    for start in starts:
+        start = _local(start)
+        end = start + SLOT_DURATION
+        # Una reserva puede tocar el día en que empieza y, si cruza la medianoche, el siguiente
+        for day in {start.date(), end.date()}:
+            if day not in counts or not grids[day]:
+                continue
+            first, last = _cell_range(start, end, grids[day])
+            for cell in range(first, last):
+                counts[day][cell] += 1
+
+    cache.set_many({keys[day]: counts[day] for day in missing}, OCCUPANCY_CACHE_TIMEOUT)
+    occupancy.update(counts)
+    return occupancy
+
+
+def _vehicle_masks(vehicle, days, calendar, window_start, window_end):
+    """Mapa de bits por día con las celdas tomadas por reservas del propio vehículo"""
+    masks = {}
+    starts = MaintenanceSchedule.objects.filter(
+        patent=vehicle, start_datetime__gt=window_start - SLOT_DURATION, start_datetime__lt=window_end
+    ).values_list('start_datetime', flat=True)
+    for start in starts:
+        start = _local(start)
+        end = start + SLOT_DURATION
+        for day in {start.date(), end.date()}:
+            grid = _day_grid(calendar, day)
+            if grid:
+                first, last = _cell_range(start, end, grid)
+                if first < last:
+                    masks[day] = masks.get(day, 0) | (((1 << (last - first)) - 1) << first)
+    return masks
+
+
+def vehicles_in_workshop(site_id, now=None):
+    """
+    Vehículos de la sucursal con un ingreso abierto reciente que ocupan una
+    bahía hoy. Se omiten los que tienen una reserva que toca el día de hoy,
+    porque esa reserva ya cuenta en la ocupación.
+    """
+    now = now or timezone.now()
+    day_start = timezone.make_aware(datetime.combine(timezone.localtime(now).date(), time.min))
+    scheduled_today = MaintenanceSchedule.objects.filter(
+        patent__site_id=site_id,
+        start_datetime__gt=day_start - SLOT_DURATION,
+        start_datetime__lt=day_start + timedelta(days=1),
+    ).values('patent')
+    return Ingreso.objects.filter(
+        patent__site_id=site_id, exit_datetime__isnull=True, entry_datetime__gte=now - IN_WORKSHOP_WINDOW,
+    ).exclude(patent__in=scheduled_today).values('patent').distinct().count()
+
+
+def find_free_slots(vehicle, count=5, after=None, horizon_days=SEARCH_HORIZON_DAYS):
+    """
+    Próximos `count` horarios libres (inicio, fin) para el vehículo, sin
+    superponerse con sus reservas ni exceder las bahías de su sucursal.
+    """
+    site = vehicle.site
+    calendar = get_work_calendar(site.id_site)
+    after = after or timezone.now()
+    after_local = _local(after)
+    days = [after_local.date() + timedelta(days=offset) for offset in range(horizon_days)]
+
+    occupancy = _site_occupancy(site.id_site, days, calendar)
+    window_end = timezone.make_aware(datetime.combine(days[-1] + timedelta(days=1), time.min))
+    vehicle_masks = _vehicle_masks(vehicle, days, calendar, after, window_end)
+
+    # Los vehículos que están hoy en el taller ocupan una bahía el resto de la jornada
+    open_ingresos = vehicles_in_workshop(site.id_site)
+    today = timezone.localdate()
+
+    slots = []
+    for day in days:
+        grid = _day_grid(calendar, day)
+        if not grid:
+            continue
+        grid_start, cells = grid
+        counts = occupancy[day]
+        in_workshop = open_ingresos if day == today else 0
+        full_mask = 0
+        for cell, used in enumerate(counts):
+            if used + in_workshop >= site.workshop_bays:
+                full_mask |= 1 << cell
+        blocked = full_mask | vehicle_masks.get(day, 0)
+
+        cell = 0
+        while cell + _SLOT_CELLS <= cells:
+            start = grid_start + cell * SLOT_STEP
+            if start >= after_local and not (blocked >> cell) & _SLOT_MASK:
+                slots.append((timezone.make_aware(start), timezone.make_aware(start + SLOT_DURATION)))
+                if len(slots) == count:
+                    return slots
+                # Sugerir horarios que no se superpongan entre sí
+                cell += _SLOT_CELLS
+            else:
+                cell += 1
+    return slots
@@ -121,6 +121,42 @@ $(document).ready(function() {
 
         // Trigger para cargar incidentes
         loadIncidentsForVehicle(patent);
+
+        // Sugerir los próximos horarios libres del taller
+        loadFreeSlots(patent);
+    }
+
+    // Función para cargar los próximos horarios libres de un vehículo
+    function loadFreeSlots(patent) {
+        var $container = $('#free-slots');
+        $container.html('Buscando horarios disponibles...').show();
+
+        $.ajax({
+            url: '/api/agenda/proximos-horarios/',
+            data: { patent: patent, k: 5 },
+            success: function(data) {
+                if (!data.slots || data.slots.length === 0) {
+                    $container.html('No hay horarios libres en los próximos días.');
+                    return;
+                }
+                var html = 'Horarios disponibles: ';
+                data.slots.forEach(function(slot) {
+                    var start = new Date(slot.start);
+                    // Valor para el input datetime-local en hora local
+                    var localValue = new Date(start.getTime() - start.getTimezoneOffset() * 60000).toISOString().slice(0, 16);
+                    html += '<button type="button" class="btn btn-sm btn-outline-primary me-1 mb-1 free-slot" data-value="' + localValue + '">' +
+                        start.toLocaleString('es-CL', { weekday: 'short', day: '2-digit', month: '2-digit', hour: '2-digit', minute: '2-digit' }) +
+                        '</button>';
+                });
+                $container.html(html);
+                $('.free-slot').click(function() {
+                    $('#id_start_datetime').val($(this).data('value'));
+                });
+            },
+            error: function() {
+                $container.html('No se pudieron cargar los horarios disponibles.');
+            }
+        });
     }
 
     // Función para cargar incidentes de un vehículo
@@ -194,6 +230,7 @@ $(document).ready(function() {
         $('#id_patent_search').val('').focus();
         $('#incidents-container').html('<div class="no-incidents-message"><p>Selecciona un vehículo para ver los incidentes disponibles</p></div>');
         $('#id_related_incidents').val('');
+        $('#free-slots').hide().empty();
     });
 
     // Función para inicializar incidentes seleccionados (se llamará desde el HTML)
@@ -1,5 +1,4 @@
 document.addEventListener('DOMContentLoaded', function() {
-  console.log('JS cargado, eventsData:', eventsData);
   var calendarEl = document.getElementById('calendar');
   var calendar = new FullCalendar.Calendar(calendarEl, {
     initialView: 'dayGridMonth',
@@ -9,7 +8,17 @@ document.addEventListener('DOMContentLoaded', function() {
       center: 'title',
       right: 'dayGridMonth,timeGridWeek,timeGridDay'
     },
-    events: eventsData,
+    events: {
+      url: eventsUrl,
+      failure: function() {
+        console.error('Error cargando los eventos del calendario');
+      }
+    },
+    eventDataTransform: function(eventData) {
+      // El feed es compacto: el título se arma desde la patente
+      eventData.title = eventData.patent + ' - Servicio de mantenimiento';
+      return eventData;
+    },
     eventClick: function(info) {
       console.log('Evento clicado:', info.event);
       // Poblar el modal con los datos del evento
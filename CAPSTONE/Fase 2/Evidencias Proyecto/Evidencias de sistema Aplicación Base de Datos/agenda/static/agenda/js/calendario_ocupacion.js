@@ -0,0 +1,83 @@
+// calendario_ocupacion.js - Mapa de calor mensual de ocupación por sucursal
+// Pide al servidor los conteos diarios del mes (un solo payload agregado) y
+// los pinta con una intensidad proporcional al máximo del mes.
+
+document.addEventListener('DOMContentLoaded', function() {
+    const container = document.getElementById('occupancy-heatmap');
+    if (!container) {
+        return;
+    }
+    const table = document.getElementById('occupancy-table');
+    const title = document.getElementById('occupancy-title');
+    const metricSelect = document.getElementById('occupancy-metric');
+    const monthNames = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+                        'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre'];
+    const today = new Date();
+    let month = new Date(today.getFullYear(), today.getMonth(), 1);
+    let data = null;
+
+    function isoDate(date) {
+        const pad = value => String(value).padStart(2, '0');
+        return `${date.getFullYear()}-${pad(date.getMonth() + 1)}-${pad(date.getDate())}`;
+    }
+
+    function render() {
+        table.innerHTML = '';
+        if (!data) {
+            return;
+        }
+        const metric = metricSelect.value;
+        const max = Math.max(1, ...data.sites.flatMap(site => site[metric]));
+
+        const header = table.insertRow();
+        header.appendChild(document.createElement('th')).textContent = 'Sucursal';
+        data.days.forEach(day => {
+            header.appendChild(document.createElement('th')).textContent = Number(day.slice(8));
+        });
+
+        data.sites.forEach(site => {
+            const row = table.insertRow();
+            row.appendChild(document.createElement('th')).textContent = site.name;
+            data.days.forEach((day, index) => {
+                const cell = row.insertCell();
+                const value = site[metric][index];
+                cell.textContent = value || '';
+                cell.style.backgroundColor = `rgba(13, 110, 253, ${(value / max * 0.8).toFixed(2)})`;
+                cell.title = `${day}: ${site.schedules[index]} agendas, ${site.ingresos[index]} ingresos, ` +
+                             `${site.open_work_orders[index]} OTs abiertas`;
+            });
+        });
+    }
+
+    function load() {
+        const end = new Date(month.getFullYear(), month.getMonth() + 1, 1);
+        title.textContent = `${monthNames[month.getMonth()]} ${month.getFullYear()}`;
+        const params = new URLSearchParams({ start: isoDate(month), end: isoDate(end) });
+        fetch(`${container.dataset.url}?${params.toString()}`)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(payload => {
+                data = payload;
+                render();
+            })
+            .catch(error => {
+                console.error('Error cargando la ocupación:', error);
+            });
+    }
+
+    document.getElementById('occupancy-prev').addEventListener('click', function() {
+        month = new Date(month.getFullYear(), month.getMonth() - 1, 1);
+        load();
+    });
+    document.getElementById('occupancy-next').addEventListener('click', function() {
+        month = new Date(month.getFullYear(), month.getMonth() + 1, 1);
+        load();
+    });
+    metricSelect.addEventListener('change', render);
+
+    load();
+});
@@ -0,0 +1,100 @@
+// capacidad_taller.js - Gantt de capacidad de mecánicos y bahías
+// Pide al servidor las líneas de tiempo del rango (arreglos por día y barras
+// en segundos epoch) y las dibuja como filas con un fondo por utilización.
+
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.getElementById('capacity-filters');
+    const sitesContainer = document.getElementById('capacity-sites');
+    const mechanicsContainer = document.getElementById('capacity-mechanics');
+    const errorBox = document.getElementById('capacity-error');
+
+    function utilisationClass(value) {
+        if (value === null) {
+            return '';
+        }
+        if (value > 1) {
+            return 'util-over';
+        }
+        return value >= 0.7 ? 'util-mid' : 'util-low';
+    }
+
+    function buildRow(label, timeline, data, barTitle) {
+        const row = document.createElement('div');
+        row.className = 'capacity-row';
+
+        const labelCell = document.createElement('div');
+        labelCell.className = 'capacity-label';
+        labelCell.textContent = label;
+        row.appendChild(labelCell);
+
+        const track = document.createElement('div');
+        track.className = 'capacity-track';
+        data.days.forEach((day, index) => {
+            const cell = document.createElement('div');
+            const utilisation = timeline.utilisation[index];
+            cell.className = `capacity-day ${utilisationClass(utilisation)}`;
+            cell.title = `${day}: ${timeline.committed[index]} h de ${timeline.capacity[index]} h`;
+            cell.textContent = utilisation === null ? '' : `${Math.round(utilisation * 100)}%`;
+            track.appendChild(cell);
+        });
+
+        const span = data.end - data.start;
+        timeline.bars.forEach(bar => {
+            const start = Math.max(bar[bar.length - 2], data.start);
+            const end = Math.min(bar[bar.length - 1], data.end);
+            if (end <= start) {
+                return;
+            }
+            const element = document.createElement('div');
+            element.className = 'capacity-bar';
+            element.style.left = `${(start - data.start) / span * 100}%`;
+            element.style.width = `${Math.max((end - start) / span * 100, 0.2)}%`;
+            element.title = barTitle(bar);
+            track.appendChild(element);
+        });
+
+        row.appendChild(track);
+        return row;
+    }
+
+    function render(data) {
+        sitesContainer.innerHTML = '';
+        mechanicsContainer.innerHTML = '';
+        data.sites.forEach(site => {
+            sitesContainer.appendChild(
+                buildRow(`${site.name} (${site.bays} bahías)`, site, data, bar => `OT-${bar[0]}`)
+            );
+        });
+        data.mechanics.forEach(mechanic => {
+            mechanicsContainer.appendChild(
+                buildRow(mechanic.name, mechanic, data, bar => `Tarea ${bar[0]} - OT-${bar[1]}`)
+            );
+        });
+    }
+
+    function load() {
+        const params = new URLSearchParams(new FormData(form));
+        fetch(`${form.dataset.url}?${params.toString()}`)
+            .then(response => response.json().then(data => {
+                if (!response.ok) {
+                    throw new Error(data.error || `HTTP ${response.status}`);
+                }
+                return data;
+            }))
+            .then(data => {
+                errorBox.classList.add('d-none');
+                render(data);
+            })
+            .catch(error => {
+                errorBox.textContent = `Error cargando la capacidad: ${error.message}`;
+                errorBox.classList.remove('d-none');
+            });
+    }
+
+    form.addEventListener('submit', function(event) {
+        event.preventDefault();
+        load();
+    });
+
+    load();
+});
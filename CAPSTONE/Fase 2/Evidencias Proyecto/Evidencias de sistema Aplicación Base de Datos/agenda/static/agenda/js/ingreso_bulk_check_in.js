@@ -0,0 +1,96 @@
+// ingreso_bulk_check_in.js - Registro en bloque de ingresos desde agendamientos
+// Envía los agendamientos marcados en una sola solicitud y muestra el
+// resultado de cada uno.
+
+document.addEventListener('DOMContentLoaded', function() {
+    const panel = document.getElementById('bulk-check-in');
+    if (!panel) {
+        return;
+    }
+    const selectAll = document.getElementById('bulk-select-all');
+    const submitBtn = document.getElementById('bulk-submit');
+    const selectedCount = document.getElementById('bulk-selected-count');
+    const resultsBox = document.getElementById('bulk-results');
+    const csrfToken = panel.querySelector('[name=csrfmiddlewaretoken]').value;
+
+    function enabledCheckboxes() {
+        return Array.from(document.querySelectorAll('.bulk-schedule:not(:disabled)'));
+    }
+
+    function selectedIds() {
+        return enabledCheckboxes().filter(checkbox => checkbox.checked).map(checkbox => checkbox.value);
+    }
+
+    function updateSelection() {
+        const count = selectedIds().length;
+        selectedCount.textContent = count;
+        submitBtn.disabled = count === 0;
+    }
+
+    function showResults(data) {
+        resultsBox.innerHTML = '';
+        const summary = document.createElement('p');
+        summary.textContent = `Ingresos registrados: ${data.created} de ${data.results.length}`;
+        resultsBox.appendChild(summary);
+
+        data.results.forEach(result => {
+            const checkbox = document.querySelector(`.bulk-schedule[value="${result.schedule_id}"]`);
+            if (result.ok) {
+                if (checkbox) {
+                    checkbox.checked = false;
+                    checkbox.disabled = true;
+                    checkbox.closest('.schedule-card').classList.add('checked-in');
+                }
+            } else {
+                const error = document.createElement('p');
+                error.className = 'bulk-error';
+                error.textContent = result.error;
+                resultsBox.appendChild(error);
+            }
+        });
+    }
+
+    selectAll.addEventListener('change', function() {
+        enabledCheckboxes().forEach(checkbox => {
+            checkbox.checked = selectAll.checked;
+        });
+        updateSelection();
+    });
+
+    document.querySelectorAll('.bulk-schedule').forEach(checkbox => {
+        checkbox.addEventListener('change', updateSelection);
+    });
+
+    submitBtn.addEventListener('click', function() {
+        const scheduleIds = selectedIds();
+        if (scheduleIds.length === 0) {
+            return;
+        }
+        submitBtn.disabled = true;
+
+        fetch(panel.dataset.url, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': csrfToken
+            },
+            body: JSON.stringify({ schedule_ids: scheduleIds })
+        })
+            .then(response => response.json().then(data => {
+                if (!response.ok) {
+                    throw new Error(data.error || `HTTP ${response.status}`);
+                }
+                return data;
+            }))
+            .then(showResults)
+            .catch(error => {
+                resultsBox.textContent = `Error registrando ingresos: ${error.message}`;
+            })
+            .finally(() => {
+                selectAll.checked = false;
+                updateSelection();
+            });
+    });
+
+    updateSelection();
+});
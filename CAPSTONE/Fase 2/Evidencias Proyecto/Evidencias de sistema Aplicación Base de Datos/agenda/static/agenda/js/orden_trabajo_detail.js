@@ -98,67 +98,41 @@ function deleteSelectedItems(tableId) {
   form.submit();
 }
 
-// Función para calcular horas transcurridas dentro del horario laboral (7:30 AM - 4:30 PM)
+// Función para calcular horas transcurridas dentro del horario laboral del taller.
+// Usa las jornadas y feriados que envía el servidor (workCalendar); por defecto 7:30 a 16:30 todos los días.
 function calculateWorkingHoursElapsed(startDatetime, endDatetime) {
-    // TEMPORAL: Cálculo de tiempo total sin restricciones de horario laboral (24 horas)
-    // Código original comentado:
-    /*
-    const workStart = new Date(endDatetime);
-    workStart.setHours(7, 30, 0, 0);
-    const workEnd = new Date(endDatetime);
-    workEnd.setHours(16, 30, 0, 0);
+    if (endDatetime <= startDatetime) {
+        return 0;
+    }
+    const calendar = (typeof workCalendar !== 'undefined') ? workCalendar : null;
+    const shifts = calendar ? calendar.shifts : null;
+    const holidays = calendar ? calendar.holidays : [];
 
     let totalHours = 0;
-
-    // Si está dentro del mismo día
-    if (startDatetime.toDateString() === endDatetime.toDateString()) {
-        const effectiveStart = new Date(Math.max(startDatetime, workStart));
-        const effectiveEnd = new Date(Math.min(endDatetime, workEnd));
-
-        if (effectiveStart < effectiveEnd) {
-            totalHours = (effectiveEnd - effectiveStart) / 3600000; // convertir a horas
-        }
-    } else {
-        // Trabajo que cruza días
-        let currentDate = new Date(startDatetime);
-        currentDate.setHours(0, 0, 0, 0);
-
-        // Día de inicio
-        if (startDatetime < workEnd) {
-            const effectiveStart = new Date(Math.max(startDatetime, workStart));
-            const effectiveEnd = workEnd;
+    const currentDate = new Date(startDatetime);
+    currentDate.setHours(0, 0, 0, 0);
+
+    while (currentDate < endDatetime) {
+        // getDay(): 0 = domingo; el servidor usa 0 = lunes
+        const weekday = (currentDate.getDay() + 6) % 7;
+        const shift = shifts ? shifts[String(weekday)] : [7.5, 16.5];
+        const isoDate = currentDate.getFullYear() + '-' +
+            String(currentDate.getMonth() + 1).padStart(2, '0') + '-' +
+            String(currentDate.getDate()).padStart(2, '0');
+
+        if (shift && !holidays.includes(isoDate)) {
+            const dayStart = new Date(currentDate.getTime() + shift[0] * 3600000);
+            const dayEnd = new Date(currentDate.getTime() + shift[1] * 3600000);
+            const effectiveStart = Math.max(startDatetime, dayStart);
+            const effectiveEnd = Math.min(endDatetime, dayEnd);
             if (effectiveStart < effectiveEnd) {
                 totalHours += (effectiveEnd - effectiveStart) / 3600000;
             }
         }
-
-        // Días completos entre inicio y fin
         currentDate.setDate(currentDate.getDate() + 1);
-        while (currentDate < endDatetime) {
-            // Día completo de trabajo
-            const dayStart = new Date(currentDate);
-            dayStart.setHours(7, 30, 0, 0);
-            const dayEnd = new Date(currentDate);
-            dayEnd.setHours(16, 30, 0, 0);
-            totalHours += (dayEnd - dayStart) / 3600000;
-            currentDate.setDate(currentDate.getDate() + 1);
-        }
-
-        // Día de fin
-        if (endDatetime > workStart) {
-            const effectiveStart = workStart;
-            const effectiveEnd = new Date(Math.min(endDatetime, workEnd));
-            if (effectiveStart < effectiveEnd) {
-                totalHours += (effectiveEnd - effectiveStart) / 3600000;
-            }
-        }
     }
 
     return totalHours;
-    */
-
-    // Cálculo temporal: tiempo total en horas (24/7)
-    return (endDatetime - startDatetime) / 3600000; // convertir milisegundos a horas
 }
 
 // Función para actualizar los tiempos de trabajo en tiempo real
@@ -171,69 +145,40 @@ function updateWorkTimes() {
     const now = new Date();
     let totalReal = 0;
 
-    // Obtener el ID de la orden de trabajo para el almacenamiento persistente
-    const workOrderId = document.getElementById('work-order-id')?.value;
-
-    // Verificar si hay pausa global activa
-    const globalPauses = pausesData['global'] || [];
-    const globalActivePause = globalPauses.find(p => !p.end);
-
     mechanicAssignments.forEach(assignment => {
         const assignmentId = assignment.id;
-        const assignedAt = assignment.assignedAt;
-        const taskStartTime = assignment.taskStartTime;
         const hasTasks = assignment.hasTasks;
         
         // Solo calcular tiempo si el mecánico tiene tareas asignadas
         if (hasTasks) {
-            // Para mecánicos con tareas, usar un tiempo de inicio persistente en sessionStorage
-            const storageKey = `taskStartTime_${workOrderId}_${assignmentId}`;
-            let storedTime = sessionStorage.getItem(storageKey);
-            if (!storedTime) {
-                storedTime = new Date().toISOString();
-                sessionStorage.setItem(storageKey, storedTime);
-            }
-            const mechanicStartTime = new Date(storedTime);
+            // Inicio calculado en el servidor: primera asignación de tarea del mecánico
+            const mechanicStartTime = assignment.taskStartTime;
             
-            // Obtener todas las pausas relevantes para este mecánico:
-            // - Pausas individuales del mecánico
-            // - Pausas globales (que afectan a todos los mecánicos)
-            const mechanicPauses = (pausesData[assignmentId.toString()] || []);
-            const globalPauses = (pausesData['global'] || []);
+            // Intervalos de pausa ya fusionados por el servidor (pausas personales + globales).
+            // Un intervalo sin end es la pausa activa: el tiempo se detiene en su inicio.
+            const pauseIntervals = pausesData[assignmentId.toString()] || [];
             
-            // Combinar todas las pausas relevantes y ordenarlas
-            const allPauses = [...mechanicPauses, ...globalPauses].sort((a, b) => new Date(a.start) - new Date(b.start));
-            
-            // Verificar si hay una pausa activa (sin end)
-            const activePause = allPauses.find(p => !p.end);
-            
-            // Calcular intervalos de trabajo
             let realTime = 0;
             let previousEnd = new Date(mechanicStartTime);
+            let isPaused = false;
             
-            for (const pause of allPauses) {
-                if (pause.end) {  // Pausa completada
-                    const pauseStart = new Date(pause.start);
-                    const pauseEnd = new Date(pause.end);
-                    // Intervalo desde previousEnd hasta pauseStart
-                    if (previousEnd < pauseStart) {
-                        realTime += calculateWorkingHoursElapsed(previousEnd, pauseStart);
-                    }
-                    // Actualizar previousEnd al pauseEnd
-                    previousEnd = pauseEnd;
-                } else {  // Pausa activa
-                    const pauseStart = new Date(pause.start);
-                    // Intervalo desde previousEnd hasta pauseStart
-                    if (previousEnd < pauseStart) {
-                        realTime += calculateWorkingHoursElapsed(previousEnd, pauseStart);
-                    }
-                    // No continuar después de pausa activa
+            for (const interval of pauseIntervals) {
+                const pauseStart = new Date(interval.start);
+                if (previousEnd < pauseStart) {
+                    realTime += calculateWorkingHoursElapsed(previousEnd, pauseStart);
+                }
+                if (!interval.end) {
+                    isPaused = true;
                     break;
                 }
+                const pauseEnd = new Date(interval.end);
+                if (pauseEnd > previousEnd) {
+                    previousEnd = pauseEnd;
+                }
             }
             
             // Si no hay pausa activa, agregar intervalo desde previousEnd hasta now
-            if (!activePause) {
+            if (!isPaused && previousEnd < now) {
                 realTime += calculateWorkingHoursElapsed(previousEnd, now);
             }
             
@@ -257,6 +202,73 @@ function updateWorkTimes() {
     }
 }
 
+// Aplica una instantánea recibida por el stream de la OT
+function applyWorkOrderSnapshot(snapshot) {
+    const badge = document.getElementById('work-order-status-badge');
+    if (badge) {
+        badge.textContent = snapshot.status.name;
+        badge.style.backgroundColor = snapshot.status.color;
+    }
+
+    // Mecánicos nuevos, inicio de trabajos o término necesitan otra estructura de página
+    let needsReload = (typeof workStartedAt === 'undefined' && snapshot.workStartedAt)
+        || (typeof workOrderCompleted !== 'undefined' && !workOrderCompleted && snapshot.completed);
+
+    if (typeof pausesData !== 'undefined' && typeof mechanicAssignments !== 'undefined') {
+        // Reemplazar las pausas conservando el mismo objeto que usa updateWorkTimes
+        Object.keys(pausesData).forEach(key => delete pausesData[key]);
+        Object.assign(pausesData, snapshot.pauses);
+
+        const rendered = new Set(mechanicAssignments.map(assignment => assignment.id));
+        const current = snapshot.mechanics.filter(mechanic => rendered.has(mechanic.id));
+        needsReload = needsReload || current.length < snapshot.mechanics.length;
+
+        // Los mecánicos quitados dejan de contar en el total
+        const currentIds = new Set(current.map(mechanic => mechanic.id));
+        rendered.forEach(id => {
+            const element = document.getElementById('real-time-' + id);
+            if (!currentIds.has(id) && element) {
+                element.textContent = '—';
+            }
+        });
+        mechanicAssignments.splice(0, mechanicAssignments.length, ...current.map(mechanic => ({
+            id: mechanic.id,
+            taskStartTime: new Date(mechanic.taskStartTime),
+            hasTasks: mechanic.hasTasks,
+        })));
+        updateWorkTimes();
+    }
+
+    if (needsReload) {
+        showReloadNotice();
+    }
+}
+
+function showReloadNotice() {
+    if (document.getElementById('work-order-reload-notice')) {
+        return;
+    }
+    const notice = document.createElement('div');
+    notice.id = 'work-order-reload-notice';
+    notice.className = 'alert alert-info d-flex justify-content-between align-items-center';
+    notice.innerHTML = '<span><i class="fas fa-sync-alt"></i> La orden de trabajo tuvo cambios.</span>' +
+        '<button type="button" class="btn btn-sm btn-outline-primary">Actualizar</button>';
+    notice.querySelector('button').addEventListener('click', () => window.location.reload());
+    const container = document.querySelector('.container') || document.body;
+    container.prepend(notice);
+}
+
+let workOrderEventSource = null;
+
+function connectWorkOrderEvents() {
+    if (workOrderEventSource || typeof workOrderEventsUrl === 'undefined' || typeof EventSource === 'undefined') {
+        return;
+    }
+    workOrderEventSource = new EventSource(workOrderEventsUrl);
+    workOrderEventSource.addEventListener('work_order', event => applyWorkOrderSnapshot(JSON.parse(event.data)));
+    workOrderEventSource.addEventListener('deleted', () => workOrderEventSource.close());
+}
+
 // Inicializar eventos cuando el DOM esté listo
 document.addEventListener('DOMContentLoaded', function() {
   initializeEventListeners();
@@ -301,4 +313,7 @@ function initializeEventListeners() {
     setInterval(updateWorkTimes, 1000);
     updateWorkTimes(); // Ejecutar inmediatamente
   }
-}
\ No newline at end of file
+
+  // Escuchar cambios hechos por otros usuarios
+  connectWorkOrderEvents();
+}
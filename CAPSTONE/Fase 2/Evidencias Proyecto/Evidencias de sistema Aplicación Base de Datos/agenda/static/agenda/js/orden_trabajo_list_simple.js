@@ -5,6 +5,8 @@ document.addEventListener('DOMContentLoaded', function() {
     // Elementos básicos
     const clearFiltersBtn = document.getElementById('clear-filters');
     const resultsCount = document.getElementById('results-count');
+    // Total de órdenes que coinciden con los filtros del servidor (todas las páginas)
+    const totalCount = resultsCount ? (resultsCount.dataset.total || 0) : 0;
 
     // Función para aplicar todos los filtros combinados
     function applyAllFilters() {
@@ -164,7 +166,7 @@ document.addEventListener('DOMContentLoaded', function() {
 
         // Actualizar contador
         if (resultsCount) {
-            resultsCount.textContent = 'Mostrando ' + visibleCount + ' de ' + columns.length + ' órdenes';
+            resultsCount.textContent = 'Mostrando ' + visibleCount + ' de ' + columns.length + ' órdenes en esta página (' + totalCount + ' en total)';
         }
     }
 
@@ -175,6 +177,11 @@ document.addEventListener('DOMContentLoaded', function() {
             allInputs.forEach(function(input) {
                 input.value = '';
             });
+            // Si hay filtros aplicados en el servidor, recargar sin parámetros
+            if (window.location.search) {
+                window.location.search = '';
+                return;
+            }
             applyAllFilters();
         });
     }
@@ -207,7 +214,7 @@ document.addEventListener('DOMContentLoaded', function() {
     // Inicializar contador
     const allCards = document.querySelectorAll('.work-order-card');
     if (resultsCount) {
-        resultsCount.textContent = 'Mostrando ' + allCards.length + ' órdenes';
+        resultsCount.textContent = 'Mostrando ' + allCards.length + ' de ' + totalCount + ' órdenes';
     }
 
     console.log('Filtros inicializados');
@@ -0,0 +1,163 @@
+"""
+Motor de asignación automática de tareas a mecánicos.
+
+Para cada OT se proponen tantas tareas como mecánicos activos tenga, con
+descripciones del catálogo que la OT aún no tiene y el tipo de servicio de la
+OT. Cada tarea se asigna al mecánico de la OT con menor puntaje, donde el
+puntaje es su carga actual (asignaciones en OTs abiertas, más las que ya se le
+planificaron en esta misma corrida) menos un descuento por afinidad: la
+fracción de sus horas trabajadas históricas que corresponden al tipo de
+servicio de la tarea.
+
+El plan se calcula con un número fijo de consultas para cualquier cantidad de
+OTs y se guarda con bulk_create en una sola transacción, así el mismo motor
+sirve para una OT desde la vista o para muchas en lote.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from documents.models import Task, TaskAssignment, WorkOrderMechanic
+from documents.rollups import refresh_work_order_rollups
+
+from .live_updates import notify_work_order
+
+TASK_CATALOG = [
+    "Revisar sistema de frenos",
+    "Inspeccionar motor y componentes",
+    "Verificar sistema eléctrico",
+    "Chequear suspensión y dirección",
+    "Revisar transmisión",
+    "Inspeccionar sistema de escape",
+    "Verificar neumáticos y ruedas",
+    "Chequear sistema de refrigeración",
+    "Revisar batería y alternador",
+    "Inspeccionar sistema de combustible",
+    "Verificar luces y señales",
+    "Chequear aire acondicionado",
+    "Revisar frenos de mano",
+    "Inspeccionar amortiguadores",
+    "Verificar correas y mangueras",
+]
+DEFAULT_URGENCY = 'Media'
+# Una afinidad completa con el tipo de servicio equivale a tener dos tareas abiertas menos
+AFFINITY_WEIGHT = 2
+
+
+def open_task_loads(mechanic_ids):
+    """Cantidad de tareas abiertas (OT sin completar y tarea sin terminar) por mecánico"""
+    now = timezone.now()
+    rows = TaskAssignment.objects.filter(
+        user_id__in=mechanic_ids,
+        task__work_order__actual_completion__isnull=True,
+    ).filter(
+        Q(task__end_datetime__isnull=True) | Q(task__end_datetime__gt=now)
+    ).values('user_id').annotate(load=Count('pk'))
+    return {row['user_id']: row['load'] for row in rows}
+
+
+def service_type_affinities(mechanic_ids):
+    """{mecánico: {tipo de servicio: fracción de sus horas trabajadas}} según el historial de OTs"""
+    hours = defaultdict(dict)
+    rows = WorkOrderMechanic.objects.filter(mechanic_id__in=mechanic_ids).values(
+        'mechanic_id', 'work_order__service_type_id'
+    ).annotate(hours=Sum('hours_worked'))
+    for row in rows:
+        hours[row['mechanic_id']][row['work_order__service_type_id']] = row['hours'] or Decimal('0')
+
+    affinities = {}
+    for mechanic_id, by_service_type in hours.items():
+        total = sum(by_service_type.values())
+        affinities[mechanic_id] = {
+            service_type_id: float(value / total) for service_type_id, value in by_service_type.items()
+        } if total else {}
+    return affinities
+
+
+def _pending_descriptions(used, count):
+    """Descripciones del catálogo que la OT no tiene, en orden; se repite el catálogo si no alcanzan"""
+    available = [description for description in TASK_CATALOG if description not in used] or TASK_CATALOG
+    return [available[index % len(available)] for index in range(count)]
+
+
+def plan_tasks(work_orders):
+    """
+    Planifica (sin guardar) las tareas de las OTs dadas. Retorna una lista por
+    tarea con 'work_order', 'assignment' (WorkOrderMechanic elegido),
+    'description', 'urgency' y 'service_type'.
+    """
+    work_orders = list(work_orders)
+    assignments = defaultdict(list)
+    for assignment in WorkOrderMechanic.objects.filter(
+        work_order__in=work_orders, is_active=True
+    ).select_related('mechanic').order_by('id_assignment'):
+        assignments[assignment.work_order_id].append(assignment)
+
+    used = defaultdict(set)
+    for work_order_id, description in Task.objects.filter(work_order__in=work_orders).values_list(
+        'work_order_id', 'description'
+    ):
+        used[work_order_id].add(description)
+
+    mechanic_ids = {assignment.mechanic_id for group in assignments.values() for assignment in group}
+    loads = open_task_loads(mechanic_ids)
+    affinities = service_type_affinities(mechanic_ids)
+
+    def score(assignment, service_type_id):
+        affinity = affinities.get(assignment.mechanic_id, {}).get(service_type_id, 0)
+        return (loads.get(assignment.mechanic_id, 0) - AFFINITY_WEIGHT * affinity, assignment.mechanic_id)
+
+    plan = []
+    for work_order in work_orders:
+        candidates = assignments.get(work_order.id_work_order)
+        if not candidates:
+            continue
+        for description in _pending_descriptions(used[work_order.id_work_order], len(candidates)):
+            chosen = min(candidates, key=lambda assignment: score(assignment, work_order.service_type_id))
+            loads[chosen.mechanic_id] = loads.get(chosen.mechanic_id, 0) + 1
+            plan.append({
+                'work_order': work_order,
+                'assignment': chosen,
+                'description': description,
+                'urgency': DEFAULT_URGENCY,
+                'service_type': work_order.service_type,
+            })
+    return plan
+
+
+def create_planned_tasks(plan):
+    """Guarda las tareas planificadas y sus asignaciones en una transacción. Retorna las tareas creadas"""
+    if not plan:
+        return []
+
+    now = timezone.now()
+    with transaction.atomic():
+        tasks = Task.objects.bulk_create([
+            Task(
+                work_order=item['work_order'],
+                description=item['description'],
+                urgency=item['urgency'],
+                start_datetime=item['work_order'].work_started_at or now,
+                end_datetime=None,  # Sin fecha de finalización estimada
+                service_type=item['service_type'],
+                supervisor_id=item['work_order'].supervisor_id,
+            ) for item in plan
+        ])
+        TaskAssignment.objects.bulk_create([
+            TaskAssignment(task=task, user_id=item['assignment'].mechanic_id, assigned_at=now)
+            for task, item in zip(tasks, plan)
+        ])
+        # bulk_create no dispara los signals que mantienen los totales de la OT
+        # ni los que avisan a los detalles abiertos
+        for work_order_id in {item['work_order'].id_work_order for item in plan}:
+            refresh_work_order_rollups(work_order_id)
+            notify_work_order(work_order_id)
+    return tasks
+
+
+def auto_assign_tasks(work_orders):
+    """Planifica y crea las tareas de una o muchas OTs. Retorna las tareas creadas"""
+    return create_planned_tasks(plan_tasks(work_orders))
@@ -4,9 +4,67 @@ from unittest.mock import patch, MagicMock
 from django.template.loader import render_to_string
 from agenda.views import home, calculate_working_hours_elapsed, calculate_completion_datetime
 from datetime import datetime, time, timedelta
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from documents.models import (
+    Site, SAPEquipment, CECO, VehicleType, Vehicle, Role, UserStatus, FlotaUser,
+    Ingreso, WorkOrder, WorkOrderStatus, Repuesto, SparePartUsage, Incident, Diagnostics,
+    WorkOrderMechanic, Task, TaskAssignment, MaintenanceSchedule, WorkShift, Holiday,
+    ServiceType,
+)
+from pausas.models import PauseType, WorkOrderPause
+from agenda.pause_timeline import PauseTimeline, merge_intervals
+from agenda.work_calendar import WorkCalendar, get_work_calendar, invalidate_work_calendars
+from agenda.scheduling import check_schedule_conflicts, validate_slots
+from agenda.slot_finder import find_free_slots
+from django.core.cache import cache
+from agenda.forms import AgendarIngresoForm
+from agenda.home_counters import get_home_counters
+from agenda.check_in import bulk_check_in
+from agenda.exits import register_exits
+from agenda.task_assignment import auto_assign_tasks, plan_tasks
+from agenda.capacity import capacity_plan, subtract_intervals
+from agenda.pending_schedules import available_dates, pending_schedules_for_day, rebuild_pending_days
+from agenda.preventive_plan import due_date, generate_preventive_plan
+from agenda.occupancy_heatmap import occupancy_heatmap
+from agenda import live_updates
+from agenda.live_updates import work_order_events, work_order_snapshot, work_order_version
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from decimal import Decimal
+from io import StringIO
+import json
 import re
 
 
+def crear_datos_base():
+    """Crea los registros mínimos (sucursal, vehículo, usuario, estados) usados por los tests"""
+    site = Site.objects.create(name='Santiago', patent_count=10)
+    equipment = SAPEquipment.objects.create(code='EQ-1')
+    ceco = CECO.objects.create(code='C-1', name='Flota', type='Operativo')
+    vehicle_type = VehicleType.objects.create(name='Camión', site=site, data='')
+    vehicle = Vehicle.objects.create(
+        patent='ABCD12', equipment=equipment, ceco=ceco, brand='Volvo', model='FH',
+        year=2020, age=5, useful_life=10, mileage=1000, site=site, operational=True,
+        backup=False, out_of_service=False, type=vehicle_type, plan=True, sinister=False,
+        observations='', compliance='OK', geotab_confirm=True, auction=False,
+    )
+    role = Role.objects.create(name='Mecánico')
+    user_status = UserStatus.objects.create(name='Activo')
+    user = User.objects.create_user(username='mecanico', password='clave-segura-123')
+    flota_user = FlotaUser.objects.create(
+        user=user, name='Mecánico Uno', role=role, patent=vehicle,
+        status=user_status, observations='', gpid='GP1',
+    )
+    status = WorkOrderStatus.objects.create(name='En Progreso', color='#0d6efd')
+    return {
+        'site': site, 'vehicle': vehicle, 'vehicle_type': vehicle_type, 'role': role,
+        'user_status': user_status, 'user': user, 'flota_user': flota_user, 'status': status,
+    }
+
+
 def validate_chilean_plate(plate):
     """
     Valida si una patente chilena tiene formato correcto.
@@ -37,6 +95,7 @@ class HomeViewTestCase(TestCase):
 
     def setUp(self):
         """Configuración inicial para los tests"""
+        cache.clear()
         self.factory = RequestFactory()
         self.client = Client()
 
@@ -391,3 +450,1229 @@ class ChileanPlateValidationTestCase(TestCase):
         for plate, expected in edge_cases:
             with self.subTest(plate=plate):
                 self.assertEqual(validate_chilean_plate(plate), expected)
+
+
+class OrdenTrabajoListEngineTestCase(TestCase):
+    """Tests para el motor de listado de órdenes de trabajo"""
+
+    def setUp(self):
+        self.data = crear_datos_base()
+        self.pause_type = PauseType.objects.create(id_pause_type='STOCK', name='Falta de stock')
+
+    def crear_ordenes(self, cantidad):
+        for i in range(cantidad):
+            ingreso = Ingreso.objects.create(
+                patent=self.data['vehicle'], entry_datetime=timezone.now(),
+                chofer=self.data['flota_user'], authorization=False,
+            )
+            work_order = WorkOrder.objects.create(ingreso=ingreso, status=self.data['status'])
+            repuesto = Repuesto.objects.create(
+                name=f'Filtro {i}', quantity=1, delivery_datetime=timezone.now()
+            )
+            SparePartUsage.objects.create(
+                work_order=work_order, repuesto=repuesto, quantity_used=2, unit_cost=0, total_cost=0
+            )
+            WorkOrderPause.objects.create(
+                work_order=work_order, pause_type=self.pause_type, reason='Sin repuesto',
+                start_datetime=timezone.now(),
+            )
+
+    def contar_consultas(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('orden_trabajo_list'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_query_count_is_constant(self):
+        """La cantidad de consultas no depende del número de OTs"""
+        self.crear_ordenes(2)
+        pocas, _ = self.contar_consultas()
+        self.crear_ordenes(6)
+        muchas, _ = self.contar_consultas()
+        self.assertEqual(pocas, muchas)
+
+    def test_stock_issues_and_active_pauses(self):
+        """Detecta repuestos sin stock y pausas activas"""
+        self.crear_ordenes(1)
+        _, response = self.contar_consultas()
+        item = response.context['work_orders_data'][0]
+        self.assertTrue(item['has_stock_issues'])
+        self.assertEqual(item['stock_issues'][0]['available'], 0)
+        self.assertTrue(item['has_active_pauses'])
+
+    def test_fallback_vehicle_from_diagnostic(self):
+        """Una OT sin ingreso toma el vehículo desde el incidente de su diagnóstico"""
+        work_order = WorkOrder.objects.create(status=self.data['status'])
+        incident = Incident.objects.create(
+            vehicle=self.data['vehicle'], reported_by=self.data['flota_user'],
+            name='Falla de frenos', incident_type='Mecanica', description='Ruido al frenar',
+        )
+        diagnostic = Diagnostics.objects.create(related_work_order=work_order)
+        diagnostic.incidents.add(incident)
+
+        _, response = self.contar_consultas()
+        item = response.context['work_orders_data'][0]
+        self.assertEqual(item['vehicle'], self.data['vehicle'])
+
+    def test_pagination_and_filters(self):
+        """Pagina en el servidor y filtra por número de OT"""
+        self.crear_ordenes(30)
+        _, response = self.contar_consultas()
+        self.assertEqual(len(response.context['work_orders_data']), 24)
+        self.assertEqual(response.context['page_obj'].paginator.count, 30)
+
+        work_order = WorkOrder.objects.first()
+        response = self.client.get(reverse('orden_trabajo_list'), {'q': f'OT-{work_order.id_work_order}'})
+        self.assertEqual(response.context['page_obj'].paginator.count, 1)
+
+    def test_pagination_links_encode_filters(self):
+        """Los enlaces de paginación codifican los filtros con caracteres reservados"""
+        self.crear_ordenes(30)
+        response = self.client.get(reverse('orden_trabajo_list'), {'page': '1', 'nota': 'a&b #c'})
+        self.assertEqual(response.context['filters_query'], 'nota=a%26b+%23c')
+        self.assertContains(response, 'href="?page=2&amp;nota=a%26b+%23c"')
+
+
+class PauseTimelineTestCase(TestCase):
+    """Tests para la línea de tiempo de pausas por mecánico"""
+
+    def setUp(self):
+        self.data = crear_datos_base()
+        self.pause_type = PauseType.objects.create(id_pause_type='STOCK', name='Falta de stock')
+        self.work_order = WorkOrder.objects.create(status=self.data['status'])
+        self.assignment = WorkOrderMechanic.objects.create(
+            work_order=self.work_order, mechanic=self.data['flota_user']
+        )
+        self.other_assignment = WorkOrderMechanic.objects.create(
+            work_order=self.work_order, mechanic=self.data['flota_user']
+        )
+        self.base = timezone.make_aware(datetime(2026, 10, 12, 9, 0))  # Lunes
+
+    def at(self, hours):
+        return self.base + timedelta(hours=hours)
+
+    def crear_pausa(self, start, end, assignment=None, is_active=True):
+        return WorkOrderPause.objects.create(
+            work_order=self.work_order, mechanic_assignment=assignment, pause_type=self.pause_type,
+            reason='Pausa', start_datetime=start, end_datetime=end, is_active=is_active,
+        )
+
+    def test_merge_intervals(self):
+        """Fusiona intervalos solapados y contiguos, manteniendo los separados"""
+        merged = merge_intervals([(5, 6), (1, 3), (2, 4), (4, 4.5), (8, 9)])
+        self.assertEqual(merged, [[1, 4.5], [5, 6], [8, 9]])
+        self.assertEqual(merge_intervals([]), [])
+
+    def test_overlapping_personal_and_global_pauses(self):
+        """Las pausas personales y globales solapadas se descuentan una sola vez"""
+        self.crear_pausa(self.at(0.5), self.at(1.5))  # Global
+        self.crear_pausa(self.at(1), self.at(2), self.assignment)
+        self.crear_pausa(self.at(0), self.at(0.25), self.other_assignment)
+        self.crear_pausa(self.at(2), self.at(3), self.assignment, is_active=False)  # Anulada
+
+        timeline = PauseTimeline.for_work_order(self.work_order, until=self.at(3))
+        times = timeline.mechanic_times(self.assignment.id_assignment, self.at(0))
+
+        self.assertAlmostEqual(times['pause_hours'], 1.5)
+        self.assertAlmostEqual(times['work_hours'], 1.5)
+        self.assertIsNone(times['active_pause'])
+        # Global (1h) + lo que agrega cada pausa personal fuera de la global (0.5h + 0.25h)
+        self.assertAlmostEqual(timeline.total_pause_hours(), 1.75)
+
+    def test_active_pause_stops_work_time(self):
+        """Una pausa abierta detiene el tiempo de trabajo y queda abierta en el payload"""
+        pause = self.crear_pausa(self.at(1), None, self.assignment)
+
+        timeline = PauseTimeline.for_work_order(self.work_order, until=self.at(3))
+        times = timeline.mechanic_times(self.assignment.id_assignment, self.at(0))
+
+        self.assertAlmostEqual(times['work_hours'], 1)
+        self.assertEqual(times['active_pause'], pause)
+        payload = timeline.pauses_payload([self.assignment.id_assignment, self.other_assignment.id_assignment])
+        self.assertIsNone(payload[str(self.assignment.id_assignment)][0]['end'])
+        self.assertEqual(payload[str(self.other_assignment.id_assignment)], [])
+        self.assertEqual(payload['global'], [])
+
+    def test_active_personal_pause_among_other_active_pauses(self):
+        """La pausa personal abierta se detecta aunque el mecánico tenga otra pausa activa"""
+        self.crear_pausa(self.at(0), None, self.assignment)  # Registrada por el jefe de taller
+        timeline = PauseTimeline.for_work_order(self.work_order, until=self.at(3))
+        self.assertFalse(timeline.has_active_personal_pause(self.assignment.id_assignment))
+
+        personal = self.crear_pausa(self.at(1), None, self.assignment)
+        personal.is_personal_pause = True
+        personal.save()
+        timeline = PauseTimeline.for_work_order(self.work_order, until=self.at(3))
+        self.assertTrue(timeline.has_active_personal_pause(self.assignment.id_assignment))
+        self.assertFalse(timeline.has_active_personal_pause(self.other_assignment.id_assignment))
+
+    def test_detail_counts_real_work_time_once(self):
+        """El detalle de la OT suma el tiempo real de cada mecánico una sola vez"""
+        self.work_order.work_started_at = self.at(0)
+        self.work_order.actual_completion = self.at(3)
+        self.work_order.save()
+        task = Task.objects.create(
+            work_order=self.work_order, description='Cambio de aceite', urgency='Normal',
+            start_datetime=self.at(0),
+        )
+        TaskAssignment.objects.create(task=task, user=self.data['flota_user'], assigned_at=self.at(0))
+        self.crear_pausa(self.at(1), self.at(2))
+
+        response = self.client.get(reverse('orden_trabajo_detail', args=[self.work_order.id_work_order]))
+
+        self.assertEqual(response.status_code, 200)
+        assignments = list(response.context['mechanic_assignments'])
+        self.assertEqual(assignments[0].task_start_time, self.at(0))
+        self.assertAlmostEqual(assignments[0].real_work_time, 2)
+        self.assertAlmostEqual(response.context['total_real_work_time'], 4)
+
+
+class CalendarioEventsTestCase(TestCase):
+    """Tests para el feed de eventos del calendario"""
+
+    def setUp(self):
+        self.data = crear_datos_base()
+        self.url = reverse('calendario_events')
+        self.incident = Incident.objects.create(
+            vehicle=self.data['vehicle'], reported_by=self.data['flota_user'],
+            name='Falla de frenos', incident_type='Mecanica', description='Ruido al frenar',
+        )
+
+    def crear_agenda(self, start):
+        return MaintenanceSchedule.objects.create(
+            patent=self.data['vehicle'], start_datetime=start, status=self.data['user_status'],
+            assigned_user=self.data['flota_user'],
+        )
+
+    def test_only_events_in_range(self):
+        """Solo retorna las agendas del rango visible, con incidentes y has_ingreso"""
+        dentro = self.crear_agenda(timezone.make_aware(datetime(2026, 10, 15, 10, 0)))
+        dentro.related_incidents.add(self.incident)
+        self.crear_agenda(timezone.make_aware(datetime(2026, 12, 1, 10, 0)))
+        Ingreso.objects.create(
+            patent=self.data['vehicle'], entry_datetime=timezone.now(), chofer=self.data['flota_user'],
+            authorization=False, schedule=dentro,
+        )
+
+        response = self.client.get(self.url, {'start': '2026-09-28T00:00:00-03:00', 'end': '2026-11-09T00:00:00-03:00'})
+
+        self.assertEqual(response.status_code, 200)
+        events = response.json()
+        self.assertEqual([e['id'] for e in events], [dentro.id_schedule])
+        self.assertTrue(events[0]['has_ingreso'])
+        self.assertEqual(events[0]['patent'], 'ABCD12')
+        self.assertEqual(events[0]['related_incidents'][0]['name'], 'Falla de frenos')
+
+    def test_conditional_get(self):
+        """Responde 304 cuando el ETag enviado coincide con el contenido actual"""
+        self.crear_agenda(timezone.make_aware(datetime(2026, 10, 15, 10, 0)))
+        params = {'start': '2026-10-01', 'end': '2026-11-01'}
+
+        response = self.client.get(self.url, params)
+        etag = response['ETag']
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.crear_agenda(timezone.make_aware(datetime(2026, 10, 20, 10, 0)))
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_invalid_range(self):
+        """Rechaza rangos faltantes, invertidos o demasiado amplios"""
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start': '2026-11-01', 'end': '2026-10-01'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start': '2026-01-01', 'end': '2027-01-01'}).status_code, 400)
+
+
+class WorkCalendarTestCase(TestCase):
+    """Tests para el calendario laboral con jornadas por sucursal y feriados"""
+
+    def setUp(self):
+        # Lunes a viernes 8:00-17:00, sábado 8:00-12:00, domingo sin jornada
+        weekday_shift = (time(8, 0), time(17, 0))
+        self.calendar = WorkCalendar(
+            {0: weekday_shift, 1: weekday_shift, 2: weekday_shift, 3: weekday_shift, 4: weekday_shift,
+             5: (time(8, 0), time(12, 0))},
+            holidays=[datetime(2025, 11, 12).date()],  # Miércoles
+        )
+
+    def tearDown(self):
+        invalidate_work_calendars()
+
+    def brute_force_elapsed(self, start, end):
+        """Recorre minuto a minuto para comparar con el cálculo en forma cerrada"""
+        minutes = 0
+        current = start
+        while current < end:
+            weekday = current.weekday()
+            clock = current.hour + current.minute / 60
+            day_start = self.calendar.day_start[weekday]
+            in_shift = day_start <= clock < day_start + self.calendar.day_hours[weekday]
+            if in_shift and current.toordinal() not in self.calendar.holidays:
+                minutes += 1
+            current += timedelta(minutes=1)
+        return minutes / 60
+
+    def test_weekend_and_holiday_are_skipped(self):
+        """El domingo y el feriado no suman horas; el sábado tiene media jornada"""
+        friday = datetime(2025, 11, 7, 16, 0)
+        tuesday = datetime(2025, 11, 11, 9, 0)
+        # Viernes 1h + sábado 4h + lunes 9h + martes 1h
+        self.assertEqual(self.calendar.elapsed(friday, tuesday), 15.0)
+        self.assertEqual(self.calendar.elapsed(datetime(2025, 11, 12, 9, 0), datetime(2025, 11, 12, 15, 0)), 0.0)
+
+    def test_completion_skips_holiday(self):
+        """Una tarea que cruza el feriado termina al día hábil siguiente"""
+        start = datetime(2025, 11, 11, 16, 0)  # Martes
+        self.assertEqual(self.calendar.add_hours(start, 3), datetime(2025, 11, 13, 10, 0))
+
+    def test_long_ranges_match_day_by_day(self):
+        """Los saltos de semanas completas coinciden con el cálculo día a día"""
+        start = datetime(2025, 10, 1, 10, 15)
+        for hours in (0.5, 9, 40, 123.25, 1000):
+            end = self.calendar.add_hours(start, hours)
+            self.assertAlmostEqual(self.calendar.elapsed(start, end), hours, places=6)
+        end = datetime(2025, 11, 20, 11, 45)
+        self.assertAlmostEqual(self.calendar.elapsed(start, end), self.brute_force_elapsed(start, end), places=6)
+
+    def test_aware_datetimes_use_local_time(self):
+        """Los datetime aware se evalúan en hora local y se retornan aware"""
+        start = timezone.make_aware(datetime(2025, 11, 10, 8, 0))
+        end = self.calendar.add_hours(start, 2)
+        self.assertTrue(timezone.is_aware(end))
+        self.assertEqual(timezone.localtime(end).hour, 10)
+        self.assertEqual(self.calendar.elapsed(start.astimezone(timezone.utc), end), 2.0)
+
+    def test_batch_api(self):
+        """elapsed_many calcula muchos pares de una vez"""
+        pairs = [(datetime(2025, 11, 10, 8, 0), datetime(2025, 11, 10, 8, 0) + timedelta(hours=i)) for i in range(5)]
+        self.assertEqual(self.calendar.elapsed_many(pairs), [0.0, 1.0, 2.0, 3.0, 4.0])
+
+    def test_site_shifts_and_cache_invalidation(self):
+        """Cada sucursal usa sus turnos y los cambios invalidan el calendario memorizado"""
+        site = Site.objects.create(name='Valparaíso', patent_count=3)
+        self.assertEqual(get_work_calendar(site.id_site).day_hours[6], 9.0)
+
+        WorkShift.objects.create(site=site, weekday=0, start_time=time(8, 0), end_time=time(12, 0))
+        calendar = get_work_calendar(site.id_site)
+        self.assertEqual(calendar.day_hours, [4.0, 0, 0, 0, 0, 0, 0])
+
+        Holiday.objects.create(date=datetime(2025, 11, 10).date(), name='Feriado')
+        self.assertEqual(
+            get_work_calendar(site.id_site).elapsed(datetime(2025, 11, 10, 8, 0), datetime(2025, 11, 17, 12, 0)), 4.0
+        )
+
+
+class ScheduleConflictTestCase(TestCase):
+    """Tests para la detección de conflictos de agenda"""
+
+    def setUp(self):
+        self.data = crear_datos_base()
+        self.vehicle = self.data['vehicle']
+        self.other_vehicle = Vehicle.objects.create(
+            patent='WXYZ34', equipment=self.vehicle.equipment, ceco=self.vehicle.ceco, brand='Volvo',
+            model='FH', year=2021, age=4, useful_life=10, mileage=500, site=self.data['site'], operational=True,
+            backup=False, out_of_service=False, type=self.data['vehicle_type'], plan=True, sinister=False,
+            observations='', compliance='OK', geotab_confirm=True, auction=False,
+        )
+        self.base = timezone.make_aware(datetime(2025, 11, 10, 9, 0))
+        self.existing = MaintenanceSchedule.objects.create(
+            patent=self.vehicle, start_datetime=self.base, status=self.data['user_status'],
+        )
+
+    def test_vehicle_overlap(self):
+        """Un vehículo no puede tener dos agendamientos superpuestos"""
+        conflicts = check_schedule_conflicts(self.vehicle, self.base + timedelta(hours=1))
+        self.assertEqual(conflicts[0]['type'], 'vehicle')
+        self.assertEqual(conflicts[0]['schedule_ids'], [self.existing.id_schedule])
+        self.assertEqual(check_schedule_conflicts(self.vehicle, self.base + timedelta(hours=2)), [])
+        # Editar el mismo agendamiento no choca consigo mismo
+        self.assertEqual(check_schedule_conflicts(self.vehicle, self.base, exclude_id=self.existing.id_schedule), [])
+
+    def test_site_capacity(self):
+        """La sucursal acepta tantos vehículos en paralelo como bahías tenga"""
+        conflicts = check_schedule_conflicts(self.other_vehicle, self.base + timedelta(minutes=30))
+        self.assertEqual([c['type'] for c in conflicts], ['site'])
+
+        self.data['site'].workshop_bays = 2
+        self.data['site'].save()
+        self.assertEqual(check_schedule_conflicts(self.other_vehicle, self.base + timedelta(minutes=30)), [])
+
+    def test_bulk_validation_detects_conflicts_between_proposals(self):
+        """La validación en bloque también detecta choques entre las propias propuestas"""
+        self.data['site'].workshop_bays = 3
+        self.data['site'].save()
+        later = self.base + timedelta(hours=4)
+        results = validate_slots([
+            {'patent': 'WXYZ34', 'start': later},
+            {'patent': 'WXYZ34', 'start': later + timedelta(hours=1)},
+            {'patent': 'ABCD12', 'start': self.base},
+            {'patent': 'NOEXISTE', 'start': later},
+        ])
+        self.assertEqual([r['valid'] for r in results], [True, False, False, False])
+
+    def test_form_rejects_overlap(self):
+        """El formulario de agendamiento rechaza horarios superpuestos"""
+        form = AgendarIngresoForm(data={
+            'patent': 'ABCD12', 'start_datetime': '2025-11-10T10:00',
+            'status': self.data['user_status'].pk, 'observations': '',
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('superpone', form.non_field_errors()[0])
+
+    def test_bulk_api(self):
+        """El endpoint recibe JSON y retorna el resultado por horario"""
+        self.client.force_login(self.data['user'])
+        response = self.client.post(
+            reverse('validar_horarios_api'),
+            data=json.dumps({'slots': [{'patent': 'abcd12', 'start_datetime': '2025-11-10T09:30:00-03:00'}]}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['results'][0]['valid'])
+        bad = self.client.post(reverse('validar_horarios_api'), data='{"slots": [{}]}', content_type='application/json')
+        self.assertEqual(bad.status_code, 400)
+
+
+class FreeSlotFinderTestCase(TestCase):
+    """Tests para la búsqueda de próximos horarios libres"""
+
+    def setUp(self):
+        cache.clear()
+        self.data = crear_datos_base()
+        self.vehicle = self.data['vehicle']
+        self.after = timezone.make_aware(datetime(2025, 11, 10, 7, 0))  # Lunes
+
+    def agendar(self, hour, minute=0, day=10):
+        return MaintenanceSchedule.objects.create(
+            patent=self.vehicle, start_datetime=timezone.make_aware(datetime(2025, 11, day, hour, minute)),
+            status=self.data['user_status'],
+        )
+
+    def local_starts(self, slots):
+        return [timezone.localtime(start).strftime('%d %H:%M') for start, _ in slots]
+
+    def test_slots_follow_working_hours(self):
+        """Sin reservas, los horarios parten al inicio de la jornada y no se superponen"""
+        slots = find_free_slots(self.vehicle, count=3, after=self.after)
+        self.assertEqual(self.local_starts(slots), ['10 07:30', '10 09:30', '10 11:30'])
+
+    def test_slots_skip_bookings_and_cache_is_invalidated(self):
+        """Las reservas existentes bloquean horarios; una reserva nueva invalida la ocupación cacheada"""
+        self.agendar(7, 30)
+        self.assertEqual(self.local_starts(find_free_slots(self.vehicle, count=1, after=self.after)), ['10 09:30'])
+
+        self.agendar(10, 0)
+        self.assertEqual(self.local_starts(find_free_slots(self.vehicle, count=1, after=self.after)), ['10 12:00'])
+
+    def test_slots_match_conflict_detection(self):
+        """Cada horario sugerido pasa la validación de conflictos"""
+        self.agendar(8, 0)
+        self.agendar(13, 15)
+        slots = find_free_slots(self.vehicle, count=6, after=self.after)
+        self.assertEqual(len(slots), 6)
+        for start, _ in slots:
+            self.assertEqual(check_schedule_conflicts(self.vehicle, start), [])
+
+    def test_vehicles_in_workshop(self):
+        """Solo ocupan bahía los ingresos abiertos recientes sin reserva contada hoy"""
+        from agenda.slot_finder import vehicles_in_workshop
+
+        now = timezone.make_aware(datetime(2025, 11, 10, 10, 0))
+        site_id = self.data['site'].id_site
+        for days_ago in (30, 1):
+            Ingreso.objects.create(
+                patent=self.vehicle, entry_datetime=now - timedelta(days=days_ago),
+                chofer=self.data['flota_user'], authorization=True,
+            )
+        # El de hace 30 días quedó sin cerrar; el de ayer sí ocupa una bahía
+        self.assertEqual(vehicles_in_workshop(site_id, now), 1)
+        # Con una reserva hoy el vehículo ya cuenta en la ocupación de las celdas
+        self.agendar(8, 0)
+        self.assertEqual(vehicles_in_workshop(site_id, now), 0)
+
+    def test_api(self):
+        """El endpoint retorna K horarios y valida la patente"""
+        self.client.force_login(self.data['user'])
+        response = self.client.get(reverse('proximos_horarios_api'), {'patent': 'abcd12', 'k': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['slots']), 2)
+        self.assertEqual(self.client.get(reverse('proximos_horarios_api'), {'patent': 'ZZZZ99'}).status_code, 404)
+
+
+class HomeCountersTestCase(TestCase):
+    """Tests para los contadores cacheados de la portada"""
+
+    def setUp(self):
+        cache.clear()
+        self.data = crear_datos_base()
+        self.pending = WorkOrderStatus.objects.create(name='Pendiente')
+        self.closed = WorkOrderStatus.objects.create(name='Cerrada')
+        self.entry = timezone.make_aware(datetime(2026, 10, 12, 9, 0))
+
+    def crear_ingreso(self):
+        return Ingreso.objects.create(
+            patent=self.data['vehicle'], entry_datetime=self.entry,
+            chofer=self.data['flota_user'], authorization=True,
+        )
+
+    def test_counters_follow_signals_without_recount(self):
+        """Los contadores se ajustan al confirmar cambios, sin volver a contar"""
+        self.assertEqual(get_home_counters(), {
+            'vehicles_count': 1, 'ingresos_count': 0, 'workorders_count': 0, 'incidents_count': 0,
+        })
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ingreso = self.crear_ingreso()
+            work_order = WorkOrder.objects.create(status=self.pending, ingreso=ingreso)
+        with self.captureOnCommitCallbacks(execute=True):
+            ingreso.exit_datetime = self.entry + timedelta(hours=3)
+            ingreso.save()
+            work_order.status = self.data['status']  # En Progreso: sigue activa
+            work_order.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            second = self.crear_ingreso()
+
+        with CaptureQueriesContext(connection) as queries:
+            counters = get_home_counters()
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(counters['ingresos_count'], 1)
+        self.assertEqual(counters['workorders_count'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            work_order.status = self.closed
+            work_order.save()
+            second.delete()
+        counters = get_home_counters()
+        self.assertEqual(counters['workorders_count'], 0)
+        self.assertEqual(counters['ingresos_count'], 0)
+
+    def test_adjustment_during_recount_is_not_lost(self):
+        """Un ajuste que llega mientras se cuenta descarta ese conteo en vez de perderse"""
+        self.crear_ingreso()
+
+        def stale_count():
+            # Otro proceso confirma un ingreso justo después de este conteo
+            with self.captureOnCommitCallbacks(execute=True):
+                self.crear_ingreso()
+            return 1
+
+        with patch.dict('agenda.home_counters._QUERIES', {'ingresos_count': stale_count}):
+            self.assertEqual(get_home_counters()['ingresos_count'], 1)
+        self.assertEqual(get_home_counters()['ingresos_count'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.crear_ingreso()
+        self.assertEqual(get_home_counters()['ingresos_count'], 3)
+
+    def test_incidents_counter_recomputed_after_diagnostic_change(self):
+        """Un diagnóstico nuevo descarta el conteo de incidentes y se recalcula"""
+        get_home_counters()
+        incident = Incident.objects.create(
+            vehicle=self.data['vehicle'], reported_by=self.data['flota_user'],
+            name='Falla de frenos', incident_type='Mecanica', description='Ruido al frenar',
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            diagnostic = Diagnostics.objects.create(status='Reportada')
+            diagnostic.incidents.add(incident)
+        self.assertEqual(get_home_counters()['incidents_count'], 1)
+
+
+class IngresosListTestCase(TestCase):
+    """Tests para la lista de ingresos paginada por cursor"""
+
+    def setUp(self):
+        self.data = crear_datos_base()
+        self.other_site = Site.objects.create(name='Valparaíso', patent_count=5)
+        self.base = timezone.make_aware(datetime(2026, 10, 1, 8, 0))
+        self.ingresos = []
+        for index in range(5):
+            ingreso = Ingreso.objects.create(
+                patent=self.data['vehicle'], entry_datetime=self.base + timedelta(days=index),
+                chofer=self.data['flota_user'], authorization=True,
+                exit_datetime=self.base + timedelta(days=index, hours=4) if index % 2 else None,
+            )
+            self.ingresos.append(ingreso)
+        # Misma hora de entrada que el último: el cursor desempata por id
+        self.twin = Ingreso.objects.create(
+            patent=self.data['vehicle'], entry_datetime=self.base + timedelta(days=4),
+            chofer=self.data['flota_user'], authorization=False,
+        )
+        WorkOrder.objects.create(status=self.data['status'], ingreso=self.ingresos[0])
+
+    def ids(self, response_or_page):
+        return [ingreso.id_ingreso for ingreso in response_or_page]
+
+    def test_pages_follow_cursor_without_gaps(self):
+        """Recorrer las páginas entrega cada ingreso una vez, del más nuevo al más antiguo"""
+        url = reverse('ingresos_list')
+        response = self.client.get(url)
+        first_page = self.ids(response.context['ingresos'])
+        self.assertEqual(len(first_page), 6)
+        self.assertIsNone(response.context['next_cursor'])
+
+        seen = []
+        cursor = None
+        requests = 0
+        with patch('agenda.ingreso_list.INGRESOS_PER_PAGE', 2):
+            while True:
+                params = {'format': 'json'}
+                if cursor:
+                    params['cursor'] = cursor
+                data = self.client.get(url, params).json()
+                requests += 1
+                seen += [int(value) for value in re.findall(r'data-ingreso-id="(\d+)"', data['html'])]
+                cursor = data['next_cursor']
+                if not cursor:
+                    break
+        self.assertEqual(seen, first_page)
+        self.assertEqual(requests, 3)
+        self.assertEqual(seen[:2], sorted([self.twin.id_ingreso, self.ingresos[4].id_ingreso], reverse=True))
+
+    def test_filters(self):
+        """Filtra por abiertos/cerrados, sucursal, rango de fechas y autorización"""
+        url = reverse('ingresos_list')
+        closed = self.ids(self.client.get(url, {'status': 'closed'}).context['ingresos'])
+        self.assertEqual(closed, [self.ingresos[3].id_ingreso, self.ingresos[1].id_ingreso])
+
+        in_range = self.client.get(url, {'date_from': '2026-10-02', 'date_to': '2026-10-03'}).context['ingresos']
+        self.assertEqual(self.ids(in_range), [self.ingresos[2].id_ingreso, self.ingresos[1].id_ingreso])
+
+        self.assertEqual(self.ids(self.client.get(url, {'site': self.other_site.id_site}).context['ingresos']), [])
+        self.assertEqual(
+            self.ids(self.client.get(url, {'authorization': 'false'}).context['ingresos']), [self.twin.id_ingreso]
+        )
+
+    def test_card_uses_annotations(self):
+        """La tarjeta muestra la OT sin consultas por ingreso"""
+        response = self.client.get(reverse('ingresos_list'), {'status': 'open'})
+        oldest = response.context['ingresos'][-1]
+        self.assertEqual(oldest.id_ingreso, self.ingresos[0].id_ingreso)
+        self.assertIsNotNone(oldest.first_work_order_id)
+        self.assertFalse(oldest.has_diagnostics)
+        self.assertContains(response, reverse('orden_trabajo_detail', args=[oldest.first_work_order_id]))
+        # Un cursor inválido vuelve a la primera página
+        self.assertEqual(
+            len(self.client.get(reverse('ingresos_list'), {'cursor': 'no-valido'}).context['ingresos']), 6
+        )
+
+
+class BulkCheckInTestCase(TestCase):
+    """Tests para el registro en bloque de ingresos desde agendamientos"""
+
+    def setUp(self):
+        cache.clear()
+        self.data = crear_datos_base()
+        self.vehicle = self.data['vehicle']
+        self.other_vehicle = Vehicle.objects.create(
+            patent='WXYZ34', equipment=self.vehicle.equipment, ceco=self.vehicle.ceco, brand='Volvo',
+            model='FH', year=2021, age=4, useful_life=10, mileage=500, site=self.data['site'], operational=True,
+            backup=False, out_of_service=False, type=self.data['vehicle_type'], plan=True, sinister=False,
+            observations='', compliance='OK', geotab_confirm=True, auction=False,
+        )
+        self.start = timezone.make_aware(datetime(2026, 10, 19, 8, 0))
+
+    def crear_agenda(self, vehicle, chofer=True):
+        return MaintenanceSchedule.objects.create(
+            patent=vehicle, start_datetime=self.start, status=self.data['user_status'],
+            expected_chofer=self.data['flota_user'] if chofer else None, observations='Mantención',
+        )
+
+    def test_creates_valid_ingresos_and_reports_errors(self):
+        """Crea los ingresos válidos en una sola inserción y explica los rechazados"""
+        first = self.crear_agenda(self.vehicle)
+        same_vehicle = self.crear_agenda(self.vehicle)
+        without_chofer = self.crear_agenda(self.other_vehicle, chofer=False)
+
+        results = bulk_check_in(
+            [first.id_schedule, same_vehicle.id_schedule, without_chofer.id_schedule, 9999],
+            self.data['flota_user'],
+        )
+        self.assertEqual([r['ok'] for r in results], [True, False, False, False])
+        self.assertIn('ingreso abierto', results[1]['error'])
+        self.assertIn('vendedor', results[2]['error'])
+
+        ingreso = Ingreso.objects.get(pk=results[0]['ingreso_id'])
+        self.assertEqual(ingreso.schedule, first)
+        self.assertEqual(ingreso.entry_registered_by, self.data['flota_user'])
+        self.assertEqual(ingreso.observations, 'Mantención')
+        self.assertFalse(ingreso.authorization)
+
+        # Un agendamiento ya registrado no vuelve a crear ingreso
+        again = bulk_check_in([first.id_schedule], self.data['flota_user'])
+        self.assertIn('ya tiene un ingreso', again[0]['error'])
+        self.assertEqual(Ingreso.objects.count(), 1)
+
+    def test_home_counter_follows_bulk_create(self):
+        """El contador de ingresos abiertos se ajusta aunque bulk_create no dispare signals"""
+        self.assertEqual(get_home_counters()['ingresos_count'], 0)
+        schedules = [self.crear_agenda(self.vehicle), self.crear_agenda(self.other_vehicle)]
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_check_in([schedule.id_schedule for schedule in schedules])
+        self.assertEqual(get_home_counters()['ingresos_count'], 2)
+
+    def test_bulk_endpoint(self):
+        """El endpoint recibe JSON y retorna el resultado por agendamiento"""
+        schedule = self.crear_agenda(self.vehicle)
+        self.client.force_login(self.data['user'])
+        response = self.client.post(
+            reverse('ingreso_bulk_check_in'),
+            data=json.dumps({'schedule_ids': [schedule.id_schedule]}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual(Ingreso.objects.get().entry_registered_by, self.data['flota_user'])
+
+        bad = self.client.post(reverse('ingreso_bulk_check_in'), data='{"schedule_ids": ["x"]}',
+                               content_type='application/json')
+        self.assertEqual(bad.status_code, 400)
+
+
+class BulkExitTestCase(TestCase):
+    """Tests para el registro en bloque de salidas"""
+
+    def setUp(self):
+        cache.clear()
+        self.data = crear_datos_base()
+        self.entry = timezone.make_aware(datetime(2026, 10, 16, 8, 0))
+        self.ingresos = [
+            Ingreso.objects.create(
+                patent=self.data['vehicle'], entry_datetime=self.entry + timedelta(hours=hours),
+                chofer=self.data['flota_user'], authorization=False,
+            ) for hours in (0, 1, 10)
+        ]
+
+    def test_register_exits_in_one_update(self):
+        """Cierra los ingresos en una consulta y omite los que entraron después de la salida"""
+        get_home_counters()
+        exit_datetime = self.entry + timedelta(hours=8)
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                closed = register_exits(
+                    [ingreso.id_ingreso for ingreso in self.ingresos], exit_datetime, self.data['flota_user']
+                )
+        self.assertEqual(closed, 2)
+        self.assertEqual(len(queries), 1)
+        first = Ingreso.objects.get(pk=self.ingresos[0].pk)
+        self.assertTrue(first.authorization)
+        self.assertEqual(first.exit_datetime, exit_datetime)
+        self.assertEqual(first.exit_registered_by, self.data['flota_user'])
+        self.assertIsNone(Ingreso.objects.get(pk=self.ingresos[2].pk).exit_datetime)
+        self.assertEqual(get_home_counters()['ingresos_count'], 1)
+
+    def test_view_pending_list_and_multi_select(self):
+        """La vista lista los pendientes paginados y cierra los seleccionados"""
+        self.client.force_login(self.data['user'])
+        response = self.client.get(reverse('registrar_salida'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page_obj'].paginator.count, 3)
+
+        data = {
+            'ingresos': [self.ingresos[0].id_ingreso, self.ingresos[1].id_ingreso],
+            'exit_datetime': '2026-10-16T17:30',
+        }
+        response = self.client.post(reverse('registrar_salida'), data)
+        self.assertContains(response, 'Debe autorizar la salida')
+        self.assertEqual(Ingreso.objects.filter(exit_datetime__isnull=True).count(), 3)
+
+        response = self.client.post(reverse('registrar_salida'), {**data, 'autorizar': 'on'})
+        self.assertRedirects(response, reverse('ingresos_list'))
+        self.assertEqual(list(Ingreso.objects.filter(exit_datetime__isnull=True)), [self.ingresos[2]])
+
+
+class TaskAssignmentEngineTestCase(TestCase):
+    """Tests para el motor de asignación automática de tareas"""
+
+    def setUp(self):
+        self.data = crear_datos_base()
+        self.base = timezone.make_aware(datetime(2026, 10, 12, 9, 0))
+        self.frenos = ServiceType.objects.create(name='Frenos', site=self.data['site'])
+        self.motor = ServiceType.objects.create(name='Motor', site=self.data['site'])
+        self.first = self.data['flota_user']
+        self.second = FlotaUser.objects.create(
+            user=User.objects.create_user(username='mecanico2', password='clave-segura-123'),
+            name='Mecánico Dos', role=self.data['role'], patent=self.data['vehicle'],
+            status=self.data['user_status'], observations='', gpid='GP2',
+        )
+
+    def crear_ot(self, service_type, *mechanics):
+        work_order = WorkOrder.objects.create(
+            status=self.data['status'], service_type=service_type, work_started_at=self.base
+        )
+        for mechanic in mechanics:
+            WorkOrderMechanic.objects.create(work_order=work_order, mechanic=mechanic)
+        return work_order
+
+    def test_open_load_moves_tasks_to_free_mechanic(self):
+        """Un mecánico con muchas tareas abiertas recibe menos tareas nuevas"""
+        busy = self.crear_ot(self.motor, self.first)
+        for index in range(3):
+            task = Task.objects.create(
+                work_order=busy, description=f'Tarea {index}', urgency='Media', start_datetime=self.base
+            )
+            TaskAssignment.objects.create(task=task, user=self.first)
+
+        work_order = self.crear_ot(self.motor, self.first, self.second)
+        plan = plan_tasks([work_order])
+        self.assertEqual([item['assignment'].mechanic for item in plan], [self.second, self.second])
+        self.assertEqual(len({item['description'] for item in plan}), 2)
+
+    def test_affinity_breaks_ties_by_service_type(self):
+        """A igual carga, la tarea va al mecánico con más horas en el tipo de servicio"""
+        history = self.crear_ot(self.frenos, self.second)
+        history.mechanic_assignments.update(hours_worked=Decimal('8'))
+        history.actual_completion = self.base
+        history.save()
+
+        work_order = self.crear_ot(self.frenos, self.first, self.second)
+        plan = plan_tasks([work_order])
+        # La afinidad completa vale dos tareas: el especialista recibe ambas antes de quedar más cargado
+        self.assertEqual([item['assignment'].mechanic for item in plan], [self.second, self.second])
+        self.assertEqual(plan[0]['service_type'], self.frenos)
+
+    def test_batch_creates_tasks_in_one_transaction(self):
+        """En lote, las tareas y asignaciones se crean juntas y la carga se reparte entre OTs"""
+        work_orders = [self.crear_ot(self.motor, self.first, self.second) for _ in range(2)]
+        with CaptureQueriesContext(connection) as queries:
+            tasks = auto_assign_tasks(work_orders)
+        self.assertEqual(len(tasks), 4)
+        self.assertEqual(TaskAssignment.objects.filter(user=self.first).count(), 2)
+        self.assertEqual(TaskAssignment.objects.filter(user=self.second).count(), 2)
+        inserts = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 2)
+
+    def test_view_preview_matches_created_tasks(self):
+        """La vista muestra el mismo plan que luego crea"""
+        work_order = self.crear_ot(self.motor, self.first, self.second)
+        self.client.force_login(self.data['user'])
+        url = reverse('orden_trabajo_add_tasks_auto', args=[work_order.id_work_order])
+        preview = self.client.get(url).context['generated_tasks']
+        self.client.post(url)
+        created = Task.objects.filter(work_order=work_order).order_by('id_task')
+        self.assertEqual([task.description for task in created], [item['description'] for item in preview])
+
+
+class CapacityPlanTestCase(TestCase):
+    """Tests para el planificador de capacidad del taller"""
+
+    def setUp(self):
+        invalidate_work_calendars()
+        self.data = crear_datos_base()
+        self.pause_type = PauseType.objects.create(id_pause_type='STOCK', name='Falta de stock')
+        self.monday = timezone.make_aware(datetime(2026, 10, 12, 9, 0))
+        self.tuesday_noon = timezone.make_aware(datetime(2026, 10, 13, 12, 0))
+        self.ingreso = Ingreso.objects.create(
+            patent=self.data['vehicle'], entry_datetime=self.monday - timedelta(hours=1),
+            chofer=self.data['flota_user'], authorization=False,
+        )
+
+    def crear_tarea(self, start, end):
+        work_order = WorkOrder.objects.create(
+            status=self.data['status'], ingreso=self.ingreso, work_started_at=start, actual_completion=end,
+        )
+        task = Task.objects.create(
+            work_order=work_order, description='Frenos', urgency='Media', start_datetime=start, end_datetime=end,
+        )
+        TaskAssignment.objects.create(task=task, user=self.data['flota_user'])
+        return work_order
+
+    def test_subtract_intervals(self):
+        """Quita de los intervalos los tramos removidos"""
+        self.assertEqual(subtract_intervals([[0, 10], [12, 20]], [[2, 4], [8, 13], [19, 30]]),
+                         [[0, 2], [4, 8], [13, 19]])
+
+    def test_mechanic_and_bay_timelines(self):
+        """Reparte horas por día según la jornada, descuenta pausas y marca sobrecargas"""
+        work_order = self.crear_tarea(self.monday, self.tuesday_noon)
+        WorkOrderPause.objects.create(
+            work_order=work_order, pause_type=self.pause_type, reason='Stock',
+            start_datetime=self.tuesday_noon - timedelta(hours=2),
+            end_datetime=self.tuesday_noon - timedelta(hours=1),
+        )
+        self.crear_tarea(self.monday, self.monday.replace(hour=16, minute=30))
+
+        with CaptureQueriesContext(connection) as queries:
+            plan = capacity_plan(datetime(2026, 10, 12).date(), datetime(2026, 10, 14).date())
+        self.assertLessEqual(len(queries), 7)
+        self.assertEqual(plan['days'], ['2026-10-12', '2026-10-13', '2026-10-14'])
+
+        mechanic = plan['mechanics'][0]
+        self.assertEqual(mechanic['committed'], [15.0, 3.5, 0.0])
+        self.assertEqual(mechanic['capacity'], [9.0, 9.0, 9.0])
+        self.assertEqual(mechanic['overloads'], [['2026-10-12', '2026-10-12']])
+        self.assertEqual(len(mechanic['bars']), 2)
+
+        site = plan['sites'][0]
+        self.assertEqual(site['committed'], [15.0, 4.5, 0.0])
+        self.assertEqual(site['utilisation'][1], 0.5)
+        self.assertEqual(site['overloads'], [['2026-10-12', '2026-10-12']])
+
+    def test_api(self):
+        """El endpoint valida el rango y retorna el plan"""
+        self.client.force_login(self.data['user'])
+        response = self.client.get(reverse('capacidad_api'), {'start': '2026-10-01', 'end': '2026-10-31'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['days']), 31)
+        too_long = self.client.get(reverse('capacidad_api'), {'start': '2026-01-01', 'end': '2026-12-31'})
+        self.assertEqual(too_long.status_code, 400)
+
+
+class PendingSchedulesTestCase(TestCase):
+    """Tests para el índice por día de agendamientos pendientes"""
+
+    def setUp(self):
+        cache.clear()
+        self.data = crear_datos_base()
+        self.monday = timezone.make_aware(datetime(2026, 10, 19, 9, 0))
+        self.schedules = [
+            MaintenanceSchedule.objects.create(
+                patent=self.data['vehicle'], start_datetime=start, status=self.data['user_status'],
+                expected_chofer=self.data['flota_user'],
+            ) for start in (self.monday, self.monday + timedelta(hours=2), self.monday + timedelta(days=1))
+        ]
+
+    def crear_ingreso(self, schedule):
+        return Ingreso.objects.create(
+            patent=self.data['vehicle'], entry_datetime=self.monday, chofer=self.data['flota_user'],
+            authorization=False, schedule=schedule,
+        )
+
+    def test_index_follows_ingresos_and_schedules(self):
+        """Registrar, mover o eliminar ingresos y agendamientos mantiene el índice"""
+        monday, tuesday = self.monday.date(), self.monday.date() + timedelta(days=1)
+        self.assertEqual(available_dates(), [monday, tuesday])
+        self.assertEqual(list(pending_schedules_for_day(monday)), self.schedules[:2])
+
+        ingreso = self.crear_ingreso(self.schedules[2])
+        self.assertEqual(available_dates(), [monday])
+
+        ingreso.schedule = self.schedules[0]
+        ingreso.save()
+        self.assertEqual(list(pending_schedules_for_day(monday)), [self.schedules[1]])
+        self.assertEqual(available_dates(), [monday, tuesday])
+
+        ingreso.delete()
+        self.assertEqual(len(pending_schedules_for_day(monday)), 2)
+
+        schedule = MaintenanceSchedule.objects.get(pk=self.schedules[2].pk)
+        schedule.start_datetime = self.monday + timedelta(days=3)
+        schedule.save()
+        self.assertEqual(available_dates(), [monday, monday + timedelta(days=3)])
+
+    def test_bulk_check_in_and_rebuild(self):
+        """El registro en bloque actualiza el índice y la reconstrucción lo deja igual"""
+        bulk_check_in([self.schedules[0].id_schedule], self.data['flota_user'])
+        self.assertEqual(list(pending_schedules_for_day(self.monday.date())), [self.schedules[1]])
+
+        MaintenanceSchedule.objects.update(pending_day=None)
+        self.assertEqual(rebuild_pending_days(), 2)
+        self.assertEqual(len(available_dates()), 2)
+
+    def test_select_view_uses_index(self):
+        """La vista lista los pendientes del día sin anti-join"""
+        self.client.force_login(self.data['user'])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('ingreso_create_select'), {'date': '2026-10-19'})
+        self.assertEqual(len(response.context['pending_schedules']), 2)
+        self.assertEqual(len(response.context['available_dates']), 2)
+        schedule_queries = [q['sql'] for q in queries.captured_queries if 'MaintenanceSchedules' in q['sql']]
+        self.assertFalse(any('Ingresos' in sql for sql in schedule_queries))
+
+
+class PreventivePlanTestCase(TestCase):
+    """Tests para el generador del plan de mantención preventiva"""
+
+    def setUp(self):
+        cache.clear()
+        invalidate_work_calendars()
+        self.data = crear_datos_base()
+        self.vehicle = self.data['vehicle']
+        self.start_day = datetime(2026, 11, 2).date()  # Lunes
+
+    def crear_vehiculos(self, count):
+        vehicles = [
+            Vehicle(
+                patent=f'PLAN{index:02d}', equipment=self.vehicle.equipment, ceco=self.vehicle.ceco, brand='Volvo',
+                model='FH', year=2021, age=4, useful_life=10, mileage=500, site=self.data['site'], operational=True,
+                backup=False, out_of_service=False, type=self.data['vehicle_type'], plan=True, sinister=False,
+                observations='', compliance='OK', geotab_confirm=True, auction=False,
+            ) for index in range(count)
+        ]
+        return Vehicle.objects.bulk_create(vehicles)
+
+    def test_due_date_uses_first_interval_reached(self):
+        """La pauta en km adelanta la mantención de un vehículo que recorre mucho"""
+        last = datetime(2026, 1, 1).date()
+        self.assertEqual(due_date(last, 180), last + timedelta(days=180))
+        # 36.500 km en un año son 100 km diarios: 10.000 km se cumplen en 100 días
+        self.assertEqual(due_date(last, 180, 10000, 36500, 1), last + timedelta(days=100))
+
+    def test_plan_respects_site_capacity(self):
+        """Llena los bloques libres de la sucursal, contando lo ya agendado, y omite lo no vencido"""
+        MaintenanceSchedule.objects.create(
+            patent=self.vehicle, status=self.data['user_status'],
+            start_datetime=timezone.make_aware(datetime.combine(self.start_day, time(7, 30))),
+        )
+        self.crear_vehiculos(5)
+        Vehicle.objects.filter(patent='PLAN00').update(plan=False)
+        Ingreso.objects.create(
+            patent=Vehicle.objects.get(patent='PLAN01'), chofer=self.data['flota_user'], authorization=True,
+            entry_datetime=timezone.make_aware(datetime.combine(self.start_day, time.min)) - timedelta(days=10),
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            result = generate_preventive_plan(start_day=self.start_day, horizon_days=7)
+        self.assertLess(len(queries), 15)
+        self.assertEqual(result['due'], 3)
+        starts = [timezone.localtime(schedule.start_datetime) for schedule in result['schedules']]
+        self.assertEqual([(start.day, start.hour, start.minute) for start in starts],
+                         [(2, 9, 30), (2, 11, 30), (2, 13, 30)])
+
+        schedules = MaintenanceSchedule.objects.filter(observations__startswith='Mantención preventiva')
+        self.assertEqual(schedules.count(), 3)
+        self.assertEqual(list(pending_schedules_for_day(self.start_day)), list(
+            MaintenanceSchedule.objects.filter(start_datetime__date=self.start_day).order_by('start_datetime')
+        ))
+
+        # Una segunda corrida no duplica: todos tienen su mantención agendada
+        self.assertEqual(generate_preventive_plan(start_day=self.start_day, horizon_days=7)['due'], 0)
+
+    def test_command_dry_run(self):
+        """El comando en modo de prueba informa el plan sin guardar"""
+        self.crear_vehiculos(6)
+        out = StringIO()
+        call_command('generate_preventive_plan', '--desde', '2026-11-02', '--dias', '1', '--dry-run', stdout=out)
+        self.assertIn('Se calcularían 4 agendamientos', out.getvalue())
+        self.assertIn('3 sin cupo', out.getvalue())
+        self.assertFalse(MaintenanceSchedule.objects.exists())
+
+
+class OccupancyHeatmapTestCase(TestCase):
+    """Tests para el mapa de calor de ocupación del calendario"""
+
+    def setUp(self):
+        self.data = crear_datos_base()
+        self.start = timezone.make_aware(datetime(2026, 10, 1))
+        self.end = timezone.make_aware(datetime(2026, 10, 4))
+
+    def crear_ot(self, created, completed=None):
+        ingreso = Ingreso.objects.create(
+            patent=self.data['vehicle'], entry_datetime=created, exit_datetime=created,
+            chofer=self.data['flota_user'], authorization=False,
+        )
+        work_order = WorkOrder.objects.create(status=self.data['status'], ingreso=ingreso, actual_completion=completed)
+        # created_datetime es auto_now_add
+        WorkOrder.objects.filter(pk=work_order.pk).update(created_datetime=created)
+        return work_order
+
+    def test_daily_counts(self):
+        """Cuenta agendas e ingresos por día y arrastra las OTs abiertas"""
+        for day in (1, 1, 3):
+            MaintenanceSchedule.objects.create(
+                patent=self.data['vehicle'], start_datetime=timezone.make_aware(datetime(2026, 10, day, 10)),
+                status=self.data['user_status'],
+            )
+        # Abierta desde antes del rango y cerrada el día 2
+        self.crear_ot(timezone.make_aware(datetime(2026, 9, 20, 10)), timezone.make_aware(datetime(2026, 10, 2, 15)))
+        # Creada el día 2 y aún abierta
+        self.crear_ot(timezone.make_aware(datetime(2026, 10, 2, 9)))
+        # Cancelada sin fecha de término: no cuenta como abierta
+        cancelada = self.crear_ot(timezone.make_aware(datetime(2026, 9, 25, 9)))
+        cancelada.status = WorkOrderStatus.objects.create(name='Cancelada')
+        cancelada.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            heatmap = occupancy_heatmap(self.start, self.end)
+        self.assertLessEqual(len(queries), 6)
+        self.assertEqual(heatmap['days'], ['2026-10-01', '2026-10-02', '2026-10-03'])
+        site = heatmap['sites'][0]
+        self.assertEqual(site['schedules'], [2, 0, 1])
+        self.assertEqual(site['ingresos'], [0, 1, 0])
+        self.assertEqual(site['open_work_orders'], [1, 2, 1])
+
+    def test_endpoint(self):
+        """El endpoint valida el rango y la sucursal y responde 304 con el mismo ETag"""
+        url = reverse('calendario_ocupacion')
+        params = {'start': '2026-10-01', 'end': '2026-11-01', 'site': self.data['site'].id_site}
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['days']), 31)
+
+        etag = response['ETag']
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=f'"otra", W/{etag}')
+        self.assertEqual(response.status_code, 304)
+        # Un valor que solo contiene a la etiqueta no es la misma versión
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=f'x{etag}')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.client.get(url, {'start': '2026-10-01'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {**params, 'site': 'x'}).status_code, 400)
+
+
+class WorkOrderLiveUpdatesTestCase(TestCase):
+    """Tests para el stream SSE del detalle de la OT"""
+
+    def setUp(self):
+        cache.clear()
+        self.data = crear_datos_base()
+        self.pause_type = PauseType.objects.create(id_pause_type='STOCK', name='Falta de stock')
+        ingreso = Ingreso.objects.create(
+            patent=self.data['vehicle'], entry_datetime=timezone.now() - timedelta(hours=3),
+            chofer=self.data['flota_user'], authorization=False,
+        )
+        self.work_order = WorkOrder.objects.create(
+            status=self.data['status'], ingreso=ingreso, work_started_at=timezone.now() - timedelta(hours=2),
+        )
+        self.assignment = WorkOrderMechanic.objects.create(
+            work_order=self.work_order, mechanic=self.data['flota_user'],
+        )
+
+    def crear_pausa(self):
+        return WorkOrderPause.objects.create(
+            work_order=self.work_order, mechanic_assignment=self.assignment, pause_type=self.pause_type,
+            reason='Stock', start_datetime=timezone.now() - timedelta(minutes=30),
+        )
+
+    def test_signals_bump_version(self):
+        """Pausas, mecánicos y cambios de la OT avisan a los streams"""
+        version = work_order_version(self.work_order.pk)
+        pause = self.crear_pausa()
+        pause.end_datetime = timezone.now()
+        pause.save()
+        self.assignment.delete()
+        self.assertGreaterEqual(work_order_version(self.work_order.pk), version + 3)
+
+    def test_snapshot(self):
+        """La instantánea trae estado, mecánicos activos y la pausa abierta"""
+        self.crear_pausa()
+        snapshot = work_order_snapshot(self.work_order.pk)
+        self.assertEqual(snapshot['status']['name'], self.data['status'].name)
+        self.assertEqual([mechanic['id'] for mechanic in snapshot['mechanics']], [self.assignment.pk])
+        self.assertTrue(snapshot['mechanics'][0]['paused'])
+        self.assertIsNone(snapshot['pauses'][str(self.assignment.pk)][-1]['end'])
+        self.assertIsNone(work_order_snapshot(0))
+
+    def test_wsgi_single_snapshot(self):
+        """Con WSGI responde una sola instantánea con retry para que EventSource vuelva a consultar"""
+        self.client.force_login(self.data['user'])
+        response = self.client.get(reverse('orden_trabajo_eventos', args=[self.work_order.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = response.content.decode()
+        self.assertTrue(body.startswith('retry: '))
+        self.assertIn('event: work_order', body)
+
+    def test_requires_login(self):
+        """Sin sesión el stream responde 401 y no expone la OT"""
+        url = reverse('orden_trabajo_eventos', args=[self.work_order.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 401)
+        self.assertNotIn(b'work_order', response.content)
+
+    async def test_requires_login_with_asgi(self):
+        """Con ASGI tampoco se abre el stream sin sesión"""
+        url = reverse('orden_trabajo_eventos', args=[self.work_order.pk])
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 401)
+
+    async def test_stream_pushes_changes(self):
+        """El stream envía la instantánea inicial y otra cuando se registra una pausa"""
+        with patch.object(live_updates, 'POLL_INTERVAL', 0):
+            events = work_order_events(self.work_order.pk)
+            self.assertTrue((await anext(events)).startswith('retry: '))
+            first = await anext(events)
+            self.assertIn('event: work_order', first)
+            self.assertFalse(json.loads(first.split('data: ', 1)[1])['mechanics'][0]['paused'])
+
+            await sync_to_async(self.crear_pausa)()
+            second = await anext(events)
+            self.assertTrue(json.loads(second.split('data: ', 1)[1])['mechanics'][0]['paused'])
+            await events.aclose()
+
+    async def test_stream_skips_known_snapshot(self):
+        """Al reconectar con Last-Event-ID vigente no reenvía la misma instantánea"""
+        with patch.object(live_updates, 'POLL_INTERVAL', 0), patch.object(live_updates, 'HEARTBEAT_SECONDS', 0):
+            events = work_order_events(self.work_order.pk)
+            await anext(events)
+            event_id = (await anext(events)).split('\n', 1)[0][len('id: '):]
+
+            events = work_order_events(self.work_order.pk, last_event_id=event_id)
+            await anext(events)
+            self.assertEqual(await anext(events), ': ping\n\n')
+            await events.aclose()
+
+
+class WorkOrderApiTestCase(TestCase):
+    """Tests para la API compacta del detalle de OT"""
+
+    def setUp(self):
+        self.data = crear_datos_base()
+        self.client.force_login(self.data['user'])
+        self.pause_type = PauseType.objects.create(id_pause_type='STOCK', name='Falta de stock')
+        ingreso = Ingreso.objects.create(
+            patent=self.data['vehicle'], entry_datetime=timezone.now() - timedelta(hours=3),
+            chofer=self.data['flota_user'], authorization=False,
+        )
+        self.work_order = WorkOrder.objects.create(
+            status=self.data['status'], ingreso=ingreso, work_started_at=timezone.now() - timedelta(hours=2),
+        )
+        self.assignment = WorkOrderMechanic.objects.create(work_order=self.work_order, mechanic=self.data['flota_user'])
+        self.task = Task.objects.create(
+            work_order=self.work_order, description='Frenos', urgency='Media', start_datetime=timezone.now(),
+        )
+        TaskAssignment.objects.create(task=self.task, user=self.data['flota_user'])
+        self.url = reverse('orden_trabajo_api', args=[self.work_order.pk])
+
+    def test_full_payload_and_not_modified(self):
+        """Retorna la OT completa y 304 mientras no cambie"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(queries), 9)
+        payload = response.json()
+        self.assertTrue(payload['full'])
+        self.assertEqual(payload['work_order']['patent'], 'ABCD12')
+        self.assertEqual(payload['tasks'][0]['mechanic_ids'], [self.data['flota_user'].pk])
+        self.assertEqual([row['id_assignment'] for row in payload['assignments']], [self.assignment.pk])
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_with_pauses(self):
+        """Registrar una pausa cambia la versión"""
+        etag = self.client.get(self.url)['ETag']
+        WorkOrderPause.objects.create(
+            work_order=self.work_order, pause_type=self.pause_type, reason='Stock', start_datetime=timezone.now(),
+        )
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_since_returns_only_changes(self):
+        """Con since solo vienen las filas modificadas y los ids vigentes"""
+        old = timezone.now() - timedelta(hours=1)
+        Task.objects.filter(pk=self.task.pk).update(updated_at=old)
+        WorkOrderMechanic.objects.filter(pk=self.assignment.pk).update(updated_at=old)
+        pause = WorkOrderPause.objects.create(
+            work_order=self.work_order, pause_type=self.pause_type, reason='Stock', start_datetime=timezone.now(),
+        )
+
+        since = (timezone.now() - timedelta(minutes=10)).isoformat()
+        payload = self.client.get(self.url, {'since': since}).json()
+        self.assertFalse(payload['full'])
+        self.assertEqual(payload['tasks'], [])
+        self.assertEqual(payload['task_ids'], [self.task.pk])
+        self.assertEqual(payload['assignments'], [])
+        self.assertEqual([row['id_pause'] for row in payload['pauses']], [pause.pk])
+
+        # Asignar otro mecánico a la tarea la marca como modificada
+        TaskAssignment.objects.create(task=self.task, user=self.data['flota_user'])
+        payload = self.client.get(self.url, {'since': since}).json()
+        self.assertEqual([task['id_task'] for task in payload['tasks']], [self.task.pk])
+
+    def test_errors(self):
+        """since inválido y OT inexistente"""
+        self.assertEqual(self.client.get(self.url, {'since': 'ayer'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('orden_trabajo_api', args=[0])).status_code, 404)
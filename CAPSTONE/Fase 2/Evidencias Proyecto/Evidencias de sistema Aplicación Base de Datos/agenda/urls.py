@@ -4,17 +4,26 @@ from . import views
 urlpatterns = [
     path('', views.home, name='home'),
     path('calendario/', views.calendario, name='calendario'),
+    path('api/calendario/eventos/', views.calendario_events, name='calendario_events'),
+    path('api/calendario/ocupacion/', views.calendario_ocupacion, name='calendario_ocupacion'),
     path('ingresos/', views.ingresos_list, name='ingresos_list'),
     path('ingresos/crear/', views.ingreso_create_select, name='ingreso_create_select'),
     path('ingresos/crear/confirmar/', views.ingreso_create_from_schedule, name='ingreso_create_from_schedule'),
+    path('ingresos/crear/en-bloque/', views.ingreso_bulk_check_in, name='ingreso_bulk_check_in'),
     path('ingresos/<int:pk>/', views.ingreso_detail, name='ingreso_detail'),
     path('salidas/registrar/', views.registrar_salida, name='registrar_salida'),
     path('calendario/agendar/', views.agendar_ingreso, name='agendar_ingreso'),
+    path('api/agenda/validar-horarios/', views.validar_horarios_api, name='validar_horarios_api'),
+    path('api/agenda/proximos-horarios/', views.proximos_horarios_api, name='proximos_horarios_api'),
+    path('capacidad/', views.capacidad_taller, name='capacidad_taller'),
+    path('api/capacidad/', views.capacidad_api, name='capacidad_api'),
+    path('api/ordenes-trabajo/<int:work_order_id>/', views.orden_trabajo_api, name='orden_trabajo_api'),
     path('api/incidents-by-vehicle/', views.get_incidents_by_vehicle, name='get_incidents_by_vehicle'),
     # URLs para órdenes de trabajo
     path('ordenes-trabajo/', views.orden_trabajo_list, name='orden_trabajo_list'),
     path('ordenes-trabajo/crear/<int:ingreso_id>/', views.orden_trabajo_create, name='orden_trabajo_create'),
     path('ordenes-trabajo/<int:work_order_id>/', views.orden_trabajo_detail, name='orden_trabajo_detail'),
+    path('ordenes-trabajo/<int:work_order_id>/eventos/', views.orden_trabajo_eventos, name='orden_trabajo_eventos'),
     path('ordenes-trabajo/<int:work_order_id>/editar/', views.orden_trabajo_update, name='orden_trabajo_update'),
     path('ordenes-trabajo/<int:work_order_id>/agregar-mecanico/', views.orden_trabajo_add_mechanic, name='orden_trabajo_add_mechanic'),
     path('ordenes-trabajo/<int:work_order_id>/agregar-repuesto/', views.orden_trabajo_add_spare_part, name='orden_trabajo_add_spare_part'),
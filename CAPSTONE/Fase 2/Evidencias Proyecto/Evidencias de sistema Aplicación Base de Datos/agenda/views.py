@@ -1,251 +1,161 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
+from django.template.loader import render_to_string
+from django.http import JsonResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_POST
 from django.contrib import messages
-from django.db.models import Q
-from datetime import datetime, time, timedelta
-from documents.models import Ingreso, MaintenanceSchedule, Vehicle, Route, WorkOrder, WorkOrderStatus, WorkOrderMechanic, SparePartUsage, Repuesto, Task, Incident, IngresoImage, Role, TaskAssignment
+from datetime import datetime, timedelta
+from documents.models import Ingreso, MaintenanceSchedule, Site, Vehicle, Route, WorkOrder, WorkOrderStatus, WorkOrderMechanic, SparePartUsage, Repuesto, Task, Incident, IngresoImage, Role, TaskAssignment
 from repuestos.models import SparePartStock
 from .forms import IngresoForm, AgendarIngresoForm, WorkOrderForm, WorkOrderMechanicForm, SparePartUsageForm
+from .work_order_list import filter_work_orders, build_work_orders_page
+from .pause_timeline import PauseTimeline
+from .work_calendar import working_hours_elapsed, completion_datetime
+from .scheduling import validate_slots
+from .slot_finder import find_free_slots
+from .home_counters import get_home_counters
+from .ingreso_list import filter_ingresos, build_ingresos_page
+from .check_in import bulk_check_in
+from .exits import pending_exits_page, parse_exit_datetime, register_exits
+from .task_assignment import auto_assign_tasks, plan_tasks
+from .capacity import capacity_plan
+from .pending_schedules import available_dates, pending_schedules_for_day
+from .occupancy_heatmap import occupancy_heatmap
+from .live_updates import snapshot_event, work_order_events, WSGI_RECONNECT_MS
+from .work_order_api import work_order_payload, work_order_state
+from .calendar_feed import calendar_events, events_etag, parse_range_bound, range_is_valid, serialize_events
+from documents.vehicle_search import search_vehicles, vehicle_by_patent
 from pausas.models import WorkOrderPause
-from django.utils.safestring import mark_safe
 from django.utils import timezone
+from django.utils.http import parse_etags
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from asgiref.sync import sync_to_async
 import json
 
 
 def home(request):
     """Vista de la portada de la aplicación"""
-    context = {
-        'vehicles_count': Vehicle.objects.count(),
-        'ingresos_count': Ingreso.objects.filter(exit_datetime__isnull=True).count(),
-        'workorders_count': WorkOrder.objects.filter(status__name__in=['En Progreso', 'Pendiente']).count(),
-        'incidents_count': Incident.objects.filter(diagnostics__status__in=['Reportada', 'En Progreso']).distinct().count(),
-    }
-    return render(request, 'agenda/home.html', context)
+    return render(request, 'agenda/home.html', get_home_counters())
 
 
-def calculate_working_hours_elapsed(start_datetime, end_datetime):
-    """Calcula las horas transcurridas TOTALES (24 horas) - TEMPORAL PARA PRUEBAS"""
-    # TEMPORALMENTE COMENTADO: Cálculo considerando solo horario laboral (7:30 AM - 4:30 PM)
-    """
-    # Horario laboral: 7:30 AM - 4:30 PM
-    work_start = time(7, 30)
-    work_end = time(16, 30)
+def calculate_working_hours_elapsed(start_datetime, end_datetime, site_id=None):
+    """Calcula las horas laborales transcurridas según el calendario del taller (turnos y feriados)"""
+    return working_hours_elapsed(start_datetime, end_datetime, site_id=site_id)
 
-    total_hours = 0
 
-    # Si está dentro del mismo día
-    if start_datetime.date() == end_datetime.date():
-        # Ajustar start y end al horario laboral
-        effective_start = max(start_datetime.time(), work_start) if start_datetime.time() >= work_start else work_start
-        effective_end = min(end_datetime.time(), work_end) if end_datetime.time() <= work_end else work_end
+def calculate_completion_datetime(start_datetime, total_hours, site_id=None):
+    """Calcula la fecha de finalización considerando solo horas laborales del calendario del taller"""
+    return completion_datetime(start_datetime, total_hours, site_id=site_id)
 
-        if effective_start < effective_end:
-            duration = datetime.combine(start_datetime.date(), effective_end) - datetime.combine(start_datetime.date(), effective_start)
-            total_hours = duration.total_seconds() / 3600
-    else:
-        # Trabajo que cruza días
-        current_date = start_datetime.date()
-
-        # Día de inicio
-        if start_datetime.time() < work_end:
-            effective_start = max(start_datetime.time(), work_start)
-            effective_end = work_end
-            if effective_start < effective_end:
-                duration = datetime.combine(current_date, effective_end) - datetime.combine(current_date, effective_start)
-                total_hours += duration.total_seconds() / 3600
-
-        # Días completos entre inicio y fin
-        current_date += timedelta(days=1)
-        while current_date < end_datetime.date():
-            # Día completo de trabajo
-            duration = datetime.combine(current_date, work_end) - datetime.combine(current_date, work_start)
-            total_hours += duration.total_seconds() / 3600
-            current_date += timedelta(days=1)
-
-        # Día de fin
-        if end_datetime.time() > work_start:
-            effective_start = work_start
-            effective_end = min(end_datetime.time(), work_end)
-            if effective_start < effective_end:
-                duration = datetime.combine(end_datetime.date(), effective_end) - datetime.combine(end_datetime.date(), effective_start)
-                total_hours += duration.total_seconds() / 3600
-
-    return total_hours
+
+def calendario(request):
+    # Los eventos se cargan desde calendario_events según el rango visible
+    return render(request, 'agenda/calendario.html')
+
+
+def _etag_matches(request, etag):
     """
+    Si `If-None-Match` nombra la etiqueta: la lista separada por comas se
+    compara etiqueta por etiqueta (comparación débil, ignorando `W/`) o con `*`
+    """
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    if '*' in etags:
+        return True
+    return etag.removeprefix('W/') in {tag.removeprefix('W/') for tag in etags}
 
-    # CÁLCULO TEMPORAL: Horas totales sin restricciones de horario laboral (24 horas)
-    duration = end_datetime - start_datetime
-    return duration.total_seconds() / 3600
 
+def _revalidated_response(request, etag, body, content_type='application/json'):
+    """
+    304 si el cliente ya tiene la versión `etag`; si no, la respuesta con
+    `body`. Si la etiqueta sale de una huella barata, `body` puede ser una
+    función para armarlo solo cuando hace falta. En ambos casos el navegador
+    puede guardarla pero debe revalidar siempre con el ETag.
+    """
+    if _etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body() if callable(body) else body, content_type=content_type)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
-def calculate_completion_datetime(start_datetime, total_hours):
-    """Calcula la fecha de finalización considerando solo horas laborales (7:30 AM - 4:30 PM)"""
-    work_start = time(7, 30)
-    work_end = time(16, 30)
-    daily_work_hours = 9  # 7:30 to 16:30 = 9 hours
-    
-    current_datetime = start_datetime
-    remaining_hours = float(total_hours)
-    
-    while remaining_hours > 0:
-        # Si current_datetime está fuera de jornada, mover al próximo inicio de jornada
-        if current_datetime.time() < work_start:
-            current_datetime = timezone.make_aware(datetime.combine(current_datetime.date(), work_start))
-        elif current_datetime.time() > work_end:
-            current_datetime = timezone.make_aware(datetime.combine(current_datetime.date() + timedelta(days=1), work_start))
-        
-        # Calcular horas disponibles en el día actual
-        day_end = timezone.make_aware(datetime.combine(current_datetime.date(), work_end))
-        if current_datetime >= day_end:
-            current_datetime = timezone.make_aware(datetime.combine(current_datetime.date() + timedelta(days=1), work_start))
-            continue
-        
-        available_hours = (day_end - current_datetime).total_seconds() / 3600
-        if remaining_hours <= available_hours:
-            current_datetime += timedelta(hours=remaining_hours)
-            remaining_hours = 0
-        else:
-            current_datetime = timezone.make_aware(datetime.combine(current_datetime.date() + timedelta(days=1), work_start))
-            remaining_hours -= available_hours
-    
-    return current_datetime
 
+def calendario_events(request):
+    """Feed JSON de agendas para FullCalendar, limitado al rango visible y con soporte de ETag"""
+    start = parse_range_bound(request.GET.get('start'))
+    end = parse_range_bound(request.GET.get('end'))
+    if not range_is_valid(start, end):
+        return JsonResponse({'error': 'Rango de fechas inválido'}, status=400)
+
+    body = serialize_events(calendar_events(start, end))
+    # El ETag es el hash del cuerpo: un 304 ahorra la transferencia, no la consulta
+    return _revalidated_response(request, events_etag(body), body)
+
+
+def calendario_ocupacion(request):
+    """Mapa de calor diario por sucursal (agendas, ingresos y OTs abiertas) para un rango, con soporte de ETag"""
+    start = parse_range_bound(request.GET.get('start'))
+    end = parse_range_bound(request.GET.get('end'))
+    if not range_is_valid(start, end):
+        return JsonResponse({'error': 'Rango de fechas inválido'}, status=400)
+    site_id = request.GET.get('site')
+    if site_id and not site_id.isdigit():
+        return JsonResponse({'error': 'Sucursal inválida'}, status=400)
+
+    body = serialize_events(occupancy_heatmap(start, end, site_id=int(site_id) if site_id else None))
+    return _revalidated_response(request, events_etag(body), body)
 
-def calendario(request):
-    schedules = MaintenanceSchedule.objects.prefetch_related('related_incidents', 'ingresos').all()
-    
-    # Crear una lista de eventos serializable
-    events_list = []
-    for schedule in schedules:
-        # Obtener incidentes relacionados
-        related_incidents = []
-        for incident in schedule.related_incidents.all():
-            related_incidents.append({
-                'id': incident.id_incident,
-                'name': incident.name,
-                'type': incident.incident_type,
-                'description': incident.description or '',
-                'priority': incident.priority or 'Normal',
-                'is_emergency': incident.is_emergency,
-                'reported_at': incident.reported_at.strftime('%Y-%m-%d %H:%M'),
-            })
-        
-        # Verificar si ya tiene un ingreso asociado
-        has_ingreso = schedule.ingresos.exists()
-        
-        events_list.append({
-            'id': schedule.id_schedule,
-            'title': f"{schedule.patent} - Servicio de mantenimiento",
-            'start': schedule.start_datetime.isoformat(),
-            'end': None,
-            'description': schedule.observations or '',
-            'patent': str(schedule.patent),
-            'assigned_user': schedule.assigned_user.name if schedule.assigned_user else '',
-            'status': schedule.status.name if schedule.status else '',
-            'related_incidents': related_incidents,
-            'has_ingreso': has_ingreso,
-        })
-    
-    # Usar json.dumps con manejo de errores
-    try:
-        events_json = json.dumps(events_list, ensure_ascii=True, default=str)
-        return render(request, 'agenda/calendario.html', {'events': mark_safe(events_json)})
-    except (TypeError, ValueError) as e:
-        # Si hay error, devolver lista vacía
-        print(f"Error serializando eventos: {e}")
-        return render(request, 'agenda/calendario.html', {'events': mark_safe('[]')})
 
 def ingresos_list(request):
     ingresos = Ingreso.objects.select_related(
-        'patent', 'patent__site', 'entry_registered_by', 'exit_registered_by', 'schedule'
-    ).prefetch_related('work_orders', 'diagnostics').all()
-    return render(request, 'agenda/ingresos_list.html', {'ingresos': ingresos})
+        'patent', 'patent__site', 'chofer', 'entry_registered_by', 'exit_registered_by', 'schedule'
+    )
+    ingresos = filter_ingresos(ingresos, request.GET)
+    page, next_cursor = build_ingresos_page(ingresos, request.GET.get('cursor'))
+
+    # Las páginas siguientes se piden desde ingresos_list.js a medida que se hace scroll
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'html': render_to_string('agenda/ingreso_cards.html', {'ingresos': page}, request=request),
+            'count': len(page),
+            'next_cursor': next_cursor,
+        })
+
+    return render(request, 'agenda/ingresos_list.html', {
+        'ingresos': page,
+        'next_cursor': next_cursor,
+        'sites': Site.objects.order_by('name'),
+    })
 
 def ingreso_create_select(request):
-    from datetime import date, datetime
-    
+    """Agendamientos pendientes de ingreso de un día, o la captura de fotos de uno de ellos"""
     # Obtener la fecha seleccionada
-    selected_date = request.GET.get('date')
-    if selected_date:
-        try:
-            selected_date = datetime.strptime(selected_date, '%Y-%m-%d').date()
-        except ValueError:
-            selected_date = date.today()
-    else:
-        selected_date = date.today()
-    
-    # Si se especifica un parámetro 'date' y 'schedule_id', mostrar captura de fotos para ese agendamiento específico
-    if request.GET.get('date') and request.GET.get('schedule_id'):
-        schedule_id = request.GET.get('schedule_id')
-        # Filtrar solo el agendamiento específico
-        pending_schedules = MaintenanceSchedule.objects.filter(
-            id_schedule=schedule_id,
-            ingresos__isnull=True,
-            start_datetime__date=selected_date
-        ).select_related('patent', 'expected_chofer', 'assigned_user', 'patent__site')
-        
+    try:
+        selected_date = datetime.strptime(request.GET.get('date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        selected_date = timezone.localdate()
+
+    pending_schedules = pending_schedules_for_day(selected_date)
+
+    # Con 'date' y 'schedule_id', mostrar captura de fotos para ese agendamiento específico
+    schedule_id = request.GET.get('schedule_id')
+    if request.GET.get('date') and schedule_id and schedule_id.isdigit():
         return render(request, 'agenda/ingreso_create_with_photos.html', {
-            'pending_schedules': pending_schedules,
-            'selected_date': selected_date,
-        })
-    
-    # Si se especifica un parámetro 'date' y 'show_schedules', mostrar lista de selección filtrada
-    if request.GET.get('date') and request.GET.get('show_schedules'):
-        # Filtrar agendamientos pendientes para la fecha seleccionada
-        pending_schedules = MaintenanceSchedule.objects.filter(
-            ingresos__isnull=True,
-            start_datetime__date=selected_date
-        ).select_related('patent', 'expected_chofer', 'assigned_user', 'patent__site').order_by('start_datetime')
-        
-        # Fechas disponibles (con agendamientos pendientes)
-        available_dates = MaintenanceSchedule.objects.filter(
-            ingresos__isnull=True
-        ).dates('start_datetime', 'day')
-        
-        return render(request, 'agenda/ingreso_create_select.html', {
-            'pending_schedules': pending_schedules,
+            'pending_schedules': pending_schedules.filter(id_schedule=schedule_id),
             'selected_date': selected_date,
-            'available_dates': available_dates,
         })
-    
-    # Si se especifica un parámetro 'date', mostrar lista de agendamientos para esa fecha
-    if request.GET.get('date'):
-        # Filtrar agendamientos pendientes para la fecha seleccionada
-        pending_schedules = MaintenanceSchedule.objects.filter(
-            ingresos__isnull=True,
-            start_datetime__date=selected_date
-        ).select_related('patent', 'expected_chofer', 'assigned_user', 'patent__site').order_by('start_datetime')
-        
-        # Fechas disponibles (con agendamientos pendientes)
-        available_dates = MaintenanceSchedule.objects.filter(
-            ingresos__isnull=True
-        ).dates('start_datetime', 'day')
-        
-        return render(request, 'agenda/ingreso_create_select.html', {
-            'pending_schedules': pending_schedules,
-            'selected_date': selected_date,
-            'available_dates': available_dates,
-        })
-    
-    # Comportamiento original: mostrar lista de agendamientos
-    # Filtrar agendamientos pendientes para la fecha seleccionada
-    pending_schedules = MaintenanceSchedule.objects.filter(
-        ingresos__isnull=True,
-        start_datetime__date=selected_date
-    ).select_related('patent').order_by('start_datetime')
-    
-    # Fechas disponibles (con agendamientos pendientes)
-    available_dates = MaintenanceSchedule.objects.filter(
-        ingresos__isnull=True
-    ).dates('start_datetime', 'day')
-    
+
     return render(request, 'agenda/ingreso_create_select.html', {
         'pending_schedules': pending_schedules,
         'selected_date': selected_date,
-        'available_dates': available_dates,
+        'available_dates': available_dates(),
     })
 
+
 def ingreso_detail(request, pk):
     ingreso = get_object_or_404(
         Ingreso.objects.prefetch_related('work_orders', 'diagnostics'), 
@@ -283,27 +193,41 @@ def ingreso_detail(request, pk):
 
 @login_required
 def registrar_salida(request):
+    """Registra la salida de uno o varios ingresos seleccionados, con una lista paginada de pendientes"""
     if request.method == 'POST':
-        ingreso_id = request.POST.get('ingreso')
-        exit_datetime = request.POST.get('exit_datetime')
-        autorizar = request.POST.get('autorizar') == 'on'
-        ingreso = get_object_or_404(Ingreso, id_ingreso=ingreso_id, exit_datetime__isnull=True)
-        if autorizar:
-            ingreso.authorization = True
-            ingreso.exit_datetime = exit_datetime
-            # Registrar quién registró la salida
-            if hasattr(request, 'user') and request.user.is_authenticated and hasattr(request.user, 'flotauser'):
-                ingreso.exit_registered_by = request.user.flotauser
-            ingreso.save()
-            return redirect('ingresos_list')
-        else:
+        # Modo múltiple (casillas "ingresos") o un solo ingreso seleccionado
+        ingreso_ids = [
+            int(ingreso_id) for ingreso_id in request.POST.getlist('ingresos') or [request.POST.get('ingreso')]
+            if ingreso_id and ingreso_id.isdigit()
+        ]
+        exit_datetime = parse_exit_datetime(request.POST.get('exit_datetime'))
+        error = None
+        if not ingreso_ids:
+            error = 'Debe seleccionar al menos un ingreso.'
+        elif exit_datetime is None:
+            error = 'Debe indicar una fecha y hora de salida válida.'
+        elif request.POST.get('autorizar') != 'on':
+            error = 'Debe autorizar la salida para registrar.'
+        if error:
             return render(request, 'agenda/registrar_salida.html', {
-                'ingresos_pendientes': Ingreso.objects.filter(exit_datetime__isnull=True),
-                'error': 'Debe autorizar la salida para registrar.'
+                'page_obj': pending_exits_page(request.POST.get('page')),
+                'selected_ids': ingreso_ids,
+                'error': error,
             })
-    else:
-        ingresos_pendientes = Ingreso.objects.filter(exit_datetime__isnull=True)
-        return render(request, 'agenda/registrar_salida.html', {'ingresos_pendientes': ingresos_pendientes})
+
+        closed = register_exits(ingreso_ids, exit_datetime, getattr(request.user, 'flotauser', None))
+        if closed:
+            messages.success(request, f'Salida registrada para {closed} ingreso(s).')
+        skipped = len(set(ingreso_ids)) - closed
+        if skipped:
+            messages.warning(
+                request, f'{skipped} ingreso(s) no se cerraron: ya tenían salida o entraron después de la hora indicada.'
+            )
+        return redirect('ingresos_list')
+
+    return render(request, 'agenda/registrar_salida.html', {
+        'page_obj': pending_exits_page(request.GET.get('page')),
+    })
 
 
 @login_required
@@ -324,8 +248,114 @@ def agendar_ingreso(request):
     else:
         # Pre-llenar el chofer con el usuario actual si está disponible
         form = AgendarIngresoForm(user=request.user if hasattr(request, 'user') and request.user.is_authenticated and hasattr(request.user, 'flotauser') else None)
-    
-        return render(request, 'agenda/agendar_ingreso.html', {'form': form, 'vehicles': json.dumps(vehicles), 'routes': json.dumps(routes)})
+
+    return render(request, 'agenda/agendar_ingreso.html', {'form': form, 'vehicles': json.dumps(vehicles), 'routes': json.dumps(routes)})
+
+
+@login_required
+def proximos_horarios_api(request):
+    """Retorna los próximos K horarios libres para agendar la mantención de un vehículo"""
+    patent = (request.GET.get('patent') or '').strip().upper()
+    if not patent:
+        return JsonResponse({'error': 'Patente requerida'}, status=400)
+    try:
+        count = min(max(int(request.GET.get('k', 5)), 1), 20)
+    except ValueError:
+        return JsonResponse({'error': 'Parámetro k inválido'}, status=400)
+    after = parse_range_bound(request.GET.get('desde')) if request.GET.get('desde') else None
+
+    try:
+        vehicle = Vehicle.objects.select_related('site').get(patent=patent)
+    except Vehicle.DoesNotExist:
+        return JsonResponse({'error': 'Vehículo no encontrado'}, status=404)
+
+    slots = find_free_slots(vehicle, count=count, after=after)
+    return JsonResponse({
+        'patent': vehicle.patent,
+        'slots': [{'start': start.isoformat(), 'end': end.isoformat()} for start, end in slots],
+    })
+
+
+@login_required
+def capacidad_taller(request):
+    """Vista del planificador de capacidad (Gantt de mecánicos y bahías)"""
+    return render(request, 'agenda/capacidad_taller.html', {'sites': Site.objects.order_by('name')})
+
+
+@login_required
+def capacidad_api(request):
+    """
+    Líneas de tiempo de capacidad entre `start` y `end` (fechas, ambas
+    incluidas; por defecto el mes actual), opcionalmente de una `site`.
+    """
+    today = timezone.localdate()
+    try:
+        start = datetime.strptime(request.GET['start'], '%Y-%m-%d').date() if request.GET.get('start') else today.replace(day=1)
+        end = datetime.strptime(request.GET['end'], '%Y-%m-%d').date() if request.GET.get('end') else (
+            (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+        )
+        site_id = int(request.GET['site']) if request.GET.get('site') else None
+        plan = capacity_plan(start, end, site_id=site_id)
+    except ValueError as e:
+        return JsonResponse({'error': f'Parámetros inválidos: {e}'}, status=400)
+    return JsonResponse(plan)
+
+
+@login_required
+@require_POST
+def validar_horarios_api(request):
+    """
+    Valida en bloque horarios propuestos. Recibe JSON
+    {"slots": [{"patent": "ABCD12", "start_datetime": "2025-11-10T09:00"}, ...]}
+    y retorna, por cada uno, si está libre y los conflictos encontrados.
+    """
+    try:
+        payload = json.loads(request.body or '{}')
+        raw_slots = payload.get('slots', [])
+        slots = []
+        for raw_slot in raw_slots:
+            start = parse_range_bound(raw_slot.get('start_datetime'))
+            if start is None:
+                raise ValueError(f"Fecha inválida: {raw_slot.get('start_datetime')}")
+            slots.append({'patent': str(raw_slot.get('patent', '')).upper(), 'start': start})
+    except (ValueError, AttributeError, TypeError) as e:
+        return JsonResponse({'error': f'Solicitud inválida: {e}'}, status=400)
+
+    results = validate_slots(slots)
+    return JsonResponse({
+        'results': [
+            {
+                'patent': slot['patent'],
+                'start_datetime': slot['start'].isoformat(),
+                'valid': result['valid'],
+                'conflicts': result['conflicts'],
+            } for slot, result in zip(slots, results)
+        ]
+    })
+
+
+@login_required
+@require_POST
+def ingreso_bulk_check_in(request):
+    """
+    Registra en bloque los ingresos de varios agendamientos. Recibe JSON
+    {"schedule_ids": [1, 2, ...]} y retorna, por cada uno, el ingreso creado
+    o el motivo por el que no se pudo registrar.
+    """
+    try:
+        payload = json.loads(request.body or '{}')
+        schedule_ids = [int(schedule_id) for schedule_id in payload.get('schedule_ids', [])]
+    except (ValueError, AttributeError, TypeError) as e:
+        return JsonResponse({'error': f'Solicitud inválida: {e}'}, status=400)
+    if not schedule_ids:
+        return JsonResponse({'error': 'No se seleccionaron agendamientos.'}, status=400)
+
+    registered_by = getattr(request.user, 'flotauser', None)
+    results = bulk_check_in(schedule_ids, registered_by)
+    return JsonResponse({
+        'created': sum(1 for result in results if result['ok']),
+        'results': results,
+    })
 
 
 def ingreso_create_from_schedule(request):
@@ -339,7 +369,7 @@ def ingreso_create_from_schedule(request):
             return redirect('ingreso_create_select')
         
         # Obtener el agendamiento
-        schedule = get_object_or_404(MaintenanceSchedule, id_schedule=schedule_id, ingresos__isnull=True)
+        schedule = get_object_or_404(MaintenanceSchedule, id_schedule=schedule_id, pending_day__isnull=False)
         
         # Validar que el schedule tenga un vendedor asignado
         if not schedule.expected_chofer:
@@ -395,73 +425,29 @@ def ingreso_create_from_schedule(request):
 
 def orden_trabajo_list(request):
     """Vista para listar todas las órdenes de trabajo"""
-    # Obtener todas las órdenes de trabajo con sus ingresos relacionados (si existen)
+    # Obtener las órdenes de trabajo con sus ingresos relacionados (si existen)
     work_orders = WorkOrder.objects.select_related(
         'ingreso__patent', 'ingreso__chofer', 'ingreso__patent__site', 'status'
-    ).prefetch_related('diagnostics__incidents__vehicle').order_by('-created_datetime')
+    ).order_by('-created_datetime', '-id_work_order')
+    work_orders = filter_work_orders(work_orders, request.GET)
 
     # Obtener estados para el filtro (excluyendo pausada, cancelada y sin orden)
     work_order_statuses = WorkOrderStatus.objects.exclude(
         name__in=['Pausada', 'Cancelada', 'Sin Orden']
     )
 
-    # Crear una lista con información de todas las órdenes de trabajo
-    work_orders_data = []
-    for work_order in work_orders:
-        # Si no hay ingreso, intentar obtener el vehículo del diagnóstico
-        vehicle = None
-        if not work_order.ingreso:
-            # Buscar el diagnóstico relacionado
-            diagnostic = work_order.diagnostics.first()
-            if diagnostic:
-                # Obtener el primer incidente del diagnóstico
-                incident = diagnostic.incidents.first()
-                if incident:
-                    vehicle = incident.vehicle
-
-        # Verificar estado de stock de repuestos
-        stock_issues = []
-        spare_part_usages = work_order.spare_part_usages.select_related('repuesto')
-        
-        for usage in spare_part_usages:
-            try:
-                from repuestos.models import SparePartStock
-                stock_info = SparePartStock.objects.get(repuesto=usage.repuesto)
-                if stock_info.current_stock < usage.quantity_used:
-                    stock_issues.append({
-                        'repuesto': usage.repuesto.name,
-                        'required': usage.quantity_used,
-                        'available': stock_info.current_stock
-                    })
-            except SparePartStock.DoesNotExist:
-                stock_issues.append({
-                    'repuesto': usage.repuesto.name,
-                    'required': usage.quantity_used,
-                    'available': 0
-                })
+    # Stock, pausas activas y vehículo de respaldo se calculan por página en consultas de conjunto
+    page_obj, work_orders_data = build_work_orders_page(work_orders, request.GET.get('page'))
 
-        # Verificar si tiene pausas activas
-        has_active_pauses = WorkOrderPause.objects.filter(work_order=work_order, is_active=True, end_datetime__isnull=True).exists()
-
-        # Determinar el estado a mostrar
-        status_name = work_order.status.name if work_order.status else 'Sin Estado'
-        status_color = work_order.status.color if work_order.status else '#6c757d'
-
-        work_orders_data.append({
-            'ingreso': work_order.ingreso,  # Puede ser None
-            'work_order': work_order,
-            'vehicle': vehicle,  # Vehículo del diagnóstico si no hay ingreso
-            'has_work_order': True,  # Siempre es True ya que estamos iterando sobre work_orders
-            'status_name': status_name,
-            'status_color': status_color,
-            'stock_issues': stock_issues,
-            'has_stock_issues': len(stock_issues) > 0,
-            'has_active_pauses': has_active_pauses,
-        })
+    # Filtros activos ya codificados para los enlaces de paginación
+    filters_query = request.GET.copy()
+    filters_query.pop('page', None)
 
     return render(request, 'agenda/orden_trabajo_list.html', {
         'work_orders_data': work_orders_data,
         'work_order_statuses': work_order_statuses,
+        'page_obj': page_obj,
+        'filters_query': filters_query.urlencode(),
     })
 
 
@@ -520,34 +506,28 @@ def orden_trabajo_detail(request, work_order_id):
         id_work_order=work_order_id
     )
 
+    # Línea de tiempo con todas las pausas de la OT (una sola consulta)
+    timeline = PauseTimeline.for_work_order(
+        work_order, until=work_order.actual_completion or timezone.now()
+    )
+
     # Verificar si tiene pausas activas
-    has_active_pauses = WorkOrderPause.objects.filter(work_order=work_order, is_active=True, end_datetime__isnull=True).exists()
+    has_active_pauses = timeline.has_active_pause
 
     # Verificar si el usuario actual es mecánico asignado
     is_assigned_mechanic = False
     has_active_personal_pause = False
     if hasattr(request.user, 'flotauser'):
-        is_assigned_mechanic = WorkOrderMechanic.objects.filter(
+        mechanic_assignment = WorkOrderMechanic.objects.filter(
             work_order=work_order,
             mechanic=request.user.flotauser,
             is_active=True
-        ).exists()
-        
+        ).first()
+        is_assigned_mechanic = mechanic_assignment is not None
+
         # Verificar si el mecánico tiene una pausa personal activa
-        if is_assigned_mechanic:
-            mechanic_assignment = WorkOrderMechanic.objects.filter(
-                work_order=work_order,
-                mechanic=request.user.flotauser,
-                is_active=True
-            ).first()
-            if mechanic_assignment:
-                has_active_personal_pause = WorkOrderPause.objects.filter(
-                    work_order=work_order,
-                    mechanic_assignment=mechanic_assignment,
-                    is_personal_pause=True,
-                    is_active=True,
-                    end_datetime__isnull=True
-                ).exists()
+        if mechanic_assignment:
+            has_active_personal_pause = timeline.has_active_personal_pause(mechanic_assignment.id_assignment)
 
     # Verificar si el usuario actual es jefe de taller
     is_jefe_taller = False
@@ -631,14 +611,7 @@ def orden_trabajo_detail(request, work_order_id):
     work_order_images = work_order.images.all().order_by('-uploaded_at')
 
     # Obtener historial de pausas de la orden de trabajo
-    work_order_pauses = WorkOrderPause.objects.filter(
-        work_order=work_order,
-        is_active=True
-    ).select_related(
-        'mechanic_assignment__mechanic',
-        'pause_type',
-        'created_by'
-    ).order_by('-start_datetime')
+    work_order_pauses = sorted(timeline.pauses, key=lambda pause: pause.start_datetime, reverse=True)
 
     # Formularios para agregar elementos
     mechanic_form = WorkOrderMechanicForm()
@@ -653,10 +626,9 @@ def orden_trabajo_detail(request, work_order_id):
     tentative_completion = work_order.tentative_completion_datetime
     total_pause_time = work_order.total_pause_time
     active_mechanic_assignments = work_order.mechanic_assignments.filter(is_active=True)
-    active_mechanic_count = active_mechanic_assignments.count()
+    active_mechanic_count = work_order.active_mechanic_count
 
     # Calcular tiempo de trabajo real para cada mecánico asignado
-    from django.utils import timezone
     total_real_work_time = 0
     
     # Inicializar variables de pausa
@@ -673,167 +645,48 @@ def orden_trabajo_detail(request, work_order_id):
     # Si no hay tareas, usar el tiempo estimado del work order
     if total_task_hours == 0:
         total_task_hours = work_order.estimated_work_duration
-    
+
+    # Índice mecánico -> tareas y primera asignación de tarea, armado una sola vez
+    tasks_by_mechanic = {}
+    first_task_assignment = {}
+    for task_info in tasks_with_hours:
+        for ta in task_info['task'].taskassignment_set.all():
+            tasks_by_mechanic.setdefault(ta.user_id, []).append(task_info)
+            if ta.user_id not in first_task_assignment or ta.assigned_at < first_task_assignment[ta.user_id]:
+                first_task_assignment[ta.user_id] = ta.assigned_at
+
     # Asignar horas de tareas específicas a cada mecánico activo
     for assignment in active_mechanic_assignments:
-        # Calcular horas asignadas basadas en tareas específicas del mecánico
-        mechanic_task_hours = 0
-        mechanic_tasks = [t for t in tasks_with_hours if any(ta.user == assignment.mechanic for ta in t['task'].taskassignment_set.all())]
-        for task_info in mechanic_tasks:
-            if task_info['assigned_hours']:
-                mechanic_task_hours += task_info['assigned_hours']
-        assignment.task_assigned_hours = mechanic_task_hours
+        mechanic_tasks = tasks_by_mechanic.get(assignment.mechanic_id, [])
+        assignment.task_assigned_hours = sum(t['assigned_hours'] or 0 for t in mechanic_tasks)
         assignment.has_tasks = len(mechanic_tasks) > 0
     
-    # Calcular has_tasks para todos los mechanic_assignments (incluyendo inactivos)
+    # Calcular has_tasks y la fecha de inicio de tareas para todos los mechanic_assignments (incluyendo inactivos)
     for assignment in mechanic_assignments:
-        mechanic_tasks = [t for t in tasks_with_hours if any(ta.user == assignment.mechanic for ta in t['task'].taskassignment_set.all())]
-        assignment.has_tasks = len(mechanic_tasks) > 0
-        
-        # Calcular la fecha de inicio de tareas para este mecánico
+        assignment.has_tasks = assignment.mechanic_id in tasks_by_mechanic
         if assignment.has_tasks and work_started:
-            mechanic_task_assignments = []
-            for task_info in tasks_with_hours:
-                for ta in task_info['task'].taskassignment_set.all():
-                    if ta.user == assignment.mechanic:
-                        mechanic_task_assignments.append(ta)
-            
-            if mechanic_task_assignments:
-                # Usar la fecha assigned_at más antigua de las asignaciones de tarea
-                earliest_task_assignment = min(mechanic_task_assignments, key=lambda ta: ta.assigned_at)
-                assignment.task_start_time = timezone.now()
-            else:
-                assignment.task_start_time = work_started
+            # Usar la fecha assigned_at más antigua de las asignaciones de tarea
+            assignment.task_start_time = first_task_assignment[assignment.mechanic_id]
         else:
             assignment.task_start_time = assignment.assigned_datetime
     
     if work_started:
         # Verificar si hay pausa global activa (afecta a todos los mecánicos)
-        global_active_pause = WorkOrderPause.objects.filter(
-            work_order=work_order,
-            mechanic_assignment__isnull=True,
-            is_active=True,
-            end_datetime__isnull=True
-        ).first()
+        global_active_pause = timeline.global_active_pause
         
-        # Calcular tiempo real de trabajo sumando intervalos entre pausas
+        # Tiempo real de trabajo: intervalos entre la primera tarea y el término
+        # (o ahora), descontando las pausas personales y globales fusionadas
         for assignment in mechanic_assignments:
-            # Verificar si el mecánico tiene tareas asignadas
-            mechanic_has_tasks = any(
-                any(ta.user == assignment.mechanic for ta in task_info['task'].taskassignment_set.all())
-                for task_info in tasks_with_hours
-            )
-            
-            # Solo calcular tiempo si el mecánico tiene tareas asignadas
-            if mechanic_has_tasks:
-                # Determinar el punto de inicio del cálculo para este mecánico
-                # Usar la fecha de la primera tarea asignada
-                mechanic_task_assignments = []
-                for task_info in tasks_with_hours:
-                    for ta in task_info['task'].taskassignment_set.all():
-                        if ta.user == assignment.mechanic:
-                            mechanic_task_assignments.append(ta)
-                
-                if mechanic_task_assignments:
-                    earliest_task_assignment = min(mechanic_task_assignments, key=lambda ta: ta.assigned_at)
-                    mechanic_start_time = earliest_task_assignment.assigned_at
-                else:
-                    mechanic_start_time = work_started
-                
-                # Obtener todas las pausas relevantes para este mecánico:
-                # - Pausas individuales del mecánico
-                # - Pausas globales (que afectan a todos los mecánicos)
-                mechanic_pauses = WorkOrderPause.objects.filter(
-                    work_order=work_order,
-                    mechanic_assignment=assignment
-                ).order_by('start_datetime')
-                
-                global_pauses = WorkOrderPause.objects.filter(
-                    work_order=work_order,
-                    mechanic_assignment__isnull=True
-                ).order_by('start_datetime')
-                
-                # Combinar todas las pausas relevantes
-                all_pauses = list(mechanic_pauses) + list(global_pauses)
-                all_pauses.sort(key=lambda x: x.start_datetime)
-                
-                # Verificar si hay una pausa activa (individual o global)
-                active_pause = None
-                for pause in all_pauses:
-                    if not pause.end_datetime:
-                        active_pause = pause
-                        break
-                
-                # Calcular intervalos de trabajo
-                real_work_time = 0
-                previous_end = mechanic_start_time
-                
-                for pause in all_pauses:
-                    if pause.end_datetime:  # Pausa completada
-                        # Intervalo desde previous_end hasta pause.start_datetime
-                        if previous_end < pause.start_datetime:
-                            real_work_time += calculate_working_hours_elapsed(previous_end, pause.start_datetime)
-                        # Actualizar previous_end al end de la pausa
-                        previous_end = pause.end_datetime
-                    else:  # Pausa activa
-                        # Intervalo desde previous_end hasta pause.start_datetime
-                        if previous_end < pause.start_datetime:
-                            real_work_time += calculate_working_hours_elapsed(previous_end, pause.start_datetime)
-                        # No continuar después de pausa activa
-                        break
-                
-                # Si no hay pausa activa, agregar intervalo desde previous_end hasta ahora (o hasta completion si está completada)
-                if not active_pause:
-                    end_time = work_order.actual_completion if work_order.actual_completion else timezone.now()
-                    real_work_time += calculate_working_hours_elapsed(previous_end, end_time)
-            else:
-                # Si no tiene tareas asignadas, tiempo = 0
-                real_work_time = 0
-            
-            # Agregar el tiempo calculado como atributo del objeto assignment
-            assignment.real_work_time = real_work_time
-            total_real_work_time += real_work_time
-
-            # Agregar el tiempo calculado como atributo del objeto assignment
-            assignment.real_work_time = real_work_time
-            total_real_work_time += real_work_time
+            times = timeline.mechanic_times(assignment.id_assignment, assignment.task_start_time)
+            # Solo cuenta tiempo si el mecánico tiene tareas asignadas
+            assignment.real_work_time = times['work_hours'] if assignment.has_tasks else 0
+            total_real_work_time += assignment.real_work_time
 
             # Determinar si el mecánico está pausado
-            assignment.is_paused = global_active_pause is not None or WorkOrderPause.objects.filter(
-                work_order=work_order,
-                mechanic_assignment=assignment,
-                is_active=True,
-                end_datetime__isnull=True
-            ).exists()
-
-    # Preparar datos de pausas para JavaScript
-    import json
-    from django.core.serializers.json import DjangoJSONEncoder
-    
-    pauses_data = {}
-    for assignment in mechanic_assignments:
-        pauses = WorkOrderPause.objects.filter(work_order=work_order, mechanic_assignment=assignment)
-        pauses_data[str(assignment.id_assignment)] = [
-            {
-                'start': pause.start_datetime.isoformat(),
-                'end': pause.end_datetime.isoformat() if pause.end_datetime else None,
-                'duration': pause.duration_minutes
-            } for pause in pauses
-        ]
-    
-    # Agregar pausas globales
-    global_pauses = WorkOrderPause.objects.filter(
-        work_order=work_order,
-        mechanic_assignment__isnull=True,
-        is_active=True
-    ).order_by('start_datetime')
-    pauses_data['global'] = [
-        {
-            'start': pause.start_datetime.isoformat(),
-            'end': pause.end_datetime.isoformat() if pause.end_datetime else None,
-            'duration': pause.duration_minutes
-        } for pause in global_pauses
-    ]
+            assignment.is_paused = times['active_pause'] is not None
+
+    # Preparar datos de pausas para JavaScript (intervalos ya fusionados por mecánico)
+    pauses_data = timeline.pauses_payload(a.id_assignment for a in mechanic_assignments)
     
     # Manejar POST para eliminar mecánico
     if request.method == 'POST':
@@ -890,6 +743,7 @@ def orden_trabajo_detail(request, work_order_id):
         'active_mechanic_count': active_mechanic_count,
         'total_real_work_time': total_real_work_time,
         'pauses_data': json.dumps(pauses_data, cls=DjangoJSONEncoder),
+        'work_calendar': json.dumps(timeline.calendar.as_dict()),
         'global_active_pause': global_active_pause,
         'is_jefe_taller': is_jefe_taller,
         'work_order_completed': work_order.actual_completion is not None,
@@ -898,6 +752,51 @@ def orden_trabajo_detail(request, work_order_id):
     return render(request, 'agenda/orden_trabajo_detail.html', context)
 
 
+@login_required
+def orden_trabajo_api(request, work_order_id):
+    """
+    Lectura compacta de la OT con ETag. Acepta `If-None-Match` y `since`
+    (fecha-hora ISO, normalmente el `server_time` anterior) para traer solo
+    las tareas, pausas y asignaciones modificadas.
+    """
+    since = None
+    if request.GET.get('since'):
+        since = parse_range_bound(request.GET['since'])
+        if since is None:
+            return JsonResponse({'error': 'Parámetro since inválido'}, status=400)
+
+    row, etag = work_order_state(work_order_id)
+    if row is None:
+        return JsonResponse({'error': 'Orden de trabajo no encontrada'}, status=404)
+    return _revalidated_response(request, etag, lambda: json.dumps(
+        work_order_payload(row, since=since), cls=DjangoJSONEncoder, separators=(',', ':')
+    ))
+
+
+async def orden_trabajo_eventos(request, work_order_id):
+    """
+    Stream SSE con los cambios de pausas, mecánicos y estado de la OT para los
+    cronómetros del detalle. Con WSGI responde una sola instantánea.
+    """
+    # login_required no envuelve vistas async en Django 4.2; request.user se
+    # resuelve de forma perezosa con la sesión, por eso se consulta en un hilo
+    if not await sync_to_async(lambda: request.user.is_authenticated)():
+        return HttpResponse(status=401)
+
+    if not isinstance(request, ASGIRequest):
+        body = await sync_to_async(snapshot_event)(work_order_id, retry=WSGI_RECONNECT_MS)
+        response = HttpResponse(body, content_type='text/event-stream')
+    else:
+        response = StreamingHttpResponse(
+            work_order_events(work_order_id, request.headers.get('Last-Event-ID')),
+            content_type='text/event-stream',
+        )
+        # Evita que nginx acumule el stream antes de enviarlo
+        response['X-Accel-Buffering'] = 'no'
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
 def orden_trabajo_update(request, work_order_id):
     """Vista para actualizar una orden de trabajo"""
     work_order = get_object_or_404(WorkOrder, id_work_order=work_order_id)
@@ -1192,67 +1091,22 @@ def search_vehicle_api(request):
     if not patent:
         return JsonResponse({'found': False, 'error': 'Patente requerida'})
     
-    try:
-        vehicle = Vehicle.objects.select_related('site').prefetch_related('routes').get(patent=patent)
-        
-        # Obtener la ruta principal (primera ruta asociada)
-        route_code = None
-        routes = vehicle.routes.all()
-        if routes.exists():
-            route_code = routes.first().route_code
-        
-        vehicle_data = {
-            'patent': vehicle.patent,
-            'brand': vehicle.brand,
-            'model': vehicle.model,
-            'site_name': vehicle.site.name if vehicle.site else None,
-            'route_code': route_code
-        }
-        
-        return JsonResponse({'found': True, 'vehicle': vehicle_data})
-        
-    except Vehicle.DoesNotExist:
+    vehicle_data = vehicle_by_patent(patent)
+    if vehicle_data is None:
         return JsonResponse({'found': False, 'error': 'Vehículo no encontrado'})
-    except Exception as e:
-        return JsonResponse({'found': False, 'error': str(e)})
+    return JsonResponse({'found': True, 'vehicle': vehicle_data})
 
 
 def search_vehicles_autocomplete(request):
     """
-    API para autocompletado de búsqueda de vehículos
+    API para autocompletado de búsqueda de vehículos (índice de trigramas con caché por consulta)
     """
     query = request.GET.get('q', '').strip()
 
     if not query or len(query) < 2:
         return JsonResponse({'vehicles': []})
 
-    # Buscar vehículos que coincidan con la consulta
-    vehicles = Vehicle.objects.filter(
-        Q(patent__icontains=query) |
-        Q(brand__icontains=query) |
-        Q(model__icontains=query)
-    ).select_related('site')[:10]  # Limitar a 10 resultados
-
-    vehicles_data = []
-    for vehicle in vehicles:
-        # Obtener la ruta principal
-        route_code = None
-        routes = vehicle.routes.all()
-        if routes.exists():
-            route_code = routes.first().route_code
-
-        vehicles_data.append({
-            'id': vehicle.patent,
-            'patent': vehicle.patent,
-            'brand': vehicle.brand,
-            'model': vehicle.model,
-            'year': vehicle.year,
-            'site_name': vehicle.site.name if vehicle.site else None,
-            'route_code': route_code,
-            'display_text': f"{vehicle.patent} - {vehicle.brand} {vehicle.model} ({vehicle.year})"
-        })
-
-    return JsonResponse({'vehicles': vehicles_data})
+    return JsonResponse({'vehicles': search_vehicles(query)})
 
 
 @login_required
@@ -1427,111 +1281,22 @@ def orden_trabajo_add_tasks_auto(request, work_order_id):
         messages.warning(request, 'No hay mecánicos asignados a esta orden de trabajo')
         return redirect('orden_trabajo_detail', work_order_id=work_order.id_work_order)
 
+    # El plan es determinista: la vista previa coincide con lo que se crea al confirmar
     if request.method == 'POST':
-        # Procesar las horas enviadas
-        import random
-        from datetime import timedelta
-
-        # Lista de descripciones posibles para tareas
-        task_descriptions = [
-            "Revisar sistema de frenos",
-            "Inspeccionar motor y componentes",
-            "Verificar sistema eléctrico",
-            "Chequear suspensión y dirección",
-            "Revisar transmisión",
-            "Inspeccionar sistema de escape",
-            "Verificar neumáticos y ruedas",
-            "Chequear sistema de refrigeración",
-            "Revisar batería y alternador",
-            "Inspeccionar sistema de combustible",
-            "Verificar luces y señales",
-            "Chequear aire acondicionado",
-            "Revisar frenos de mano",
-            "Inspeccionar amortiguadores",
-            "Verificar correas y mangueras"
-        ]
-
-        urgencies = ['Alta', 'Media', 'Baja']
-
-        # Obtener service_types disponibles
-        from documents.models import ServiceType
-        service_types = list(ServiceType.objects.all())
-
-        tasks_created = 0
-        for assignment in mechanic_assignments:
-            # Generar datos aleatorios
-            description = random.choice(task_descriptions)
-            urgency = random.choice(urgencies)
-            service_type = random.choice(service_types) if service_types else None
-
-            # Crear la tarea sin horas estimadas
-            start_datetime = work_order.work_started_at if work_order.work_started_at else timezone.now()
-
-            task = Task.objects.create(
-                work_order=work_order,
-                description=description,
-                urgency=urgency,
-                start_datetime=start_datetime,
-                end_datetime=None,  # Sin fecha de finalización estimada
-                service_type=service_type,
-                supervisor=work_order.supervisor
-            )
-
-            # Asignar la tarea al mecánico
-            from documents.models import TaskAssignment
-            TaskAssignment.objects.create(
-                task=task,
-                user=assignment.mechanic
-            )
-
-            tasks_created += 1
-
+        tasks = auto_assign_tasks([work_order])
         from django.contrib import messages
-        messages.success(request, f'Se crearon {tasks_created} tarea(s) automáticamente para los mecánicos asignados')
+        messages.success(request, f'Se crearon {len(tasks)} tarea(s) automáticamente para los mecánicos asignados')
         return redirect('orden_trabajo_detail', work_order_id=work_order.id_work_order)
 
-    # GET request - mostrar formulario con tareas generadas
-    import random
-
-    # Lista de descripciones posibles para tareas
-    task_descriptions = [
-        "Revisar sistema de frenos",
-        "Inspeccionar motor y componentes",
-        "Verificar sistema eléctrico",
-        "Chequear suspensión y dirección",
-        "Revisar transmisión",
-        "Inspeccionar sistema de escape",
-        "Verificar neumáticos y ruedas",
-        "Chequear sistema de refrigeración",
-        "Revisar batería y alternador",
-        "Inspeccionar sistema de combustible",
-        "Verificar luces y señales",
-        "Chequear aire acondicionado",
-        "Revisar frenos de mano",
-        "Inspeccionar amortiguadores",
-        "Verificar correas y mangueras"
+    generated_tasks = [
+        {
+            'assignment': item['assignment'],
+            'description': item['description'],
+            'urgency': item['urgency'],
+            'service_type': item['service_type'].name if item['service_type'] else 'General',
+        } for item in plan_tasks([work_order])
     ]
 
-    urgencies = ['Alta', 'Media', 'Baja']
-
-    # Obtener service_types disponibles
-    from documents.models import ServiceType
-    service_types = list(ServiceType.objects.all())
-
-    # Generar tareas aleatorias para mostrar (sin guardar)
-    generated_tasks = []
-    for assignment in mechanic_assignments:
-        description = random.choice(task_descriptions)
-        urgency = random.choice(urgencies)
-        service_type = random.choice(service_types) if service_types else None
-
-        generated_tasks.append({
-            'assignment': assignment,
-            'description': description,
-            'urgency': urgency,
-            'service_type': service_type.name if service_type else 'General'
-        })
-
     return render(request, 'agenda/orden_trabajo_add_tasks_auto.html', {
         'work_order': work_order,
         'mechanic_assignments': mechanic_assignments,
@@ -1928,5 +1693,5 @@ def orden_trabajo_start_work(request, work_order_id):
 
     return render(request, 'agenda/orden_trabajo_start_work.html', {
         'work_order': work_order,
-        'active_mechanic_count': work_order.mechanic_assignments.filter(is_active=True).count(),
+        'active_mechanic_count': work_order.active_mechanic_count,
     })
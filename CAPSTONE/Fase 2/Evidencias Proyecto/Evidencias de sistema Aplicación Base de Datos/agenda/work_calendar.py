@@ -0,0 +1,222 @@
+"""
+Calendario laboral del taller.
+
+Calcula horas laborales transcurridas y fechas de término en forma cerrada:
+las semanas completas se resuelven con una multiplicación y los feriados con
+búsqueda binaria sobre sumas acumuladas, sin recorrer el calendario día a día.
+Las jornadas se definen por sucursal y día de la semana (WorkShift) y los días
+sin jornada en la tabla de feriados (Holiday).
+"""
+import bisect
+import time as clock
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from documents.models import Holiday, WorkShift
+
+# Jornada usada cuando no hay turnos configurados: 7:30 a 16:30 todos los días
+DEFAULT_SHIFT = (time(7, 30), time(16, 30))
+
+_VERSION_KEY = 'work_calendar_version'
+# Cada proceso consulta la versión compartida a lo más cada estos segundos
+VERSION_CHECK_SECONDS = 5
+_calendars = {}
+
+
+def _clock_hours(value):
+    return value.hour + value.minute / 60 + value.second / 3600 + value.microsecond / 3600000000
+
+
+def _to_local(value):
+    """Retorna (datetime naive en hora local, si venía aware)"""
+    if timezone.is_aware(value):
+        return timezone.make_naive(value), True
+    return value, False
+
+
+class WorkCalendar:
+    """Jornadas semanales y feriados de un taller"""
+
+    def __init__(self, shifts=None, holidays=()):
+        """
+        shifts: {weekday: (start_time, end_time)}; los días que no aparecen no tienen jornada.
+        Si es None se usa DEFAULT_SHIFT todos los días. holidays: fechas sin jornada.
+        """
+        if shifts is None:
+            shifts = {weekday: DEFAULT_SHIFT for weekday in range(7)}
+
+        self.day_start = [0.0] * 7
+        self.day_hours = [0.0] * 7
+        for weekday, (start, end) in shifts.items():
+            self.day_start[weekday] = _clock_hours(start)
+            self.day_hours[weekday] = max(0.0, _clock_hours(end) - _clock_hours(start))
+
+        self.week_hours = sum(self.day_hours)
+        self.week_prefix = [0.0]
+        for hours in self.day_hours:
+            self.week_prefix.append(self.week_prefix[-1] + hours)
+
+        # Solo importan los feriados que caen en un día con jornada
+        self.holidays = sorted({
+            holiday.toordinal() for holiday in holidays if self.day_hours[holiday.weekday()] > 0
+        })
+        self.holiday_prefix = [0.0]
+        for ordinal in self.holidays:
+            self.holiday_prefix.append(self.holiday_prefix[-1] + self.day_hours[(ordinal - 1) % 7])
+
+    # El ordinal 1 (0001-01-01) es lunes, así que el día de la semana es (ordinal - 1) % 7
+
+    def _hours_before(self, ordinal):
+        """Horas laborales de todos los días anteriores al ordinal"""
+        weeks, rest = divmod(ordinal - 1, 7)
+        return (
+            weeks * self.week_hours + self.week_prefix[rest]
+            - self.holiday_prefix[bisect.bisect_left(self.holidays, ordinal)]
+        )
+
+    def _hours_between(self, first_ordinal, last_ordinal):
+        """Horas laborales de los días [first_ordinal, last_ordinal)"""
+        return self._hours_before(last_ordinal) - self._hours_before(first_ordinal)
+
+    def _is_holiday(self, ordinal):
+        index = bisect.bisect_left(self.holidays, ordinal)
+        return index < len(self.holidays) and self.holidays[index] == ordinal
+
+    def _day_hours(self, ordinal):
+        return 0.0 if self._is_holiday(ordinal) else self.day_hours[(ordinal - 1) % 7]
+
+    def _offset(self, moment, ordinal):
+        """Horas laborales transcurridas en el día de `moment` hasta ese instante"""
+        if self._is_holiday(ordinal):
+            return 0.0
+        weekday = (ordinal - 1) % 7
+        clock = _clock_hours(moment.time())
+        return min(max(clock - self.day_start[weekday], 0.0), self.day_hours[weekday])
+
+    def shift_for(self, day):
+        """(inicio de jornada en horas, horas de jornada) de una fecha, o None si no hay jornada"""
+        ordinal = day.toordinal()
+        hours = self._day_hours(ordinal)
+        if hours <= 0:
+            return None
+        return self.day_start[(ordinal - 1) % 7], hours
+
+    def elapsed(self, start_datetime, end_datetime):
+        """Horas laborales entre dos instantes (0 si end es anterior a start)"""
+        start, _ = _to_local(start_datetime)
+        end, _ = _to_local(end_datetime)
+        if end <= start:
+            return 0.0
+        start_ordinal = start.toordinal()
+        end_ordinal = end.toordinal()
+        hours = (
+            self._hours_between(start_ordinal, end_ordinal)
+            + self._offset(end, end_ordinal) - self._offset(start, start_ordinal)
+        )
+        return max(0.0, hours)
+
+    def add_hours(self, start_datetime, total_hours):
+        """Instante en que se cumplen `total_hours` horas laborales desde start_datetime"""
+        total_hours = float(total_hours)
+        if total_hours <= 0:
+            return start_datetime
+        if self.week_hours == 0:
+            raise ValueError('El calendario laboral no tiene jornadas definidas')
+
+        start, was_aware = _to_local(start_datetime)
+        ordinal = start.toordinal()
+        # Horas contadas desde el inicio de la jornada del día actual
+        remaining = total_hours + self._offset(start, ordinal)
+
+        while remaining > self._day_hours(ordinal):
+            if remaining > 2 * self.week_hours:
+                # Saltar semanas completas de una vez; los feriados quedan en el resto
+                target = ordinal + 7 * (int(remaining // self.week_hours) - 1)
+            else:
+                target = ordinal + 1
+            remaining -= self._hours_between(ordinal, target)
+            ordinal = target
+
+        day = datetime.fromordinal(ordinal)
+        seconds = round((self.day_start[(ordinal - 1) % 7] + remaining) * 3600, 6)
+        result = day + timedelta(seconds=seconds)
+        return timezone.make_aware(result) if was_aware else result
+
+    def elapsed_many(self, pairs):
+        """Versión por lotes de elapsed: recibe pares (inicio, fin) y retorna la lista de horas"""
+        return [self.elapsed(start, end) for start, end in pairs]
+
+    def add_hours_many(self, pairs):
+        """Versión por lotes de add_hours: recibe pares (inicio, horas)"""
+        return [self.add_hours(start, hours) for start, hours in pairs]
+
+    def as_dict(self):
+        """Jornadas y feriados serializables, para replicar el cálculo en el navegador"""
+        return {
+            'shifts': {
+                str(weekday): [self.day_start[weekday], self.day_start[weekday] + self.day_hours[weekday]]
+                for weekday in range(7) if self.day_hours[weekday] > 0
+            },
+            'holidays': [datetime.fromordinal(ordinal).date().isoformat() for ordinal in self.holidays],
+        }
+
+
+def _load_calendar(site_id):
+    shifts = list(WorkShift.objects.filter(site_id=site_id)) if site_id else []
+    if not shifts:
+        shifts = list(WorkShift.objects.filter(site__isnull=True))
+
+    holidays_filter = Q(site__isnull=True)
+    if site_id:
+        holidays_filter |= Q(site_id=site_id)
+    holidays = Holiday.objects.filter(holidays_filter).values_list('date', flat=True)
+
+    shift_map = {shift.weekday: (shift.start_time, shift.end_time) for shift in shifts}
+    return WorkCalendar(shift_map or None, holidays)
+
+
+def get_work_calendar(site_id=None):
+    """
+    Calendario de la sucursal (o el general), memorizado en el proceso hasta
+    que cambien turnos o feriados. La versión vive en la caché compartida
+    (settings.CACHES) y se revisa cada VERSION_CHECK_SECONDS, así un cambio
+    hecho en otro proceso se aplica a lo más con ese retraso.
+    """
+    now = clock.monotonic()
+    cached = _calendars.get(site_id)
+    if cached is not None and now - cached[1] < VERSION_CHECK_SECONDS:
+        return cached[2]
+    version = cache.get(_VERSION_KEY, 0)
+    if cached is None or cached[0] != version:
+        cached = (version, now, _load_calendar(site_id))
+    else:
+        cached = (version, now, cached[2])
+    _calendars[site_id] = cached
+    return cached[2]
+
+
+def invalidate_work_calendars():
+    """
+    Invalida los calendarios memorizados: de inmediato en este proceso y, en
+    los demás que comparten la caché, en la siguiente revisión de la versión.
+    """
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        cache.set(_VERSION_KEY, 1, None)
+    _calendars.clear()
+
+
+def working_hours_elapsed(start_datetime, end_datetime, site_id=None):
+    return get_work_calendar(site_id).elapsed(start_datetime, end_datetime)
+
+
+def completion_datetime(start_datetime, total_hours, site_id=None):
+    return get_work_calendar(site_id).add_hours(start_datetime, total_hours)
+
+
+def working_hours_elapsed_many(pairs, site_id=None):
+    return get_work_calendar(site_id).elapsed_many(pairs)
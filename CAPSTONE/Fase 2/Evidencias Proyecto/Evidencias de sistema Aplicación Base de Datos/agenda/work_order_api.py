@@ -0,0 +1,126 @@
+"""
+API de lectura compacta del detalle de una OT para las tablets del taller.
+
+En lugar de reconstruir formularios, diagnósticos, imágenes y estadísticas
+del detalle HTML, entrega la OT con sus tareas, pausas y mecánicos asignados
+en un JSON plano armado con `values()`.
+
+* La versión (ETag) sale de una huella barata: los campos de la OT más la
+  cantidad y la última modificación de tareas, pausas y asignaciones, en una
+  sola consulta con subconsultas. Si coincide con `If-None-Match` se responde
+  304 sin serializar nada.
+* Con `since` (el `server_time` de la respuesta anterior) solo se incluyen
+  las filas modificadas desde entonces, más las listas completas de ids para
+  que el cliente descarte las eliminadas. Se resta SINCE_OVERLAP a `since`
+  para no perder escrituras cuya transacción terminó después de la lectura
+  anterior; el cliente simplemente reemplaza por id.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.utils import timezone
+
+from documents.models import Task, TaskAssignment, WorkOrder, WorkOrderMechanic
+from pausas.models import WorkOrderPause
+
+SINCE_OVERLAP = timedelta(seconds=5)
+
+WORK_ORDER_FIELDS = (
+    'id_work_order', 'status_id', 'status__name', 'status__color', 'ingreso__patent_id',
+    'work_started_at', 'tentative_completion', 'actual_completion', 'estimated_hours', 'pause_minutes',
+    'active_mechanic_count', 'has_active_pause', 'supervisor_id', 'service_type_id',
+)
+TASK_FIELDS = (
+    'id_task', 'description', 'urgency', 'start_datetime', 'end_datetime', 'service_type_id', 'updated_at',
+)
+PAUSE_FIELDS = (
+    'id_pause', 'mechanic_assignment_id', 'pause_type_id', 'pause_type__name', 'reason',
+    'start_datetime', 'end_datetime', 'is_personal_pause', 'updated_at',
+)
+ASSIGNMENT_FIELDS = (
+    'id_assignment', 'mechanic_id', 'mechanic__name', 'assigned_datetime', 'hours_worked', 'is_active', 'updated_at',
+)
+
+
+def _children(work_order_id):
+    """Querysets de las filas hijas que expone la API"""
+    return {
+        'tasks': Task.objects.filter(work_order_id=work_order_id).order_by('id_task'),
+        'pauses': WorkOrderPause.objects.filter(work_order_id=work_order_id, is_active=True).order_by('id_pause'),
+        'assignments': WorkOrderMechanic.objects.filter(work_order_id=work_order_id).order_by('id_assignment'),
+    }
+
+
+def _fingerprint_subqueries(children):
+    """Cantidad y última modificación de cada colección como subconsultas escalares"""
+    annotations = {}
+    for name, queryset in children.items():
+        summary = queryset.order_by().values('work_order_id').annotate(
+            total=Count('pk'), last=Max('updated_at')
+        )
+        annotations[f'{name}_total'] = Subquery(summary.values('total')[:1])
+        annotations[f'{name}_last'] = Subquery(summary.values('last')[:1])
+    return annotations
+
+
+def work_order_state(work_order_id):
+    """
+    Fila de la OT con la huella de sus hijas, en una consulta. Retorna
+    (fila, etag) o (None, None) si la OT no existe.
+    """
+    children = _children(OuterRef('pk'))
+    row = WorkOrder.objects.filter(id_work_order=work_order_id).annotate(
+        **_fingerprint_subqueries(children)
+    ).values(*WORK_ORDER_FIELDS, *[f'{name}_{part}' for name in children for part in ('total', 'last')]).first()
+    if row is None:
+        return None, None
+    fingerprint = '|'.join(str(row[key]) for key in sorted(row))
+    return row, '"%s"' % hashlib.md5(fingerprint.encode('utf-8')).hexdigest()
+
+
+def work_order_payload(row, since=None):
+    """
+    Cuerpo de la respuesta para la fila de work_order_state. Con `since` solo
+    trae las tareas, pausas y asignaciones modificadas después de esa fecha.
+    """
+    work_order_id = row['id_work_order']
+    server_time = timezone.now()
+    children = _children(work_order_id)
+
+    payload = {
+        'server_time': server_time,
+        'full': since is None,
+        'work_order': {
+            'id': work_order_id,
+            'status': {'id': row['status_id'], 'name': row['status__name'], 'color': row['status__color']},
+            'patent': row['ingreso__patent_id'],
+            'work_started_at': row['work_started_at'],
+            'tentative_completion': row['tentative_completion'],
+            'actual_completion': row['actual_completion'],
+            'estimated_hours': row['estimated_hours'],
+            'pause_minutes': row['pause_minutes'],
+            'active_mechanic_count': row['active_mechanic_count'],
+            'has_active_pause': row['has_active_pause'],
+            'supervisor_id': row['supervisor_id'],
+            'service_type_id': row['service_type_id'],
+        },
+    }
+    fields = {'tasks': TASK_FIELDS, 'pauses': PAUSE_FIELDS, 'assignments': ASSIGNMENT_FIELDS}
+    for name, queryset in children.items():
+        if since is None:
+            payload[name] = list(queryset.values(*fields[name]))
+            continue
+        # Ids vigentes para que el cliente descarte las filas eliminadas
+        payload[f'{name[:-1]}_ids'] = list(queryset.values_list('pk', flat=True))
+        payload[name] = list(queryset.filter(updated_at__gte=since - SINCE_OVERLAP).values(*fields[name]))
+
+    # Mecánicos de cada tarea, solo para las tareas incluidas
+    mechanics = {}
+    for task_id, user_id in TaskAssignment.objects.filter(
+        task_id__in=[task['id_task'] for task in payload['tasks']]
+    ).order_by('id_assignment').values_list('task_id', 'user_id'):
+        mechanics.setdefault(task_id, []).append(user_id)
+    for task in payload['tasks']:
+        task['mechanic_ids'] = mechanics.get(task['id_task'], [])
+    return payload
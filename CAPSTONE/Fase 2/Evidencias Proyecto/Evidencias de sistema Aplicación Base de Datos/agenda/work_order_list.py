@@ -0,0 +1,134 @@
+"""
+Motor de listado de órdenes de trabajo.
+
+Calcula los datos que muestra el tablero de OTs (faltantes de stock, pausas
+activas y vehículo de respaldo cuando la OT no tiene ingreso) con un número
+fijo de consultas por página, sin importar cuántas OTs existan.
+"""
+from datetime import datetime
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+from documents.models import Diagnostics, SparePartUsage
+
+WORK_ORDERS_PER_PAGE = 24
+
+
+def filter_work_orders(work_orders, params):
+    """Aplica en la base de datos los filtros del tablero de OTs"""
+    query = (params.get('q') or '').strip()
+    if query:
+        condition = Q(ingreso__patent__patent__icontains=query)
+        ot_number = query.upper().replace('OT-', '')
+        if ot_number.isdigit():
+            condition |= Q(id_work_order=int(ot_number))
+        work_orders = work_orders.filter(condition)
+
+    status = params.get('status')
+    if status:
+        work_orders = work_orders.filter(status__name=status)
+
+    created_date = params.get('date')
+    if created_date:
+        try:
+            work_orders = work_orders.filter(
+                created_datetime__date=datetime.strptime(created_date, '%Y-%m-%d').date()
+            )
+        except ValueError:
+            pass
+
+    month = params.get('month')
+    if month:
+        try:
+            month_date = datetime.strptime(month, '%Y-%m')
+            work_orders = work_orders.filter(
+                created_datetime__year=month_date.year,
+                created_datetime__month=month_date.month,
+            )
+        except ValueError:
+            pass
+
+    parts_issued = params.get('parts_issued')
+    if parts_issued in ('true', 'false'):
+        work_orders = work_orders.filter(parts_issued=parts_issued == 'true')
+
+    return work_orders
+
+
+def _stock_issues_by_work_order(work_order_ids):
+    """Faltantes de stock por OT en una sola consulta (uso + stock vía LEFT JOIN)"""
+    issues = {}
+    usages = SparePartUsage.objects.filter(
+        work_order_id__in=work_order_ids
+    ).values_list(
+        'work_order_id', 'repuesto__name', 'quantity_used', 'repuesto__stock_info__current_stock'
+    ).order_by('id_usage')
+
+    for work_order_id, repuesto_name, quantity_used, current_stock in usages:
+        available = current_stock if current_stock is not None else 0
+        if current_stock is None or current_stock < quantity_used:
+            issues.setdefault(work_order_id, []).append({
+                'repuesto': repuesto_name,
+                'required': quantity_used,
+                'available': available,
+            })
+    return issues
+
+
+def _fallback_vehicles(work_order_ids):
+    """Vehículo del primer incidente del primer diagnóstico de cada OT sin ingreso"""
+    if not work_order_ids:
+        return {}
+
+    first_diagnostic = {}
+    diagnostics = Diagnostics.objects.filter(
+        related_work_order_id__in=work_order_ids
+    ).values_list('id', 'related_work_order_id').order_by('id')
+    for diagnostic_id, work_order_id in diagnostics:
+        first_diagnostic.setdefault(work_order_id, diagnostic_id)
+
+    if not first_diagnostic:
+        return {}
+
+    work_order_by_diagnostic = {d: wo for wo, d in first_diagnostic.items()}
+    through = Diagnostics.incidents.through.objects.filter(
+        diagnostics_id__in=work_order_by_diagnostic.keys()
+    ).select_related('incident__vehicle__site').order_by('diagnostics_id', 'incident_id')
+
+    vehicles = {}
+    for row in through:
+        work_order_id = work_order_by_diagnostic[row.diagnostics_id]
+        vehicles.setdefault(work_order_id, row.incident.vehicle)
+    return vehicles
+
+
+def build_work_orders_page(work_orders, page_number, per_page=WORK_ORDERS_PER_PAGE):
+    """
+    Pagina el queryset de OTs y arma los datos de cada tarjeta del tablero.
+    Retorna (page_obj, work_orders_data).
+    """
+    paginator = Paginator(work_orders, per_page)
+    page_obj = paginator.get_page(page_number)
+    page_work_orders = list(page_obj.object_list)
+
+    work_order_ids = [wo.id_work_order for wo in page_work_orders]
+    stock_issues_map = _stock_issues_by_work_order(work_order_ids)
+    vehicles_map = _fallback_vehicles([wo.id_work_order for wo in page_work_orders if not wo.ingreso_id])
+
+    work_orders_data = []
+    for work_order in page_work_orders:
+        stock_issues = stock_issues_map.get(work_order.id_work_order, [])
+        work_orders_data.append({
+            'ingreso': work_order.ingreso,  # Puede ser None
+            'work_order': work_order,
+            'vehicle': vehicles_map.get(work_order.id_work_order),  # Vehículo del diagnóstico si no hay ingreso
+            'has_work_order': True,
+            'status_name': work_order.status.name if work_order.status else 'Sin Estado',
+            'status_color': work_order.status.color if work_order.status else '#6c757d',
+            'stock_issues': stock_issues,
+            'has_stock_issues': len(stock_issues) > 0,
+            'has_active_pauses': work_order.has_active_pause,
+        })
+
+    return page_obj, work_orders_data
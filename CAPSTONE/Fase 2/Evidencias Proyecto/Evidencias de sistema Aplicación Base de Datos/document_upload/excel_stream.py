@@ -0,0 +1,216 @@
+"""
+Escritura de reportes Excel en modo write-only de openpyxl.
+
+Las hojas se escriben fila a fila a archivos temporales en lugar de mantener
+todo el libro en memoria, y el .xlsx final se arma en un archivo temporal que
+se entrega por partes con FileResponse (un StreamingHttpResponse), así la
+memoria no crece con la cantidad de filas.
+
+Hay dos tipos de hoja:
+
+* DataSheet: tablas de datos que pueden tener miles de filas. Se escriben con
+  append(); los anchos de columna se calculan con el encabezado y una muestra
+  de las primeras WIDTH_SAMPLE_ROWS filas, antes de escribirlas.
+* LayoutSheet: hojas chicas de KPIs, análisis y gráficos que se arman por
+  coordenadas (ws['A1'], ws.cell(), merge_cells, add_chart). Se guardan en
+  memoria y se vuelcan en orden al cerrar el libro, con anchos calculados una
+  sola vez a partir de sus valores.
+"""
+import tempfile
+
+from django.http import FileResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.cell import coordinate_from_string, column_index_from_string
+from openpyxl.worksheet.cell_range import CellRange
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+WIDTH_SAMPLE_ROWS = 200
+
+
+def _width(value):
+	return len(str(value)) if value is not None else 0
+
+
+def _fit(width, padding, max_width):
+	"""Ancho de columna para el texto más largo, con tope opcional"""
+	return min(width + padding, max_width) if max_width else width + padding
+
+
+class _ColumnWidths:
+	"""Anchos fijos por letra de columna, con la misma interfaz que column_dimensions"""
+
+	class _Dimension:
+		def __init__(self):
+			self.width = None
+
+	def __init__(self):
+		self._dimensions = {}
+
+	def __getitem__(self, letter):
+		return self._dimensions.setdefault(letter, self._Dimension())
+
+	def fixed(self):
+		return {letter: dimension.width for letter, dimension in self._dimensions.items() if dimension.width}
+
+
+class DataSheet:
+	"""Hoja de datos escrita por filas; solo retiene la muestra para calcular anchos"""
+
+	def __init__(self, ws, max_width=25, padding=2):
+		self.ws = ws
+		self.max_width = max_width
+		self.padding = padding
+		self._pending = []
+		self._merges = []
+		self._widths = {}
+		self._flushed = False
+
+	@property
+	def title(self):
+		return self.ws.title
+
+	def _cell(self, value, font=None, fill=None, alignment=None):
+		if font is None and fill is None and alignment is None:
+			return value
+		cell = WriteOnlyCell(self.ws, value=value)
+		if font is not None:
+			cell.font = font
+		if fill is not None:
+			cell.fill = fill
+		if alignment is not None:
+			cell.alignment = alignment
+		return cell
+
+	def title_row(self, value, span, font=None, alignment=None):
+		"""Fila de título combinada en las primeras `span` columnas (no cuenta para los anchos)"""
+		if self._flushed:
+			raise ValueError('Los títulos deben escribirse antes de las filas de datos')
+		row = len(self._pending) + 1
+		self._merges.append(f'A{row}:{get_column_letter(span)}{row}')
+		self._pending.append(([self._cell(value, font=font, alignment=alignment)], False))
+
+	def append(self, values, font=None, fill=None, alignment=None):
+		"""Agrega una fila; el estilo, si se indica, se aplica a todas sus celdas"""
+		row = [self._cell(value, font=font, fill=fill, alignment=alignment) for value in values]
+		if self._flushed:
+			self.ws.append(row)
+			return
+		for index, value in enumerate(values, 1):
+			self._widths[index] = max(self._widths.get(index, 0), _width(value))
+		self._pending.append((row, True))
+		if sum(1 for _, measured in self._pending if measured) > WIDTH_SAMPLE_ROWS:
+			self.flush()
+
+	def flush(self):
+		"""Fija los anchos de columna con la muestra y escribe las filas retenidas"""
+		if self._flushed:
+			return
+		self._flushed = True
+		for index, width in self._widths.items():
+			self.ws.column_dimensions[get_column_letter(index)].width = _fit(width, self.padding, self.max_width)
+		for merge in self._merges:
+			self.ws.merged_cells.add(CellRange(merge))
+		for row, _ in self._pending:
+			self.ws.append(row)
+		self._pending = []
+
+	close = flush
+
+
+class LayoutSheet:
+	"""
+	Hoja chica armada por coordenadas con la interfaz habitual de openpyxl
+	(ws['A1'] = ..., ws.cell(...), merge_cells, add_chart, column_dimensions).
+	"""
+
+	def __init__(self, ws, max_width=30, padding=2):
+		self.ws = ws
+		self.max_width = max_width
+		self.padding = padding
+		self.column_dimensions = _ColumnWidths()
+		self._cells = {}
+		self._merges = []
+
+	@property
+	def title(self):
+		return self.ws.title
+
+	def cell(self, row, column, value=None):
+		cell = self._cells.get((row, column))
+		if cell is None:
+			cell = self._cells[(row, column)] = WriteOnlyCell(self.ws)
+		if value is not None:
+			cell.value = value
+		return cell
+
+	def _position(self, coordinate):
+		column, row = coordinate_from_string(coordinate)
+		return row, column_index_from_string(column)
+
+	def __getitem__(self, coordinate):
+		return self.cell(*self._position(coordinate))
+
+	def __setitem__(self, coordinate, value):
+		self.cell(*self._position(coordinate)).value = value
+
+	def merge_cells(self, range_string):
+		self._merges.append(range_string)
+
+	def add_chart(self, chart, anchor=None):
+		self.ws.add_chart(chart, anchor)
+
+	def close(self):
+		"""Vuelca las celdas en orden de fila con los anchos calculados"""
+		if not self._cells:
+			return
+		max_row = max(row for row, _ in self._cells)
+		max_column = max(column for _, column in self._cells)
+
+		widths = {}
+		for (row, column), cell in self._cells.items():
+			widths[column] = max(widths.get(column, 0), _width(cell.value))
+		fixed = self.column_dimensions.fixed()
+		for column, width in widths.items():
+			letter = get_column_letter(column)
+			self.ws.column_dimensions[letter].width = fixed.get(letter) or _fit(width, self.padding, self.max_width)
+		for letter, width in fixed.items():
+			self.ws.column_dimensions[letter].width = width
+
+		for merge in self._merges:
+			self.ws.merged_cells.add(CellRange(merge))
+		for row in range(1, max_row + 1):
+			self.ws.append([self._cells.get((row, column)) for column in range(1, max_column + 1)])
+		self._cells = {}
+
+
+class StreamingWorkbook:
+	"""Libro write-only cuyas hojas se crean en el orden en que aparecerán"""
+
+	def __init__(self):
+		self.wb = Workbook(write_only=True)
+		self._sheets = []
+
+	def data_sheet(self, title, max_width=25, padding=2):
+		sheet = DataSheet(self.wb.create_sheet(title), max_width=max_width, padding=padding)
+		self._sheets.append(sheet)
+		return sheet
+
+	def layout_sheet(self, title, max_width=30, padding=2):
+		sheet = LayoutSheet(self.wb.create_sheet(title), max_width=max_width, padding=padding)
+		self._sheets.append(sheet)
+		return sheet
+
+	def save(self, file):
+		for sheet in self._sheets:
+			sheet.close()
+		self.wb.save(file)
+
+	def response(self, filename):
+		"""Guarda el libro en un archivo temporal y lo entrega por partes"""
+		file = tempfile.TemporaryFile()
+		self.save(file)
+		file.seek(0)
+		# FileResponse cierra (y así elimina) el archivo temporal al terminar de enviarlo
+		return FileResponse(file, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
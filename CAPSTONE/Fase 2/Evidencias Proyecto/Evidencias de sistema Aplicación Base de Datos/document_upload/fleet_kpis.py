@@ -0,0 +1,141 @@
+"""
+Indicadores de flota por zona (sucursal) del reporte kpis_flota.
+
+Los vehículos atendidos en el período actual y en el anterior, y los
+completados del actual, salen de una sola consulta agrupada por sucursal con
+agregación condicional sobre los ingresos de ambos períodos (un LEFT JOIN
+filtrado, así las sucursales sin ingresos también aparecen). El resultado se
+agrupa por id de sucursal, no por nombre, y lo comparten la hoja de KPIs, el
+dashboard y los datos para Power BI del libro.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, FilteredRelation, Q
+from django.utils import timezone
+
+from documents.models import Ingreso, Site
+
+# Zonas que se muestran (en cero) si aún no hay sucursales registradas
+DEFAULT_ZONES = ('Norte', 'Sur', 'Metropolitana', 'Centro', 'Oriente', 'Poniente')
+
+
+def _month_bounds(month_start):
+	"""(inicio del mes, último día del mes, inicio del mes anterior, último día del mes anterior)"""
+	month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+	previous_start = (month_start - timedelta(days=1)).replace(day=1)
+	return month_start, month_end, previous_start, month_start - timedelta(days=1)
+
+
+def _day_start(day):
+	return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def fleet_kpi_period(periodo='mensual', now=None):
+	"""
+	Mes actual y mes anterior. En el período mensual, si el mes actual aún no
+	tiene ingresos se usa el último mes con datos.
+	"""
+	now = now or timezone.now()
+	current_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+	if periodo == 'mensual':
+		current_end = _month_bounds(current_start)[1]
+		has_data = Ingreso.objects.filter(
+			entry_datetime__gte=_day_start(current_start.date()),
+			entry_datetime__lt=_day_start(current_end.date() + timedelta(days=1)),
+		).exists()
+		if not has_data:
+			last_entry = Ingreso.objects.order_by('-entry_datetime').values_list('entry_datetime', flat=True).first()
+			if last_entry:
+				current_start = _day_start(last_entry.date().replace(day=1))
+	current_start, current_end, previous_start, previous_end = _month_bounds(current_start)
+	return {
+		'current_start': current_start,
+		'current_end': current_end,
+		'previous_start': previous_start,
+		'previous_end': previous_end,
+		'name': f"{current_start.strftime('%B %Y')} vs {previous_start.strftime('%B %Y')}",
+	}
+
+
+def _zone_kpis(zone, vehiculos, vehiculos_prev, completados, dias_mes):
+	# Eficiencia mecánicos (vehículos atendidos / día promedio)
+	eficiencia = vehiculos / max(dias_mes, 1) if vehiculos > 0 else 0
+	# Trazabilidad (simulado - base 60%, mejora con el volumen)
+	trazabilidad = min(100, 60 + (vehiculos * 2))
+	# Indicadores flota (disponibilidad: ingresos completados del período)
+	disponibilidad = (completados / max(vehiculos, 1)) * 100 if vehiculos > 0 else 0
+	# KPI General (promedio ponderado)
+	kpi = eficiencia * 0.3 + trazabilidad * 0.3 + disponibilidad * 0.4
+
+	tendencia = "→"
+	if vehiculos > vehiculos_prev:
+		tendencia = "↗️"
+	elif vehiculos < vehiculos_prev:
+		tendencia = "↘️"
+
+	return {
+		'id': zone[0],
+		'zona': zone[1],
+		'vehiculos': vehiculos,
+		'vehiculos_prev': vehiculos_prev,
+		'completados': completados,
+		'eficiencia': eficiencia,
+		'trazabilidad': trazabilidad,
+		'disponibilidad': disponibilidad,
+		'kpi': kpi,
+		'tendencia': tendencia,
+	}
+
+
+def _average(zones, key):
+	return sum(zone[key] for zone in zones) / max(len(zones), 1)
+
+
+def fleet_kpis(period):
+	"""
+	KPIs por zona y globales del período de fleet_kpi_period. Retorna
+	{'zones': [...], 'totals': {...}}; cada zona trae sus conteos (vehiculos,
+	vehiculos_prev, completados) y los indicadores calculados.
+	"""
+	current = Q(
+		ingresos__entry_datetime__gte=_day_start(period['current_start'].date()),
+		ingresos__entry_datetime__lt=_day_start(period['current_end'].date() + timedelta(days=1)),
+	)
+	previous = Q(
+		ingresos__entry_datetime__gte=_day_start(period['previous_start'].date()),
+		ingresos__entry_datetime__lt=_day_start(period['previous_end'].date() + timedelta(days=1)),
+	)
+	rows = Site.objects.annotate(
+		# Solo los ingresos de ambos períodos entran al JOIN
+		ingresos=FilteredRelation('vehicle__ingreso', condition=Q(
+			vehicle__ingreso__entry_datetime__gte=_day_start(period['previous_start'].date()),
+			vehicle__ingreso__entry_datetime__lt=_day_start(period['current_end'].date() + timedelta(days=1)),
+		)),
+	).values('id_site', 'name').annotate(
+		current=Count('ingresos', filter=current),
+		previous=Count('ingresos', filter=previous),
+		completed=Count('ingresos', filter=current & Q(ingresos__exit_datetime__isnull=False)),
+	).values_list('id_site', 'name', 'current', 'previous', 'completed').order_by('id_site')
+
+	dias_mes = (period['current_end'] - period['current_start']).days + 1
+	zones = [
+		_zone_kpis((site_id, name), current_count, previous_count, completed, dias_mes)
+		for site_id, name, current_count, previous_count, completed in rows
+	]
+	if not zones:
+		zones = [_zone_kpis((None, name), 0, 0, 0, dias_mes) for name in DEFAULT_ZONES]
+
+	vehiculos = sum(zone['vehiculos'] for zone in zones)
+	vehiculos_prev = sum(zone['vehiculos_prev'] for zone in zones)
+	return {
+		'zones': zones,
+		'totals': {
+			'vehiculos': vehiculos,
+			'vehiculos_prev': vehiculos_prev,
+			'variacion': ((vehiculos - vehiculos_prev) / max(vehiculos_prev, 1)) * 100,
+			'eficiencia': _average(zones, 'eficiencia'),
+			'trazabilidad': _average(zones, 'trazabilidad'),
+			'disponibilidad': _average(zones, 'disponibilidad'),
+			'kpi': _average(zones, 'kpi'),
+		},
+	}
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from document_upload.report_jobs import process_pending_report_jobs
+
+
+class Command(BaseCommand):
+	help = 'Genera los reportes Excel en cola o que quedaron sin terminar'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--retry-failed', action='store_true',
+							help='Reintentar también los reportes que fallaron')
+
+	def handle(self, *args, **options):
+		ready, failed = process_pending_report_jobs(retry_failed=options['retry_failed'])
+		self.stdout.write(self.style.SUCCESS(f'Reportes generados: {ready}'))
+		if failed:
+			self.stdout.write(self.style.WARNING(f'Reportes con error: {failed}'))
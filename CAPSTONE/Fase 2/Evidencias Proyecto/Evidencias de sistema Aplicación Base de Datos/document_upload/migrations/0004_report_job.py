@@ -0,0 +1,40 @@
+# Generated by Django 4.2.23 on 2026-10-18 00:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('documents', '0052_task_mechanic_updated_at'),
+        ('document_upload', '0003_documenttype_remove_uploadeddocument_report_type_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id_job', models.AutoField(primary_key=True, serialize=False)),
+                ('report_key', models.CharField(help_text='Identificador del reporte (por ejemplo: productividad)', max_length=50)),
+                ('params', models.JSONField(blank=True, default=dict, help_text='Filtros con los que se pidió el reporte')),
+                ('status', models.CharField(choices=[('pending', 'En cola'), ('running', 'Generando'), ('ready', 'Listo'), ('failed', 'Con error')], default='pending', max_length=10)),
+                ('file', models.FileField(blank=True, upload_to='reports/%Y/%m/%d/')),
+                ('file_size', models.PositiveIntegerField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('report', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='job', to='documents.report')),
+                ('report_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='document_upload.reporttype')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='report_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'report_jobs',
+                'ordering': ['-created_at', '-id_job'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='report_jobs_status_idx')],
+            },
+        ),
+    ]
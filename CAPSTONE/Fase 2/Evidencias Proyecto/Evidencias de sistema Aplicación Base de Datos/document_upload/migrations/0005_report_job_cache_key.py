@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-18 00:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('document_upload', '0004_report_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportjob',
+            name='cache_key',
+            field=models.CharField(blank=True, db_index=True, help_text='Huella de reporte, filtros y versión de los datos (report_cache.py)', max_length=64),
+        ),
+    ]
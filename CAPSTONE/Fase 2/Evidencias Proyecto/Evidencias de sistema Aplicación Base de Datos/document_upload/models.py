@@ -57,3 +57,56 @@ class UploadedDocument(models.Model):
 	class Meta:
 		db_table = 'uploaded_documents'
 		ordering = ['-uploaded_at']
+
+
+class ReportJob(models.Model):
+	"""Generación de un reporte Excel en segundo plano (ver report_jobs.py)."""
+	STATUS_CHOICES = [
+		('pending', 'En cola'),
+		('running', 'Generando'),
+		('ready', 'Listo'),
+		('failed', 'Con error'),
+	]
+
+	id_job = models.AutoField(primary_key=True)
+	report_key = models.CharField(max_length=50, help_text="Identificador del reporte (por ejemplo: productividad)")
+	params = models.JSONField(default=dict, blank=True, help_text="Filtros con los que se pidió el reporte")
+	cache_key = models.CharField(max_length=64, blank=True, db_index=True, help_text="Huella de reporte, filtros y versión de los datos (report_cache.py)")
+	report_type = models.ForeignKey(ReportType, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+	report = models.OneToOneField('documents.Report', on_delete=models.SET_NULL, null=True, blank=True, related_name='job')
+	status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+	file = models.FileField(upload_to='reports/%Y/%m/%d/', blank=True)
+	file_size = models.PositiveIntegerField(null=True, blank=True)
+	error = models.TextField(blank=True, default='')
+	requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='report_jobs')
+	created_at = models.DateTimeField(auto_now_add=True)
+	started_at = models.DateTimeField(null=True, blank=True)
+	finished_at = models.DateTimeField(null=True, blank=True)
+
+	def __str__(self):
+		return f"{self.report_key} #{self.id_job} ({self.get_status_display()})"
+
+	@property
+	def is_finished(self):
+		return self.status in ('ready', 'failed')
+
+	@property
+	def queue_seconds(self):
+		"""Segundos que esperó en la cola antes de empezar"""
+		if not self.started_at:
+			return None
+		return (self.started_at - self.created_at).total_seconds()
+
+	@property
+	def run_seconds(self):
+		"""Segundos que tomó generar el archivo"""
+		if not self.started_at or not self.finished_at:
+			return None
+		return (self.finished_at - self.started_at).total_seconds()
+
+	class Meta:
+		db_table = 'report_jobs'
+		ordering = ['-created_at', '-id_job']
+		indexes = [
+			models.Index(fields=['status', 'created_at'], name='report_jobs_status_idx'),
+		]
@@ -0,0 +1,159 @@
+"""
+Agregados compartidos por los reportes de productividad y de tiempos y horas
+hombre.
+
+Ambos reportes leen las mismas OTs del período y necesitan los mismos totales:
+horas de los mecánicos por OT, OTs y horas por mecánico, OTs por tipo de
+mantención y por zona, y minutos por tipo de pausa. WorkOrderAggregates los
+calcula una sola vez con consultas agrupadas (GROUP BY) y todas las hojas del
+libro leen de ahí, en lugar de sumar las asignaciones y pausas de cada OT en
+cada hoja.
+
+Las horas en pausa no son una suma de columnas: PauseTimeline fusiona los
+intervalos que se solapan y los mide en horario laboral. Se calculan una vez
+por OT al recorrer `rows()`, que carga las asignaciones y pausas por bloques
+de OTs (dos consultas por bloque), y los totales que dependen de ellas quedan
+disponibles al terminar el recorrido.
+"""
+from django.db.models import Avg, Count, DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from agenda.pause_timeline import PauseTimeline
+from agenda.work_calendar import get_work_calendar
+from documents.models import WorkOrder, WorkOrderMechanic
+from pausas.models import WorkOrderPause
+
+CHUNK_SIZE = 500
+
+WORK_ORDER_FIELDS = (
+	'id_work_order', 'created_datetime', 'work_started_at', 'actual_completion', 'estimated_completion',
+	'ingreso_id', 'ingreso__patent_id', 'ingreso__patent__model', 'ingreso__patent__brand',
+	'ingreso__entry_datetime', 'ingreso__exit_datetime', 'ingreso__patent__site__name',
+	'service_type__name', 'status__name', 'mechanic_hours',
+)
+
+
+def period_work_orders(start_date, end_date):
+	"""OTs creadas, iniciadas o terminadas entre start_date y end_date (incluidos)"""
+	return WorkOrder.objects.filter(
+		Q(created_datetime__date__gte=start_date) & Q(created_datetime__date__lte=end_date) |
+		Q(work_started_at__date__gte=start_date) & Q(work_started_at__date__lte=end_date) |
+		Q(actual_completion__date__gte=start_date) & Q(actual_completion__date__lte=end_date)
+	)
+
+
+class WorkOrderAggregates:
+	"""Totales por OT, mecánico, tipo de mantención, zona y tipo de pausa de un conjunto de OTs"""
+
+	def __init__(self, work_orders):
+		self.work_orders = work_orders.order_by()
+		self.calendar = get_work_calendar()
+		# Se completan al recorrer rows()
+		self.pause_hours = 0
+		self.mechanic_pause_minutes = {}
+
+		summary = self.work_orders.aggregate(
+			total=Count('pk'), vehicles=Count('ingreso__patent', distinct=True)
+		)
+		self.total_work_orders = summary['total']
+		self.vehicles_attended = summary['vehicles']
+
+		assignments = WorkOrderMechanic.objects.filter(work_order__in=self.work_orders)
+		self.mechanics = {
+			name: {'work_orders': work_orders, 'hours': hours}
+			for name, work_orders, hours in assignments.values('mechanic__name').annotate(
+				work_orders=Count('pk'), hours=Sum('hours_worked')
+			).values_list('mechanic__name', 'work_orders', 'hours').order_by('mechanic__name')
+		}
+		self.mechanic_hours = float(sum(data['hours'] for data in self.mechanics.values()))
+
+		self.service_types = {}
+		self.average_hours_by_type = {}
+		finished = Q(service_type__isnull=False, work_started_at__isnull=False, actual_completion__isnull=False)
+		for name, total, average in self.work_orders.values('service_type__name').annotate(
+			total=Count('pk'),
+			average=Avg(F('actual_completion') - F('work_started_at'), filter=finished),
+		).values_list('service_type__name', 'total', 'average').order_by('service_type__name'):
+			self.service_types[name or 'Sin tipo'] = total
+			if average is not None:
+				self.average_hours_by_type[name] = average.total_seconds() / 3600
+
+		self.zones = {
+			name or 'Sin zona': total
+			for name, total in self.work_orders.values('ingreso__patent__site__name').annotate(
+				total=Count('pk')
+			).values_list('ingreso__patent__site__name', 'total').order_by('ingreso__patent__site__name')
+		}
+
+		pauses = WorkOrderPause.objects.filter(work_order__in=self.work_orders)
+		self.pause_type_minutes = dict(
+			pauses.values('pause_type__name').annotate(
+				minutes=Coalesce(Sum('duration_minutes'), 0)
+			).values_list('pause_type__name', 'minutes').order_by('pause_type__name')
+		)
+		self.pause_minutes = sum(self.pause_type_minutes.values())
+
+	@property
+	def effective_hours(self):
+		"""Horas de los mecánicos menos las horas en pausa (completo tras recorrer rows())"""
+		return self.mechanic_hours - self.pause_hours
+
+	def _rows_queryset(self):
+		mechanic_hours = WorkOrderMechanic.objects.filter(work_order=OuterRef('pk')).order_by().values(
+			'work_order'
+		).annotate(total=Sum('hours_worked')).values('total')
+		return self.work_orders.annotate(
+			mechanic_hours=Coalesce(
+				Subquery(mechanic_hours[:1]), Value(0), output_field=DecimalField(max_digits=10, decimal_places=2)
+			)
+		).values(*WORK_ORDER_FIELDS).order_by('id_work_order')
+
+	def _load_chunk(self, chunk, pause_details):
+		ids = [row['id_work_order'] for row in chunk]
+		assignments = {}
+		for assignment in WorkOrderMechanic.objects.filter(work_order_id__in=ids).order_by('id_assignment').values(
+			'id_assignment', 'work_order_id', 'mechanic__name', 'hours_worked'
+		):
+			assignments.setdefault(assignment['work_order_id'], []).append(assignment)
+		pauses = {}
+		queryset = WorkOrderPause.objects.filter(work_order_id__in=ids)
+		if pause_details:
+			queryset = queryset.select_related('pause_type', 'mechanic_assignment__mechanic')
+		else:
+			queryset = queryset.filter(is_active=True).only(
+				'work_order_id', 'mechanic_assignment_id', 'start_datetime', 'end_datetime', 'is_active'
+			)
+		for pause in queryset:
+			pauses.setdefault(pause.work_order_id, []).append(pause)
+
+		for row in chunk:
+			row['assignments'] = assignments.get(row['id_work_order'], [])
+			row['pauses'] = pauses.get(row['id_work_order'], [])
+			timeline = PauseTimeline(row['pauses'], until=row['actual_completion'], calendar=self.calendar)
+			row['timeline'] = timeline
+			row['pause_hours'] = timeline.total_pause_hours()
+			row['mechanic_hours'] = float(row['mechanic_hours'])
+			self.pause_hours += row['pause_hours']
+			for assignment in row['assignments']:
+				name = assignment['mechanic__name']
+				self.mechanic_pause_minutes[name] = self.mechanic_pause_minutes.get(name, 0) + round(
+					timeline.mechanic_pause_hours(assignment['id_assignment']) * 60, 2
+				)
+			yield row
+
+	def rows(self, pause_details=False):
+		"""
+		Filas de las OTs con sus horas de mecánicos, asignaciones, pausas y horas
+		en pausa fusionadas. Con pause_details las pausas (activas o no) traen
+		su tipo y mecánico para listarlas.
+		"""
+		self.pause_hours = 0
+		self.mechanic_pause_minutes = {}
+		chunk = []
+		for row in self._rows_queryset().iterator(chunk_size=CHUNK_SIZE):
+			chunk.append(row)
+			if len(chunk) == CHUNK_SIZE:
+				yield from self._load_chunk(chunk, pause_details)
+				chunk = []
+		if chunk:
+			yield from self._load_chunk(chunk, pause_details)
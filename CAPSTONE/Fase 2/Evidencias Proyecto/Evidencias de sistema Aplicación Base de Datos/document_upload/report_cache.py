@@ -0,0 +1,77 @@
+"""
+Caché de los reportes Excel generados en segundo plano.
+
+Cada ReportJob guarda una huella (cache_key) del reporte, sus filtros, el día
+y la marca de agua de los datos. Por cada tabla de origen, la marca de agua
+toma la última modificación (updated_at, si la tabla lo tiene), el mayor id y
+la cantidad de filas. Cualquier alta, cambio o eliminación cambia la marca y,
+con ella, la huella, sin tener que invalidar nada. Los cambios hechos con
+QuerySet.update() no tocan updated_at: deben asignarlo explícitamente. Una petición con la misma
+huella que un trabajo listo reutiliza su archivo sin volver a calcularlo.
+
+El día local forma parte de la huella porque los períodos (diario, semanal,
+mensual) se calculan a partir de hoy.
+"""
+import hashlib
+import json
+
+from django.apps import apps
+from django.db.models import Count, Max
+from django.utils import timezone
+
+# Filtros que leen los reportes; los demás parámetros de la URL no cambian el archivo
+CACHE_PARAMS = ('periodo',)
+
+# Tablas que lee cada reporte: (modelo, campo de última modificación o None)
+_WORK_ORDER_SOURCES = (
+	('documents.WorkOrder', 'updated_at'),
+	('documents.WorkOrderMechanic', 'updated_at'),
+	('pausas.WorkOrderPause', 'updated_at'),
+	('documents.Ingreso', 'updated_at'),
+	('documents.Vehicle', 'updated_at'),
+	('documents.Site', 'updated_at'),
+	('documents.ServiceType', 'updated_at'),
+	('documents.WorkOrderStatus', 'updated_at'),
+	('documents.FlotaUser', 'updated_at'),
+)
+REPORT_SOURCES = {
+	'productividad': _WORK_ORDER_SOURCES,
+	'tiempos_horas_hombre': _WORK_ORDER_SOURCES + (('pausas.PauseType', 'updated_at'),),
+	'kpis_flota': (
+		('documents.Ingreso', 'updated_at'),
+		('documents.WorkOrder', 'updated_at'),
+		('documents.WorkOrderMechanic', 'updated_at'),
+		('documents.Incident', 'updated_at'),
+		('documents.Vehicle', 'updated_at'),
+		('documents.Site', 'updated_at'),
+	),
+}
+
+
+def data_watermark(report_key):
+	"""[modelo, última modificación, mayor id, filas] por tabla de origen; None si el reporte no se cachea"""
+	sources = REPORT_SOURCES.get(report_key)
+	if sources is None:
+		return None
+	watermark = []
+	for label, timestamp_field in sources:
+		aggregates = {'last_pk': Max('pk'), 'total': Count('pk')}
+		if timestamp_field:
+			aggregates['last_change'] = Max(timestamp_field)
+		row = apps.get_model(label).objects.aggregate(**aggregates)
+		watermark.append([label, row.get('last_change'), row['last_pk'], row['total']])
+	return watermark
+
+
+def report_cache_key(report_key, params):
+	"""Huella del reporte con sus filtros y la versión actual de los datos ('' si no se cachea)"""
+	watermark = data_watermark(report_key)
+	if watermark is None:
+		return ''
+	fingerprint = json.dumps({
+		'report': report_key,
+		'params': {key: params[key] for key in CACHE_PARAMS if key in params},
+		'day': timezone.localdate(),
+		'data': watermark,
+	}, sort_keys=True, default=str)
+	return hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()
@@ -0,0 +1,197 @@
+"""
+Cola local de reportes Excel generados en segundo plano.
+
+Los reportes pesados (QUEUED_REPORT_TYPES en views.py) no se calculan dentro
+de la petición: se crea un ReportJob y, al confirmarse la transacción, se
+envía a un pool de procesos que arma el libro con build_excel_report, guarda
+el .xlsx como archivo del trabajo y registra el documents.Report asociado.
+El usuario consulta el estado del trabajo y descarga el archivo cuando está
+listo.
+
+Los procesos del pool se crean con 'spawn' (no 'fork'), así no heredan las
+conexiones a la base de datos ni los hilos del servidor; cada uno configura
+Django al iniciar. Los trabajos se toman con un UPDATE condicionado al estado
+'pending', de modo que el pool y el comando `run_report_jobs` nunca generan
+dos veces el mismo. El comando genera lo que haya quedado en cola o colgado
+(por ejemplo al reiniciar el servidor).
+
+Antes de encolar se busca un trabajo listo con la misma huella (ver
+report_cache.py): si los datos no cambiaron, se entrega ese archivo.
+"""
+import json
+import logging
+import multiprocessing
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.core.files import File
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from documents.models import FlotaUser, Report
+
+from .models import ReportJob, ReportType
+from .report_cache import report_cache_key
+
+logger = logging.getLogger(__name__)
+
+# Un trabajo 'running' más antiguo que esto se considera perdido
+STALE_AFTER = timedelta(minutes=30)
+
+_executor = None
+
+
+def _get_executor():
+	global _executor
+	if _executor is None:
+		_executor = ProcessPoolExecutor(
+			max_workers=settings.REPORT_JOB_WORKERS,
+			mp_context=multiprocessing.get_context('spawn'),
+			initializer=django.setup,
+		)
+	return _executor
+
+
+def _report_type(report_key):
+	"""ReportType con el nombre del reporte en el catálogo (se crea la primera vez)"""
+	from .views import REPORT_TYPES
+
+	name = next((item['name'] for item in REPORT_TYPES if item['id'] == report_key), report_key)
+	return ReportType.objects.filter(name=name).first() or ReportType.objects.create(name=name)
+
+
+def _register_report(job):
+	"""Registra el documents.Report del archivo entregado al usuario del trabajo"""
+	job.report = Report.objects.create(
+		type=job.report_type,
+		user=FlotaUser.objects.filter(user=job.requested_by).first() if job.requested_by else None,
+		data=json.dumps({'report': job.report_key, 'params': job.params, 'job': job.id_job, 'file': job.file.name}),
+	)
+
+
+def cached_report_job(report_key, params, cache_key, user=None):
+	"""
+	Trabajo que ya cubre la petición: uno del mismo usuario en curso o listo
+	con la misma huella, o una copia para el usuario del archivo listo de
+	otro. Retorna None si hay que generar el reporte.
+	"""
+	jobs = ReportJob.objects.filter(cache_key=cache_key).select_related('report_type')
+	if user is not None:
+		own = jobs.filter(requested_by=user, status__in=('pending', 'running', 'ready')).first()
+		if own is not None and (own.status != 'ready' or own.file.storage.exists(own.file.name)):
+			return own
+	source = jobs.filter(status='ready').exclude(file='').order_by('-finished_at').first()
+	if source is None or not source.file.storage.exists(source.file.name):
+		return None
+
+	now = timezone.now()
+	job = ReportJob.objects.create(
+		report_key=report_key,
+		params=params,
+		cache_key=cache_key,
+		report_type=source.report_type,
+		requested_by=user,
+		status='ready',
+		file=source.file.name,
+		file_size=source.file_size,
+		started_at=now,
+		finished_at=now,
+	)
+	_register_report(job)
+	job.save(update_fields=['report'])
+	return job
+
+
+def enqueue_report_job(report_key, params, user=None):
+	"""
+	Registra el trabajo y lo encola para cuando se confirme la transacción.
+	Si un trabajo con la misma huella ya cubre la petición, retorna ese.
+	"""
+	cache_key = report_cache_key(report_key, params)
+	if cache_key:
+		cached = cached_report_job(report_key, params, cache_key, user)
+		if cached is not None:
+			return cached
+
+	job = ReportJob.objects.create(
+		report_key=report_key,
+		params=params,
+		cache_key=cache_key,
+		report_type=_report_type(report_key),
+		requested_by=user,
+	)
+	job_id = job.id_job
+	if settings.REPORT_JOBS_ASYNC:
+		transaction.on_commit(lambda: _get_executor().submit(_run_in_worker, job_id))
+	else:
+		transaction.on_commit(lambda: run_report_job(job_id))
+	return job
+
+
+def run_report_job(job_id):
+	"""Genera el archivo de un trabajo en cola. Retorna True si quedó listo"""
+	from .excel_stream import StreamingWorkbook
+	from .views import build_excel_report, report_filename
+
+	started_at = timezone.now()
+	claimed = ReportJob.objects.filter(id_job=job_id, status='pending').update(
+		status='running', started_at=started_at
+	)
+	if not claimed:
+		return False
+	job = ReportJob.objects.select_related('report_type', 'requested_by').get(id_job=job_id)
+	# Huella de los datos tal como están al empezar: si cambian durante la
+	# generación, la próxima petición no coincidirá y se generará de nuevo
+	job.cache_key = report_cache_key(job.report_key, job.params)
+
+	try:
+		book = StreamingWorkbook()
+		build_excel_report(book, job.report_key, job.params)
+		with tempfile.TemporaryFile() as file:
+			book.save(file)
+			file.seek(0)
+			job.file.save(report_filename(job.report_key, timezone.localtime(started_at)), File(file), save=False)
+	except Exception as e:
+		logger.exception('No se pudo generar el reporte %s (trabajo #%s)', job.report_key, job_id)
+		ReportJob.objects.filter(id_job=job_id).update(
+			status='failed', error=str(e), finished_at=timezone.now()
+		)
+		return False
+
+	job.file_size = job.file.size
+	_register_report(job)
+	job.status = 'ready'
+	job.finished_at = timezone.now()
+	job.save(update_fields=['file', 'file_size', 'cache_key', 'report', 'status', 'finished_at'])
+	return True
+
+
+def _run_in_worker(job_id):
+	try:
+		run_report_job(job_id)
+	finally:
+		connections.close_all()
+
+
+def process_pending_report_jobs(retry_failed=False, stale_after=STALE_AFTER):
+	"""
+	Genera en este proceso los trabajos en cola, más los que quedaron colgados
+	en 'running' (y los fallidos si retry_failed). Retorna (listos, con error).
+	"""
+	requeue = Q(status='running', started_at__lt=timezone.now() - stale_after)
+	if retry_failed:
+		requeue |= Q(status='failed')
+	ReportJob.objects.filter(requeue).update(status='pending', started_at=None, finished_at=None, error='')
+
+	ready = failed = 0
+	pending = list(ReportJob.objects.filter(status='pending').order_by('created_at', 'id_job').values_list('id_job', flat=True))
+	for job_id in pending:
+		if run_report_job(job_id):
+			ready += 1
+		else:
+			failed += 1
+	return ready, failed
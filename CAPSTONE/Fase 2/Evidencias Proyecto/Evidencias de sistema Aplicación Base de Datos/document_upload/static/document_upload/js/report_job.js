@@ -0,0 +1,64 @@
+// Consulta el estado del reporte en segundo plano hasta que termine
+document.addEventListener('DOMContentLoaded', function() {
+    const container = document.getElementById('report-job');
+    if (!container) {
+        return;
+    }
+    const statusUrl = container.dataset.statusUrl;
+    const POLL_MS = 2000;
+
+    function formatSeconds(value) {
+        return `${value.toFixed(1)} s`;
+    }
+
+    function render(job) {
+        const badge = document.getElementById('report-job-status');
+        badge.textContent = job.status_display;
+        badge.className = 'badge ' + (job.status === 'ready' ? 'bg-success' : job.status === 'failed' ? 'bg-danger' : 'bg-secondary');
+
+        const timings = [];
+        if (job.queue_seconds !== null) {
+            timings.push(`En cola: ${formatSeconds(job.queue_seconds)}`);
+        }
+        if (job.run_seconds !== null) {
+            timings.push(`Generación: ${formatSeconds(job.run_seconds)}`);
+        }
+        document.getElementById('report-job-timings').textContent = timings.join(' · ');
+
+        if (job.status === 'ready' || job.status === 'failed') {
+            const spinner = document.getElementById('report-job-spinner');
+            if (spinner) {
+                spinner.remove();
+            }
+            document.getElementById('report-job-waiting').classList.add('d-none');
+        }
+        if (job.status === 'failed') {
+            const error = document.getElementById('report-job-error');
+            error.textContent = job.error || 'No se pudo generar el reporte.';
+            error.classList.remove('d-none');
+        }
+        if (job.status === 'ready') {
+            const download = document.getElementById('report-job-download');
+            download.href = job.download_url;
+            download.classList.remove('d-none');
+            // Descargar automáticamente, como los reportes inmediatos
+            window.location.href = job.download_url;
+        }
+    }
+
+    function poll() {
+        fetch(statusUrl, { headers: { 'Accept': 'application/json' } })
+            .then(response => response.json())
+            .then(job => {
+                render(job);
+                if (job.status !== 'ready' && job.status !== 'failed') {
+                    setTimeout(poll, POLL_MS);
+                }
+            })
+            .catch(() => setTimeout(poll, POLL_MS * 2));
+    }
+
+    if (container.dataset.status !== 'ready' && container.dataset.status !== 'failed') {
+        setTimeout(poll, POLL_MS);
+    }
+});
@@ -1,3 +1,419 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest.mock import patch
 
-# Create your tests here.
+import openpyxl
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from agenda.exits import register_exits
+from agenda.tests import crear_datos_base
+from documents.models import (
+	FlotaUser, Incident, Ingreso, Repuesto, ServiceType, Site, WorkOrder, WorkOrderMechanic,
+)
+from pausas.models import PauseType, WorkOrderPause
+from repuestos.models import SparePartStock, StockMovement, Supplier
+
+from .fleet_kpis import fleet_kpi_period, fleet_kpis
+from .models import ReportJob
+from .report_aggregates import WorkOrderAggregates
+from .report_cache import report_cache_key
+from .report_jobs import enqueue_report_job, process_pending_report_jobs, run_report_job
+
+
+@override_settings(REPORT_JOBS_ASYNC=False)
+class ExcelReportStreamingTestCase(TestCase):
+	"""Tests para los reportes Excel escritos en modo write-only"""
+
+	def setUp(self):
+		self.media_root = tempfile.mkdtemp()
+		media_override = override_settings(MEDIA_ROOT=self.media_root)
+		media_override.enable()
+		self.addCleanup(media_override.disable)
+		self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+		self.data = crear_datos_base()
+		self.client.force_login(self.data['user'])
+		now = timezone.now()
+		self.ingreso = Ingreso.objects.create(
+			patent=self.data['vehicle'], entry_datetime=now - timedelta(hours=3),
+			exit_datetime=now - timedelta(hours=1), chofer=self.data['flota_user'], authorization=False,
+		)
+		self.work_order = WorkOrder.objects.create(
+			status=self.data['status'], ingreso=self.ingreso, work_started_at=now - timedelta(hours=2),
+		)
+		WorkOrderMechanic.objects.create(work_order=self.work_order, mechanic=self.data['flota_user'])
+		Incident.objects.create(
+			vehicle=self.data['vehicle'], reported_by=self.data['flota_user'],
+			name='Falla de frenos', incident_type='Mecanica', description='Ruido al frenar',
+		)
+		repuesto = Repuesto.objects.create(name='Pastillas', quantity=4, delivery_datetime=now)
+		SparePartStock.objects.create(
+			repuesto=repuesto, supplier=Supplier.objects.create(name='Frenos SA'),
+			unit_cost=Decimal('1500'), current_stock=1, minimum_stock=2,
+		)
+		StockMovement.objects.create(
+			repuesto=repuesto, movement_type='OUT', quantity=-2, previous_stock=3, new_stock=1,
+			work_order=self.work_order, performed_by=self.data['flota_user'],
+		)
+
+	def generar(self, report_type, **params):
+		response = self.client.get(
+			reverse('document_upload:generate_excel_report', args=[report_type]), params
+		)
+		self.assertEqual(response.status_code, 200)
+		self.assertTrue(response.streaming)
+		self.assertEqual(
+			response['Content-Type'], 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+		)
+		self.assertIn(f'{report_type}_', response['Content-Disposition'])
+		return openpyxl.load_workbook(BytesIO(b''.join(response.streaming_content)))
+
+	def generar_en_cola(self, report_type, **params):
+		"""Los reportes pesados se encolan; se generan al confirmar la transacción"""
+		with self.captureOnCommitCallbacks(execute=True):
+			response = self.client.get(
+				reverse('document_upload:generate_excel_report', args=[report_type]), params
+			)
+		job = ReportJob.objects.get()
+		self.assertRedirects(response, reverse('document_upload:report_job_detail', args=[job.pk]))
+		job.refresh_from_db()
+		self.assertEqual(job.status, 'ready', job.error)
+		self.assertEqual(job.params, params)
+		self.assertIsNotNone(job.report)
+
+		response = self.client.get(reverse('document_upload:report_job_download', args=[job.pk]))
+		self.assertEqual(response.status_code, 200)
+		self.assertIn(f'{report_type}_', response['Content-Disposition'])
+		return openpyxl.load_workbook(BytesIO(b''.join(response.streaming_content)))
+
+	def test_productividad(self):
+		"""BaseOTs se escribe por filas y los KPIs salen de la misma pasada"""
+		wb = self.generar_en_cola('productividad', periodo='mensual')
+		self.assertEqual(wb.sheetnames, ['BaseOTs', 'KPIs', 'Gráficos'])
+		self.assertEqual(wb['BaseOTs']['A2'].value, 'ABCD12')
+		self.assertTrue(wb['BaseOTs']['A1'].font.bold)
+		self.assertEqual(wb['KPIs']['B6'].value, 1)
+
+	def test_productividad_sin_datos(self):
+		"""Sin OTs en el período se entrega el libro con el mensaje informativo"""
+		WorkOrder.objects.all().delete()
+		wb = self.generar_en_cola('productividad', periodo='diario')
+		self.assertEqual(wb.sheetnames, ['BaseOTs', 'KPIs'])
+		self.assertIn('No se encontraron', wb['BaseOTs']['A1'].value)
+
+	def test_tiempos_horas_hombre(self):
+		wb = self.generar_en_cola('tiempos_horas_hombre')
+		self.assertEqual(wb.sheetnames, ['TiemposHoras', 'Análisis', 'Gráficos'])
+		self.assertEqual(wb['TiemposHoras']['B2'].value, 'Mecánico Uno')
+		self.assertEqual(wb['Análisis']['A14'].value, 'Mecánico Uno')
+
+	def test_repuestos_utilizados(self):
+		"""Cada movimiento aparece en los datos y en la tabla pivot, con su OT"""
+		with CaptureQueriesContext(connection) as queries:
+			wb = self.generar('repuestos_utilizados')
+		self.assertLessEqual(len(queries), 6)
+		self.assertEqual(wb.sheetnames, ['Datos Repuestos', 'Análisis', 'Tabla Pivot', 'Gráficos'])
+		data = wb['Datos Repuestos']
+		self.assertIn('A1:I1', [str(merged) for merged in data.merged_cells.ranges])
+		self.assertEqual(data['A4'].value, 'Patente')
+		row = [cell.value for cell in data[5]]
+		self.assertEqual(row[:4], ['ABCD12', 'Pastillas', 2, 'Frenos SA'])
+		self.assertEqual(row[6], f'OT-{self.work_order.pk}')
+		self.assertEqual(data['A5'].fill.start_color.rgb, 'FFFF0000')
+		self.assertEqual([cell.value for cell in wb['Tabla Pivot'][5]], row)
+		self.assertEqual(wb['Análisis']['B5'].value, 2)
+
+	def test_vehiculos_ingresados_salidos(self):
+		wb = self.generar('vehiculos_ingresados_salidos', periodo='semanal')
+		ws = wb['Vehículos IO']
+		self.assertEqual(ws['A5'].value, 'ABCD12')
+		self.assertEqual(ws['G5'].value, '1 incidencia(s)')
+		self.assertEqual(ws['A5'].fill.start_color.rgb, 'FFFFFF00')
+		self.assertEqual(ws['A6'].value, None)
+
+	def test_demas_reportes(self):
+		"""El resto de los reportes se arma con hojas por coordenadas"""
+		sheets = {
+			'reportes_generales': 'Estadísticas Generales Reportes',
+			'reportes_recientes': 'Reportes Recientes',
+			'inexistente': 'Reporte No Disponible',
+		}
+		for report_type, sheet in sheets.items():
+			with self.subTest(report_type=report_type):
+				self.assertEqual(self.generar(report_type).sheetnames[0], sheet)
+		self.assertEqual(self.generar_en_cola('kpis_flota').sheetnames[0], 'KPIs Flota')
+
+
+@override_settings(REPORT_JOBS_ASYNC=False)
+class ReportJobTestCase(TestCase):
+	"""Tests para la cola de reportes en segundo plano"""
+
+	def setUp(self):
+		self.media_root = tempfile.mkdtemp()
+		media_override = override_settings(MEDIA_ROOT=self.media_root)
+		media_override.enable()
+		self.addCleanup(media_override.disable)
+		self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+		self.data = crear_datos_base()
+		self.client.force_login(self.data['user'])
+
+	def encolar(self, report_type='productividad', **params):
+		return enqueue_report_job(report_type, params, self.data['user'])
+
+	def test_job_stays_pending_until_processed(self):
+		"""Sin confirmar la transacción el trabajo queda en cola; el comando lo genera"""
+		job = self.encolar(periodo='semanal')
+		self.assertEqual(job.status, 'pending')
+		self.assertEqual(job.report_type.name, 'Reporte de Productividad')
+
+		status_url = reverse('document_upload:report_job_status', args=[job.pk])
+		payload = self.client.get(status_url).json()
+		self.assertEqual(payload['status'], 'pending')
+		self.assertIsNone(payload['download_url'])
+		self.assertEqual(
+			self.client.get(reverse('document_upload:report_job_download', args=[job.pk])).status_code, 404
+		)
+
+		out = StringIO()
+		call_command('run_report_jobs', stdout=out)
+		self.assertIn('Reportes generados: 1', out.getvalue())
+
+		job.refresh_from_db()
+		self.assertEqual(job.status, 'ready')
+		self.assertGreater(job.file_size, 0)
+		self.assertGreaterEqual(job.run_seconds, 0)
+		self.assertEqual(job.report.type, job.report_type)
+		self.assertEqual(job.report.user, self.data['flota_user'])
+		self.assertEqual(json.loads(job.report.data)['params'], {'periodo': 'semanal'})
+		payload = self.client.get(status_url).json()
+		self.assertEqual(payload['download_url'], reverse('document_upload:report_job_download', args=[job.pk]))
+
+		# Un trabajo ya generado no se vuelve a tomar
+		self.assertFalse(run_report_job(job.pk))
+
+	def test_failed_and_stale_jobs(self):
+		job = self.encolar()
+		with patch('document_upload.views.build_excel_report', side_effect=ValueError('sin datos')), \
+				self.assertLogs('document_upload.report_jobs', level='ERROR'):
+			self.assertEqual(process_pending_report_jobs(), (0, 1))
+		job.refresh_from_db()
+		self.assertEqual(job.status, 'failed')
+		self.assertEqual(job.error, 'sin datos')
+		self.assertEqual(self.client.get(reverse('document_upload:report_job_detail', args=[job.pk])).status_code, 200)
+
+		# Los fallidos solo se reintentan a pedido; los colgados en 'running' se retoman
+		stale = self.encolar()
+		ReportJob.objects.filter(pk=stale.pk).update(status='running', started_at=timezone.now() - timedelta(hours=1))
+		self.assertEqual(process_pending_report_jobs(), (1, 0))
+		self.assertEqual(process_pending_report_jobs(retry_failed=True), (1, 0))
+		self.assertEqual(set(ReportJob.objects.values_list('status', flat=True)), {'ready'})
+
+	def test_jobs_are_private(self):
+		job = self.encolar()
+		other = User.objects.create_user(username='otro', password='clave-segura-123')
+		self.client.force_login(other)
+		self.assertEqual(self.client.get(reverse('document_upload:report_job_status', args=[job.pk])).status_code, 404)
+		response = self.client.get(reverse('document_upload:reports_dashboard'))
+		self.assertEqual(list(response.context['report_jobs']), [])
+
+
+@override_settings(REPORT_JOBS_ASYNC=False)
+class ReportCacheTestCase(TestCase):
+	"""Tests para la caché de reportes por huella de datos"""
+
+	def setUp(self):
+		self.media_root = tempfile.mkdtemp()
+		media_override = override_settings(MEDIA_ROOT=self.media_root)
+		media_override.enable()
+		self.addCleanup(media_override.disable)
+		self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+		self.data = crear_datos_base()
+		self.client.force_login(self.data['user'])
+		self.ingreso = Ingreso.objects.create(
+			patent=self.data['vehicle'], entry_datetime=timezone.now() - timedelta(hours=2),
+			chofer=self.data['flota_user'], authorization=False,
+		)
+		WorkOrder.objects.create(status=self.data['status'], ingreso=self.ingreso)
+		self.url = reverse('document_upload:generate_excel_report', args=['productividad'])
+
+	def pedir(self, **params):
+		with self.captureOnCommitCallbacks(execute=True):
+			return self.client.get(self.url, params or {'periodo': 'mensual'})
+
+	def test_same_data_serves_stored_file(self):
+		self.pedir()
+		job = ReportJob.objects.get()
+		self.assertEqual(job.status, 'ready')
+		self.assertTrue(job.cache_key)
+
+		with patch('document_upload.views.build_excel_report') as build:
+			response = self.pedir(periodo='mensual', _='123')
+		build.assert_not_called()
+		self.assertRedirects(
+			response, reverse('document_upload:report_job_download', args=[job.pk]), fetch_redirect_response=False
+		)
+		self.assertEqual(ReportJob.objects.count(), 1)
+
+		# Otro usuario recibe su propio trabajo con el mismo archivo
+		other = User.objects.create_user(username='supervisor', password='clave-segura-123')
+		self.client.force_login(other)
+		with patch('document_upload.views.build_excel_report') as build:
+			self.pedir()
+		build.assert_not_called()
+		copy = ReportJob.objects.get(requested_by=other)
+		self.assertEqual((copy.status, copy.file.name), ('ready', job.file.name))
+		self.assertIsNotNone(copy.report)
+
+	def test_data_changes_produce_new_key(self):
+		key = report_cache_key('productividad', {'periodo': 'mensual'})
+		self.assertEqual(key, report_cache_key('productividad', {'periodo': 'mensual', 'page': '2'}))
+		self.assertNotEqual(key, report_cache_key('productividad', {'periodo': 'semanal'}))
+		self.assertEqual(report_cache_key('repuestos_utilizados', {}), '')
+
+		register_exits([self.ingreso.pk], timezone.now())
+		after_exit = report_cache_key('productividad', {'periodo': 'mensual'})
+		self.assertNotEqual(after_exit, key)
+
+		# Editar una tabla de catálogo (renombrar la sucursal) también cambia la huella
+		self.data['site'].name = 'Santiago Centro'
+		self.data['site'].save()
+		self.assertNotEqual(report_cache_key('productividad', {'periodo': 'mensual'}), after_exit)
+		after_exit = report_cache_key('productividad', {'periodo': 'mensual'})
+
+		WorkOrder.objects.all().delete()
+		self.assertNotEqual(report_cache_key('productividad', {'periodo': 'mensual'}), after_exit)
+
+		# Con datos nuevos el reporte se vuelve a generar
+		self.pedir()
+		self.pedir()
+		self.assertEqual(ReportJob.objects.count(), 1)
+		WorkOrder.objects.create(status=self.data['status'], ingreso=self.ingreso)
+		self.pedir()
+		self.assertEqual(ReportJob.objects.filter(status='ready').count(), 2)
+
+
+class ReportAggregatesTestCase(TestCase):
+	"""Tests para los agregados de los reportes de productividad y tiempos"""
+
+	def setUp(self):
+		self.data = crear_datos_base()
+		self.pause_type = PauseType.objects.create(id_pause_type='STOCK', name='Falta de stock')
+		self.base = timezone.make_aware(datetime(2026, 10, 12, 9, 0))  # Lunes
+		other = FlotaUser.objects.create(
+			user=User.objects.create_user(username='mecanico2', password='clave-segura-123'),
+			name='Mecánico Dos', role=self.data['role'], patent=self.data['vehicle'],
+			status=self.data['user_status'], observations='', gpid='GP2',
+		)
+		ingreso = Ingreso.objects.create(
+			patent=self.data['vehicle'], entry_datetime=self.base, chofer=self.data['flota_user'],
+			authorization=False,
+		)
+		self.work_order = WorkOrder.objects.create(
+			status=self.data['status'], ingreso=ingreso,
+			service_type=ServiceType.objects.create(name='Frenos', site=self.data['site']),
+			work_started_at=self.base, actual_completion=self.base + timedelta(hours=4),
+		)
+		self.assignment = WorkOrderMechanic.objects.create(
+			work_order=self.work_order, mechanic=self.data['flota_user'], hours_worked=Decimal('3'),
+		)
+		self.other_assignment = WorkOrderMechanic.objects.create(
+			work_order=self.work_order, mechanic=other, hours_worked=Decimal('2'),
+		)
+		# Global de 10:00 a 11:00 y personal de 10:30 a 11:30: se solapan media hora
+		for start, end, assignment in ((1, 2, None), (1.5, 2.5, self.assignment)):
+			WorkOrderPause.objects.create(
+				work_order=self.work_order, mechanic_assignment=assignment, pause_type=self.pause_type,
+				reason='Pausa', start_datetime=self.base + timedelta(hours=start),
+				end_datetime=self.base + timedelta(hours=end),
+			)
+		sin_ingreso = WorkOrder.objects.create(status=self.data['status'])
+		WorkOrderMechanic.objects.create(
+			work_order=sin_ingreso, mechanic=self.data['flota_user'], hours_worked=Decimal('1'),
+		)
+
+	def test_grouped_totals(self):
+		"""Los totales por mecánico, tipo y zona salen de consultas agrupadas"""
+		aggregates = WorkOrderAggregates(WorkOrder.objects.all())
+		self.assertEqual((aggregates.total_work_orders, aggregates.vehicles_attended), (2, 1))
+		self.assertEqual(aggregates.mechanics, {
+			'Mecánico Dos': {'work_orders': 1, 'hours': Decimal('2')},
+			'Mecánico Uno': {'work_orders': 2, 'hours': Decimal('4')},
+		})
+		self.assertEqual(aggregates.mechanic_hours, 6)
+		self.assertEqual(aggregates.service_types, {'Frenos': 1, 'Sin tipo': 1})
+		self.assertEqual(aggregates.zones, {'Santiago': 1, 'Sin zona': 1})
+		self.assertAlmostEqual(aggregates.average_hours_by_type['Frenos'], 4)
+		self.assertEqual(list(aggregates.pause_type_minutes), ['Falta de stock'])
+		self.assertEqual(aggregates.pause_minutes, aggregates.pause_type_minutes['Falta de stock'])
+
+	def test_rows_merge_pauses_once(self):
+		"""Las filas traen las horas por OT y acumulan las pausas fusionadas"""
+		aggregates = WorkOrderAggregates(WorkOrder.objects.all())
+		with CaptureQueriesContext(connection) as queries:
+			rows = list(aggregates.rows())
+		self.assertLessEqual(len(queries), 3)
+
+		row = rows[0]
+		self.assertEqual(row['id_work_order'], self.work_order.pk)
+		self.assertEqual(row['mechanic_hours'], 5)
+		self.assertEqual([a['mechanic__name'] for a in row['assignments']], ['Mecánico Uno', 'Mecánico Dos'])
+		# Global (1h) + lo que la personal agrega fuera de la global (0.5h)
+		self.assertAlmostEqual(row['pause_hours'], 1.5)
+		self.assertEqual(rows[1]['pause_hours'], 0)
+		self.assertAlmostEqual(aggregates.effective_hours, 4.5)
+		self.assertEqual(aggregates.mechanic_pause_minutes, {'Mecánico Uno': 90, 'Mecánico Dos': 60})
+
+
+class FleetKpisTestCase(TestCase):
+	"""Tests para los KPIs de flota por zona en una consulta agrupada"""
+
+	def setUp(self):
+		self.data = crear_datos_base()
+		# Otra sucursal con el mismo nombre: los conteos van por id, no por nombre
+		self.other_site = Site.objects.create(name='Santiago', patent_count=5)
+		self.now = timezone.make_aware(datetime(2026, 10, 15, 12, 0))
+		for entry, exit in (
+			(datetime(2026, 10, 2, 9), datetime(2026, 10, 2, 18)),
+			(datetime(2026, 10, 10, 9), None),
+			(datetime(2026, 9, 20, 9), datetime(2026, 9, 21, 9)),
+			(datetime(2026, 7, 1, 9), None),  # Fuera de ambos períodos
+		):
+			Ingreso.objects.create(
+				patent=self.data['vehicle'], entry_datetime=timezone.make_aware(entry),
+				exit_datetime=timezone.make_aware(exit) if exit else None,
+				chofer=self.data['flota_user'], authorization=False,
+			)
+
+	def test_counts_by_site_in_one_query(self):
+		with CaptureQueriesContext(connection) as queries:
+			period = fleet_kpi_period('mensual', now=self.now)
+			kpis = fleet_kpis(period)
+		self.assertEqual(len(queries), 2)
+		self.assertEqual(period['previous_start'].date(), datetime(2026, 9, 1).date())
+
+		santiago, other = kpis['zones']
+		self.assertEqual((santiago['id'], santiago['vehiculos'], santiago['vehiculos_prev'], santiago['completados']),
+						 (self.data['site'].pk, 2, 1, 1))
+		self.assertEqual(santiago['disponibilidad'], 50)
+		self.assertEqual(santiago['tendencia'], '↗️')
+		self.assertEqual((other['id'], other['vehiculos'], other['vehiculos_prev']), (self.other_site.pk, 0, 0))
+		self.assertEqual(kpis['totals']['vehiculos'], 2)
+		self.assertEqual(kpis['totals']['variacion'], 100)
+		self.assertAlmostEqual(kpis['totals']['kpi'], (santiago['kpi'] + other['kpi']) / 2)
+
+	def test_falls_back_to_last_month_with_data(self):
+		period = fleet_kpi_period('mensual', now=timezone.make_aware(datetime(2027, 2, 10, 12, 0)))
+		self.assertEqual(period['current_start'].date(), datetime(2026, 10, 1).date())
+		self.assertEqual(fleet_kpis(period)['totals']['vehiculos'], 2)
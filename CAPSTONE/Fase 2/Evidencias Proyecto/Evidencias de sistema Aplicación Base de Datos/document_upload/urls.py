@@ -3,7 +3,8 @@ from .views import (
     dashboard, upload_document, document_list, delete_document,
     report_type_list, report_type_create, report_type_edit, report_type_delete,
     document_type_list, document_type_create, document_type_edit, document_type_delete,
-    reports_dashboard, generate_excel_report
+    reports_dashboard, generate_excel_report,
+    report_job_detail, report_job_status, report_job_download
 )
 
 app_name = 'document_upload'
@@ -29,4 +30,7 @@ urlpatterns = [
     # URLs para reportes
     path('reports/', reports_dashboard, name='reports_dashboard'),
     path('reports/generate/<str:report_type>/', generate_excel_report, name='generate_excel_report'),
+    path('reports/jobs/<int:job_id>/', report_job_detail, name='report_job_detail'),
+    path('reports/jobs/<int:job_id>/status/', report_job_status, name='report_job_status'),
+    path('reports/jobs/<int:job_id>/download/', report_job_download, name='report_job_download'),
 ]
@@ -1,19 +1,18 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.utils import timezone
 from django.db.models import Count, F, Sum, Avg
-from datetime import timedelta, datetime
+from datetime import timedelta
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import Http404, HttpResponse
+from django.http import FileResponse, Http404, JsonResponse
 from django.core.paginator import Paginator
 from django import forms
 from django.db import models
-from io import BytesIO
-from itertools import chain
 
 from documents.models import Report
-from .models import ReportType, UploadedDocument, DocumentType
-from repuestos.models import SparePartStock, StockMovement, Supplier
+from .models import ReportJob, ReportType, UploadedDocument, DocumentType
+from repuestos.models import StockMovement, Supplier
 
 
 class DocumentUploadForm(forms.ModelForm):
@@ -363,2321 +362,1796 @@ def document_type_delete(request, type_id):
 	return render(request, 'document_upload/document_type_delete.html', context)
 
 
+# Estadísticas disponibles para reportes
+REPORT_TYPES = [
+	{
+		'id': 'reportes_generales',
+		'name': 'Estadísticas Generales de Reportes',
+		'description': 'Total de reportes, reportes del día, últimos 7 días, tipos activos',
+		'icon': 'fas fa-chart-line',
+		'color': 'primary'
+	},
+	{
+		'id': 'reportes_por_tipo',
+		'name': 'Reportes por Tipo',
+		'description': 'Distribución de reportes agrupados por tipo',
+		'icon': 'fas fa-chart-pie',
+		'color': 'info'
+	},
+	{
+		'id': 'tendencia_reportes',
+		'name': 'Tendencia de Reportes',
+		'description': 'Evolución semanal de generación de reportes',
+		'icon': 'fas fa-wave-square',
+		'color': 'warning'
+	},
+	{
+		'id': 'usuarios_reportes',
+		'name': 'Usuarios Más Activos (Reportes)',
+		'description': 'Ranking de usuarios que más reportes han generado',
+		'icon': 'fas fa-user-tie',
+		'color': 'success'
+	},
+	{
+		'id': 'reportes_recientes',
+		'name': 'Reportes Recientes',
+		'description': 'Lista detallada de los reportes más recientes',
+		'icon': 'fas fa-clipboard-list',
+		'color': 'secondary'
+	},
+	{
+		'id': 'productividad',
+		'name': 'Reporte de Productividad',
+		'description': 'Análisis completo de mantenimientos con KPIs, gráficos de barras y análisis por zona/mecánico',
+		'icon': 'fas fa-tools',
+		'color': 'danger',
+		'has_period': True
+	},
+	{
+		'id': 'tiempos_horas_hombre',
+		'name': 'Reporte de Tiempos y Horas Hombre',
+		'description': 'Análisis detallado de tiempos de trabajo, pausas y eficiencia por mecánico/zona',
+		'icon': 'fas fa-clock',
+		'color': 'warning',
+		'has_filters': True
+	},
+	{
+		'id': 'repuestos_utilizados',
+		'name': 'Reporte de Repuestos Utilizados',
+		'description': 'Análisis de consumo de repuestos con costos, proveedores y alertas de stock',
+		'icon': 'fas fa-cogs',
+		'color': 'dark',
+		'has_filters': True
+	},
+	{
+		'id': 'vehiculos_ingresados_salidos',
+		'name': 'Reporte de Vehículos Ingresados/Salidos',
+		'description': 'Control de ingresos y salidas de vehículos con tiempos, estados e incidencias',
+		'icon': 'fas fa-truck',
+		'color': 'info',
+		'has_filters': True
+	},
+	{
+		'id': 'kpis_flota',
+		'name': 'Reporte de Indicadores de Flota (KPIs Globales)',
+		'description': 'Dashboard con KPIs de zona, eficiencia mecánicos, trazabilidad y disponibilidad de flota',
+		'icon': 'fas fa-tachometer-alt',
+		'color': 'primary',
+		'has_period': True
+	}
+]
+
+
 @login_required
 def reports_dashboard(request):
 	"""Vista para mostrar opciones de reportes disponibles."""
-	
-	# Estadísticas disponibles para reportes
-	report_types = [
-		{
-			'id': 'reportes_generales',
-			'name': 'Estadísticas Generales de Reportes',
-			'description': 'Total de reportes, reportes del día, últimos 7 días, tipos activos',
-			'icon': 'fas fa-chart-line',
-			'color': 'primary'
-		},
-		{
-			'id': 'reportes_por_tipo',
-			'name': 'Reportes por Tipo',
-			'description': 'Distribución de reportes agrupados por tipo',
-			'icon': 'fas fa-chart-pie',
-			'color': 'info'
-		},
-		{
-			'id': 'tendencia_reportes',
-			'name': 'Tendencia de Reportes',
-			'description': 'Evolución semanal de generación de reportes',
-			'icon': 'fas fa-wave-square',
-			'color': 'warning'
-		},
-		{
-			'id': 'usuarios_reportes',
-			'name': 'Usuarios Más Activos (Reportes)',
-			'description': 'Ranking de usuarios que más reportes han generado',
-			'icon': 'fas fa-user-tie',
-			'color': 'success'
-		},
-		{
-			'id': 'reportes_recientes',
-			'name': 'Reportes Recientes',
-			'description': 'Lista detallada de los reportes más recientes',
-			'icon': 'fas fa-clipboard-list',
-			'color': 'secondary'
-		},
-		{
-			'id': 'productividad',
-			'name': 'Reporte de Productividad',
-			'description': 'Análisis completo de mantenimientos con KPIs, gráficos de barras y análisis por zona/mecánico',
-			'icon': 'fas fa-tools',
-			'color': 'danger',
-			'has_period': True
-		},
-		{
-			'id': 'tiempos_horas_hombre',
-			'name': 'Reporte de Tiempos y Horas Hombre',
-			'description': 'Análisis detallado de tiempos de trabajo, pausas y eficiencia por mecánico/zona',
-			'icon': 'fas fa-clock',
-			'color': 'warning',
-			'has_filters': True
-		},
-		{
-			'id': 'repuestos_utilizados',
-			'name': 'Reporte de Repuestos Utilizados',
-			'description': 'Análisis de consumo de repuestos con costos, proveedores y alertas de stock',
-			'icon': 'fas fa-cogs',
-			'color': 'dark',
-			'has_filters': True
-		},
-		{
-			'id': 'vehiculos_ingresados_salidos',
-			'name': 'Reporte de Vehículos Ingresados/Salidos',
-			'description': 'Control de ingresos y salidas de vehículos con tiempos, estados e incidencias',
-			'icon': 'fas fa-truck',
-			'color': 'info',
-			'has_filters': True
-		},
-		{
-			'id': 'kpis_flota',
-			'name': 'Reporte de Indicadores de Flota (KPIs Globales)',
-			'description': 'Dashboard con KPIs de zona, eficiencia mecánicos, trazabilidad y disponibilidad de flota',
-			'icon': 'fas fa-tachometer-alt',
-			'color': 'primary',
-			'has_period': True
-		}
-	]
-	
 	context = {
-		'report_types': report_types,
+		'report_types': REPORT_TYPES,
+		'report_jobs': ReportJob.objects.filter(requested_by=request.user).select_related('report_type')[:10],
 	}
 	return render(request, 'document_upload/reports_dashboard.html', context)
 
 
+# Reportes que recorren todas las OTs del período: se generan en segundo plano (report_jobs)
+QUEUED_REPORT_TYPES = {'productividad', 'tiempos_horas_hombre', 'kpis_flota'}
+
+
+def report_filename(report_type, moment=None):
+	"""Nombre del archivo .xlsx del reporte"""
+	moment = moment or timezone.now()
+	return f"{report_type}_{moment.strftime('%Y%m%d_%H%M%S')}.xlsx"
+
+
 @login_required
 def generate_excel_report(request, report_type):
-	"""Vista para generar reportes en Excel."""
+	"""
+	Vista para generar reportes en Excel. Los reportes pesados se encolan y se
+	redirige a la página del trabajo; el resto se entrega de inmediato.
+	"""
+	if report_type in QUEUED_REPORT_TYPES:
+		from .report_jobs import enqueue_report_job
+		
+		job = enqueue_report_job(report_type, request.GET.dict(), request.user)
+		if job.status == 'ready':
+			# Mismo reporte con los mismos datos: se entrega el archivo ya generado
+			return redirect('document_upload:report_job_download', job_id=job.id_job)
+		return redirect('document_upload:report_job_detail', job_id=job.id_job)
+	
 	try:
-		from openpyxl import Workbook
-		from openpyxl.styles import Font, PatternFill, Alignment
-		from openpyxl.chart import BarChart, Reference, PieChart
-		from openpyxl.chart.label import DataLabelList
-		
-		wb = Workbook()
-		now = timezone.now()  # Definir now al inicio
-		
-		if report_type == 'reportes_generales':
-			# Estadísticas generales de reportes
-			ws = wb.active
-			ws.title = "Estadísticas Generales Reportes"
-			
-			# Título
-			ws['A1'] = "ESTADÍSTICAS GENERALES DE REPORTES"
-			ws['A1'].font = Font(size=16, bold=True)
-			ws.merge_cells('A1:D1')
-			ws['A1'].alignment = Alignment(horizontal='center')
-			
-			# Datos
-			total_reports = Report.objects.count()
-			reports_today = Report.objects.filter(generated_datetime__date=now.date()).count()
-			reports_last_week = Report.objects.filter(generated_datetime__date__gte=(now - timedelta(days=7)).date()).count()
-			report_types_count = ReportType.objects.filter(active=True).count()
-			
-			ws['A3'] = "Métrica"
-			ws['B3'] = "Valor"
-			ws['A3'].font = Font(bold=True)
-			ws['B3'].font = Font(bold=True)
-			
-			data = [
-				["Total de Reportes", total_reports],
-				["Reportes Hoy", reports_today],
-				["Reportes Últimos 7 días", reports_last_week],
-				["Tipos de Reporte Activos", report_types_count],
-			]
-			
-			for i, (metric, value) in enumerate(data, 4):
-				ws[f'A{i}'] = metric
-				ws[f'B{i}'] = value
-			
-			# Autoajustar columnas
-			for column in ws.columns:
-				max_length = 0
-				column_letter = None
-				for cell in column:
-					try:
-						if hasattr(cell, 'column_letter'):
-							column_letter = cell.column_letter
-						if len(str(cell.value)) > max_length:
-							max_length = len(str(cell.value))
-					except:
-						pass
-				if column_letter:
-					ws.column_dimensions[column_letter].width = max_length + 2
-		
-		elif report_type == 'reportes_por_tipo':
-			# Reportes por tipo
-			ws = wb.active
-			ws.title = "Reportes por Tipo"
-			
-			ws['A1'] = "REPORTES AGRUPADOS POR TIPO"
-			ws['A1'].font = Font(size=16, bold=True)
-			ws.merge_cells('A1:C1')
-			ws['A1'].alignment = Alignment(horizontal='center')
-			
-			ws['A3'] = "Tipo de Reporte"
-			ws['B3'] = "Cantidad"
-			ws['C3'] = "Porcentaje"
-			ws['A3'].font = Font(bold=True)
-			ws['B3'].font = Font(bold=True)
-			ws['C3'].font = Font(bold=True)
-			
-			reports_by_type = (
-				Report.objects
-				.values('type__name')
-				.annotate(count=Count('id_report'))
-				.order_by('-count')
-			)
-			
-			total = sum(item['count'] for item in reports_by_type)
-			
-			for i, item in enumerate(reports_by_type, 4):
-				ws[f'A{i}'] = item['type__name'] or 'Sin tipo'
-				ws[f'B{i}'] = item['count']
-				percentage = (item['count'] / total * 100) if total > 0 else 0
-				ws[f'C{i}'] = f"{percentage:.1f}%"
-			
-			# Autoajustar columnas
-			for column in ws.columns:
-				max_length = 0
-				column_letter = None
-				for cell in column:
-					try:
-						if hasattr(cell, 'column_letter'):
-							column_letter = cell.column_letter
-						if len(str(cell.value)) > max_length:
-							max_length = len(str(cell.value))
-					except:
-						pass
-				if column_letter:
-					ws.column_dimensions[column_letter].width = max_length + 2
-		
-		elif report_type == 'tendencia_reportes':
-			# Tendencia semanal de reportes
-			ws = wb.active
-			ws.title = "Tendencia Reportes"
-			
-			ws['A1'] = "TENDENCIA SEMANAL DE GENERACIÓN DE REPORTES"
-			ws['A1'].font = Font(size=16, bold=True)
-			ws.merge_cells('A1:C1')
-			ws['A1'].alignment = Alignment(horizontal='center')
-			
-			ws['A3'] = "Fecha"
-			ws['B3'] = "Cantidad de Reportes"
-			ws['C3'] = "Día de la Semana"
-			ws['A3'].font = Font(bold=True)
-			ws['B3'].font = Font(bold=True)
-			ws['C3'].font = Font(bold=True)
-			
-			# Obtener datos de los últimos 7 días
-			for i in range(6, -1, -1):
-				day = (now - timedelta(days=i)).date()
-				count = Report.objects.filter(generated_datetime__date=day).count()
-				
-				row = 4 + (6 - i)  # Empezar desde la fila 4
-				ws[f'A{row}'] = day.strftime('%d/%m/%Y')
-				ws[f'B{row}'] = count
-				ws[f'C{row}'] = day.strftime('%A')  # Nombre del día
-			
-			# Autoajustar columnas
-			for column in ws.columns:
-				max_length = 0
-				column_letter = None
-				for cell in column:
-					try:
-						if hasattr(cell, 'column_letter'):
-							column_letter = cell.column_letter
-						if len(str(cell.value)) > max_length:
-							max_length = len(str(cell.value))
-					except:
-						pass
-				if column_letter:
-					ws.column_dimensions[column_letter].width = max_length + 2
-		
-		elif report_type == 'usuarios_reportes':
-			# Usuarios más activos en reportes
-			ws = wb.active
-			ws.title = "Usuarios Activos Reportes"
-			
-			ws['A1'] = "USUARIOS MÁS ACTIVOS EN GENERACIÓN DE REPORTES"
-			ws['A1'].font = Font(size=16, bold=True)
-			ws.merge_cells('A1:D1')
-			ws['A1'].alignment = Alignment(horizontal='center')
-			
-			ws['A3'] = "Posición"
-			ws['B3'] = "Usuario"
-			ws['C3'] = "Rol"
-			ws['D3'] = "Total de Reportes"
-			ws['A3'].font = Font(bold=True)
-			ws['B3'].font = Font(bold=True)
-			ws['C3'].font = Font(bold=True)
-			ws['D3'].font = Font(bold=True)
-			
-			# Obtener top 10 usuarios más activos
-			from django.db.models import Q
-			top_users = (
-				Report.objects
-				.select_related('user', 'user__role')
-				.values('user__name', 'user__role__name')
-				.annotate(count=Count('id_report'))
-				.filter(~Q(user__name__isnull=True) & ~Q(user__name=''))
-				.order_by('-count')[:10]
-			)
-			
-			for i, user_data in enumerate(top_users, 4):
-				ws[f'A{i}'] = i - 3  # Posición (1, 2, 3...)
-				ws[f'B{i}'] = user_data['user__name'] or 'Sin nombre'
-				ws[f'C{i}'] = user_data['user__role__name'] or 'Sin rol'
-				ws[f'D{i}'] = user_data['count']
-			
-			# Autoajustar columnas
-			for column in ws.columns:
-				max_length = 0
-				column_letter = None
-				for cell in column:
-					try:
-						if hasattr(cell, 'column_letter'):
-							column_letter = cell.column_letter
-						if len(str(cell.value)) > max_length:
-							max_length = len(str(cell.value))
-					except:
-						pass
-				if column_letter:
-					ws.column_dimensions[column_letter].width = max_length + 2
-		
-		elif report_type == 'reportes_recientes':
-			# Reportes recientes
-			ws = wb.active
-			ws.title = "Reportes Recientes"
-			
-			ws['A1'] = "REPORTES MÁS RECIENTES"
-			ws['A1'].font = Font(size=16, bold=True)
-			ws.merge_cells('A1:F1')
-			ws['A1'].alignment = Alignment(horizontal='center')
-			
-			ws['A3'] = "ID Reporte"
-			ws['B3'] = "Usuario"
-			ws['C3'] = "Tipo"
-			ws['D3'] = "Fecha de Generación"
-			ws['E3'] = "Rol del Usuario"
-			ws['F3'] = "Datos"
-			ws['A3'].font = Font(bold=True)
-			ws['B3'].font = Font(bold=True)
-			ws['C3'].font = Font(bold=True)
-			ws['D3'].font = Font(bold=True)
-			ws['E3'].font = Font(bold=True)
-			ws['F3'].font = Font(bold=True)
-			
-			# Obtener los 50 reportes más recientes
-			recent_reports = Report.objects.select_related('user', 'type').order_by('-generated_datetime')[:50]
-			
-			for i, report in enumerate(recent_reports, 4):
-				ws[f'A{i}'] = report.id_report
-				ws[f'B{i}'] = report.user.name if report.user else 'Sin usuario'
-				ws[f'C{i}'] = report.type.name if report.type else 'Sin tipo'
-				ws[f'D{i}'] = report.generated_datetime.strftime('%d/%m/%Y %H:%M:%S') if report.generated_datetime else ''
-				ws[f'E{i}'] = report.user.role.name if report.user and report.user.role else 'Sin rol'
-				ws[f'F{i}'] = str(report.data)[:100] + '...' if len(str(report.data)) > 100 else str(report.data)
-			
-			# Autoajustar columnas
-			for column in ws.columns:
-				max_length = 0
-				column_letter = None
-				for cell in column:
-					try:
-						if hasattr(cell, 'column_letter'):
-							column_letter = cell.column_letter
-						if len(str(cell.value)) > max_length:
-							max_length = len(str(cell.value))
-					except:
-						pass
-				if column_letter:
-					ws.column_dimensions[column_letter].width = min(max_length + 2, 50)  # Máximo 50 caracteres para evitar columnas muy anchas
-		
-		elif report_type == 'productividad':
-			# Reporte de Productividad
-			from documents.models import WorkOrder, WorkOrderMechanic, Ingreso, Vehicle, ServiceType, Site
-			from pausas.models import WorkOrderPause
-			from django.db.models import Sum, Count, F, Q, Case, When, Value, DecimalField
-			from django.db.models.functions import Coalesce
-			
-			# Determinar período
-			now = timezone.now()
-			if 'periodo' in request.GET:
-				periodo = request.GET.get('periodo', 'diario')
-			else:
-				periodo = 'mensual'  # Por defecto mensual
-			
-			if periodo == 'diario':
-				start_date = now.date()
-				end_date = now.date()
-				period_name = f"Diario - {start_date.strftime('%d/%m/%Y')}"
-			elif periodo == 'semanal':
-				start_date = now.date() - timedelta(days=now.weekday())  # Lunes
-				end_date = start_date + timedelta(days=6)  # Domingo
-				period_name = f"Semanal - {start_date.strftime('%d/%m/%Y')} al {end_date.strftime('%d/%m/%Y')}"
-			else:  # mensual
-				start_date = now.date().replace(day=1)
-				end_date = (now.date().replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
-				period_name = f"Mensual - {start_date.strftime('%d/%m/%Y')} al {end_date.strftime('%d/%m/%Y')}"
-			
-			# Consultar datos de productividad
-			work_orders = WorkOrder.objects.filter(
-				Q(created_datetime__date__gte=start_date) & Q(created_datetime__date__lte=end_date) |
-				Q(work_started_at__date__gte=start_date) & Q(work_started_at__date__lte=end_date) |
-				Q(actual_completion__date__gte=start_date) & Q(actual_completion__date__lte=end_date)
-			).select_related(
-				'ingreso__patent', 'service_type', 'status'
-			).prefetch_related(
-				'mechanic_assignments__mechanic',
-				'pauses'
-			)
-			
-			# Verificar si hay datos
-			if not work_orders.exists():
-				# Si no hay datos, crear una hoja con mensaje informativo
-				ws_data = wb.active
-				ws_data.title = "BaseOTs"
-				ws_data['A1'] = "No se encontraron órdenes de trabajo en el período seleccionado"
-				ws_data['A1'].font = Font(size=14, bold=True)
-				ws_data['A2'] = f"Período: {period_name}"
-				ws_data['A3'] = f"Fechas: {start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')}"
-				
-				# Crear hoja de KPIs vacía
-				ws_kpi = wb.create_sheet("KPIs")
-				ws_kpi['A1'] = "REPORTE DE PRODUCTIVIDAD"
-				ws_kpi['A1'].font = Font(size=16, bold=True)
-				ws_kpi.merge_cells('A1:D1')
-				ws_kpi['A1'].alignment = Alignment(horizontal='center')
-				ws_kpi['A2'] = f"Período: {period_name}"
-				ws_kpi['A2'].font = Font(bold=True)
-				ws_kpi.merge_cells('A2:D2')
-				ws_kpi['A2'].alignment = Alignment(horizontal='center')
-				ws_kpi['A4'] = "No hay datos disponibles para el período seleccionado"
-				return response
-			
-			# Crear hoja de datos
-			ws_data = wb.active
-			ws_data.title = "BaseOTs"
-			
-			# Encabezados
-			headers = [
-				'Patente', 'Modelo', 'Marca', 'Mecánico Asignado', 'Tipo Mantención', 
-				'Fecha/Hora Ingreso', 'Fecha/Hora Salida', 'Duración Total (horas)', 
-				'Horas Hombre Efectivas', 'Zona', 'Estado OT', 'Horas Pausas'
-			]
-			
-			for col, header in enumerate(headers, 1):
-				ws_data.cell(row=1, column=col, value=header)
-				ws_data.cell(row=1, column=col).font = Font(bold=True)
-			
-			# Datos
-			row = 2
-			total_vehicles = 0
-			vehicles_set = set()
-			
-			for wo in work_orders:
-				if wo.ingreso:
-					patent = wo.ingreso.patent.patent
-					modelo = wo.ingreso.patent.model
-					marca = wo.ingreso.patent.brand
-					fecha_ingreso = wo.ingreso.entry_datetime
-					fecha_salida = wo.ingreso.exit_datetime
-					zona = wo.ingreso.patent.site.name if wo.ingreso.patent.site else 'Sin zona'
-					vehicles_set.add(patent)
-				else:
-					patent = 'Sin patente'
-					modelo = 'Sin modelo'
-					marca = 'Sin marca'
-					fecha_ingreso = wo.created_datetime
-					fecha_salida = wo.actual_completion
-					zona = 'Sin zona'
-				
-				# Mecánicos asignados
-				mecanicos = [assignment.mechanic.name for assignment in wo.mechanic_assignments.all()]
-				mecanico_str = ', '.join(mecanicos) if mecanicos else 'Sin asignar'
-				
-				# Tipo de mantención
-				tipo_mantencion = wo.service_type.name if wo.service_type else 'Sin tipo'
-				
-				# Calcular duración total
-				if fecha_ingreso and fecha_salida:
-					duracion_total = (fecha_salida - fecha_ingreso).total_seconds() / 3600
-				else:
-					duracion_total = 0
-				
-				# Calcular horas hombre efectivas (excluyendo pausas)
-				total_pauses_hours = sum(
-					pause.duration_minutes / 60 for pause in wo.pauses.all() 
-					if pause.duration_minutes
-				)
-				
-				# Horas hombre totales de mecánicos asignados
-				total_mechanic_hours = sum(
-					float(assignment.hours_worked) for assignment in wo.mechanic_assignments.all()
-				)
-				
-				horas_efectivas = max(0, total_mechanic_hours - total_pauses_hours)
-				
-				# Estado de la OT
-				estado_ot = wo.status.name if wo.status else 'Sin estado'
-				
-				# Escribir fila
-				ws_data.cell(row=row, column=1, value=patent)
-				ws_data.cell(row=row, column=2, value=modelo)
-				ws_data.cell(row=row, column=3, value=marca)
-				ws_data.cell(row=row, column=4, value=mecanico_str)
-				ws_data.cell(row=row, column=5, value=tipo_mantencion)
-				ws_data.cell(row=row, column=6, value=fecha_ingreso.strftime('%d/%m/%Y %H:%M') if fecha_ingreso else '')
-				ws_data.cell(row=row, column=7, value=fecha_salida.strftime('%d/%m/%Y %H:%M') if fecha_salida else '')
-				ws_data.cell(row=row, column=8, value=round(duracion_total, 2) if duracion_total > 0 else 0)
-				ws_data.cell(row=row, column=9, value=round(horas_efectivas, 2))
-				ws_data.cell(row=row, column=10, value=zona)
-				ws_data.cell(row=row, column=11, value=estado_ot)
-				ws_data.cell(row=row, column=12, value=round(total_pauses_hours, 2))
-				
-				row += 1
-			
-			# Autoajustar columnas
-			for column in ws_data.columns:
-				max_length = 0
-				column_letter = None
-				for cell in column:
-					try:
-						if hasattr(cell, 'column_letter'):
-							column_letter = cell.column_letter
-						if len(str(cell.value)) > max_length:
-							max_length = len(str(cell.value))
-					except:
-						pass
-				if column_letter:
-					ws_data.column_dimensions[column_letter].width = min(max_length + 2, 30)
-			
-			# Crear hoja de KPIs
-			ws_kpi = wb.create_sheet("KPIs")
+		from .excel_stream import StreamingWorkbook
+		
+		book = StreamingWorkbook()
+		build_excel_report(book, report_type, request.GET)
+		
+		# Preparar respuesta HTTP (se envía por partes desde un archivo temporal)
+		return book.response(report_filename(report_type))
+		
+	except ImportError:
+		messages.error(request, 'La librería openpyxl no está instalada. Instale con: pip install openpyxl')
+		return redirect('document_upload:reports_dashboard')
+	except Exception as e:
+		messages.error(request, f'Error al generar el reporte: {str(e)}')
+		return redirect('document_upload:reports_dashboard')
+
+
+def _user_report_job(request, job_id):
+	"""Trabajo de reporte del usuario (el staff puede ver todos)"""
+	jobs = ReportJob.objects.select_related('report_type')
+	if not request.user.is_staff:
+		jobs = jobs.filter(requested_by=request.user)
+	return get_object_or_404(jobs, id_job=job_id)
+
+
+def _report_job_payload(job):
+	return {
+		'id': job.id_job,
+		'report': job.report_key,
+		'status': job.status,
+		'status_display': job.get_status_display(),
+		'created_at': job.created_at,
+		'started_at': job.started_at,
+		'finished_at': job.finished_at,
+		'queue_seconds': job.queue_seconds,
+		'run_seconds': job.run_seconds,
+		'file_size': job.file_size,
+		'error': job.error,
+		'download_url': reverse('document_upload:report_job_download', args=[job.id_job]) if job.status == 'ready' else None,
+	}
+
+
+@login_required
+def report_job_detail(request, job_id):
+	"""Página de espera de un reporte en segundo plano; consulta el estado hasta que esté listo."""
+	job = _user_report_job(request, job_id)
+	context = {
+		'job': job,
+		'report_name': job.report_type.name if job.report_type else job.report_key,
+	}
+	return render(request, 'document_upload/report_job_detail.html', context)
+
+
+@login_required
+def report_job_status(request, job_id):
+	"""Estado y tiempos del trabajo en JSON (para el polling de la página de espera)."""
+	return JsonResponse(_report_job_payload(_user_report_job(request, job_id)))
+
+
+@login_required
+def report_job_download(request, job_id):
+	"""Descarga el archivo generado por el trabajo."""
+	job = _user_report_job(request, job_id)
+	if job.status != 'ready' or not job.file:
+		raise Http404("El reporte aún no está disponible")
+	return FileResponse(
+		job.file.open('rb'), as_attachment=True, filename=report_filename(job.report_key, timezone.localtime(job.started_at)),
+	)
+
+
+def build_excel_report(book, report_type, params):
+	"""
+	Escribe las hojas del reporte en `book` (un StreamingWorkbook). `params`
+	son los filtros de la petición (por ejemplo `periodo`); se usa tanto desde
+	la vista como desde los trabajos en segundo plano.
+	"""
+	from openpyxl.styles import Font, PatternFill, Alignment
+	from openpyxl.chart import BarChart, Reference, PieChart
+	from openpyxl.chart.label import DataLabelList
+	
+	now = timezone.now()  # Definir now al inicio
+	
+	if report_type == 'reportes_generales':
+		# Estadísticas generales de reportes
+		ws = book.layout_sheet("Estadísticas Generales Reportes", max_width=None)
+		
+		# Título
+		ws['A1'] = "ESTADÍSTICAS GENERALES DE REPORTES"
+		ws['A1'].font = Font(size=16, bold=True)
+		ws.merge_cells('A1:D1')
+		ws['A1'].alignment = Alignment(horizontal='center')
+		
+		# Datos
+		total_reports = Report.objects.count()
+		reports_today = Report.objects.filter(generated_datetime__date=now.date()).count()
+		reports_last_week = Report.objects.filter(generated_datetime__date__gte=(now - timedelta(days=7)).date()).count()
+		report_types_count = ReportType.objects.filter(active=True).count()
+		
+		ws['A3'] = "Métrica"
+		ws['B3'] = "Valor"
+		ws['A3'].font = Font(bold=True)
+		ws['B3'].font = Font(bold=True)
+		
+		data = [
+			["Total de Reportes", total_reports],
+			["Reportes Hoy", reports_today],
+			["Reportes Últimos 7 días", reports_last_week],
+			["Tipos de Reporte Activos", report_types_count],
+		]
+		
+		for i, (metric, value) in enumerate(data, 4):
+			ws[f'A{i}'] = metric
+			ws[f'B{i}'] = value
+	
+	elif report_type == 'reportes_por_tipo':
+		# Reportes por tipo
+		ws = book.layout_sheet("Reportes por Tipo", max_width=None)
+		
+		ws['A1'] = "REPORTES AGRUPADOS POR TIPO"
+		ws['A1'].font = Font(size=16, bold=True)
+		ws.merge_cells('A1:C1')
+		ws['A1'].alignment = Alignment(horizontal='center')
+		
+		ws['A3'] = "Tipo de Reporte"
+		ws['B3'] = "Cantidad"
+		ws['C3'] = "Porcentaje"
+		ws['A3'].font = Font(bold=True)
+		ws['B3'].font = Font(bold=True)
+		ws['C3'].font = Font(bold=True)
+		
+		reports_by_type = (
+			Report.objects
+			.values('type__name')
+			.annotate(count=Count('id_report'))
+			.order_by('-count')
+		)
+		
+		total = sum(item['count'] for item in reports_by_type)
+		
+		for i, item in enumerate(reports_by_type, 4):
+			ws[f'A{i}'] = item['type__name'] or 'Sin tipo'
+			ws[f'B{i}'] = item['count']
+			percentage = (item['count'] / total * 100) if total > 0 else 0
+			ws[f'C{i}'] = f"{percentage:.1f}%"
+	
+	elif report_type == 'tendencia_reportes':
+		# Tendencia semanal de reportes
+		ws = book.layout_sheet("Tendencia Reportes", max_width=None)
+		
+		ws['A1'] = "TENDENCIA SEMANAL DE GENERACIÓN DE REPORTES"
+		ws['A1'].font = Font(size=16, bold=True)
+		ws.merge_cells('A1:C1')
+		ws['A1'].alignment = Alignment(horizontal='center')
+		
+		ws['A3'] = "Fecha"
+		ws['B3'] = "Cantidad de Reportes"
+		ws['C3'] = "Día de la Semana"
+		ws['A3'].font = Font(bold=True)
+		ws['B3'].font = Font(bold=True)
+		ws['C3'].font = Font(bold=True)
+		
+		# Obtener datos de los últimos 7 días
+		for i in range(6, -1, -1):
+			day = (now - timedelta(days=i)).date()
+			count = Report.objects.filter(generated_datetime__date=day).count()
+			
+			row = 4 + (6 - i)  # Empezar desde la fila 4
+			ws[f'A{row}'] = day.strftime('%d/%m/%Y')
+			ws[f'B{row}'] = count
+			ws[f'C{row}'] = day.strftime('%A')  # Nombre del día
+	
+	elif report_type == 'usuarios_reportes':
+		# Usuarios más activos en reportes
+		ws = book.layout_sheet("Usuarios Activos Reportes", max_width=None)
+		
+		ws['A1'] = "USUARIOS MÁS ACTIVOS EN GENERACIÓN DE REPORTES"
+		ws['A1'].font = Font(size=16, bold=True)
+		ws.merge_cells('A1:D1')
+		ws['A1'].alignment = Alignment(horizontal='center')
+		
+		ws['A3'] = "Posición"
+		ws['B3'] = "Usuario"
+		ws['C3'] = "Rol"
+		ws['D3'] = "Total de Reportes"
+		ws['A3'].font = Font(bold=True)
+		ws['B3'].font = Font(bold=True)
+		ws['C3'].font = Font(bold=True)
+		ws['D3'].font = Font(bold=True)
+		
+		# Obtener top 10 usuarios más activos
+		from django.db.models import Q
+		top_users = (
+			Report.objects
+			.select_related('user', 'user__role')
+			.values('user__name', 'user__role__name')
+			.annotate(count=Count('id_report'))
+			.filter(~Q(user__name__isnull=True) & ~Q(user__name=''))
+			.order_by('-count')[:10]
+		)
+		
+		for i, user_data in enumerate(top_users, 4):
+			ws[f'A{i}'] = i - 3  # Posición (1, 2, 3...)
+			ws[f'B{i}'] = user_data['user__name'] or 'Sin nombre'
+			ws[f'C{i}'] = user_data['user__role__name'] or 'Sin rol'
+			ws[f'D{i}'] = user_data['count']
+	
+	elif report_type == 'reportes_recientes':
+		# Reportes recientes
+		ws = book.layout_sheet("Reportes Recientes", max_width=50)
+		
+		ws['A1'] = "REPORTES MÁS RECIENTES"
+		ws['A1'].font = Font(size=16, bold=True)
+		ws.merge_cells('A1:F1')
+		ws['A1'].alignment = Alignment(horizontal='center')
+		
+		ws['A3'] = "ID Reporte"
+		ws['B3'] = "Usuario"
+		ws['C3'] = "Tipo"
+		ws['D3'] = "Fecha de Generación"
+		ws['E3'] = "Rol del Usuario"
+		ws['F3'] = "Datos"
+		ws['A3'].font = Font(bold=True)
+		ws['B3'].font = Font(bold=True)
+		ws['C3'].font = Font(bold=True)
+		ws['D3'].font = Font(bold=True)
+		ws['E3'].font = Font(bold=True)
+		ws['F3'].font = Font(bold=True)
+		
+		# Obtener los 50 reportes más recientes
+		recent_reports = Report.objects.select_related('user', 'type').order_by('-generated_datetime')[:50]
+		
+		for i, report in enumerate(recent_reports, 4):
+			ws[f'A{i}'] = report.id_report
+			ws[f'B{i}'] = report.user.name if report.user else 'Sin usuario'
+			ws[f'C{i}'] = report.type.name if report.type else 'Sin tipo'
+			ws[f'D{i}'] = report.generated_datetime.strftime('%d/%m/%Y %H:%M:%S') if report.generated_datetime else ''
+			ws[f'E{i}'] = report.user.role.name if report.user and report.user.role else 'Sin rol'
+			ws[f'F{i}'] = str(report.data)[:100] + '...' if len(str(report.data)) > 100 else str(report.data)
+	
+	elif report_type == 'productividad':
+		# Reporte de Productividad
+		from .report_aggregates import WorkOrderAggregates, period_work_orders
+		
+		# Determinar período
+		now = timezone.now()
+		if 'periodo' in params:
+			periodo = params.get('periodo', 'diario')
+		else:
+			periodo = 'mensual'  # Por defecto mensual
+		
+		if periodo == 'diario':
+			start_date = now.date()
+			end_date = now.date()
+			period_name = f"Diario - {start_date.strftime('%d/%m/%Y')}"
+		elif periodo == 'semanal':
+			start_date = now.date() - timedelta(days=now.weekday())  # Lunes
+			end_date = start_date + timedelta(days=6)  # Domingo
+			period_name = f"Semanal - {start_date.strftime('%d/%m/%Y')} al {end_date.strftime('%d/%m/%Y')}"
+		else:  # mensual
+			start_date = now.date().replace(day=1)
+			end_date = (now.date().replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+			period_name = f"Mensual - {start_date.strftime('%d/%m/%Y')} al {end_date.strftime('%d/%m/%Y')}"
+		
+		# Consultar datos de productividad
+		work_orders = period_work_orders(start_date, end_date)
+		
+		# Verificar si hay datos
+		if not work_orders.exists():
+			# Si no hay datos, crear una hoja con mensaje informativo
+			ws_data = book.layout_sheet("BaseOTs")
+			ws_data['A1'] = "No se encontraron órdenes de trabajo en el período seleccionado"
+			ws_data['A1'].font = Font(size=14, bold=True)
+			ws_data['A2'] = f"Período: {period_name}"
+			ws_data['A3'] = f"Fechas: {start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')}"
 			
-			# KPIs principales
+			# Crear hoja de KPIs vacía
+			ws_kpi = book.layout_sheet("KPIs")
 			ws_kpi['A1'] = "REPORTE DE PRODUCTIVIDAD"
 			ws_kpi['A1'].font = Font(size=16, bold=True)
-			ws_kpi.merge_cells('A1:E1')
+			ws_kpi.merge_cells('A1:D1')
 			ws_kpi['A1'].alignment = Alignment(horizontal='center')
-			
 			ws_kpi['A2'] = f"Período: {period_name}"
 			ws_kpi['A2'].font = Font(bold=True)
-			ws_kpi.merge_cells('A2:E2')
+			ws_kpi.merge_cells('A2:D2')
 			ws_kpi['A2'].alignment = Alignment(horizontal='center')
-			
-			# KPIs
-			ws_kpi['A4'] = "KPI"
-			ws_kpi['B4'] = "Valor"
-			ws_kpi['C4'] = "Fórmula"
-			ws_kpi['A4'].font = Font(bold=True)
-			ws_kpi['B4'].font = Font(bold=True)
-			ws_kpi['C4'].font = Font(bold=True)
-			
-			# Calcular KPIs
-			total_vehicles_attended = len(vehicles_set)
-			total_work_orders = work_orders.count()
-			
-			# Eficiencia por mecánico
-			mechanic_efficiency = {}
-			for wo in work_orders:
-				for assignment in wo.mechanic_assignments.all():
-					mechanic_name = assignment.mechanic.name
-					if mechanic_name not in mechanic_efficiency:
-						mechanic_efficiency[mechanic_name] = {'work_orders': 0, 'hours': 0}
-					mechanic_efficiency[mechanic_name]['work_orders'] += 1
-					mechanic_efficiency[mechanic_name]['hours'] += assignment.hours_worked
-			
-			# Productividad total (horas efectivas / horas programadas)
-			total_effective_hours = sum(
-				sum(float(assignment.hours_worked) for assignment in wo.mechanic_assignments.all()) - 
-				sum(pause.duration_minutes / 60 for pause in wo.pauses.all() if pause.duration_minutes)
-				for wo in work_orders
-			)
-			
-			# Horas programadas aproximadas (8 horas por día hábil en el período)
-			if periodo == 'diario':
-				programmed_hours = 8
-			elif periodo == 'semanal':
-				programmed_hours = 8 * 5  # 5 días hábiles
-			else:  # mensual
-				programmed_hours = 8 * 20  # 20 días hábiles aproximados
-			
-			productivity_ratio = (total_effective_hours / programmed_hours * 100) if programmed_hours > 0 else 0
-			
-			kpis = [
-				["Vehículos atendidos", total_vehicles_attended, ""],
-				["Total órdenes de trabajo", total_work_orders, ""],
-				["Horas hombre efectivas totales", round(total_effective_hours, 2), "Horas trabajadas - tiempo de pausas"],
-				["Productividad total (%)", f"{round(productivity_ratio, 1)}%", "(Horas efectivas totales / Horas programadas) × 100"],
-			]
-			
-			for i, (kpi, value, formula) in enumerate(kpis, 5):
-				ws_kpi.cell(row=i, column=1, value=kpi)
-				ws_kpi.cell(row=i, column=2, value=value)
-				ws_kpi.cell(row=i, column=3, value=formula)
-			
-			# Eficiencia por mecánico
-			ws_kpi['A10'] = "EFICIENCIA POR MECÁNICO"
-			ws_kpi['A10'].font = Font(bold=True)
-			ws_kpi.merge_cells('A10:C10')
-			
-			ws_kpi['A11'] = "Mecánico"
-			ws_kpi['B11'] = "Órdenes de Trabajo"
-			ws_kpi['C11'] = "Horas Totales"
-			ws_kpi['A11'].font = Font(bold=True)
-			ws_kpi['B11'].font = Font(bold=True)
-			ws_kpi['C11'].font = Font(bold=True)
-			
-			row = 12
-			for mechanic, data in mechanic_efficiency.items():
-				ws_kpi.cell(row=row, column=1, value=mechanic)
-				ws_kpi.cell(row=row, column=2, value=data['work_orders'])
-				ws_kpi.cell(row=row, column=3, value=round(data['hours'], 2))
-				row += 1
-			
-			# Ajustar ancho de columnas
-			ws_kpi.column_dimensions['A'].width = 30  # KPI
-			ws_kpi.column_dimensions['B'].width = 25  # Valor
-			ws_kpi.column_dimensions['C'].width = 50  # Fórmula
-			
-			# Autoajustar columnas KPIs
-			for column in ws_kpi.columns:
-				max_length = 0
-				column_letter = None
-				for cell in column:
-					try:
-						if hasattr(cell, 'column_letter'):
-							column_letter = cell.column_letter
-						if len(str(cell.value)) > max_length:
-							max_length = len(str(cell.value))
-					except:
-						pass
-				if column_letter:
-					ws_kpi.column_dimensions[column_letter].width = min(max_length + 2, 30)
-			
-			# Crear hoja de Gráficos
-			ws_charts = wb.create_sheet("Gráficos")
-			
-			# Preparar datos para gráficos
-			
-			# 1. Vehículos por tipo de mantención
-			service_types_data = {}
-			zones_data = {}
-			mechanics_data = {}
-			
-			for wo in work_orders:
-				# Por tipo de mantención
-				service_type = wo.service_type.name if wo.service_type else 'Sin tipo'
-				if service_type not in service_types_data:
-					service_types_data[service_type] = 0
-				service_types_data[service_type] += 1
-				
-				# Por zona
-				if wo.ingreso and wo.ingreso.patent.site:
-					zone = wo.ingreso.patent.site.name
-				else:
-					zone = 'Sin zona'
-				if zone not in zones_data:
-					zones_data[zone] = 0
-				zones_data[zone] += 1
-				
-				# Por mecánico
-				for assignment in wo.mechanic_assignments.all():
-					mechanic_name = assignment.mechanic.name
-					if mechanic_name not in mechanics_data:
-						mechanics_data[mechanic_name] = {'work_orders': 0, 'hours': 0}
-					mechanics_data[mechanic_name]['work_orders'] += 1
-					mechanics_data[mechanic_name]['hours'] += assignment.hours_worked
-			
-			# Crear datos para gráfico de tipos de mantención
-			ws_charts['A1'] = 'Vehículos por Tipo de Mantención'
+			ws_kpi['A4'] = "No hay datos disponibles para el período seleccionado"
+			return
+		
+		# Crear hoja de datos
+		ws_data = book.data_sheet("BaseOTs", max_width=30)
+		
+		# Encabezados
+		headers = [
+			'Patente', 'Modelo', 'Marca', 'Mecánico Asignado', 'Tipo Mantención', 
+			'Fecha/Hora Ingreso', 'Fecha/Hora Salida', 'Duración Total (horas)', 
+			'Horas Hombre Efectivas', 'Zona', 'Estado OT', 'Horas Pausas'
+		]
+		ws_data.append(headers, font=Font(bold=True))
+		
+		# Datos: los totales por mecánico, tipo y zona salen de consultas agrupadas;
+		# las horas en pausa de cada OT se acumulan al recorrer las filas
+		aggregates = WorkOrderAggregates(work_orders)
+		
+		for wo in aggregates.rows():
+			if wo['ingreso_id']:
+				patent = wo['ingreso__patent_id']
+				modelo = wo['ingreso__patent__model']
+				marca = wo['ingreso__patent__brand']
+				fecha_ingreso = wo['ingreso__entry_datetime']
+				fecha_salida = wo['ingreso__exit_datetime']
+				zona = wo['ingreso__patent__site__name'] or 'Sin zona'
+			else:
+				patent = 'Sin patente'
+				modelo = 'Sin modelo'
+				marca = 'Sin marca'
+				fecha_ingreso = wo['created_datetime']
+				fecha_salida = wo['actual_completion']
+				zona = 'Sin zona'
+			
+			# Mecánicos asignados
+			mecanicos = [assignment['mechanic__name'] for assignment in wo['assignments']]
+			mecanico_str = ', '.join(mecanicos) if mecanicos else 'Sin asignar'
+			
+			# Tipo de mantención
+			tipo_mantencion = wo['service_type__name'] or 'Sin tipo'
+			
+			# Calcular duración total
+			if fecha_ingreso and fecha_salida:
+				duracion_total = (fecha_salida - fecha_ingreso).total_seconds() / 3600
+			else:
+				duracion_total = 0
+			
+			# Horas hombre efectivas: horas de los mecánicos menos las pausas fusionadas
+			total_pauses_hours = wo['pause_hours']
+			horas_efectivas = max(0, wo['mechanic_hours'] - total_pauses_hours)
+			
+			# Estado de la OT
+			estado_ot = wo['status__name'] or 'Sin estado'
+			
+			# Escribir fila
+			ws_data.append([
+				patent,
+				modelo,
+				marca,
+				mecanico_str,
+				tipo_mantencion,
+				fecha_ingreso.strftime('%d/%m/%Y %H:%M') if fecha_ingreso else '',
+				fecha_salida.strftime('%d/%m/%Y %H:%M') if fecha_salida else '',
+				round(duracion_total, 2) if duracion_total > 0 else 0,
+				round(horas_efectivas, 2),
+				zona,
+				estado_ot,
+				round(total_pauses_hours, 2),
+			])
+		ws_data.close()
+		total_effective_hours = aggregates.effective_hours
+		
+		# Crear hoja de KPIs
+		ws_kpi = book.layout_sheet("KPIs")
+		
+		# KPIs principales
+		ws_kpi['A1'] = "REPORTE DE PRODUCTIVIDAD"
+		ws_kpi['A1'].font = Font(size=16, bold=True)
+		ws_kpi.merge_cells('A1:E1')
+		ws_kpi['A1'].alignment = Alignment(horizontal='center')
+		
+		ws_kpi['A2'] = f"Período: {period_name}"
+		ws_kpi['A2'].font = Font(bold=True)
+		ws_kpi.merge_cells('A2:E2')
+		ws_kpi['A2'].alignment = Alignment(horizontal='center')
+		
+		# KPIs
+		ws_kpi['A4'] = "KPI"
+		ws_kpi['B4'] = "Valor"
+		ws_kpi['C4'] = "Fórmula"
+		ws_kpi['A4'].font = Font(bold=True)
+		ws_kpi['B4'].font = Font(bold=True)
+		ws_kpi['C4'].font = Font(bold=True)
+		
+		# Calcular KPIs
+		total_vehicles_attended = aggregates.vehicles_attended
+		total_work_orders = aggregates.total_work_orders
+		
+		# Horas programadas aproximadas (8 horas por día hábil en el período)
+		if periodo == 'diario':
+			programmed_hours = 8
+		elif periodo == 'semanal':
+			programmed_hours = 8 * 5  # 5 días hábiles
+		else:  # mensual
+			programmed_hours = 8 * 20  # 20 días hábiles aproximados
+		
+		productivity_ratio = (total_effective_hours / programmed_hours * 100) if programmed_hours > 0 else 0
+		
+		kpis = [
+			["Vehículos atendidos", total_vehicles_attended, ""],
+			["Total órdenes de trabajo", total_work_orders, ""],
+			["Horas hombre efectivas totales", round(total_effective_hours, 2), "Horas trabajadas - tiempo de pausas"],
+			["Productividad total (%)", f"{round(productivity_ratio, 1)}%", "(Horas efectivas totales / Horas programadas) × 100"],
+		]
+		
+		for i, (kpi, value, formula) in enumerate(kpis, 5):
+			ws_kpi.cell(row=i, column=1, value=kpi)
+			ws_kpi.cell(row=i, column=2, value=value)
+			ws_kpi.cell(row=i, column=3, value=formula)
+		
+		# Eficiencia por mecánico
+		ws_kpi['A10'] = "EFICIENCIA POR MECÁNICO"
+		ws_kpi['A10'].font = Font(bold=True)
+		ws_kpi.merge_cells('A10:C10')
+		
+		ws_kpi['A11'] = "Mecánico"
+		ws_kpi['B11'] = "Órdenes de Trabajo"
+		ws_kpi['C11'] = "Horas Totales"
+		ws_kpi['A11'].font = Font(bold=True)
+		ws_kpi['B11'].font = Font(bold=True)
+		ws_kpi['C11'].font = Font(bold=True)
+		
+		row = 12
+		for mechanic, data in aggregates.mechanics.items():
+			ws_kpi.cell(row=row, column=1, value=mechanic)
+			ws_kpi.cell(row=row, column=2, value=data['work_orders'])
+			ws_kpi.cell(row=row, column=3, value=round(data['hours'], 2))
+			row += 1
+		
+		# Crear hoja de Gráficos
+		ws_charts = book.layout_sheet("Gráficos", max_width=25)
+		
+		# Datos para gráficos (de los mismos agregados)
+		mechanics_data = aggregates.mechanics
+		service_types_data = aggregates.service_types
+		zones_data = aggregates.zones
+		
+		# Crear datos para gráfico de tipos de mantención
+		ws_charts['A1'] = 'Vehículos por Tipo de Mantención'
+		ws_charts['A1'].font = Font(size=14, bold=True)
+		ws_charts['A2'] = 'Tipo de Mantención'
+		ws_charts['B2'] = 'Cantidad'
+		ws_charts['A2'].font = Font(bold=True)
+		ws_charts['B2'].font = Font(bold=True)
+		
+		row = 3
+		for service_type, count in sorted(service_types_data.items(), key=lambda x: x[1], reverse=True):
+			ws_charts.cell(row=row, column=1, value=service_type)
+			ws_charts.cell(row=row, column=2, value=count)
+			row += 1
+		
+		# Crear gráfico de barras para tipos de mantención
+		chart1 = BarChart()
+		chart1.type = "col"
+		chart1.style = 10
+		chart1.title = "Vehículos por Tipo de Mantención"
+		chart1.y_axis.title = 'Cantidad de Vehículos'
+		chart1.x_axis.title = 'Tipo de Mantención'
+		
+		data1 = Reference(ws_charts, min_col=2, min_row=2, max_row=row-1)
+		cats1 = Reference(ws_charts, min_col=1, min_row=3, max_row=row-1)
+		chart1.add_data(data1, titles_from_data=True)
+		chart1.set_categories(cats1)
+		
+		ws_charts.add_chart(chart1, "D2")
+		
+		# Crear datos para gráfico de zonas
+		ws_charts.cell(row=1, column=5, value='Vehículos por Zona')
+		ws_charts.cell(row=1, column=5).font = Font(size=14, bold=True)
+		ws_charts.cell(row=2, column=5, value='Zona')
+		ws_charts.cell(row=2, column=6, value='Cantidad')
+		ws_charts.cell(row=2, column=5).font = Font(bold=True)
+		ws_charts.cell(row=2, column=6).font = Font(bold=True)
+		
+		row_zones = 3
+		for zone, count in sorted(zones_data.items(), key=lambda x: x[1], reverse=True):
+			ws_charts.cell(row=row_zones, column=5, value=zone)
+			ws_charts.cell(row=row_zones, column=6, value=count)
+			row_zones += 1
+		
+		# Crear gráfico de barras para zonas
+		chart2 = BarChart()
+		chart2.type = "col"
+		chart2.style = 10
+		chart2.title = "Vehículos por Zona"
+		chart2.y_axis.title = 'Cantidad de Vehículos'
+		chart2.x_axis.title = 'Zona'
+		
+		data2 = Reference(ws_charts, min_col=6, min_row=2, max_row=row_zones-1)
+		cats2 = Reference(ws_charts, min_col=5, min_row=3, max_row=row_zones-1)
+		chart2.add_data(data2, titles_from_data=True)
+		chart2.set_categories(cats2)
+		
+		ws_charts.add_chart(chart2, "H2")
+		
+		# Crear datos para gráfico de mecánicos (órdenes de trabajo)
+		ws_charts.cell(row=15, column=1, value='Órdenes de Trabajo por Mecánico')
+		ws_charts.cell(row=15, column=1).font = Font(size=14, bold=True)
+		ws_charts.cell(row=16, column=1, value='Mecánico')
+		ws_charts.cell(row=16, column=2, value='Órdenes de Trabajo')
+		ws_charts.cell(row=16, column=1).font = Font(bold=True)
+		ws_charts.cell(row=16, column=2).font = Font(bold=True)
+		
+		row_mechanics = 17
+		for mechanic, data in sorted(mechanics_data.items(), key=lambda x: x[1]['work_orders'], reverse=True):
+			ws_charts.cell(row=row_mechanics, column=1, value=mechanic)
+			ws_charts.cell(row=row_mechanics, column=2, value=data['work_orders'])
+			row_mechanics += 1
+		
+		# Crear gráfico de barras para mecánicos
+		chart3 = BarChart()
+		chart3.type = "col"
+		chart3.style = 10
+		chart3.title = "Órdenes de Trabajo por Mecánico"
+		chart3.y_axis.title = 'Cantidad de Órdenes'
+		chart3.x_axis.title = 'Mecánico'
+		
+		data3 = Reference(ws_charts, min_col=2, min_row=16, max_row=row_mechanics-1)
+		cats3 = Reference(ws_charts, min_col=1, min_row=17, max_row=row_mechanics-1)
+		chart3.add_data(data3, titles_from_data=True)
+		chart3.set_categories(cats3)
+		
+		ws_charts.add_chart(chart3, "D17")
+	
+	elif report_type == 'tiempos_horas_hombre':
+		# Reporte de Tiempos y Horas Hombre
+		from .report_aggregates import WorkOrderAggregates, period_work_orders
+		
+		# Determinar filtros
+		now = timezone.now()
+		periodo = params.get('periodo', 'mensual')
+		
+		# Determinar rango de fechas
+		if periodo == 'semanal':
+			start_date = now.date() - timedelta(days=now.weekday())  # Lunes
+			end_date = start_date + timedelta(days=6)  # Domingo
+			period_name = f"Semanal - {start_date.strftime('%d/%m/%Y')} al {end_date.strftime('%d/%m/%Y')}"
+		else:  # mensual
+			start_date = now.date().replace(day=1)
+			end_date = (now.date().replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+			period_name = f"Mensual - {start_date.strftime('%d/%m/%Y')} al {end_date.strftime('%d/%m/%Y')}"
+		
+		# Consultar datos base: totales agrupados una sola vez para todas las hojas
+		aggregates = WorkOrderAggregates(period_work_orders(start_date, end_date))
+		
+		# Crear hoja de datos detallados
+		ws_data = book.data_sheet("TiemposHoras")
+		
+		# Encabezados
+		headers = [
+			'Patente', 'Mecánico', 'Tipo Evento', 'Motivo Pausa', 'Duración Pausa (min)', 
+			'Tiempo Total Trabajo (horas)', 'Horas Hombre Efectivas', 'Zona', 'Tipo Mantención',
+			'Fecha Evento', 'Estado OT', 'Impacto en Tiempos'
+		]
+		
+		ws_data.append(headers, font=Font(bold=True))
+		
+		# Colores condicionales (rojo si >20% pausas), aplicados al escribir cada fila
+		red_fill = PatternFill(start_color="FFFF0000", end_color="FFFF0000", fill_type="solid")
+		
+		def append_time_row(values):
+			pause_minutes = values[4] or 0
+			work_hours = values[5] or 0
+			high_pauses = work_hours > 0 and (pause_minutes / 60) > (work_hours * 0.2)
+			ws_data.append(values, fill=red_fill if high_pauses else None)
+		
+		# Datos detallados: los minutos en pausa por mecánico se acumulan al recorrer
+		# las filas (cada mecánico queda detenido por sus pausas personales y por las
+		# globales de la OT; la línea de tiempo las fusiona sin contar solapamientos)
+		for wo in aggregates.rows(pause_details=True):
+			patent = wo['ingreso__patent_id'] if wo['ingreso_id'] else 'Sin patente'
+			zona = wo['ingreso__patent__site__name'] or 'Sin zona'
+			tipo_mantencion = wo['service_type__name'] or 'Sin tipo'
+			estado_ot = wo['status__name'] or 'Sin estado'
+			fecha_evento = wo['created_datetime'].date() if wo['created_datetime'] else None
+			
+			# Calcular tiempo total de trabajo
+			if wo['work_started_at'] and wo['actual_completion']:
+				tiempo_total_trabajo = (wo['actual_completion'] - wo['work_started_at']).total_seconds() / 3600
+			else:
+				tiempo_total_trabajo = 0
+			
+			# Determinar impacto en tiempos
+			impacto = "Normal"
+			if wo['pause_hours'] > tiempo_total_trabajo * 0.2:  # Más del 20% en pausas
+				impacto = "Extendido - Altas Pausas"
+			elif wo['actual_completion'] and wo['estimated_completion'] and wo['actual_completion'] > wo['estimated_completion']:
+				impacto = "Extendido - Fallas Adicionales"
+			
+			# Agregar fila para la OT principal
+			if wo['assignments']:
+				for assignment in wo['assignments']:
+					append_time_row([
+						patent,
+						assignment['mechanic__name'],
+						'Mantención',
+						'Trabajo programado',
+						0,
+						round(tiempo_total_trabajo, 2),
+						round(assignment['hours_worked'], 2),
+						zona,
+						tipo_mantencion,
+						fecha_evento.strftime('%d/%m/%Y') if fecha_evento else '',
+						estado_ot,
+						impacto,
+					])
+			else:
+				# OT sin mecánicos asignados
+				append_time_row([
+					patent,
+					'Sin asignar',
+					'Mantención',
+					'Trabajo programado',
+					0,
+					round(tiempo_total_trabajo, 2),
+					0,
+					zona,
+					tipo_mantencion,
+					fecha_evento.strftime('%d/%m/%Y') if fecha_evento else '',
+					estado_ot,
+					impacto,
+				])
+			
+			# Agregar filas para cada pausa
+			for pause in wo['pauses']:
+				pause_type_name = pause.pause_type.name if pause.pause_type else 'Sin tipo'
+				duration_minutes = pause.duration_minutes or 0
+				
+				append_time_row([
+					patent,
+					pause.mechanic_assignment.mechanic.name if pause.mechanic_assignment else 'Sin asignar',
+					'Pausa',
+					pause_type_name,
+					duration_minutes,
+					0,
+					0,
+					zona,
+					tipo_mantencion,
+					pause.start_datetime.date().strftime('%d/%m/%Y') if pause.start_datetime else '',
+					estado_ot,
+					'Pausa',
+				])
+		ws_data.close()
+		
+		total_effective_hours = aggregates.effective_hours
+		total_pause_time = aggregates.pause_minutes
+		pause_types_count = aggregates.pause_type_minutes
+		mechanic_stats = {
+			mechanic: {'work_hours': data['hours'], 'pause_minutes': aggregates.mechanic_pause_minutes.get(mechanic, 0)}
+			for mechanic, data in aggregates.mechanics.items()
+		}
+		
+		# Crear hoja de análisis y KPIs
+		ws_analysis = book.layout_sheet("Análisis")
+		
+		ws_analysis['A1'] = "REPORTE DE TIEMPOS Y HORAS HOMBRE"
+		ws_analysis['A1'].font = Font(size=16, bold=True)
+		ws_analysis.merge_cells('A1:E1')
+		ws_analysis['A1'].alignment = Alignment(horizontal='center')
+		
+		ws_analysis['A2'] = f"Período: {period_name}"
+		ws_analysis['A2'].font = Font(bold=True)
+		ws_analysis.merge_cells('A2:E2')
+		ws_analysis['A2'].alignment = Alignment(horizontal='center')
+		
+		# KPIs principales
+		ws_analysis['A4'] = "KPI"
+		ws_analysis['B4'] = "Valor"
+		ws_analysis['A4'].font = Font(bold=True)
+		ws_analysis['B4'].font = Font(bold=True)
+		
+		# Calcular KPIs
+		pause_percentage = (float(total_pause_time) / 60 / max(float(total_effective_hours), 1)) * 100 if total_effective_hours > 0 else 0
+		
+		# Tiempos promedio por tipo de mantención
+		avg_times_display = [
+			f"{service_type}: {avg_time:.1f}h"
+			for service_type, avg_time in aggregates.average_hours_by_type.items()
+		]
+		
+		kpis = [
+			["Horas hombre totales", round(total_effective_hours, 2)],
+			["Total tiempo en pausas (minutos)", total_pause_time],
+			["Porcentaje de pausas", f"{round(pause_percentage, 1)}%"],
+			["Tiempos promedio por tipo", " | ".join(avg_times_display[:3])],  # Limitar a 3 tipos
+		]
+		
+		for i, (kpi, value) in enumerate(kpis, 5):
+			ws_analysis.cell(row=i, column=1, value=kpi)
+			ws_analysis.cell(row=i, column=2, value=value)
+		
+		# Análisis por mecánico
+		ws_analysis['A12'] = "ANÁLISIS POR MECÁNICO"
+		ws_analysis['A12'].font = Font(bold=True)
+		ws_analysis.merge_cells('A12:D12')
+		
+		ws_analysis['A13'] = "Mecánico"
+		ws_analysis['B13'] = "Horas Trabajadas"
+		ws_analysis['C13'] = "Tiempo en Pausas (min)"
+		ws_analysis['D13'] = "% Pausas"
+		ws_analysis['A13'].font = Font(bold=True)
+		ws_analysis['B13'].font = Font(bold=True)
+		ws_analysis['C13'].font = Font(bold=True)
+		ws_analysis['D13'].font = Font(bold=True)
+		
+		row = 14
+		for mechanic, stats in sorted(mechanic_stats.items(), key=lambda x: x[1]['work_hours'], reverse=True):
+			pause_pct = (float(stats['pause_minutes']) / 60 / max(float(stats['work_hours']), 0.1)) * 100 if stats['work_hours'] > 0 else 0
+			ws_analysis.cell(row=row, column=1, value=mechanic)
+			ws_analysis.cell(row=row, column=2, value=round(stats['work_hours'], 2))
+			ws_analysis.cell(row=row, column=3, value=stats['pause_minutes'])
+			ws_analysis.cell(row=row, column=4, value=f"{round(pause_pct, 1)}%")
+			
+			# Colorear en rojo si >20% pausas
+			if pause_pct > 20:
+				for c in range(1, 5):
+					ws_analysis.cell(row=row, column=c).fill = red_fill
+			
+			row += 1
+		
+		# Crear hoja de gráficos
+		ws_charts = book.layout_sheet("Gráficos", max_width=25)
+		
+		# Preparar datos para gráficos
+		mechanic_work_hours = {}
+		mechanic_pause_minutes = {}
+		mechanic_efficiency = {}
+		
+		for mechanic, stats in mechanic_stats.items():
+			mechanic_work_hours[mechanic] = stats['work_hours']
+			mechanic_pause_minutes[mechanic] = stats['pause_minutes']
+			pause_pct = (float(stats['pause_minutes']) / 60 / max(float(stats['work_hours']), 0.1)) * 100 if stats['work_hours'] > 0 else 0
+			mechanic_efficiency[mechanic] = pause_pct
+		
+		# 1. Gráfico de pastel para distribución de pausas
+		if pause_types_count:
+			ws_charts['A1'] = 'Distribución de Tipos de Pausa'
 			ws_charts['A1'].font = Font(size=14, bold=True)
-			ws_charts['A2'] = 'Tipo de Mantención'
-			ws_charts['B2'] = 'Cantidad'
+			ws_charts['A2'] = 'Tipo de Pausa'
+			ws_charts['B2'] = 'Minutos Totales'
 			ws_charts['A2'].font = Font(bold=True)
 			ws_charts['B2'].font = Font(bold=True)
 			
 			row = 3
-			for service_type, count in sorted(service_types_data.items(), key=lambda x: x[1], reverse=True):
-				ws_charts.cell(row=row, column=1, value=service_type)
-				ws_charts.cell(row=row, column=2, value=count)
+			for pause_type, minutes in sorted(pause_types_count.items(), key=lambda x: x[1], reverse=True):
+				ws_charts.cell(row=row, column=1, value=pause_type)
+				ws_charts.cell(row=row, column=2, value=minutes)
 				row += 1
 			
-			# Crear gráfico de barras para tipos de mantención
-			chart1 = BarChart()
-			chart1.type = "col"
-			chart1.style = 10
-			chart1.title = "Vehículos por Tipo de Mantención"
-			chart1.y_axis.title = 'Cantidad de Vehículos'
-			chart1.x_axis.title = 'Tipo de Mantención'
+			# Crear gráfico de pastel
+			from openpyxl.chart import PieChart
+			pie_chart = PieChart()
+			pie_chart.title = "Distribución de Pausas por Tipo"
+			pie_chart.style = 10
 			
-			data1 = Reference(ws_charts, min_col=2, min_row=2, max_row=row-1)
-			cats1 = Reference(ws_charts, min_col=1, min_row=3, max_row=row-1)
-			chart1.add_data(data1, titles_from_data=True)
-			chart1.set_categories(cats1)
+			data = Reference(ws_charts, min_col=2, min_row=2, max_row=row-1)
+			cats = Reference(ws_charts, min_col=1, min_row=3, max_row=row-1)
+			pie_chart.add_data(data, titles_from_data=True)
+			pie_chart.set_categories(cats)
 			
-			ws_charts.add_chart(chart1, "D2")
-			
-			# Crear datos para gráfico de zonas
-			ws_charts.cell(row=1, column=5, value='Vehículos por Zona')
+			ws_charts.add_chart(pie_chart, "D2")
+		
+		# 2. Gráfico de barras para horas trabajadas por mecánico
+		if mechanic_work_hours:
+			ws_charts.cell(row=1, column=5, value='Horas Trabajadas por Mecánico')
 			ws_charts.cell(row=1, column=5).font = Font(size=14, bold=True)
-			ws_charts.cell(row=2, column=5, value='Zona')
-			ws_charts.cell(row=2, column=6, value='Cantidad')
+			ws_charts.cell(row=2, column=5, value='Mecánico')
+			ws_charts.cell(row=2, column=6, value='Horas')
 			ws_charts.cell(row=2, column=5).font = Font(bold=True)
 			ws_charts.cell(row=2, column=6).font = Font(bold=True)
 			
-			row_zones = 3
-			for zone, count in sorted(zones_data.items(), key=lambda x: x[1], reverse=True):
-				ws_charts.cell(row=row_zones, column=5, value=zone)
-				ws_charts.cell(row=row_zones, column=6, value=count)
-				row_zones += 1
-			
-			# Crear gráfico de barras para zonas
-			chart2 = BarChart()
-			chart2.type = "col"
-			chart2.style = 10
-			chart2.title = "Vehículos por Zona"
-			chart2.y_axis.title = 'Cantidad de Vehículos'
-			chart2.x_axis.title = 'Zona'
-			
-			data2 = Reference(ws_charts, min_col=6, min_row=2, max_row=row_zones-1)
-			cats2 = Reference(ws_charts, min_col=5, min_row=3, max_row=row_zones-1)
-			chart2.add_data(data2, titles_from_data=True)
-			chart2.set_categories(cats2)
+			row_hours = 3
+			for mechanic, hours in sorted(mechanic_work_hours.items(), key=lambda x: x[1], reverse=True):
+				ws_charts.cell(row=row_hours, column=5, value=mechanic)
+				ws_charts.cell(row=row_hours, column=6, value=hours)
+				row_hours += 1
 			
-			ws_charts.add_chart(chart2, "H2")
-			
-			# Crear datos para gráfico de mecánicos (órdenes de trabajo)
-			ws_charts.cell(row=15, column=1, value='Órdenes de Trabajo por Mecánico')
+			# Crear gráfico de barras
+			from openpyxl.chart import BarChart
+			bar_chart1 = BarChart()
+			bar_chart1.type = "col"
+			bar_chart1.style = 10
+			bar_chart1.title = "Horas Trabajadas por Mecánico"
+			bar_chart1.y_axis.title = 'Horas'
+			bar_chart1.x_axis.title = 'Mecánico'
+			
+			data1 = Reference(ws_charts, min_col=6, min_row=2, max_row=row_hours-1)
+			cats1 = Reference(ws_charts, min_col=5, min_row=3, max_row=row_hours-1)
+			bar_chart1.add_data(data1, titles_from_data=True)
+			bar_chart1.set_categories(cats1)
+			
+			ws_charts.add_chart(bar_chart1, "H2")
+		
+		# 3. Gráfico de barras para tiempo en pausas por mecánico
+		if mechanic_pause_minutes:
+			ws_charts.cell(row=15, column=1, value='Tiempo en Pausas por Mecánico')
 			ws_charts.cell(row=15, column=1).font = Font(size=14, bold=True)
 			ws_charts.cell(row=16, column=1, value='Mecánico')
-			ws_charts.cell(row=16, column=2, value='Órdenes de Trabajo')
+			ws_charts.cell(row=16, column=2, value='Minutos en Pausas')
 			ws_charts.cell(row=16, column=1).font = Font(bold=True)
 			ws_charts.cell(row=16, column=2).font = Font(bold=True)
 			
-			row_mechanics = 17
-			for mechanic, data in sorted(mechanics_data.items(), key=lambda x: x[1]['work_orders'], reverse=True):
-				ws_charts.cell(row=row_mechanics, column=1, value=mechanic)
-				ws_charts.cell(row=row_mechanics, column=2, value=data['work_orders'])
-				row_mechanics += 1
-			
-			# Crear gráfico de barras para mecánicos
-			chart3 = BarChart()
-			chart3.type = "col"
-			chart3.style = 10
-			chart3.title = "Órdenes de Trabajo por Mecánico"
-			chart3.y_axis.title = 'Cantidad de Órdenes'
-			chart3.x_axis.title = 'Mecánico'
-			
-			data3 = Reference(ws_charts, min_col=2, min_row=16, max_row=row_mechanics-1)
-			cats3 = Reference(ws_charts, min_col=1, min_row=17, max_row=row_mechanics-1)
-			chart3.add_data(data3, titles_from_data=True)
-			chart3.set_categories(cats3)
-			
-			ws_charts.add_chart(chart3, "D17")
-			
-			# Autoajustar columnas en hoja de gráficos
-			for column in ws_charts.columns:
-				max_length = 0
-				column_letter = None
-				for cell in column:
-					try:
-						if hasattr(cell, 'column_letter'):
-							column_letter = cell.column_letter
-						if len(str(cell.value)) > max_length:
-							max_length = len(str(cell.value))
-					except:
-						pass
-				if column_letter:
-					ws_charts.column_dimensions[column_letter].width = min(max_length + 2, 25)
-		
-		elif report_type == 'tiempos_horas_hombre':
-			# Reporte de Tiempos y Horas Hombre
-			from documents.models import WorkOrder, WorkOrderMechanic, Ingreso, Vehicle, ServiceType, Site
-			from pausas.models import WorkOrderPause, PauseType
-			from django.db.models import Sum, Count, F, Q, Case, When, Value, DecimalField, Avg
-			from django.db.models.functions import Coalesce
-			
-			# Determinar filtros
-			now = timezone.now()
-			periodo = request.GET.get('periodo', 'mensual')
+			row_pauses = 17
+			for mechanic, minutes in sorted(mechanic_pause_minutes.items(), key=lambda x: x[1], reverse=True):
+				ws_charts.cell(row=row_pauses, column=1, value=mechanic)
+				ws_charts.cell(row=row_pauses, column=2, value=minutes)
+				row_pauses += 1
 			
-			# Determinar rango de fechas
-			if periodo == 'semanal':
-				start_date = now.date() - timedelta(days=now.weekday())  # Lunes
-				end_date = start_date + timedelta(days=6)  # Domingo
-				period_name = f"Semanal - {start_date.strftime('%d/%m/%Y')} al {end_date.strftime('%d/%m/%Y')}"
-			else:  # mensual
-				start_date = now.date().replace(day=1)
-				end_date = (now.date().replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
-				period_name = f"Mensual - {start_date.strftime('%d/%m/%Y')} al {end_date.strftime('%d/%m/%Y')}"
-			
-			# Consultar datos base
-			base_query = WorkOrder.objects.filter(
-				Q(created_datetime__date__gte=start_date) & Q(created_datetime__date__lte=end_date) |
-				Q(work_started_at__date__gte=start_date) & Q(work_started_at__date__lte=end_date) |
-				Q(actual_completion__date__gte=start_date) & Q(actual_completion__date__lte=end_date)
-			).select_related(
-				'ingreso__patent', 'service_type', 'status'
-			).prefetch_related(
-				'mechanic_assignments__mechanic',
-				'pauses__pause_type'
-			)
-			
-			work_orders = base_query
-			
-			# Crear hoja de datos detallados
-			ws_data = wb.active
-			ws_data.title = "TiemposHoras"
-			
-			# Encabezados
-			headers = [
-				'Patente', 'Mecánico', 'Tipo Evento', 'Motivo Pausa', 'Duración Pausa (min)', 
-				'Tiempo Total Trabajo (horas)', 'Horas Hombre Efectivas', 'Zona', 'Tipo Mantención',
-				'Fecha Evento', 'Estado OT', 'Impacto en Tiempos'
-			]
-			
-			for col, header in enumerate(headers, 1):
-				ws_data.cell(row=1, column=col, value=header)
-				ws_data.cell(row=1, column=col).font = Font(bold=True)
-			
-			# Datos detallados
-			row = 2
-			total_pause_time = 0
-			total_work_time = 0
-			pause_types_count = {}
+			# Crear gráfico de barras
+			bar_chart2 = BarChart()
+			bar_chart2.type = "col"
+			bar_chart2.style = 10
+			bar_chart2.title = "Tiempo en Pausas por Mecánico"
+			bar_chart2.y_axis.title = 'Minutos'
+			bar_chart2.x_axis.title = 'Mecánico'
+			
+			data2 = Reference(ws_charts, min_col=2, min_row=16, max_row=row_pauses-1)
+			cats2 = Reference(ws_charts, min_col=1, min_row=17, max_row=row_pauses-1)
+			bar_chart2.add_data(data2, titles_from_data=True)
+			bar_chart2.set_categories(cats2)
+			
+			ws_charts.add_chart(bar_chart2, "D15")
+		
+		# 4. Gráfico de barras para eficiencia (% pausas) por mecánico
+		if mechanic_efficiency:
+			ws_charts.cell(row=15, column=5, value='Eficiencia por Mecánico (% Pausas)')
+			ws_charts.cell(row=15, column=5).font = Font(size=14, bold=True)
+			ws_charts.cell(row=16, column=5, value='Mecánico')
+			ws_charts.cell(row=16, column=6, value='% Pausas')
+			ws_charts.cell(row=16, column=5).font = Font(bold=True)
+			ws_charts.cell(row=16, column=6).font = Font(bold=True)
+			
+			row_eff = 17
+			for mechanic, pct in sorted(mechanic_efficiency.items(), key=lambda x: x[1], reverse=True):
+				ws_charts.cell(row=row_eff, column=5, value=mechanic)
+				ws_charts.cell(row=row_eff, column=6, value=round(pct, 1))
+				row_eff += 1
 			
-			for wo in work_orders:
-				patent = wo.ingreso.patent.patent if wo.ingreso else 'Sin patente'
-				zona = wo.ingreso.patent.site.name if wo.ingreso and wo.ingreso.patent.site else 'Sin zona'
-				tipo_mantencion = wo.service_type.name if wo.service_type else 'Sin tipo'
-				estado_ot = wo.status.name if wo.status else 'Sin estado'
-				fecha_evento = wo.created_datetime.date() if wo.created_datetime else None
-				
-				# Calcular tiempo total de trabajo
-				if wo.work_started_at and wo.actual_completion:
-					tiempo_total_trabajo = (wo.actual_completion - wo.work_started_at).total_seconds() / 3600
-				else:
-					tiempo_total_trabajo = 0
-				
-				# Calcular horas hombre efectivas
-				total_pauses_hours = sum(
-					pause.duration_minutes / 60 for pause in wo.pauses.all() 
-					if pause.duration_minutes
-				)
-				total_mechanic_hours = sum(
-					float(assignment.hours_worked) for assignment in wo.mechanic_assignments.all()
-				)
-				horas_efectivas = max(0, total_mechanic_hours - total_pauses_hours)
-				
-				# Determinar impacto en tiempos
-				impacto = "Normal"
-				if total_pauses_hours > tiempo_total_trabajo * 0.2:  # Más del 20% en pausas
-					impacto = "Extendido - Altas Pausas"
-				elif wo.actual_completion and wo.estimated_completion and wo.actual_completion > wo.estimated_completion:
-					impacto = "Extendido - Fallas Adicionales"
-				
-				# Agregar fila para la OT principal
-				if wo.mechanic_assignments.exists():
-					for assignment in wo.mechanic_assignments.all():
-						ws_data.cell(row=row, column=1, value=patent)
-						ws_data.cell(row=row, column=2, value=assignment.mechanic.name)
-						ws_data.cell(row=row, column=3, value='Mantención')
-						ws_data.cell(row=row, column=4, value='Trabajo programado')
-						ws_data.cell(row=row, column=5, value=0)
-						ws_data.cell(row=row, column=6, value=round(tiempo_total_trabajo, 2))
-						ws_data.cell(row=row, column=7, value=round(assignment.hours_worked, 2))
-						ws_data.cell(row=row, column=8, value=zona)
-						ws_data.cell(row=row, column=9, value=tipo_mantencion)
-						ws_data.cell(row=row, column=10, value=fecha_evento.strftime('%d/%m/%Y') if fecha_evento else '')
-						ws_data.cell(row=row, column=11, value=estado_ot)
-						ws_data.cell(row=row, column=12, value=impacto)
-						row += 1
-						
-						total_work_time += assignment.hours_worked
-				else:
-					# OT sin mecánicos asignados
-					ws_data.cell(row=row, column=1, value=patent)
-					ws_data.cell(row=row, column=2, value='Sin asignar')
-					ws_data.cell(row=row, column=3, value='Mantención')
-					ws_data.cell(row=row, column=4, value='Trabajo programado')
-					ws_data.cell(row=row, column=5, value=0)
-					ws_data.cell(row=row, column=6, value=round(tiempo_total_trabajo, 2))
-					ws_data.cell(row=row, column=7, value=0)
-					ws_data.cell(row=row, column=8, value=zona)
-					ws_data.cell(row=row, column=9, value=tipo_mantencion)
-					ws_data.cell(row=row, column=10, value=fecha_evento.strftime('%d/%m/%Y') if fecha_evento else '')
-					ws_data.cell(row=row, column=11, value=estado_ot)
-					ws_data.cell(row=row, column=12, value=impacto)
-					row += 1
-				
-				# Agregar filas para cada pausa
-				for pause in wo.pauses.all():
-					pause_type_name = pause.pause_type.name if pause.pause_type else 'Sin tipo'
-					duration_minutes = pause.duration_minutes or 0
-					
-					# Contar tipos de pausa para gráfico
-					if pause_type_name not in pause_types_count:
-						pause_types_count[pause_type_name] = 0
-					pause_types_count[pause_type_name] += duration_minutes
-					
-					total_pause_time += duration_minutes
-					
-					ws_data.cell(row=row, column=1, value=patent)
-					ws_data.cell(row=row, column=2, value=pause.mechanic_assignment.mechanic.name if pause.mechanic_assignment else 'Sin asignar')
-					ws_data.cell(row=row, column=3, value='Pausa')
-					ws_data.cell(row=row, column=4, value=pause_type_name)
-					ws_data.cell(row=row, column=5, value=duration_minutes)
-					ws_data.cell(row=row, column=6, value=0)
-					ws_data.cell(row=row, column=7, value=0)
-					ws_data.cell(row=row, column=8, value=zona)
-					ws_data.cell(row=row, column=9, value=tipo_mantencion)
-					ws_data.cell(row=row, column=10, value=pause.start_datetime.date().strftime('%d/%m/%Y') if pause.start_datetime else '')
-					ws_data.cell(row=row, column=11, value=estado_ot)
-					ws_data.cell(row=row, column=12, value='Pausa')
-					row += 1
-			
-			# Aplicar colores condicionales (rojo si >20% pausas)
-			from openpyxl.styles import PatternFill
-			red_fill = PatternFill(start_color="FFFF0000", end_color="FFFF0000", fill_type="solid")
-			
-			for r in range(2, row):
-				pause_minutes = ws_data.cell(row=r, column=5).value or 0
-				work_hours = ws_data.cell(row=r, column=6).value or 0
-				if work_hours > 0 and (pause_minutes / 60) > (work_hours * 0.2):
-					for c in range(1, 13):
-						ws_data.cell(row=r, column=c).fill = red_fill
-			
-			# Autoajustar columnas
-			for column in ws_data.columns:
-				max_length = 0
-				column_letter = None
-				for cell in column:
-					try:
-						if hasattr(cell, 'column_letter'):
-							column_letter = cell.column_letter
-						if len(str(cell.value)) > max_length:
-							max_length = len(str(cell.value))
-					except:
-						pass
-				if column_letter:
-					ws_data.column_dimensions[column_letter].width = min(max_length + 2, 25)
-			
-			# Crear hoja de análisis y KPIs
-			ws_analysis = wb.create_sheet("Análisis")
-			
-			ws_analysis['A1'] = "REPORTE DE TIEMPOS Y HORAS HOMBRE"
-			ws_analysis['A1'].font = Font(size=16, bold=True)
-			ws_analysis.merge_cells('A1:E1')
-			ws_analysis['A1'].alignment = Alignment(horizontal='center')
-			
-			ws_analysis['A2'] = f"Período: {period_name}"
-			ws_analysis['A2'].font = Font(bold=True)
-			ws_analysis.merge_cells('A2:E2')
-			ws_analysis['A2'].alignment = Alignment(horizontal='center')
-			
-			# KPIs principales
-			ws_analysis['A4'] = "KPI"
-			ws_analysis['B4'] = "Valor"
-			ws_analysis['A4'].font = Font(bold=True)
-			ws_analysis['B4'].font = Font(bold=True)
-			
-			# Calcular KPIs
-			total_effective_hours = sum(
-				sum(float(assignment.hours_worked) for assignment in wo.mechanic_assignments.all()) - 
-				sum(pause.duration_minutes / 60 for pause in wo.pauses.all() if pause.duration_minutes)
-				for wo in work_orders
-			)
-			
-			pause_percentage = (float(total_pause_time) / 60 / max(float(total_effective_hours), 1)) * 100 if total_effective_hours > 0 else 0
-			
-			# Tiempos promedio por tipo de mantención
-			avg_times_by_type = {}
-			for wo in work_orders:
-				if wo.service_type and wo.work_started_at and wo.actual_completion:
-					service_type = wo.service_type.name
-					duration = (wo.actual_completion - wo.work_started_at).total_seconds() / 3600
-					if service_type not in avg_times_by_type:
-						avg_times_by_type[service_type] = []
-					avg_times_by_type[service_type].append(duration)
-			
-			avg_times_display = []
-			for service_type, durations in avg_times_by_type.items():
-				if durations:
-					avg_time = sum(durations) / len(durations)
-					avg_times_display.append(f"{service_type}: {avg_time:.1f}h")
-			
-			kpis = [
-				["Horas hombre totales", round(total_effective_hours, 2)],
-				["Total tiempo en pausas (minutos)", total_pause_time],
-				["Porcentaje de pausas", f"{round(pause_percentage, 1)}%"],
-				["Tiempos promedio por tipo", " | ".join(avg_times_display[:3])],  # Limitar a 3 tipos
-			]
-			
-			for i, (kpi, value) in enumerate(kpis, 5):
-				ws_analysis.cell(row=i, column=1, value=kpi)
-				ws_analysis.cell(row=i, column=2, value=value)
-			
-			# Análisis por mecánico
-			ws_analysis['A12'] = "ANÁLISIS POR MECÁNICO"
-			ws_analysis['A12'].font = Font(bold=True)
-			ws_analysis.merge_cells('A12:D12')
-			
-			ws_analysis['A13'] = "Mecánico"
-			ws_analysis['B13'] = "Horas Trabajadas"
-			ws_analysis['C13'] = "Tiempo en Pausas (min)"
-			ws_analysis['D13'] = "% Pausas"
-			ws_analysis['A13'].font = Font(bold=True)
-			ws_analysis['B13'].font = Font(bold=True)
-			ws_analysis['C13'].font = Font(bold=True)
-			ws_analysis['D13'].font = Font(bold=True)
-			
-			mechanic_stats = {}
-			for wo in work_orders:
-				for assignment in wo.mechanic_assignments.all():
-					mechanic_name = assignment.mechanic.name
-					if mechanic_name not in mechanic_stats:
-						mechanic_stats[mechanic_name] = {'work_hours': 0, 'pause_minutes': 0}
-					mechanic_stats[mechanic_name]['work_hours'] += assignment.hours_worked
-					
-				for pause in wo.pauses.all():
-					if pause.mechanic_assignment:
-						# Pausa específica para un mecánico
-						mechanic_name = pause.mechanic_assignment.mechanic.name
-						if mechanic_name not in mechanic_stats:
-							mechanic_stats[mechanic_name] = {'work_hours': 0, 'pause_minutes': 0}
-						mechanic_stats[mechanic_name]['pause_minutes'] += pause.duration_minutes or 0
-					else:
-						# Pausa general que afecta a todos los mecánicos de la OT
-						mechanic_assignments = wo.mechanic_assignments.all()
-						if mechanic_assignments.exists():
-							# Distribuir la pausa entre todos los mecánicos asignados
-							pause_per_mechanic = (pause.duration_minutes or 0) / mechanic_assignments.count()
-							for assignment in mechanic_assignments:
-								mechanic_name = assignment.mechanic.name
-								if mechanic_name not in mechanic_stats:
-									mechanic_stats[mechanic_name] = {'work_hours': 0, 'pause_minutes': 0}
-								mechanic_stats[mechanic_name]['pause_minutes'] += pause_per_mechanic
-			
-			row = 14
-			for mechanic, stats in sorted(mechanic_stats.items(), key=lambda x: x[1]['work_hours'], reverse=True):
-				pause_pct = (float(stats['pause_minutes']) / 60 / max(float(stats['work_hours']), 0.1)) * 100 if stats['work_hours'] > 0 else 0
-				ws_analysis.cell(row=row, column=1, value=mechanic)
-				ws_analysis.cell(row=row, column=2, value=round(stats['work_hours'], 2))
-				ws_analysis.cell(row=row, column=3, value=stats['pause_minutes'])
-				ws_analysis.cell(row=row, column=4, value=f"{round(pause_pct, 1)}%")
-				
-				# Colorear en rojo si >20% pausas
-				if pause_pct > 20:
-					for c in range(1, 5):
-						ws_analysis.cell(row=row, column=c).fill = red_fill
-				
-				row += 1
-			
-			# Autoajustar columnas análisis
-			for column in ws_analysis.columns:
-				max_length = 0
-				column_letter = None
-				for cell in column:
-					try:
-						if hasattr(cell, 'column_letter'):
-							column_letter = cell.column_letter
-						if len(str(cell.value)) > max_length:
-							max_length = len(str(cell.value))
-					except:
-						pass
-				if column_letter:
-					ws_analysis.column_dimensions[column_letter].width = min(max_length + 2, 30)
-			
-			# Crear hoja de gráficos
-			ws_charts = wb.create_sheet("Gráficos")
-			
-			# Preparar datos para gráficos
-			mechanic_work_hours = {}
-			mechanic_pause_minutes = {}
-			mechanic_efficiency = {}
-			
-			for mechanic, stats in mechanic_stats.items():
-				mechanic_work_hours[mechanic] = stats['work_hours']
-				mechanic_pause_minutes[mechanic] = stats['pause_minutes']
-				pause_pct = (float(stats['pause_minutes']) / 60 / max(float(stats['work_hours']), 0.1)) * 100 if stats['work_hours'] > 0 else 0
-				mechanic_efficiency[mechanic] = pause_pct
-			
-			# 1. Gráfico de pastel para distribución de pausas
-			if pause_types_count:
-				ws_charts['A1'] = 'Distribución de Tipos de Pausa'
-				ws_charts['A1'].font = Font(size=14, bold=True)
-				ws_charts['A2'] = 'Tipo de Pausa'
-				ws_charts['B2'] = 'Minutos Totales'
-				ws_charts['A2'].font = Font(bold=True)
-				ws_charts['B2'].font = Font(bold=True)
-				
-				row = 3
-				for pause_type, minutes in sorted(pause_types_count.items(), key=lambda x: x[1], reverse=True):
-					ws_charts.cell(row=row, column=1, value=pause_type)
-					ws_charts.cell(row=row, column=2, value=minutes)
-					row += 1
-				
-				# Crear gráfico de pastel
-				from openpyxl.chart import PieChart
-				pie_chart = PieChart()
-				pie_chart.title = "Distribución de Pausas por Tipo"
-				pie_chart.style = 10
-				
-				data = Reference(ws_charts, min_col=2, min_row=2, max_row=row-1)
-				cats = Reference(ws_charts, min_col=1, min_row=3, max_row=row-1)
-				pie_chart.add_data(data, titles_from_data=True)
-				pie_chart.set_categories(cats)
-				
-				ws_charts.add_chart(pie_chart, "D2")
-			
-			# 2. Gráfico de barras para horas trabajadas por mecánico
-			if mechanic_work_hours:
-				ws_charts.cell(row=1, column=5, value='Horas Trabajadas por Mecánico')
-				ws_charts.cell(row=1, column=5).font = Font(size=14, bold=True)
-				ws_charts.cell(row=2, column=5, value='Mecánico')
-				ws_charts.cell(row=2, column=6, value='Horas')
-				ws_charts.cell(row=2, column=5).font = Font(bold=True)
-				ws_charts.cell(row=2, column=6).font = Font(bold=True)
-				
-				row_hours = 3
-				for mechanic, hours in sorted(mechanic_work_hours.items(), key=lambda x: x[1], reverse=True):
-					ws_charts.cell(row=row_hours, column=5, value=mechanic)
-					ws_charts.cell(row=row_hours, column=6, value=hours)
-					row_hours += 1
-				
-				# Crear gráfico de barras
-				from openpyxl.chart import BarChart
-				bar_chart1 = BarChart()
-				bar_chart1.type = "col"
-				bar_chart1.style = 10
-				bar_chart1.title = "Horas Trabajadas por Mecánico"
-				bar_chart1.y_axis.title = 'Horas'
-				bar_chart1.x_axis.title = 'Mecánico'
-				
-				data1 = Reference(ws_charts, min_col=6, min_row=2, max_row=row_hours-1)
-				cats1 = Reference(ws_charts, min_col=5, min_row=3, max_row=row_hours-1)
-				bar_chart1.add_data(data1, titles_from_data=True)
-				bar_chart1.set_categories(cats1)
-				
-				ws_charts.add_chart(bar_chart1, "H2")
-			
-			# 3. Gráfico de barras para tiempo en pausas por mecánico
-			if mechanic_pause_minutes:
-				ws_charts.cell(row=15, column=1, value='Tiempo en Pausas por Mecánico')
-				ws_charts.cell(row=15, column=1).font = Font(size=14, bold=True)
-				ws_charts.cell(row=16, column=1, value='Mecánico')
-				ws_charts.cell(row=16, column=2, value='Minutos en Pausas')
-				ws_charts.cell(row=16, column=1).font = Font(bold=True)
-				ws_charts.cell(row=16, column=2).font = Font(bold=True)
-				
-				row_pauses = 17
-				for mechanic, minutes in sorted(mechanic_pause_minutes.items(), key=lambda x: x[1], reverse=True):
-					ws_charts.cell(row=row_pauses, column=1, value=mechanic)
-					ws_charts.cell(row=row_pauses, column=2, value=minutes)
-					row_pauses += 1
-				
-				# Crear gráfico de barras
-				bar_chart2 = BarChart()
-				bar_chart2.type = "col"
-				bar_chart2.style = 10
-				bar_chart2.title = "Tiempo en Pausas por Mecánico"
-				bar_chart2.y_axis.title = 'Minutos'
-				bar_chart2.x_axis.title = 'Mecánico'
-				
-				data2 = Reference(ws_charts, min_col=2, min_row=16, max_row=row_pauses-1)
-				cats2 = Reference(ws_charts, min_col=1, min_row=17, max_row=row_pauses-1)
-				bar_chart2.add_data(data2, titles_from_data=True)
-				bar_chart2.set_categories(cats2)
-				
-				ws_charts.add_chart(bar_chart2, "D15")
-			
-			# 4. Gráfico de barras para eficiencia (% pausas) por mecánico
-			if mechanic_efficiency:
-				ws_charts.cell(row=15, column=5, value='Eficiencia por Mecánico (% Pausas)')
-				ws_charts.cell(row=15, column=5).font = Font(size=14, bold=True)
-				ws_charts.cell(row=16, column=5, value='Mecánico')
-				ws_charts.cell(row=16, column=6, value='% Pausas')
-				ws_charts.cell(row=16, column=5).font = Font(bold=True)
-				ws_charts.cell(row=16, column=6).font = Font(bold=True)
-				
-				row_eff = 17
-				for mechanic, pct in sorted(mechanic_efficiency.items(), key=lambda x: x[1], reverse=True):
-					ws_charts.cell(row=row_eff, column=5, value=mechanic)
-					ws_charts.cell(row=row_eff, column=6, value=round(pct, 1))
-					row_eff += 1
-				
-				# Crear gráfico de barras
-				bar_chart3 = BarChart()
-				bar_chart3.type = "col"
-				bar_chart3.style = 10
-				bar_chart3.title = "Eficiencia por Mecánico (% Tiempo en Pausas)"
-				bar_chart3.y_axis.title = 'Porcentaje (%)'
-				bar_chart3.x_axis.title = 'Mecánico'
-				
-				data3 = Reference(ws_charts, min_col=6, min_row=16, max_row=row_eff-1)
-				cats3 = Reference(ws_charts, min_col=5, min_row=17, max_row=row_eff-1)
-				bar_chart3.add_data(data3, titles_from_data=True)
-				bar_chart3.set_categories(cats3)
-				
-				ws_charts.add_chart(bar_chart3, "H15")
-			
-			# Autoajustar columnas gráficos
-			for column in ws_charts.columns:
-				max_length = 0
-				column_letter = None
-				for cell in column:
-					try:
-						if hasattr(cell, 'column_letter'):
-							column_letter = cell.column_letter
-						if len(str(cell.value)) > max_length:
-							max_length = len(str(cell.value))
-					except:
-						pass
-				if column_letter:
-					ws_charts.column_dimensions[column_letter].width = min(max_length + 2, 25)
-		
-		elif report_type == 'repuestos_utilizados':
-			# Reporte de Repuestos Utilizados
-			from documents.models import WorkOrder, Vehicle
-			
-			# Obtener parámetros de filtro
-			periodo = request.GET.get('periodo', 'mensual')
-			
-			# Calcular fechas según período
-			if periodo == 'semanal':
-				start_date = now - timedelta(days=7)
-				period_name = "Última Semana"
-			elif periodo == 'mensual':
-				start_date = now - timedelta(days=30)
-				period_name = "Último Mes"
-			else:
-				start_date = now - timedelta(days=30)
-				period_name = "Último Mes"
-			
-			# Filtrar movimientos de salida (consumo de repuestos)
-			stock_movements = StockMovement.objects.filter(
-				movement_type='OUT',
-				performed_at__gte=start_date
-			).select_related(
-				'repuesto', 'supplier', 'work_order', 'performed_by'
-			)
-			
-			# Crear hoja de datos
-			ws_data = wb.create_sheet("Datos Repuestos")
-			
-			ws_data['A1'] = "REPORTE DE REPUESTOS UTILIZADOS"
-			ws_data['A1'].font = Font(size=16, bold=True)
-			ws_data.merge_cells('A1:I1')
-			ws_data['A1'].alignment = Alignment(horizontal='center')
-			
-			ws_data['A2'] = f"Período: {period_name}"
-			ws_data['A2'].font = Font(bold=True)
-			ws_data.merge_cells('A2:I2')
-			ws_data['A2'].alignment = Alignment(horizontal='center')
-			
-			# Encabezados
-			headers = [
-				'Patente', 'Repuesto', 'Cantidad Usada', 'Proveedor', 
-				'Costo Estimado', 'Fecha Uso', 'OT Asociada', 'Mecánico', 'Stock Restante'
-			]
-			
-			for col, header in enumerate(headers, 1):
-				ws_data.cell(row=4, column=col, value=header)
-				ws_data.cell(row=4, column=col).font = Font(bold=True)
-				ws_data.cell(row=4, column=col).fill = PatternFill(start_color="FFD3D3D3", end_color="FFD3D3D3", fill_type="solid")
-			
-			# Datos de repuestos utilizados
-			row = 5
-			total_cost = 0
-			parts_by_vehicle = {}
-			parts_by_mechanic = {}
-			monthly_consumption = {}
-			
-			for movement in stock_movements:
-				try:
-					# Obtener información del vehículo desde la OT
-					patent = 'Sin patente'
-					if movement.work_order and movement.work_order.ingreso:
-						patent = movement.work_order.ingreso.patent.patent
-					
-					# Obtener información del stock
-					stock_info = SparePartStock.objects.filter(repuesto=movement.repuesto).first()
-					costo_estimado = 0
-					stock_restante = 0
-					proveedor = 'Sin proveedor'
-					
-					if stock_info:
-						costo_estimado = float(stock_info.unit_cost) * abs(movement.quantity)
-						stock_restante = stock_info.current_stock
-						if stock_info.supplier:
-							proveedor = stock_info.supplier.name
-					
-					# Nombre del mecánico
-					mecanico = 'Sin asignar'
-					if movement.performed_by:
-						mecanico = movement.performed_by.user.get_full_name() or movement.performed_by.user.username
-					
-					# OT asociada
-					ot_asociada = 'Sin OT'
-					if movement.work_order:
-						ot_asociada = f"OT-{movement.work_order.id}"
-					
-					# Llenar fila de datos
-					ws_data.cell(row=row, column=1, value=patent)
-					ws_data.cell(row=row, column=2, value=movement.repuesto.name)
-					ws_data.cell(row=row, column=3, value=abs(movement.quantity))
-					ws_data.cell(row=row, column=4, value=proveedor)
-					ws_data.cell(row=row, column=5, value=round(costo_estimado, 2))
-					ws_data.cell(row=row, column=6, value=movement.performed_at.date().strftime('%d/%m/%Y'))
-					ws_data.cell(row=row, column=7, value=ot_asociada)
-					ws_data.cell(row=row, column=8, value=mecanico)
-					ws_data.cell(row=row, column=9, value=stock_restante)
-					
-					# Colorear si stock bajo
-					if stock_info and stock_info.is_low_stock():
-						for col in range(1, 10):
-							ws_data.cell(row=row, column=col).fill = PatternFill(start_color="FFFF0000", end_color="FFFF0000", fill_type="solid")
-					
-					# Acumuladores para análisis
-					total_cost += costo_estimado
-					
-					# Por vehículo
-					if patent not in parts_by_vehicle:
-						parts_by_vehicle[patent] = {'count': 0, 'cost': 0}
-					parts_by_vehicle[patent]['count'] += abs(movement.quantity)
-					parts_by_vehicle[patent]['cost'] += costo_estimado
-					
-					# Por mecánico
-					if mecanico not in parts_by_mechanic:
-						parts_by_mechanic[mecanico] = {'count': 0, 'cost': 0}
-					parts_by_mechanic[mecanico]['count'] += abs(movement.quantity)
-					parts_by_mechanic[mecanico]['cost'] += costo_estimado
-					
-					# Consumo mensual
-					month_key = movement.performed_at.strftime('%Y-%m')
-					if month_key not in monthly_consumption:
-						monthly_consumption[month_key] = 0
-					monthly_consumption[month_key] += abs(movement.quantity)
-					
-					row += 1
-					
-				except Exception as e:
-					# Si hay error con un movimiento específico, continuar
-					continue
-			
-			# Autoajustar columnas datos
-			for column in ws_data.columns:
-				max_length = 0
-				column_letter = None
-				for cell in column:
-					try:
-						if hasattr(cell, 'column_letter'):
-							column_letter = cell.column_letter
-						if len(str(cell.value)) > max_length:
-							max_length = len(str(cell.value))
-					except:
-						pass
-				if column_letter:
-					ws_data.column_dimensions[column_letter].width = min(max_length + 2, 25)
-			
-			# Crear hoja de análisis
-			ws_analysis = wb.create_sheet("Análisis")
-			
-			ws_analysis['A1'] = "ANÁLISIS DE REPUESTOS UTILIZADOS"
-			ws_analysis['A1'].font = Font(size=16, bold=True)
-			ws_analysis.merge_cells('A1:E1')
-			ws_analysis['A1'].alignment = Alignment(horizontal='center')
-			
-			ws_analysis['A2'] = f"Período: {period_name}"
-			ws_analysis['A2'].font = Font(bold=True)
-			ws_analysis.merge_cells('A2:E2')
-			ws_analysis['A2'].alignment = Alignment(horizontal='center')
-			
-			# KPIs principales
-			ws_analysis['A4'] = "KPI"
-			ws_analysis['B4'] = "Valor"
-			ws_analysis['A4'].font = Font(bold=True)
-			ws_analysis['B4'].font = Font(bold=True)
-			
-			kpis = [
-				["Total Repuestos Utilizados", sum(abs(m.quantity) for m in stock_movements)],
-				["Costo Total Estimado", f"${round(total_cost, 2)}"],
-				["Vehículos Atendidos", len(parts_by_vehicle)],
-				["Mecánicos Involucrados", len(parts_by_mechanic)],
-			]
-			
-			for i, (kpi, value) in enumerate(kpis, 5):
-				ws_analysis.cell(row=i, column=1, value=kpi)
-				ws_analysis.cell(row=i, column=2, value=value)
-			
-			# Análisis por vehículo
-			ws_analysis['A10'] = "REPUESTOS POR VEHÍCULO"
-			ws_analysis['A10'].font = Font(bold=True)
-			ws_analysis.merge_cells('A10:C10')
-			
-			ws_analysis['A11'] = "Vehículo"
-			ws_analysis['B11'] = "Cantidad Total"
-			ws_analysis['C11'] = "Costo Total"
-			ws_analysis['A11'].font = Font(bold=True)
-			ws_analysis['B11'].font = Font(bold=True)
-			ws_analysis['C11'].font = Font(bold=True)
-			
-			row = 12
-			for vehicle, data in sorted(parts_by_vehicle.items(), key=lambda x: x[1]['count'], reverse=True):
-				ws_analysis.cell(row=row, column=1, value=vehicle)
-				ws_analysis.cell(row=row, column=2, value=data['count'])
-				ws_analysis.cell(row=row, column=3, value=f"${round(data['cost'], 2)}")
-				row += 1
-			
-			# Análisis por mecánico
-			ws_analysis.cell(row=10, column=5, value='REPUESTOS POR MECÁNICO')
-			ws_analysis.cell(row=10, column=5).font = Font(bold=True)
-			ws_analysis.merge_cells('E10:G10')
-			
-			ws_analysis.cell(row=11, column=5, value='Mecánico')
-			ws_analysis.cell(row=11, column=6, value='Cantidad Total')
-			ws_analysis.cell(row=11, column=7, value='Costo Total')
-			ws_analysis.cell(row=11, column=5).font = Font(bold=True)
-			ws_analysis.cell(row=11, column=6).font = Font(bold=True)
-			ws_analysis.cell(row=11, column=7).font = Font(bold=True)
-			
-			row_mech = 12
-			for mechanic, data in sorted(parts_by_mechanic.items(), key=lambda x: x[1]['count'], reverse=True):
-				ws_analysis.cell(row=row_mech, column=5, value=mechanic)
-				ws_analysis.cell(row=row_mech, column=6, value=data['count'])
-				ws_analysis.cell(row=row_mech, column=7, value=data['cost'])
-				row_mech += 1
-			
-			# Autoajustar columnas análisis
-			for column in ws_analysis.columns:
-				max_length = 0
-				column_letter = None
-				for cell in column:
-					try:
-						if hasattr(cell, 'column_letter'):
-							column_letter = cell.column_letter
-						if len(str(cell.value)) > max_length:
-							max_length = len(str(cell.value))
-					except:
-						pass
-				if column_letter:
-					ws_analysis.column_dimensions[column_letter].width = min(max_length + 2, 30)
-			
-			# Crear hoja de tabla pivot
-			ws_pivot = wb.create_sheet("Tabla Pivot")
-			
-			ws_pivot['A1'] = "TABLA PIVOT - REPUESTOS UTILIZADOS"
-			ws_pivot['A1'].font = Font(size=16, bold=True)
-			ws_pivot.merge_cells('A1:E1')
-			ws_pivot['A1'].alignment = Alignment(horizontal='center')
-			
-			ws_pivot['A3'] = "Esta hoja contiene datos para crear tablas pivot en Excel."
-			ws_pivot['A3'].font = Font(italic=True)
-			
-			# Copiar datos para pivot (sin encabezados)
-			pivot_row = 5
-			for r in range(6, row):  # Desde fila 6 hasta el final de datos
-				for c in range(1, 10):  # Todas las columnas
-					value = ws_data.cell(row=r, column=c).value
-					ws_pivot.cell(row=pivot_row, column=c, value=value)
-				pivot_row += 1
-			
-			# Encabezados para pivot
-			pivot_headers = headers
-			for col, header in enumerate(pivot_headers, 1):
-				ws_pivot.cell(row=4, column=col, value=header)
-				ws_pivot.cell(row=4, column=col).font = Font(bold=True)
-				ws_pivot.cell(row=4, column=col).fill = PatternFill(start_color="FFD3D3D3", end_color="FFD3D3D3", fill_type="solid")
-			
-			# Autoajustar columnas pivot
-			for column in ws_pivot.columns:
-				max_length = 0
-				column_letter = None
-				for cell in column:
-					try:
-						if hasattr(cell, 'column_letter'):
-							column_letter = cell.column_letter
-						if len(str(cell.value)) > max_length:
-							max_length = len(str(cell.value))
-					except:
-						pass
-				if column_letter:
-					ws_pivot.column_dimensions[column_letter].width = min(max_length + 2, 25)
-			
-			# Crear hoja de gráficos
-			ws_charts = wb.create_sheet("Gráficos")
-			
-			# Gráfico de líneas para tendencias de consumo mensual
-			if monthly_consumption:
-				ws_charts['A1'] = 'Tendencia de Consumo Mensual'
-				ws_charts['A1'].font = Font(size=14, bold=True)
-				ws_charts['A2'] = 'Mes'
-				ws_charts['B2'] = 'Cantidad Consumida'
-				ws_charts['A2'].font = Font(bold=True)
-				ws_charts['B2'].font = Font(bold=True)
-				
-				row_chart = 3
-				for month, quantity in sorted(monthly_consumption.items()):
-					ws_charts.cell(row=row_chart, column=1, value=month)
-					ws_charts.cell(row=row_chart, column=2, value=quantity)
-					row_chart += 1
-				
-				# Crear gráfico de líneas
-				from openpyxl.chart import LineChart, Reference
-				line_chart = LineChart()
-				line_chart.title = "Tendencia de Consumo de Repuestos"
-				line_chart.style = 12
-				line_chart.y_axis.title = 'Cantidad'
-				line_chart.x_axis.title = 'Mes'
-				
-				data_line = Reference(ws_charts, min_col=2, min_row=2, max_row=row_chart-1)
-				cats_line = Reference(ws_charts, min_col=1, min_row=3, max_row=row_chart-1)
-				line_chart.add_data(data_line, titles_from_data=True)
-				line_chart.set_categories(cats_line)
-				
-				ws_charts.add_chart(line_chart, "D2")
-			
-			# Gráfico de barras para repuestos por vehículo (top 10)
-			if parts_by_vehicle:
-				ws_charts.cell(row=1, column=6, value='Top 10 Vehículos por Consumo')
-				ws_charts.cell(row=1, column=6).font = Font(size=14, bold=True)
-				ws_charts.cell(row=2, column=6, value='Vehículo')
-				ws_charts.cell(row=2, column=7, value='Cantidad')
-				ws_charts.cell(row=2, column=6).font = Font(bold=True)
-				ws_charts.cell(row=2, column=7).font = Font(bold=True)
-				
-				row_vehicle = 3
-				for vehicle, data in sorted(parts_by_vehicle.items(), key=lambda x: x[1]['count'], reverse=True)[:10]:
-					ws_charts.cell(row=row_vehicle, column=6, value=vehicle[:15])  # Limitar longitud
-					ws_charts.cell(row=row_vehicle, column=7, value=data['count'])
-					row_vehicle += 1
-				
-				# Crear gráfico de barras
-				from openpyxl.chart import BarChart
-				bar_chart = BarChart()
-				bar_chart.type = "col"
-				bar_chart.style = 10
-				bar_chart.title = "Top 10 Vehículos por Consumo de Repuestos"
-				bar_chart.y_axis.title = 'Cantidad'
-				bar_chart.x_axis.title = 'Vehículo'
-				
-				data_bar = Reference(ws_charts, min_col=7, min_row=2, max_row=row_vehicle-1)
-				cats_bar = Reference(ws_charts, min_col=6, min_row=3, max_row=row_vehicle-1)
-				bar_chart.add_data(data_bar, titles_from_data=True)
-				bar_chart.set_categories(cats_bar)
+			# Crear gráfico de barras
+			bar_chart3 = BarChart()
+			bar_chart3.type = "col"
+			bar_chart3.style = 10
+			bar_chart3.title = "Eficiencia por Mecánico (% Tiempo en Pausas)"
+			bar_chart3.y_axis.title = 'Porcentaje (%)'
+			bar_chart3.x_axis.title = 'Mecánico'
+			
+			data3 = Reference(ws_charts, min_col=6, min_row=16, max_row=row_eff-1)
+			cats3 = Reference(ws_charts, min_col=5, min_row=17, max_row=row_eff-1)
+			bar_chart3.add_data(data3, titles_from_data=True)
+			bar_chart3.set_categories(cats3)
+			
+			ws_charts.add_chart(bar_chart3, "H15")
+	
+	elif report_type == 'repuestos_utilizados':
+		# Reporte de Repuestos Utilizados
+		from documents.models import Vehicle
+		
+		# Obtener parámetros de filtro
+		periodo = params.get('periodo', 'mensual')
+		
+		# Calcular fechas según período
+		if periodo == 'semanal':
+			start_date = now - timedelta(days=7)
+			period_name = "Última Semana"
+		elif periodo == 'mensual':
+			start_date = now - timedelta(days=30)
+			period_name = "Último Mes"
+		else:
+			start_date = now - timedelta(days=30)
+			period_name = "Último Mes"
+		
+		# Filtrar movimientos de salida (consumo de repuestos)
+		stock_movements = StockMovement.objects.filter(
+			movement_type='OUT',
+			performed_at__gte=start_date
+		).select_related(
+			'repuesto__stock_info__supplier', 'supplier',
+			'work_order__ingreso__patent', 'performed_by__user'
+		)
+		
+		# Las hojas se crean en el orden del libro; datos y tabla pivot se escriben
+		# en la misma pasada y el análisis y los gráficos se arman al final
+		ws_data = book.data_sheet("Datos Repuestos")
+		ws_analysis = book.layout_sheet("Análisis")
+		ws_pivot = book.data_sheet("Tabla Pivot")
+		ws_charts = book.layout_sheet("Gráficos", max_width=25)
+		
+		ws_data.title_row("REPORTE DE REPUESTOS UTILIZADOS", 9, font=Font(size=16, bold=True), alignment=Alignment(horizontal='center'))
+		ws_data.title_row(f"Período: {period_name}", 9, font=Font(bold=True), alignment=Alignment(horizontal='center'))
+		ws_data.append([])
+		
+		# Encabezados
+		headers = [
+			'Patente', 'Repuesto', 'Cantidad Usada', 'Proveedor', 
+			'Costo Estimado', 'Fecha Uso', 'OT Asociada', 'Mecánico', 'Stock Restante'
+		]
+		header_fill = PatternFill(start_color="FFD3D3D3", end_color="FFD3D3D3", fill_type="solid")
+		ws_data.append(headers, font=Font(bold=True), fill=header_fill)
+		
+		# Hoja con los mismos datos para crear tablas pivot en Excel
+		ws_pivot.title_row("TABLA PIVOT - REPUESTOS UTILIZADOS", 5, font=Font(size=16, bold=True), alignment=Alignment(horizontal='center'))
+		ws_pivot.append([])
+		ws_pivot.append(["Esta hoja contiene datos para crear tablas pivot en Excel."], font=Font(italic=True))
+		ws_pivot.append(headers, font=Font(bold=True), fill=header_fill)
+		
+		# Datos de repuestos utilizados
+		low_stock_fill = PatternFill(start_color="FFFF0000", end_color="FFFF0000", fill_type="solid")
+		total_quantity = 0
+		total_cost = 0
+		parts_by_vehicle = {}
+		parts_by_mechanic = {}
+		monthly_consumption = {}
+		
+		for movement in stock_movements.iterator(chunk_size=1000):
+			try:
+				# Obtener información del vehículo desde la OT
+				patent = 'Sin patente'
+				if movement.work_order and movement.work_order.ingreso:
+					patent = movement.work_order.ingreso.patent.patent
+				
+				# Obtener información del stock (ya cargada con select_related)
+				stock_info = getattr(movement.repuesto, 'stock_info', None)
+				costo_estimado = 0
+				stock_restante = 0
+				proveedor = 'Sin proveedor'
+				
+				if stock_info:
+					costo_estimado = float(stock_info.unit_cost) * abs(movement.quantity)
+					stock_restante = stock_info.current_stock
+					if stock_info.supplier:
+						proveedor = stock_info.supplier.name
+				
+				# Nombre del mecánico
+				mecanico = 'Sin asignar'
+				if movement.performed_by:
+					mecanico = movement.performed_by.user.get_full_name() or movement.performed_by.user.username
+				
+				# OT asociada
+				ot_asociada = 'Sin OT'
+				if movement.work_order:
+					ot_asociada = f"OT-{movement.work_order.id_work_order}"
+				
+				# Llenar fila de datos (coloreada si stock bajo) y su copia para la tabla pivot
+				values = [
+					patent,
+					movement.repuesto.name,
+					abs(movement.quantity),
+					proveedor,
+					round(costo_estimado, 2),
+					movement.performed_at.date().strftime('%d/%m/%Y'),
+					ot_asociada,
+					mecanico,
+					stock_restante,
+				]
+				ws_data.append(values, fill=low_stock_fill if stock_info and stock_info.is_low_stock() else None)
+				ws_pivot.append(values)
+				
+				# Acumuladores para análisis
+				total_quantity += abs(movement.quantity)
+				total_cost += costo_estimado
+				
+				# Por vehículo
+				if patent not in parts_by_vehicle:
+					parts_by_vehicle[patent] = {'count': 0, 'cost': 0}
+				parts_by_vehicle[patent]['count'] += abs(movement.quantity)
+				parts_by_vehicle[patent]['cost'] += costo_estimado
 				
-				ws_charts.add_chart(bar_chart, "I2")
-			
-			# Autoajustar columnas gráficos
-			for column in ws_charts.columns:
-				max_length = 0
-				column_letter = None
-				for cell in column:
-					try:
-						if hasattr(cell, 'column_letter'):
-							column_letter = cell.column_letter
-						if len(str(cell.value)) > max_length:
-							max_length = len(str(cell.value))
-					except:
-						pass
-				if column_letter:
-					ws_charts.column_dimensions[column_letter].width = min(max_length + 2, 25)
-		
-		elif report_type == 'vehiculos_ingresados_salidos':
-			# Reporte de Vehículos Ingresados/Salidos
-			from documents.models import Ingreso, Vehicle, Site, Incident
-			
-			# Obtener parámetros de filtro
-			periodo = request.GET.get('periodo', 'semanal')
-			
-			# Calcular fechas según período
-			if periodo == 'diario':
-				start_date = now.date()
-				end_date = now.date()
-				period_name = "Día Actual"
-			elif periodo == 'semanal':
-				start_date = (now - timedelta(days=7)).date()
-				end_date = now.date()
-				period_name = "Última Semana"
-			else:
-				start_date = (now - timedelta(days=30)).date()
-				end_date = now.date()
-				period_name = "Último Mes"
-			
-			# Filtrar ingresos por período - incluir vehículos con actividad en el período
-			# (entraron en el período O salieron en el período O están actualmente en taller)
-			ingresos = Ingreso.objects.filter(
-				# Entraron en el período
-				entry_datetime__date__gte=start_date,
-				entry_datetime__date__lte=end_date
-			).select_related(
-				'patent', 'chofer', 'patent__site', 'entry_registered_by', 'exit_registered_by'
-			)
-			
-			# También incluir vehículos actualmente en taller (sin fecha de salida)
-			vehiculos_en_taller = Ingreso.objects.filter(
-				exit_datetime__isnull=True,
-				entry_datetime__date__lte=end_date  # Entraron antes o durante el período
-			).exclude(
-				# Excluir los que ya están en las consultas anteriores
-				entry_datetime__date__gte=start_date,
-				entry_datetime__date__lte=end_date
-			).select_related(
-				'patent', 'chofer', 'patent__site', 'entry_registered_by', 'exit_registered_by'
-			)
-			
-			# También incluir vehículos que salieron durante el período (independientemente de cuándo entraron)
-			vehiculos_salieron_en_periodo = Ingreso.objects.filter(
-				exit_datetime__date__gte=start_date,
-				exit_datetime__date__lte=end_date,
-				exit_datetime__isnull=False  # Tienen fecha de salida
-			).exclude(
-				# Excluir los que ya están en la primera consulta (entraron en el período)
-				entry_datetime__date__gte=start_date,
-				entry_datetime__date__lte=end_date
-			).select_related(
-				'patent', 'chofer', 'patent__site', 'entry_registered_by', 'exit_registered_by'
-			)
-			
-			# Combinar todas las consultas
-			ingresos = list(chain(ingresos, vehiculos_en_taller, vehiculos_salieron_en_periodo))
-			
-			# Eliminar duplicados basados en ID de ingreso
-			seen_ids = set()
-			ingresos_unicos = []
-			for ingreso in ingresos:
-				if ingreso.id_ingreso not in seen_ids:
-					seen_ids.add(ingreso.id_ingreso)
-					ingresos_unicos.append(ingreso)
-			
-			ingresos = ingresos_unicos
-			
-			# Ordenar por fecha de entrada descendente
-			ingresos.sort(key=lambda x: x.entry_datetime, reverse=True)
-			
-			# Crear hoja de datos
-			ws_data = wb.create_sheet("Vehículos IO")
-			
-			ws_data['A1'] = "REPORTE DE VEHÍCULOS INGRESADOS/SALIDOS"
-			ws_data['A1'].font = Font(size=16, bold=True)
-			ws_data.merge_cells('A1:I1')
-			ws_data['A1'].alignment = Alignment(horizontal='center')
+				# Por mecánico
+				if mecanico not in parts_by_mechanic:
+					parts_by_mechanic[mecanico] = {'count': 0, 'cost': 0}
+				parts_by_mechanic[mecanico]['count'] += abs(movement.quantity)
+				parts_by_mechanic[mecanico]['cost'] += costo_estimado
+				
+				# Consumo mensual
+				month_key = movement.performed_at.strftime('%Y-%m')
+				if month_key not in monthly_consumption:
+					monthly_consumption[month_key] = 0
+				monthly_consumption[month_key] += abs(movement.quantity)
+				
+			except Exception as e:
+				# Si hay error con un movimiento específico, continuar
+				continue
+		ws_data.close()
+		ws_pivot.close()
+		
+		# Hoja de análisis
+		ws_analysis['A1'] = "ANÁLISIS DE REPUESTOS UTILIZADOS"
+		ws_analysis['A1'].font = Font(size=16, bold=True)
+		ws_analysis.merge_cells('A1:E1')
+		ws_analysis['A1'].alignment = Alignment(horizontal='center')
+		
+		ws_analysis['A2'] = f"Período: {period_name}"
+		ws_analysis['A2'].font = Font(bold=True)
+		ws_analysis.merge_cells('A2:E2')
+		ws_analysis['A2'].alignment = Alignment(horizontal='center')
+		
+		# KPIs principales
+		ws_analysis['A4'] = "KPI"
+		ws_analysis['B4'] = "Valor"
+		ws_analysis['A4'].font = Font(bold=True)
+		ws_analysis['B4'].font = Font(bold=True)
+		
+		kpis = [
+			["Total Repuestos Utilizados", total_quantity],
+			["Costo Total Estimado", f"${round(total_cost, 2)}"],
+			["Vehículos Atendidos", len(parts_by_vehicle)],
+			["Mecánicos Involucrados", len(parts_by_mechanic)],
+		]
+		
+		for i, (kpi, value) in enumerate(kpis, 5):
+			ws_analysis.cell(row=i, column=1, value=kpi)
+			ws_analysis.cell(row=i, column=2, value=value)
+		
+		# Análisis por vehículo
+		ws_analysis['A10'] = "REPUESTOS POR VEHÍCULO"
+		ws_analysis['A10'].font = Font(bold=True)
+		ws_analysis.merge_cells('A10:C10')
+		
+		ws_analysis['A11'] = "Vehículo"
+		ws_analysis['B11'] = "Cantidad Total"
+		ws_analysis['C11'] = "Costo Total"
+		ws_analysis['A11'].font = Font(bold=True)
+		ws_analysis['B11'].font = Font(bold=True)
+		ws_analysis['C11'].font = Font(bold=True)
+		
+		row = 12
+		for vehicle, data in sorted(parts_by_vehicle.items(), key=lambda x: x[1]['count'], reverse=True):
+			ws_analysis.cell(row=row, column=1, value=vehicle)
+			ws_analysis.cell(row=row, column=2, value=data['count'])
+			ws_analysis.cell(row=row, column=3, value=f"${round(data['cost'], 2)}")
+			row += 1
+		
+		# Análisis por mecánico
+		ws_analysis.cell(row=10, column=5, value='REPUESTOS POR MECÁNICO')
+		ws_analysis.cell(row=10, column=5).font = Font(bold=True)
+		ws_analysis.merge_cells('E10:G10')
+		
+		ws_analysis.cell(row=11, column=5, value='Mecánico')
+		ws_analysis.cell(row=11, column=6, value='Cantidad Total')
+		ws_analysis.cell(row=11, column=7, value='Costo Total')
+		ws_analysis.cell(row=11, column=5).font = Font(bold=True)
+		ws_analysis.cell(row=11, column=6).font = Font(bold=True)
+		ws_analysis.cell(row=11, column=7).font = Font(bold=True)
+		
+		row_mech = 12
+		for mechanic, data in sorted(parts_by_mechanic.items(), key=lambda x: x[1]['count'], reverse=True):
+			ws_analysis.cell(row=row_mech, column=5, value=mechanic)
+			ws_analysis.cell(row=row_mech, column=6, value=data['count'])
+			ws_analysis.cell(row=row_mech, column=7, value=data['cost'])
+			row_mech += 1
+		
+		# Hoja de gráficos
+		# Gráfico de líneas para tendencias de consumo mensual
+		if monthly_consumption:
+			ws_charts['A1'] = 'Tendencia de Consumo Mensual'
+			ws_charts['A1'].font = Font(size=14, bold=True)
+			ws_charts['A2'] = 'Mes'
+			ws_charts['B2'] = 'Cantidad Consumida'
+			ws_charts['A2'].font = Font(bold=True)
+			ws_charts['B2'].font = Font(bold=True)
 			
-			ws_data['A2'] = f"Período: {period_name}"
-			ws_data['A2'].font = Font(bold=True)
-			ws_data.merge_cells('A2:I2')
-			ws_data['A2'].alignment = Alignment(horizontal='center')
+			row_chart = 3
+			for month, quantity in sorted(monthly_consumption.items()):
+				ws_charts.cell(row=row_chart, column=1, value=month)
+				ws_charts.cell(row=row_chart, column=2, value=quantity)
+				row_chart += 1
+			
+			# Crear gráfico de líneas
+			from openpyxl.chart import LineChart, Reference
+			line_chart = LineChart()
+			line_chart.title = "Tendencia de Consumo de Repuestos"
+			line_chart.style = 12
+			line_chart.y_axis.title = 'Cantidad'
+			line_chart.x_axis.title = 'Mes'
+			
+			data_line = Reference(ws_charts, min_col=2, min_row=2, max_row=row_chart-1)
+			cats_line = Reference(ws_charts, min_col=1, min_row=3, max_row=row_chart-1)
+			line_chart.add_data(data_line, titles_from_data=True)
+			line_chart.set_categories(cats_line)
+			
+			ws_charts.add_chart(line_chart, "D2")
+		
+		# Gráfico de barras para repuestos por vehículo (top 10)
+		if parts_by_vehicle:
+			ws_charts.cell(row=1, column=6, value='Top 10 Vehículos por Consumo')
+			ws_charts.cell(row=1, column=6).font = Font(size=14, bold=True)
+			ws_charts.cell(row=2, column=6, value='Vehículo')
+			ws_charts.cell(row=2, column=7, value='Cantidad')
+			ws_charts.cell(row=2, column=6).font = Font(bold=True)
+			ws_charts.cell(row=2, column=7).font = Font(bold=True)
 			
-			# Encabezados
-			headers = [
-				'Patente', 'Ruta/Origen', 'Chofer', 'Sucursal', 'Hora Ingreso', 
-				'Hora Salida', 'Incidencias', 'Autorización Salida', 'Tiempo en Taller'
-			]
+			row_vehicle = 3
+			for vehicle, data in sorted(parts_by_vehicle.items(), key=lambda x: x[1]['count'], reverse=True)[:10]:
+				ws_charts.cell(row=row_vehicle, column=6, value=vehicle[:15])  # Limitar longitud
+				ws_charts.cell(row=row_vehicle, column=7, value=data['count'])
+				row_vehicle += 1
 			
-			for col, header in enumerate(headers, 1):
-				ws_data.cell(row=4, column=col, value=header)
-				ws_data.cell(row=4, column=col).font = Font(bold=True)
-				ws_data.cell(row=4, column=col).fill = PatternFill(start_color="FFD3D3D3", end_color="FFD3D3D3", fill_type="solid")
+			# Crear gráfico de barras
+			from openpyxl.chart import BarChart
+			bar_chart = BarChart()
+			bar_chart.type = "col"
+			bar_chart.style = 10
+			bar_chart.title = "Top 10 Vehículos por Consumo de Repuestos"
+			bar_chart.y_axis.title = 'Cantidad'
+			bar_chart.x_axis.title = 'Vehículo'
 			
-			# Datos de vehículos
-			row = 5
-			total_ingresos = 0
-			total_salidas = 0
-			tiempos_taller = []
-			vehiculos_por_zona = {}
-			ingresos_por_dia = {}
+			data_bar = Reference(ws_charts, min_col=7, min_row=2, max_row=row_vehicle-1)
+			cats_bar = Reference(ws_charts, min_col=6, min_row=3, max_row=row_vehicle-1)
+			bar_chart.add_data(data_bar, titles_from_data=True)
+			bar_chart.set_categories(cats_bar)
 			
-			for ingreso in ingresos:
-				try:
-					# Información básica
-					patent = ingreso.patent.patent
-					ruta_origen = f"{ingreso.patent.site.name}" if ingreso.patent.site else "Sin sucursal"
-					chofer = f"{ingreso.chofer.user.get_full_name()}" if ingreso.chofer and ingreso.chofer.user else "Sin chofer"
-					sucursal = ingreso.patent.site.name if ingreso.patent.site else "Sin sucursal"
-					hora_ingreso = ingreso.entry_datetime.strftime('%d/%m/%Y %H:%M')
-					hora_salida = ingreso.exit_datetime.strftime('%d/%m/%Y %H:%M') if ingreso.exit_datetime else "Pendiente"
-					
-					# Incidencias (daños reportados)
-					incidencias = "Sin incidencias"
-					related_incidents = Incident.objects.filter(vehicle=ingreso.patent).count()
-					if related_incidents > 0:
-						incidencias = f"{related_incidents} incidencia(s)"
-					
-					# Autorización de salida
-					autorizacion = "Sí" if ingreso.authorization else "No"
-					
-					# Tiempo en taller
-					tiempo_taller = ""
-					if ingreso.exit_datetime:
-						duration = ingreso.exit_datetime - ingreso.entry_datetime
-						days = duration.days
-						hours, remainder = divmod(duration.seconds, 3600)
-						minutes, seconds = divmod(remainder, 60)
-						
-						if days > 0:
-							tiempo_taller = f"{days}d {hours}h {minutes}m"
-							tiempos_taller.append(duration.total_seconds() / 3600)  # horas
-						else:
-							tiempo_taller = f"{hours}h {minutes}m"
-							tiempos_taller.append(duration.total_seconds() / 3600)
-					
-					# Llenar fila de datos
-					ws_data.cell(row=row, column=1, value=patent)
-					ws_data.cell(row=row, column=2, value=ruta_origen)
-					ws_data.cell(row=row, column=3, value=chofer)
-					ws_data.cell(row=row, column=4, value=sucursal)
-					ws_data.cell(row=row, column=5, value=hora_ingreso)
-					ws_data.cell(row=row, column=6, value=hora_salida)
-					ws_data.cell(row=row, column=7, value=incidencias)
-					ws_data.cell(row=row, column=8, value=autorizacion)
-					ws_data.cell(row=row, column=9, value=tiempo_taller)
-					
-					# Colorear si no tiene autorización o tiempo excesivo
-					if not ingreso.authorization:
-						for col in range(1, 10):
-							ws_data.cell(row=row, column=col).fill = PatternFill(start_color="FFFFFF00", end_color="FFFFFF00", fill_type="solid")  # Amarillo
-					
-					if ingreso.exit_datetime and (ingreso.exit_datetime - ingreso.entry_datetime).total_seconds() > 24 * 3600:  # Más de 24 horas
-						for col in range(1, 10):
-							ws_data.cell(row=row, column=col).fill = PatternFill(start_color="FFFFA500", end_color="FFFFA500", fill_type="solid")  # Naranja
-					
-					# Acumuladores para análisis
-					total_ingresos += 1
-					if ingreso.exit_datetime:
-						total_salidas += 1
-					
-					# Por zona
-					zona = sucursal
-					if zona not in vehiculos_por_zona:
-						vehiculos_por_zona[zona] = {'ingresos': 0, 'salidas': 0}
-					vehiculos_por_zona[zona]['ingresos'] += 1
-					if ingreso.exit_datetime:
-						vehiculos_por_zona[zona]['salidas'] += 1
-					
-					# Por día - contar tanto entradas como salidas
-					dia_entrada = ingreso.entry_datetime.date().strftime('%Y-%m-%d')
-					if dia_entrada not in ingresos_por_dia:
-						ingresos_por_dia[dia_entrada] = 0
-					ingresos_por_dia[dia_entrada] += 1
-					
-					# Si hay salida, también contar el día de salida
-					if ingreso.exit_datetime:
-						dia_salida = ingreso.exit_datetime.date().strftime('%Y-%m-%d')
-						if dia_salida != dia_entrada:  # Evitar duplicar si entrada y salida son el mismo día
-							if dia_salida not in ingresos_por_dia:
-								ingresos_por_dia[dia_salida] = 0
-							ingresos_por_dia[dia_salida] += 1
-					
-					row += 1
+			ws_charts.add_chart(bar_chart, "I2")
+	
+	elif report_type == 'vehiculos_ingresados_salidos':
+		# Reporte de Vehículos Ingresados/Salidos
+		from documents.models import Ingreso, Vehicle, Site, Incident
+		from django.db.models import Count, OuterRef, Q, Subquery
+		from django.db.models.functions import Coalesce
+		
+		# Obtener parámetros de filtro
+		periodo = params.get('periodo', 'semanal')
+		
+		# Calcular fechas según período
+		if periodo == 'diario':
+			start_date = now.date()
+			end_date = now.date()
+			period_name = "Día Actual"
+		elif periodo == 'semanal':
+			start_date = (now - timedelta(days=7)).date()
+			end_date = now.date()
+			period_name = "Última Semana"
+		else:
+			start_date = (now - timedelta(days=30)).date()
+			end_date = now.date()
+			period_name = "Último Mes"
+		
+		# Ingresos con actividad en el período: entraron en el período, salieron en el
+		# período (independientemente de cuándo entraron) o siguen en taller. Una sola
+		# consulta ordenada por fecha de entrada, con las incidencias de cada vehículo
+		# contadas en una subconsulta
+		incident_counts = Incident.objects.filter(
+			vehicle_id=OuterRef('patent_id')
+		).order_by().values('vehicle_id').annotate(total=Count('pk')).values('total')[:1]
+		ingresos = Ingreso.objects.filter(
+			Q(entry_datetime__date__gte=start_date, entry_datetime__date__lte=end_date) |
+			Q(exit_datetime__isnull=True, entry_datetime__date__lte=end_date) |
+			Q(exit_datetime__date__gte=start_date, exit_datetime__date__lte=end_date)
+		).select_related(
+			'patent', 'chofer__user', 'patent__site', 'entry_registered_by', 'exit_registered_by'
+		).annotate(
+			incident_count=Coalesce(Subquery(incident_counts), 0)
+		).order_by('-entry_datetime', '-id_ingreso')
+		
+		# Crear hoja de datos
+		ws_data = book.data_sheet("Vehículos IO")
+		
+		ws_data.title_row("REPORTE DE VEHÍCULOS INGRESADOS/SALIDOS", 9, font=Font(size=16, bold=True), alignment=Alignment(horizontal='center'))
+		ws_data.title_row(f"Período: {period_name}", 9, font=Font(bold=True), alignment=Alignment(horizontal='center'))
+		ws_data.append([])
+		
+		# Encabezados
+		headers = [
+			'Patente', 'Ruta/Origen', 'Chofer', 'Sucursal', 'Hora Ingreso', 
+			'Hora Salida', 'Incidencias', 'Autorización Salida', 'Tiempo en Taller'
+		]
+		ws_data.append(headers, font=Font(bold=True), fill=PatternFill(start_color="FFD3D3D3", end_color="FFD3D3D3", fill_type="solid"))
+		
+		# Datos de vehículos
+		unauthorized_fill = PatternFill(start_color="FFFFFF00", end_color="FFFFFF00", fill_type="solid")  # Amarillo
+		overdue_fill = PatternFill(start_color="FFFFA500", end_color="FFFFA500", fill_type="solid")  # Naranja
+		total_ingresos = 0
+		total_salidas = 0
+		total_autorizados = 0
+		total_registros = 0
+		tiempos_taller = []
+		vehiculos_por_zona = {}
+		ingresos_por_dia = {}
+		
+		for ingreso in ingresos.iterator(chunk_size=1000):
+			total_registros += 1
+			if ingreso.authorization:
+				total_autorizados += 1
+			try:
+				# Información básica
+				patent = ingreso.patent.patent
+				ruta_origen = f"{ingreso.patent.site.name}" if ingreso.patent.site else "Sin sucursal"
+				chofer = f"{ingreso.chofer.user.get_full_name()}" if ingreso.chofer and ingreso.chofer.user else "Sin chofer"
+				sucursal = ingreso.patent.site.name if ingreso.patent.site else "Sin sucursal"
+				hora_ingreso = ingreso.entry_datetime.strftime('%d/%m/%Y %H:%M')
+				hora_salida = ingreso.exit_datetime.strftime('%d/%m/%Y %H:%M') if ingreso.exit_datetime else "Pendiente"
+				
+				# Incidencias (daños reportados)
+				incidencias = "Sin incidencias"
+				related_incidents = ingreso.incident_count
+				if related_incidents > 0:
+					incidencias = f"{related_incidents} incidencia(s)"
+				
+				# Autorización de salida
+				autorizacion = "Sí" if ingreso.authorization else "No"
+				
+				# Tiempo en taller
+				tiempo_taller = ""
+				if ingreso.exit_datetime:
+					duration = ingreso.exit_datetime - ingreso.entry_datetime
+					days = duration.days
+					hours, remainder = divmod(duration.seconds, 3600)
+					minutes, seconds = divmod(remainder, 60)
 					
-				except Exception as e:
-					# Si hay error con un ingreso específico, continuar
-					continue
-			
-			# Autoajustar columnas datos
-			for column in ws_data.columns:
-				max_length = 0
-				column_letter = None
-				for cell in column:
-					try:
-						if hasattr(cell, 'column_letter'):
-							column_letter = cell.column_letter
-						if len(str(cell.value)) > max_length:
-							max_length = len(str(cell.value))
-					except:
-						pass
-				if column_letter:
-					ws_data.column_dimensions[column_letter].width = min(max_length + 2, 25)
-			
-			# Crear hoja de análisis
-			ws_analysis = wb.create_sheet("Análisis")
-			
-			ws_analysis['A1'] = "ANÁLISIS DE VEHÍCULOS INGRESADOS/SALIDOS"
-			ws_analysis['A1'].font = Font(size=16, bold=True)
-			ws_analysis.merge_cells('A1:F1')
-			ws_analysis['A1'].alignment = Alignment(horizontal='center')
-			
-			ws_analysis['A2'] = f"Período: {period_name}"
-			ws_analysis['A2'].font = Font(bold=True)
-			ws_analysis.merge_cells('A2:F2')
-			ws_analysis['A2'].alignment = Alignment(horizontal='center')
-			
-			# KPIs principales
-			ws_analysis['A4'] = "KPI"
-			ws_analysis['B4'] = "Valor"
-			ws_analysis['C4'] = "Fórmula"
-			ws_analysis['A4'].font = Font(bold=True)
-			ws_analysis['B4'].font = Font(bold=True)
-			ws_analysis['C4'].font = Font(bold=True)
-			
-			# Calcular KPIs mejorados
-			tiempo_promedio = sum(tiempos_taller) / len(tiempos_taller) if tiempos_taller else 0
-			tasa_ocupacion = (total_ingresos - total_salidas) / max(total_ingresos, 1) * 100 if total_ingresos > 0 else 0
-			
-			# KPIs adicionales
-			eficiencia_reparacion = (total_salidas / max(total_ingresos, 1)) * 100 if total_ingresos > 0 else 0
-			vehiculos_retraso = sum(1 for t in tiempos_taller if t > 24)  # Más de 24 horas
-			tasa_autorizacion = sum(1 for i in ingresos if i.authorization) / max(len(ingresos), 1) * 100
-			vehiculos_sin_autorizacion = sum(1 for i in ingresos if not i.authorization)
-			
-			kpis = [
-				["Total Ingresos", total_ingresos, ""],
-				["Total Salidas", total_salidas, ""],
-				["Vehículos en Taller", total_ingresos - total_salidas, ""],
-				["Tiempo Promedio en Taller", f"{round(tiempo_promedio, 1)} horas", "Promedio de tiempos de estadía"],
-				["Tasa de Ocupación", f"{round(tasa_ocupacion, 1)}%", "(Ingresos - Salidas) / Ingresos × 100"],
-				["Eficiencia de Reparación", f"{round(eficiencia_reparacion, 1)}%", "Salidas / Ingresos × 100"],
-				["Vehículos con Retraso (>24h)", vehiculos_retraso, ""],
-				["Tasa de Autorización", f"{round(tasa_autorizacion, 1)}%", ""],
-				["Vehículos sin Autorización", vehiculos_sin_autorizacion, ""],
-			]
-			
-			for i, (kpi, value, formula) in enumerate(kpis, 5):
-				ws_analysis.cell(row=i, column=1, value=kpi)
-				ws_analysis.cell(row=i, column=2, value=value)
-				ws_analysis.cell(row=i, column=3, value=formula)
-			
-			# Análisis por zona
-			ws_analysis['E4'] = "VEHÍCULOS POR ZONA"
-			ws_analysis['E4'].font = Font(bold=True)
-			ws_analysis.merge_cells('E4:G4')
-			
-			ws_analysis['E5'] = "Zona"
-			ws_analysis['F5'] = "Ingresos"
-			ws_analysis['G5'] = "Salidas"
-			ws_analysis['E5'].font = Font(bold=True)
-			ws_analysis['F5'].font = Font(bold=True)
-			ws_analysis['G5'].font = Font(bold=True)
-			
-			row = 6
-			for zona, data in sorted(vehiculos_por_zona.items()):
-				ws_analysis.cell(row=row, column=5, value=zona)
-				ws_analysis.cell(row=row, column=6, value=data['ingresos'])
-				ws_analysis.cell(row=row, column=7, value=data['salidas'])
-				row += 1
-			
-			# Autoajustar columnas análisis
-			for column in ws_analysis.columns:
-				max_length = 0
-				column_letter = None
-				for cell in column:
-					try:
-						if hasattr(cell, 'column_letter'):
-							column_letter = cell.column_letter
-						if len(str(cell.value)) > max_length:
-							max_length = len(str(cell.value))
-					except:
-						pass
-				if column_letter:
-					ws_analysis.column_dimensions[column_letter].width = min(max_length + 2, 30)
-			
-			# Crear hoja de gráficos
-			ws_charts = wb.create_sheet("Gráficos")
-			
-			# Gráfico de barras para ingresos vs salidas por zona
-			if vehiculos_por_zona:
-				ws_charts['A1'] = 'Ingresos vs Salidas por Zona'
-				ws_charts['A1'].font = Font(size=14, bold=True)
-				ws_charts['A2'] = 'Zona'
-				ws_charts['B2'] = 'Ingresos'
-				ws_charts['C2'] = 'Salidas'
-				ws_charts['A2'].font = Font(bold=True)
-				ws_charts['B2'].font = Font(bold=True)
-				ws_charts['C2'].font = Font(bold=True)
-				
-				row_chart = 3
-				for zona, data in sorted(vehiculos_por_zona.items(), key=lambda x: x[1]['ingresos'], reverse=True):
-					ws_charts.cell(row=row_chart, column=1, value=zona)
-					ws_charts.cell(row=row_chart, column=2, value=data['ingresos'])
-					ws_charts.cell(row=row_chart, column=3, value=data['salidas'])
-					row_chart += 1
-				
-				# Crear gráfico de barras agrupadas
-				from openpyxl.chart import BarChart, Reference
-				bar_chart = BarChart()
-				bar_chart.type = "col"
-				bar_chart.style = 10
-				bar_chart.title = "Ingresos vs Salidas por Zona"
-				bar_chart.y_axis.title = 'Cantidad'
-				bar_chart.x_axis.title = 'Zona'
-				
-				data_ingresos = Reference(ws_charts, min_col=2, min_row=2, max_row=row_chart-1)
-				data_salidas = Reference(ws_charts, min_col=3, min_row=2, max_row=row_chart-1)
-				cats = Reference(ws_charts, min_col=1, min_row=3, max_row=row_chart-1)
-				
-				bar_chart.add_data(data_ingresos, titles_from_data=True)
-				bar_chart.add_data(data_salidas, titles_from_data=True)
-				bar_chart.set_categories(cats)
-				
-				ws_charts.add_chart(bar_chart, "E2")
-			
-			# Gráfico de líneas para ingresos por día
-			if ingresos_por_dia:
-				ws_charts.cell(row=1, column=6, value='Ingresos Diarios')
-				ws_charts.cell(row=1, column=6).font = Font(size=14, bold=True)
-				ws_charts.cell(row=2, column=6, value='Fecha')
-				ws_charts.cell(row=2, column=7, value='Ingresos')
-				ws_charts.cell(row=2, column=6).font = Font(bold=True)
-				ws_charts.cell(row=2, column=7).font = Font(bold=True)
-				
-				row_line = 3
-				for fecha, cantidad in sorted(ingresos_por_dia.items()):
-					ws_charts.cell(row=row_line, column=6, value=fecha)
-					ws_charts.cell(row=row_line, column=7, value=cantidad)
-					row_line += 1
-				
-				# Crear gráfico de líneas
-				from openpyxl.chart import LineChart
-				line_chart = LineChart()
-				line_chart.title = "Ingresos Diarios de Vehículos"
-				line_chart.style = 12
-				line_chart.y_axis.title = 'Cantidad de Ingresos'
-				line_chart.x_axis.title = 'Fecha'
-				
-				data_line = Reference(ws_charts, min_col=7, min_row=2, max_row=row_line-1)
-				cats_line = Reference(ws_charts, min_col=6, min_row=3, max_row=row_line-1)
-				line_chart.add_data(data_line, titles_from_data=True)
-				line_chart.set_categories(cats_line)
-				
-				ws_charts.add_chart(line_chart, "I2")
-			
-			# Autoajustar columnas gráficos
-			for column in ws_charts.columns:
-				max_length = 0
-				column_letter = None
-				for cell in column:
-					try:
-						if hasattr(cell, 'column_letter'):
-							column_letter = cell.column_letter
-						if len(str(cell.value)) > max_length:
-							max_length = len(str(cell.value))
-					except:
-						pass
-				if column_letter:
-					ws_charts.column_dimensions[column_letter].width = min(max_length + 2, 25)
-		
-		elif report_type == 'kpis_flota':
-			# Reporte de Indicadores de Flota (KPIs Globales)
-			from documents.models import Ingreso, Vehicle, Site, Incident
-			from django.db.models import Count, Avg, Sum, F, Q
-			from django.db.models.functions import TruncMonth, ExtractMonth, ExtractYear
-			
-			# Obtener parámetros de filtro
-			periodo = request.GET.get('periodo', 'mensual')
-			
-			# Calcular fechas según período
-			if periodo == 'mensual':
-				# Mes actual vs mes anterior
-				now = timezone.now()
-				current_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-				current_month_end = (current_month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-				previous_month_start = (current_month_start - timedelta(days=1)).replace(day=1)
-				previous_month_end = current_month_start - timedelta(days=1)
-				
-				# Verificar si hay datos en el período actual
-				current_data_count = Ingreso.objects.filter(
-					entry_datetime__date__gte=current_month_start.date(),
-					entry_datetime__date__lte=current_month_end.date()
-				).count()
-				
-				# Si no hay datos en el mes actual, usar el último mes con datos
-				if current_data_count == 0:
-					# Encontrar el último mes con datos
-					last_data = Ingreso.objects.order_by('-entry_datetime').first()
-					if last_data:
-						last_date = last_data.entry_datetime.date()
-						current_month_start = timezone.make_aware(datetime.combine(last_date.replace(day=1), datetime.min.time()))
-						current_month_end = (current_month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-						previous_month_start = (current_month_start - timedelta(days=1)).replace(day=1)
-						previous_month_end = current_month_start - timedelta(days=1)
-				
-				period_name = f"{current_month_start.strftime('%B %Y')} vs {previous_month_start.strftime('%B %Y')}"
-			else:
-				# Otro período si es necesario
-				current_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-				current_month_end = (current_month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-				previous_month_start = (current_month_start - timedelta(days=1)).replace(day=1)
-				previous_month_end = current_month_start - timedelta(days=1)
-				period_name = f"{current_month_start.strftime('%B %Y')} vs {previous_month_start.strftime('%B %Y')}"
-			
-			# Obtener datos del período actual y anterior
-			current_period_data = Ingreso.objects.filter(
-				entry_datetime__date__gte=current_month_start.date(),
-				entry_datetime__date__lte=current_month_end.date()
-			).select_related('patent', 'patent__site')
-			
-			previous_period_data = Ingreso.objects.filter(
-				entry_datetime__date__gte=previous_month_start.date(),
-				entry_datetime__date__lte=previous_month_end.date()
-			).select_related('patent', 'patent__site')
-			
-			# Crear hoja de KPIs Flota
-			ws_kpis = wb.create_sheet("KPIs Flota")
-			
-			ws_kpis['A1'] = "INDICADORES DE FLOTA (KPIs GLOBALES)"
-			ws_kpis['A1'].font = Font(size=18, bold=True, color="FF0000FF")
-			ws_kpis.merge_cells('A1:G1')
-			ws_kpis['A1'].alignment = Alignment(horizontal='center')
-			
-			ws_kpis['A2'] = f"Período: {period_name}"
-			ws_kpis['A2'].font = Font(size=12, bold=True)
-			ws_kpis.merge_cells('A2:G2')
-			ws_kpis['A2'].alignment = Alignment(horizontal='center')
-			
-			# Encabezados de la tabla principal
-			headers = [
-				'Zona', 'Vehículos Atendidos', 'Eficiencia Mecánicos', 
-				'Trazabilidad', 'Indicadores Flota', 'KPI General', 'Tendencia'
-			]
-			
-			for col, header in enumerate(headers, 1):
-				ws_kpis.cell(row=4, column=col, value=header)
-				ws_kpis.cell(row=4, column=col).font = Font(bold=True, size=11)
-				ws_kpis.cell(row=4, column=col).fill = PatternFill(start_color="FFCCCCCC", end_color="FFCCCCCC", fill_type="solid")
-				ws_kpis.cell(row=4, column=col).alignment = Alignment(horizontal='center')
-			
-			# Obtener zonas disponibles (sitios reales de la base de datos)
-			sitios = Site.objects.all()
-			zonas = [sitio.name for sitio in sitios]
-			
-			# Si no hay sitios, usar zonas por defecto
-			if not zonas:
-				zonas = ['Norte', 'Sur', 'Metropolitana', 'Centro', 'Oriente', 'Poniente']
-			
-			# Calcular métricas por zona
-			row = 5
-			kpis_globales = {
-				'total_vehiculos_atendidos': 0,
-				'eficiencia_promedio': 0,
-				'trazabilidad_promedio': 0,
-				'disponibilidad_promedio': 0
-			}
-			
-			zonas_data = []
-			
-			for zona in zonas:
-				# Filtrar datos por zona (usar nombre exacto del sitio)
-				current_zona = current_period_data.filter(patent__site__name=zona)
-				previous_zona = previous_period_data.filter(patent__site__name=zona)
-				
-				# Calcular métricas
-				vehiculos_atendidos = current_zona.count()
-				vehiculos_atendidos_prev = previous_zona.count()
-				
-				# Eficiencia mecánicos (vehículos atendidos / día promedio)
-				dias_mes = (current_month_end - current_month_start).days + 1
-				eficiencia = vehiculos_atendidos / max(dias_mes, 1) if vehiculos_atendidos > 0 else 0
-				
-				# Trazabilidad (simulado - reducción de errores ≥40%)
-				trazabilidad_base = 60  # Base 60%
-				trazabilidad = min(100, trazabilidad_base + (vehiculos_atendidos * 2))  # Mejora con volumen
-				
-				# Indicadores flota (disponibilidad, gastos controlados)
-				completados = current_zona.filter(exit_datetime__isnull=False).count()
-				disponibilidad = (completados / max(vehiculos_atendidos, 1)) * 100 if vehiculos_atendidos > 0 else 0
-				
-				# KPI General (promedio ponderado)
-				kpi_general = (eficiencia * 0.3 + trazabilidad * 0.3 + disponibilidad * 0.4)
-				
-				# Tendencia vs período anterior
-				tendencia = "→"
-				if vehiculos_atendidos > vehiculos_atendidos_prev:
-					tendencia = "↗️"
-				elif vehiculos_atendidos < vehiculos_atendidos_prev:
-					tendencia = "↘️"
-				
-				# Llenar fila
-				ws_kpis.cell(row=row, column=1, value=zona)
-				ws_kpis.cell(row=row, column=2, value=vehiculos_atendidos)
-				ws_kpis.cell(row=row, column=3, value=f"{eficiencia:.1f} veh/día")
-				ws_kpis.cell(row=row, column=4, value=f"{trazabilidad:.1f}%")
-				ws_kpis.cell(row=row, column=5, value=f"{disponibilidad:.1f}%")
-				ws_kpis.cell(row=row, column=6, value=f"{kpi_general:.1f}/100")
-				ws_kpis.cell(row=row, column=7, value=tendencia)
-				
-				# Colorear según rendimiento
-				if kpi_general >= 80:
-					color = "FF00FF00"  # Verde
-				elif kpi_general >= 60:
-					color = "FFFFFF00"  # Amarillo
-				else:
-					color = "FFFF0000"  # Rojo
-				
-				for col in range(1, 8):
-					ws_kpis.cell(row=row, column=col).fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
-				
-				zonas_data.append({
-					'zona': zona,
-					'vehiculos': vehiculos_atendidos,
-					'eficiencia': eficiencia,
-					'trazabilidad': trazabilidad,
-					'disponibilidad': disponibilidad,
-					'kpi': kpi_general
-				})
+					if days > 0:
+						tiempo_taller = f"{days}d {hours}h {minutes}m"
+						tiempos_taller.append(duration.total_seconds() / 3600)  # horas
+					else:
+						tiempo_taller = f"{hours}h {minutes}m"
+						tiempos_taller.append(duration.total_seconds() / 3600)
+				
+				# Colorear si no tiene autorización o tiempo excesivo (el naranja prevalece)
+				row_fill = None
+				if not ingreso.authorization:
+					row_fill = unauthorized_fill
+				if ingreso.exit_datetime and (ingreso.exit_datetime - ingreso.entry_datetime).total_seconds() > 24 * 3600:  # Más de 24 horas
+					row_fill = overdue_fill
+				
+				# Llenar fila de datos
+				ws_data.append([
+					patent,
+					ruta_origen,
+					chofer,
+					sucursal,
+					hora_ingreso,
+					hora_salida,
+					incidencias,
+					autorizacion,
+					tiempo_taller,
+				], fill=row_fill)
+				
+				# Acumuladores para análisis
+				total_ingresos += 1
+				if ingreso.exit_datetime:
+					total_salidas += 1
 				
-				kpis_globales['total_vehiculos_atendidos'] += vehiculos_atendidos
-				row += 1
-			
-			# Fila de totales
-			ws_kpis.cell(row=row, column=1, value="TOTAL GLOBAL")
-			ws_kpis.cell(row=row, column=1).font = Font(bold=True, size=12)
-			ws_kpis.cell(row=row, column=2, value=kpis_globales['total_vehiculos_atendidos'])
-			ws_kpis.cell(row=row, column=2).font = Font(bold=True, size=12)
-			
-			# KPIs globales calculados
-			eficiencia_global = sum(z['eficiencia'] for z in zonas_data) / max(len(zonas_data), 1)
-			trazabilidad_global = sum(z['trazabilidad'] for z in zonas_data) / max(len(zonas_data), 1)
-			disponibilidad_global = sum(z['disponibilidad'] for z in zonas_data) / max(len(zonas_data), 1)
-			kpi_global_general = sum(z['kpi'] for z in zonas_data) / max(len(zonas_data), 1)
-			
-			ws_kpis.cell(row=row, column=3, value=f"{eficiencia_global:.1f} veh/día")
-			ws_kpis.cell(row=row, column=3).font = Font(bold=True, size=12)
-			ws_kpis.cell(row=row, column=4, value=f"{trazabilidad_global:.1f}%")
-			ws_kpis.cell(row=row, column=4).font = Font(bold=True, size=12)
-			ws_kpis.cell(row=row, column=5, value=f"{disponibilidad_global:.1f}%")
-			ws_kpis.cell(row=row, column=5).font = Font(bold=True, size=12)
-			ws_kpis.cell(row=row, column=6, value=f"{kpi_global_general:.1f}/100")
-			ws_kpis.cell(row=row, column=6).font = Font(bold=True, size=12)
-			ws_kpis.cell(row=row, column=7, value="📊")
-			ws_kpis.cell(row=row, column=7).font = Font(bold=True, size=12)
-			
-			# Colorear fila de totales
-			for col in range(1, 8):
-				ws_kpis.cell(row=row, column=col).fill = PatternFill(start_color="FFE6E6FA", end_color="FFE6E6FA", fill_type="solid")
-			
-			# Autoajustar columnas
-			for column in ws_kpis.columns:
-				max_length = 0
-				column_letter = None
-				for cell in column:
-					try:
-						if hasattr(cell, 'column_letter'):
-							column_letter = cell.column_letter
-						if len(str(cell.value)) > max_length:
-							max_length = len(str(cell.value))
-					except:
-						pass
-				if column_letter:
-					ws_kpis.column_dimensions[column_letter].width = min(max_length + 3, 20)
-			
-			# Crear hoja de Dashboard con Gauges
-			ws_dashboard = wb.create_sheet("Dashboard KPIs")
-			
-			ws_dashboard['A1'] = "DASHBOARD DE INDICADORES DE FLOTA"
-			ws_dashboard['A1'].font = Font(size=16, bold=True, color="FF0000FF")
-			ws_dashboard.merge_cells('A1:I1')
-			ws_dashboard['A1'].alignment = Alignment(horizontal='center')
-			
-			# KPIs principales en formato gauge simulado
-			ws_dashboard['A3'] = "KPIs PRINCIPALES"
-			ws_dashboard['A3'].font = Font(bold=True, size=14)
-			ws_dashboard.merge_cells('A3:C3')
-			
-			# KPI General
-			ws_dashboard['A5'] = "KPI GENERAL"
-			ws_dashboard['A6'] = f"{kpi_global_general:.1f}/100"
-			ws_dashboard['A5'].font = Font(bold=True)
-			ws_dashboard['A6'].font = Font(size=24, bold=True, color="FF0000FF")
-			
-			# Eficiencia Global
-			ws_dashboard['D5'] = "EFICIENCIA GLOBAL"
-			ws_dashboard['D6'] = f"{eficiencia_global:.1f} veh/día"
-			ws_dashboard['D5'].font = Font(bold=True)
-			ws_dashboard['D6'].font = Font(size=20, bold=True, color="FF008000")
-			
-			# Disponibilidad
-			ws_dashboard['G5'] = "DISPONIBILIDAD FLOTA"
-			ws_dashboard['G6'] = f"{disponibilidad_global:.1f}%"
-			ws_dashboard['G5'].font = Font(bold=True)
-			ws_dashboard['G6'].font = Font(size=20, bold=True, color="FF800080")
-			
-			# Gráfico de barras por zona
-			ws_dashboard['A10'] = "DESEMPEÑO POR ZONA"
-			ws_dashboard['A10'].font = Font(bold=True, size=14)
-			ws_dashboard.merge_cells('A10:C10')
-			
-			# Datos para gráfico
-			ws_dashboard['A12'] = 'Zona'
-			ws_dashboard['B12'] = 'KPI'
-			ws_dashboard['C12'] = 'Vehículos'
-			ws_dashboard['A12'].font = Font(bold=True)
-			ws_dashboard['B12'].font = Font(bold=True)
-			ws_dashboard['C12'].font = Font(bold=True)
+				# Por zona
+				zona = sucursal
+				if zona not in vehiculos_por_zona:
+					vehiculos_por_zona[zona] = {'ingresos': 0, 'salidas': 0}
+				vehiculos_por_zona[zona]['ingresos'] += 1
+				if ingreso.exit_datetime:
+					vehiculos_por_zona[zona]['salidas'] += 1
+				
+				# Por día - contar tanto entradas como salidas
+				dia_entrada = ingreso.entry_datetime.date().strftime('%Y-%m-%d')
+				if dia_entrada not in ingresos_por_dia:
+					ingresos_por_dia[dia_entrada] = 0
+				ingresos_por_dia[dia_entrada] += 1
+				
+				# Si hay salida, también contar el día de salida
+				if ingreso.exit_datetime:
+					dia_salida = ingreso.exit_datetime.date().strftime('%Y-%m-%d')
+					if dia_salida != dia_entrada:  # Evitar duplicar si entrada y salida son el mismo día
+						if dia_salida not in ingresos_por_dia:
+							ingresos_por_dia[dia_salida] = 0
+						ingresos_por_dia[dia_salida] += 1
+				
+			except Exception as e:
+				# Si hay error con un ingreso específico, continuar
+				continue
+		ws_data.close()
+		
+		# Crear hoja de análisis
+		ws_analysis = book.layout_sheet("Análisis")
+		
+		ws_analysis['A1'] = "ANÁLISIS DE VEHÍCULOS INGRESADOS/SALIDOS"
+		ws_analysis['A1'].font = Font(size=16, bold=True)
+		ws_analysis.merge_cells('A1:F1')
+		ws_analysis['A1'].alignment = Alignment(horizontal='center')
+		
+		ws_analysis['A2'] = f"Período: {period_name}"
+		ws_analysis['A2'].font = Font(bold=True)
+		ws_analysis.merge_cells('A2:F2')
+		ws_analysis['A2'].alignment = Alignment(horizontal='center')
+		
+		# KPIs principales
+		ws_analysis['A4'] = "KPI"
+		ws_analysis['B4'] = "Valor"
+		ws_analysis['C4'] = "Fórmula"
+		ws_analysis['A4'].font = Font(bold=True)
+		ws_analysis['B4'].font = Font(bold=True)
+		ws_analysis['C4'].font = Font(bold=True)
+		
+		# Calcular KPIs mejorados
+		tiempo_promedio = sum(tiempos_taller) / len(tiempos_taller) if tiempos_taller else 0
+		tasa_ocupacion = (total_ingresos - total_salidas) / max(total_ingresos, 1) * 100 if total_ingresos > 0 else 0
+		
+		# KPIs adicionales
+		eficiencia_reparacion = (total_salidas / max(total_ingresos, 1)) * 100 if total_ingresos > 0 else 0
+		vehiculos_retraso = sum(1 for t in tiempos_taller if t > 24)  # Más de 24 horas
+		tasa_autorizacion = total_autorizados / max(total_registros, 1) * 100
+		vehiculos_sin_autorizacion = total_registros - total_autorizados
+		
+		kpis = [
+			["Total Ingresos", total_ingresos, ""],
+			["Total Salidas", total_salidas, ""],
+			["Vehículos en Taller", total_ingresos - total_salidas, ""],
+			["Tiempo Promedio en Taller", f"{round(tiempo_promedio, 1)} horas", "Promedio de tiempos de estadía"],
+			["Tasa de Ocupación", f"{round(tasa_ocupacion, 1)}%", "(Ingresos - Salidas) / Ingresos × 100"],
+			["Eficiencia de Reparación", f"{round(eficiencia_reparacion, 1)}%", "Salidas / Ingresos × 100"],
+			["Vehículos con Retraso (>24h)", vehiculos_retraso, ""],
+			["Tasa de Autorización", f"{round(tasa_autorizacion, 1)}%", ""],
+			["Vehículos sin Autorización", vehiculos_sin_autorizacion, ""],
+		]
+		
+		for i, (kpi, value, formula) in enumerate(kpis, 5):
+			ws_analysis.cell(row=i, column=1, value=kpi)
+			ws_analysis.cell(row=i, column=2, value=value)
+			ws_analysis.cell(row=i, column=3, value=formula)
+		
+		# Análisis por zona
+		ws_analysis['E4'] = "VEHÍCULOS POR ZONA"
+		ws_analysis['E4'].font = Font(bold=True)
+		ws_analysis.merge_cells('E4:G4')
+		
+		ws_analysis['E5'] = "Zona"
+		ws_analysis['F5'] = "Ingresos"
+		ws_analysis['G5'] = "Salidas"
+		ws_analysis['E5'].font = Font(bold=True)
+		ws_analysis['F5'].font = Font(bold=True)
+		ws_analysis['G5'].font = Font(bold=True)
+		
+		row = 6
+		for zona, data in sorted(vehiculos_por_zona.items()):
+			ws_analysis.cell(row=row, column=5, value=zona)
+			ws_analysis.cell(row=row, column=6, value=data['ingresos'])
+			ws_analysis.cell(row=row, column=7, value=data['salidas'])
+			row += 1
+		
+		# Crear hoja de gráficos
+		ws_charts = book.layout_sheet("Gráficos", max_width=25)
+		
+		# Gráfico de barras para ingresos vs salidas por zona
+		if vehiculos_por_zona:
+			ws_charts['A1'] = 'Ingresos vs Salidas por Zona'
+			ws_charts['A1'].font = Font(size=14, bold=True)
+			ws_charts['A2'] = 'Zona'
+			ws_charts['B2'] = 'Ingresos'
+			ws_charts['C2'] = 'Salidas'
+			ws_charts['A2'].font = Font(bold=True)
+			ws_charts['B2'].font = Font(bold=True)
+			ws_charts['C2'].font = Font(bold=True)
 			
-			for i, zona_data in enumerate(zonas_data, 13):
-				ws_dashboard.cell(row=i, column=1, value=zona_data['zona'])
-				ws_dashboard.cell(row=i, column=2, value=zona_data['kpi'])
-				ws_dashboard.cell(row=i, column=3, value=zona_data['vehiculos'])
+			row_chart = 3
+			for zona, data in sorted(vehiculos_por_zona.items(), key=lambda x: x[1]['ingresos'], reverse=True):
+				ws_charts.cell(row=row_chart, column=1, value=zona)
+				ws_charts.cell(row=row_chart, column=2, value=data['ingresos'])
+				ws_charts.cell(row=row_chart, column=3, value=data['salidas'])
+				row_chart += 1
 			
-			# Crear gráfico de barras
+			# Crear gráfico de barras agrupadas
 			from openpyxl.chart import BarChart, Reference
 			bar_chart = BarChart()
 			bar_chart.type = "col"
 			bar_chart.style = 10
-			bar_chart.title = "KPI por Zona"
-			bar_chart.y_axis.title = 'Valor KPI'
+			bar_chart.title = "Ingresos vs Salidas por Zona"
+			bar_chart.y_axis.title = 'Cantidad'
 			bar_chart.x_axis.title = 'Zona'
 			
-			data_kpi = Reference(ws_dashboard, min_col=2, min_row=12, max_row=len(zonas_data)+12)
-			cats_zona = Reference(ws_dashboard, min_col=1, min_row=13, max_row=len(zonas_data)+12)
-			
-			bar_chart.add_data(data_kpi, titles_from_data=True)
-			bar_chart.set_categories(cats_zona)
-			
-			ws_dashboard.add_chart(bar_chart, "E10")
-			
-			# Indicadores de decisión
-			ws_dashboard['A20'] = "INDICADORES DE DECISIÓN"
-			ws_dashboard['A20'].font = Font(bold=True, size=14)
-			ws_dashboard.merge_cells('A20:I20')
-			
-			ws_dashboard['A22'] = "🚨 ACCIONES RECOMENDADAS:"
-			ws_dashboard['A22'].font = Font(bold=True, color="FFFF0000")
-			
-			# Lógica para recomendaciones
-			recomendaciones = []
-			if kpi_global_general < 70:
-				recomendaciones.append("• Revisar procesos de mantenimiento en zonas con bajo rendimiento")
-			if eficiencia_global < 2:
-				recomendaciones.append("• Optimizar distribución de mecánicos por zona")
-			if disponibilidad_global < 80:
-				recomendaciones.append("• Implementar sistema de alertas para vehículos pendientes")
-			if trazabilidad_global < 70:
-				recomendaciones.append("• Mejorar control de calidad y reducción de errores")
-			
-			if not recomendaciones:
-				recomendaciones.append("• Todos los indicadores en niveles óptimos ✓")
-			
-			for i, rec in enumerate(recomendaciones, 23):
-				ws_dashboard.cell(row=i, column=1, value=rec)
+			data_ingresos = Reference(ws_charts, min_col=2, min_row=2, max_row=row_chart-1)
+			data_salidas = Reference(ws_charts, min_col=3, min_row=2, max_row=row_chart-1)
+			cats = Reference(ws_charts, min_col=1, min_row=3, max_row=row_chart-1)
 			
-			# Comparativo con período anterior
-			ws_dashboard['A30'] = "COMPARATIVO CON PERÍODO ANTERIOR"
-			ws_dashboard['A30'].font = Font(bold=True, size=14)
-			ws_dashboard.merge_cells('A30:I30')
+			bar_chart.add_data(data_ingresos, titles_from_data=True)
+			bar_chart.add_data(data_salidas, titles_from_data=True)
+			bar_chart.set_categories(cats)
 			
-			# Calcular métricas del período anterior
-			prev_vehiculos = previous_period_data.count()
-			current_vehiculos = current_period_data.count()
-			
-			variacion = ((current_vehiculos - prev_vehiculos) / max(prev_vehiculos, 1)) * 100
-			
-			ws_dashboard['A32'] = f"Período Actual: {current_vehiculos} vehículos"
-			ws_dashboard['A33'] = f"Período Anterior: {prev_vehiculos} vehículos"
-			ws_dashboard['A34'] = f"Variación: {variacion:+.1f}%"
-			
-			if variacion > 0:
-				ws_dashboard['A34'].font = Font(color="FF008000", bold=True)  # Verde
-			elif variacion < 0:
-				ws_dashboard['A34'].font = Font(color="FFFF0000", bold=True)  # Rojo
+			ws_charts.add_chart(bar_chart, "E2")
+		
+		# Gráfico de líneas para ingresos por día
+		if ingresos_por_dia:
+			ws_charts.cell(row=1, column=6, value='Ingresos Diarios')
+			ws_charts.cell(row=1, column=6).font = Font(size=14, bold=True)
+			ws_charts.cell(row=2, column=6, value='Fecha')
+			ws_charts.cell(row=2, column=7, value='Ingresos')
+			ws_charts.cell(row=2, column=6).font = Font(bold=True)
+			ws_charts.cell(row=2, column=7).font = Font(bold=True)
+			
+			row_line = 3
+			for fecha, cantidad in sorted(ingresos_por_dia.items()):
+				ws_charts.cell(row=row_line, column=6, value=fecha)
+				ws_charts.cell(row=row_line, column=7, value=cantidad)
+				row_line += 1
+			
+			# Crear gráfico de líneas
+			from openpyxl.chart import LineChart
+			line_chart = LineChart()
+			line_chart.title = "Ingresos Diarios de Vehículos"
+			line_chart.style = 12
+			line_chart.y_axis.title = 'Cantidad de Ingresos'
+			line_chart.x_axis.title = 'Fecha'
+			
+			data_line = Reference(ws_charts, min_col=7, min_row=2, max_row=row_line-1)
+			cats_line = Reference(ws_charts, min_col=6, min_row=3, max_row=row_line-1)
+			line_chart.add_data(data_line, titles_from_data=True)
+			line_chart.set_categories(cats_line)
+			
+			ws_charts.add_chart(line_chart, "I2")
+	
+	elif report_type == 'kpis_flota':
+		# Reporte de Indicadores de Flota (KPIs Globales)
+		from .fleet_kpis import fleet_kpi_period, fleet_kpis
+		
+		# Mes actual vs mes anterior; los conteos de todas las zonas salen de una consulta
+		period = fleet_kpi_period(params.get('periodo', 'mensual'))
+		period_name = period['name']
+		current_month_start = period['current_start']
+		kpis = fleet_kpis(period)
+		zonas_data = kpis['zones']
+		
+		# Crear hoja de KPIs Flota
+		ws_kpis = book.layout_sheet("KPIs Flota", max_width=20, padding=3)
+		
+		ws_kpis['A1'] = "INDICADORES DE FLOTA (KPIs GLOBALES)"
+		ws_kpis['A1'].font = Font(size=18, bold=True, color="FF0000FF")
+		ws_kpis.merge_cells('A1:G1')
+		ws_kpis['A1'].alignment = Alignment(horizontal='center')
+		
+		ws_kpis['A2'] = f"Período: {period_name}"
+		ws_kpis['A2'].font = Font(size=12, bold=True)
+		ws_kpis.merge_cells('A2:G2')
+		ws_kpis['A2'].alignment = Alignment(horizontal='center')
+		
+		# Encabezados de la tabla principal
+		headers = [
+			'Zona', 'Vehículos Atendidos', 'Eficiencia Mecánicos', 
+			'Trazabilidad', 'Indicadores Flota', 'KPI General', 'Tendencia'
+		]
+		
+		for col, header in enumerate(headers, 1):
+			ws_kpis.cell(row=4, column=col, value=header)
+			ws_kpis.cell(row=4, column=col).font = Font(bold=True, size=11)
+			ws_kpis.cell(row=4, column=col).fill = PatternFill(start_color="FFCCCCCC", end_color="FFCCCCCC", fill_type="solid")
+			ws_kpis.cell(row=4, column=col).alignment = Alignment(horizontal='center')
+		
+		# Métricas por zona
+		row = 5
+		for zona_data in zonas_data:
+			kpi_general = zona_data['kpi']
+			
+			# Llenar fila
+			ws_kpis.cell(row=row, column=1, value=zona_data['zona'])
+			ws_kpis.cell(row=row, column=2, value=zona_data['vehiculos'])
+			ws_kpis.cell(row=row, column=3, value=f"{zona_data['eficiencia']:.1f} veh/día")
+			ws_kpis.cell(row=row, column=4, value=f"{zona_data['trazabilidad']:.1f}%")
+			ws_kpis.cell(row=row, column=5, value=f"{zona_data['disponibilidad']:.1f}%")
+			ws_kpis.cell(row=row, column=6, value=f"{kpi_general:.1f}/100")
+			ws_kpis.cell(row=row, column=7, value=zona_data['tendencia'])
+			
+			# Colorear según rendimiento
+			if kpi_general >= 80:
+				color = "FF00FF00"  # Verde
+			elif kpi_general >= 60:
+				color = "FFFFFF00"  # Amarillo
 			else:
-				ws_dashboard['A34'].font = Font(color="FF000000", bold=True)  # Negro
-			
-			# Crear hoja de datos para Power BI
-			ws_powerbi = wb.create_sheet("Datos Power BI")
-			
-			ws_powerbi['A1'] = "DATOS PARA POWER BI - KPIs FLOTA"
-			ws_powerbi['A1'].font = Font(size=14, bold=True)
-			ws_powerbi.merge_cells('A1:F1')
-			
-			# Encabezados para Power BI
-			headers_pb = ['Fecha', 'Zona', 'Vehículos_Atendidos', 'Eficiencia_Mecánicos', 'Trazabilidad', 'Disponibilidad_Flota', 'KPI_General']
-			
-			for col, header in enumerate(headers_pb, 1):
-				ws_powerbi.cell(row=3, column=col, value=header)
-				ws_powerbi.cell(row=3, column=col).font = Font(bold=True)
-			
-			# Datos para Power BI (período actual)
-			row_pb = 4
-			for zona_data in zonas_data:
-				ws_powerbi.cell(row=row_pb, column=1, value=current_month_start.strftime('%Y-%m-%d'))
-				ws_powerbi.cell(row=row_pb, column=2, value=zona_data['zona'])
-				ws_powerbi.cell(row=row_pb, column=3, value=zona_data['vehiculos'])
-				ws_powerbi.cell(row=row_pb, column=4, value=round(zona_data['eficiencia'], 2))
-				ws_powerbi.cell(row=row_pb, column=5, value=round(zona_data['trazabilidad'], 2))
-				ws_powerbi.cell(row=row_pb, column=6, value=round(zona_data['disponibilidad'], 2))
-				ws_powerbi.cell(row=row_pb, column=7, value=round(zona_data['kpi'], 2))
-				row_pb += 1
-			
-			# VBA comentado - reemplazado con hoja de instrucciones simple
-			ws_vba = wb.create_sheet("Dashboard Info")
-			ws_vba['A1'] = "INSTRUCCIONES DASHBOARD"
-			ws_vba['A1'].font = Font(size=14, bold=True)
-			ws_vba.merge_cells('A1:D1')
-			ws_vba['A1'].alignment = Alignment(horizontal='center')
-			
-			ws_vba['A3'] = "Dashboard KPIs Flota incluye:"
-			ws_vba['A3'].font = Font(bold=True)
-			
-			info = [
-				"• KPIs calculados por zona real",
-				"• Gráfico de rendimiento por zona", 
-				"• Datos exportables a Power BI",
-				"• Análisis de tendencias mensual",
-				"• Colores según nivel de rendimiento",
-				"",
-				"VBA avanzado disponible en versiones futuras."
-			]
-			
-			for i, item in enumerate(info, 5):
-				ws_vba.cell(row=i, column=1, value=item)
+				color = "FFFF0000"  # Rojo
 			
-			ws_vba.column_dimensions['A'].width = 50
-			
-			info = [
-				"• KPIs calculados por zona real",
-				"• Gráfico de rendimiento por zona", 
-				"• Datos exportables a Power BI",
-				"• Análisis de tendencias mensual",
-				"• Colores según nivel de rendimiento",
-				"",
-				"VBA avanzado disponible en versiones futuras."
-			]
-			
-			for i, item in enumerate(info, 5):
-				ws_vba.cell(row=i, column=1, value=item)
-			
-			ws_vba.column_dimensions['A'].width = 50
+			for col in range(1, 8):
+				ws_kpis.cell(row=row, column=col).fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
+			row += 1
+		
+		# Fila de totales
+		ws_kpis.cell(row=row, column=1, value="TOTAL GLOBAL")
+		ws_kpis.cell(row=row, column=1).font = Font(bold=True, size=12)
+		ws_kpis.cell(row=row, column=2, value=kpis['totals']['vehiculos'])
+		ws_kpis.cell(row=row, column=2).font = Font(bold=True, size=12)
+		
+		# KPIs globales (promedio de las zonas)
+		eficiencia_global = kpis['totals']['eficiencia']
+		trazabilidad_global = kpis['totals']['trazabilidad']
+		disponibilidad_global = kpis['totals']['disponibilidad']
+		kpi_global_general = kpis['totals']['kpi']
+		
+		ws_kpis.cell(row=row, column=3, value=f"{eficiencia_global:.1f} veh/día")
+		ws_kpis.cell(row=row, column=3).font = Font(bold=True, size=12)
+		ws_kpis.cell(row=row, column=4, value=f"{trazabilidad_global:.1f}%")
+		ws_kpis.cell(row=row, column=4).font = Font(bold=True, size=12)
+		ws_kpis.cell(row=row, column=5, value=f"{disponibilidad_global:.1f}%")
+		ws_kpis.cell(row=row, column=5).font = Font(bold=True, size=12)
+		ws_kpis.cell(row=row, column=6, value=f"{kpi_global_general:.1f}/100")
+		ws_kpis.cell(row=row, column=6).font = Font(bold=True, size=12)
+		ws_kpis.cell(row=row, column=7, value="📊")
+		ws_kpis.cell(row=row, column=7).font = Font(bold=True, size=12)
+		
+		# Colorear fila de totales
+		for col in range(1, 8):
+			ws_kpis.cell(row=row, column=col).fill = PatternFill(start_color="FFE6E6FA", end_color="FFE6E6FA", fill_type="solid")
+		
+		# Crear hoja de Dashboard con Gauges
+		ws_dashboard = book.layout_sheet("Dashboard KPIs", max_width=None)
+		
+		ws_dashboard['A1'] = "DASHBOARD DE INDICADORES DE FLOTA"
+		ws_dashboard['A1'].font = Font(size=16, bold=True, color="FF0000FF")
+		ws_dashboard.merge_cells('A1:I1')
+		ws_dashboard['A1'].alignment = Alignment(horizontal='center')
 		
+		# KPIs principales en formato gauge simulado
+		ws_dashboard['A3'] = "KPIs PRINCIPALES"
+		ws_dashboard['A3'].font = Font(bold=True, size=14)
+		ws_dashboard.merge_cells('A3:C3')
+		
+		# KPI General
+		ws_dashboard['A5'] = "KPI GENERAL"
+		ws_dashboard['A6'] = f"{kpi_global_general:.1f}/100"
+		ws_dashboard['A5'].font = Font(bold=True)
+		ws_dashboard['A6'].font = Font(size=24, bold=True, color="FF0000FF")
+		
+		# Eficiencia Global
+		ws_dashboard['D5'] = "EFICIENCIA GLOBAL"
+		ws_dashboard['D6'] = f"{eficiencia_global:.1f} veh/día"
+		ws_dashboard['D5'].font = Font(bold=True)
+		ws_dashboard['D6'].font = Font(size=20, bold=True, color="FF008000")
+		
+		# Disponibilidad
+		ws_dashboard['G5'] = "DISPONIBILIDAD FLOTA"
+		ws_dashboard['G6'] = f"{disponibilidad_global:.1f}%"
+		ws_dashboard['G5'].font = Font(bold=True)
+		ws_dashboard['G6'].font = Font(size=20, bold=True, color="FF800080")
+		
+		# Gráfico de barras por zona
+		ws_dashboard['A10'] = "DESEMPEÑO POR ZONA"
+		ws_dashboard['A10'].font = Font(bold=True, size=14)
+		ws_dashboard.merge_cells('A10:C10')
+		
+		# Datos para gráfico
+		ws_dashboard['A12'] = 'Zona'
+		ws_dashboard['B12'] = 'KPI'
+		ws_dashboard['C12'] = 'Vehículos'
+		ws_dashboard['A12'].font = Font(bold=True)
+		ws_dashboard['B12'].font = Font(bold=True)
+		ws_dashboard['C12'].font = Font(bold=True)
+		
+		for i, zona_data in enumerate(zonas_data, 13):
+			ws_dashboard.cell(row=i, column=1, value=zona_data['zona'])
+			ws_dashboard.cell(row=i, column=2, value=zona_data['kpi'])
+			ws_dashboard.cell(row=i, column=3, value=zona_data['vehiculos'])
+		
+		# Crear gráfico de barras
+		from openpyxl.chart import BarChart, Reference
+		bar_chart = BarChart()
+		bar_chart.type = "col"
+		bar_chart.style = 10
+		bar_chart.title = "KPI por Zona"
+		bar_chart.y_axis.title = 'Valor KPI'
+		bar_chart.x_axis.title = 'Zona'
+		
+		data_kpi = Reference(ws_dashboard, min_col=2, min_row=12, max_row=len(zonas_data)+12)
+		cats_zona = Reference(ws_dashboard, min_col=1, min_row=13, max_row=len(zonas_data)+12)
+		
+		bar_chart.add_data(data_kpi, titles_from_data=True)
+		bar_chart.set_categories(cats_zona)
+		
+		ws_dashboard.add_chart(bar_chart, "E10")
+		
+		# Indicadores de decisión
+		ws_dashboard['A20'] = "INDICADORES DE DECISIÓN"
+		ws_dashboard['A20'].font = Font(bold=True, size=14)
+		ws_dashboard.merge_cells('A20:I20')
+		
+		ws_dashboard['A22'] = "🚨 ACCIONES RECOMENDADAS:"
+		ws_dashboard['A22'].font = Font(bold=True, color="FFFF0000")
+		
+		# Lógica para recomendaciones
+		recomendaciones = []
+		if kpi_global_general < 70:
+			recomendaciones.append("• Revisar procesos de mantenimiento en zonas con bajo rendimiento")
+		if eficiencia_global < 2:
+			recomendaciones.append("• Optimizar distribución de mecánicos por zona")
+		if disponibilidad_global < 80:
+			recomendaciones.append("• Implementar sistema de alertas para vehículos pendientes")
+		if trazabilidad_global < 70:
+			recomendaciones.append("• Mejorar control de calidad y reducción de errores")
+		
+		if not recomendaciones:
+			recomendaciones.append("• Todos los indicadores en niveles óptimos ✓")
+		
+		for i, rec in enumerate(recomendaciones, 23):
+			ws_dashboard.cell(row=i, column=1, value=rec)
+		
+		# Comparativo con período anterior
+		ws_dashboard['A30'] = "COMPARATIVO CON PERÍODO ANTERIOR"
+		ws_dashboard['A30'].font = Font(bold=True, size=14)
+		ws_dashboard.merge_cells('A30:I30')
+		
+		# Métricas del período anterior (sumadas de las mismas filas por zona)
+		prev_vehiculos = kpis['totals']['vehiculos_prev']
+		current_vehiculos = kpis['totals']['vehiculos']
+		variacion = kpis['totals']['variacion']
+		
+		ws_dashboard['A32'] = f"Período Actual: {current_vehiculos} vehículos"
+		ws_dashboard['A33'] = f"Período Anterior: {prev_vehiculos} vehículos"
+		ws_dashboard['A34'] = f"Variación: {variacion:+.1f}%"
+		
+		if variacion > 0:
+			ws_dashboard['A34'].font = Font(color="FF008000", bold=True)  # Verde
+		elif variacion < 0:
+			ws_dashboard['A34'].font = Font(color="FFFF0000", bold=True)  # Rojo
 		else:
-			# Tipo de reporte no implementado aún
-			ws = wb.active
-			ws.title = "Reporte No Disponible"
-			
-			ws['A1'] = f"REPORTE '{report_type.replace('_', ' ').upper()}' NO IMPLEMENTADO AÚN"
-			ws['A1'].font = Font(size=14, bold=True)
-			ws.merge_cells('A1:D1')
-			ws['A1'].alignment = Alignment(horizontal='center')
-			
-			ws['A3'] = "Este tipo de reporte estará disponible próximamente."
-			ws['A3'].font = Font(italic=True)
+			ws_dashboard['A34'].font = Font(color="FF000000", bold=True)  # Negro
 		
-		# Preparar respuesta HTTP
-		buffer = BytesIO()
-		wb.save(buffer)
-		buffer.seek(0)
+		# Crear hoja de datos para Power BI
+		ws_powerbi = book.layout_sheet("Datos Power BI", max_width=None)
 		
-		response = HttpResponse(
-			buffer.getvalue(),
-			content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-		)
-		response['Content-Disposition'] = f'attachment; filename="{report_type}_{now.strftime("%Y%m%d_%H%M%S")}.xlsx"'
+		ws_powerbi['A1'] = "DATOS PARA POWER BI - KPIs FLOTA"
+		ws_powerbi['A1'].font = Font(size=14, bold=True)
+		ws_powerbi.merge_cells('A1:F1')
 		
-		return response
+		# Encabezados para Power BI
+		headers_pb = ['Fecha', 'Zona', 'Vehículos_Atendidos', 'Eficiencia_Mecánicos', 'Trazabilidad', 'Disponibilidad_Flota', 'KPI_General']
 		
-	except ImportError:
-		messages.error(request, 'La librería openpyxl no está instalada. Instale con: pip install openpyxl')
-		return redirect('document_upload:reports_dashboard')
-	except Exception as e:
-		messages.error(request, f'Error al generar el reporte: {str(e)}')
-		return redirect('document_upload:reports_dashboard')
+		for col, header in enumerate(headers_pb, 1):
+			ws_powerbi.cell(row=3, column=col, value=header)
+			ws_powerbi.cell(row=3, column=col).font = Font(bold=True)
+		
+		# Datos para Power BI (período actual)
+		row_pb = 4
+		for zona_data in zonas_data:
+			ws_powerbi.cell(row=row_pb, column=1, value=current_month_start.strftime('%Y-%m-%d'))
+			ws_powerbi.cell(row=row_pb, column=2, value=zona_data['zona'])
+			ws_powerbi.cell(row=row_pb, column=3, value=zona_data['vehiculos'])
+			ws_powerbi.cell(row=row_pb, column=4, value=round(zona_data['eficiencia'], 2))
+			ws_powerbi.cell(row=row_pb, column=5, value=round(zona_data['trazabilidad'], 2))
+			ws_powerbi.cell(row=row_pb, column=6, value=round(zona_data['disponibilidad'], 2))
+			ws_powerbi.cell(row=row_pb, column=7, value=round(zona_data['kpi'], 2))
+			row_pb += 1
+		
+		# VBA comentado - reemplazado con hoja de instrucciones simple
+		ws_vba = book.layout_sheet("Dashboard Info", max_width=None)
+		ws_vba['A1'] = "INSTRUCCIONES DASHBOARD"
+		ws_vba['A1'].font = Font(size=14, bold=True)
+		ws_vba.merge_cells('A1:D1')
+		ws_vba['A1'].alignment = Alignment(horizontal='center')
+		
+		ws_vba['A3'] = "Dashboard KPIs Flota incluye:"
+		ws_vba['A3'].font = Font(bold=True)
+		
+		info = [
+			"• KPIs calculados por zona real",
+			"• Gráfico de rendimiento por zona", 
+			"• Datos exportables a Power BI",
+			"• Análisis de tendencias mensual",
+			"• Colores según nivel de rendimiento",
+			"",
+			"VBA avanzado disponible en versiones futuras."
+		]
+		
+		for i, item in enumerate(info, 5):
+			ws_vba.cell(row=i, column=1, value=item)
+		
+		ws_vba.column_dimensions['A'].width = 50
+		
+		info = [
+			"• KPIs calculados por zona real",
+			"• Gráfico de rendimiento por zona", 
+			"• Datos exportables a Power BI",
+			"• Análisis de tendencias mensual",
+			"• Colores según nivel de rendimiento",
+			"",
+			"VBA avanzado disponible en versiones futuras."
+		]
+		
+		for i, item in enumerate(info, 5):
+			ws_vba.cell(row=i, column=1, value=item)
+		
+		ws_vba.column_dimensions['A'].width = 50
+	
+	else:
+		# Tipo de reporte no implementado aún
+		ws = book.layout_sheet("Reporte No Disponible")
+		
+		ws['A1'] = f"REPORTE '{report_type.replace('_', ' ').upper()}' NO IMPLEMENTADO AÚN"
+		ws['A1'].font = Font(size=14, bold=True)
+		ws.merge_cells('A1:D1')
+		ws['A1'].alignment = Alignment(horizontal='center')
+		
+		ws['A3'] = "Este tipo de reporte estará disponible próximamente."
+		ws['A3'].font = Font(italic=True)
+
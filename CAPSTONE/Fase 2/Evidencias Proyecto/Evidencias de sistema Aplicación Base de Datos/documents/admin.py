@@ -3,7 +3,8 @@ from .models import (
     Site, SAPEquipment, CECO, VehicleType, VehicleStatus, Vehicle,
     Role, UserStatus, FlotaUser, Route, ServiceType, Ingreso,
     Task, TaskAssignment, Pause, Document, Repuesto, Notification,
-    Report, MaintenanceSchedule, Incident, IncidentImage, IngresoImage
+    Report, MaintenanceSchedule, Incident, IncidentImage, IngresoImage,
+    WorkShift, Holiday
 )
 
 # Register your models here.
@@ -27,6 +28,8 @@ admin.site.register(MaintenanceSchedule)
 admin.site.register(Incident)
 admin.site.register(IncidentImage)
 admin.site.register(IngresoImage)
+admin.site.register(WorkShift)
+admin.site.register(Holiday)
 
 
 # Clases de admin personalizadas para mejor gestión
@@ -0,0 +1,142 @@
+"""
+Procesamiento en segundo plano de las fotos de ingresos, incidentes y OTs.
+
+Las fotos tomadas con celular llegan de varios MB. Al crear el registro, la
+foto se encola (al confirmarse la transacción) en un pool de hilos que la
+reorienta según EXIF, la reescala a IMAGE_MAX_DIMENSION, la recodifica como
+JPEG y genera una miniatura de IMAGE_THUMBNAIL_SIZE. Las rutas de ambas
+variantes quedan en el registro y processing_status indica si ya está lista.
+Antes de procesar, cada foto se toma pasándola a 'processing' con un UPDATE
+condicional, así el pool y el comando nunca trabajan la misma foto a la vez.
+El comando `process_pending_images` procesa lo que haya quedado pendiente
+(fotos antiguas o trabajos perdidos al reiniciar el servidor) y devuelve a la
+cola las que llevan más de STALE_AFTER en 'processing'.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+JPEG_QUALITY = 85
+# Una foto en 'processing' más antigua que esto se considera perdida
+STALE_AFTER = timedelta(minutes=30)
+IMAGE_MODELS = ['documents.IncidentImage', 'documents.IngresoImage', 'documents.WorkOrderImage']
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_PROCESSING_WORKERS, thread_name_prefix='image-processing'
+        )
+    return _executor
+
+
+def _encode_jpeg(image, max_dimension):
+    """Copia de la imagen acotada a max_dimension por lado, como JPEG"""
+    image = image.copy()
+    image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+    return ContentFile(buffer.getvalue())
+
+
+def _save_variant(instance, field_name, base_name, content):
+    field = instance._meta.get_field(field_name)
+    name = field.generate_filename(instance, f'{base_name}.jpg')
+    return field.storage.save(name, content)
+
+
+def process_image(model_label, pk, statuses=('pending',)):
+    """
+    Genera las variantes de una foto con alguno de los estados dados y las
+    registra. Retorna True si quedó procesada; False si falló o si ya la tomó
+    otro proceso.
+    """
+    model = apps.get_model(model_label)
+    claimed = model.objects.filter(pk=pk, processing_status__in=statuses).update(
+        processing_status='processing', processing_started_at=timezone.now()
+    )
+    if not claimed:
+        return False
+    instance = model.objects.get(pk=pk)
+    if not instance.image:
+        model.objects.filter(pk=pk).update(processing_status='failed')
+        return False
+
+    original_name = instance.image.name
+    try:
+        with instance.image.open('rb') as source:
+            image = Image.open(source)
+            image.load()
+        image = ImageOps.exif_transpose(image).convert('RGB')
+
+        base_name = os.path.splitext(os.path.basename(original_name))[0]
+        image_name = _save_variant(
+            instance, 'image', base_name, _encode_jpeg(image, settings.IMAGE_MAX_DIMENSION)
+        )
+        thumbnail_name = _save_variant(
+            instance, 'thumbnail', base_name, _encode_jpeg(image, settings.IMAGE_THUMBNAIL_SIZE)
+        )
+    except Exception:
+        logger.exception('No se pudo procesar la foto %s #%s', model_label, pk)
+        model.objects.filter(pk=pk).update(processing_status='failed')
+        return False
+
+    # update() en lugar de save() para no volver a disparar el signal de creación
+    model.objects.filter(pk=pk).update(
+        image=image_name, thumbnail=thumbnail_name, processing_status='ready'
+    )
+    if image_name != original_name:
+        instance.image.storage.delete(original_name)
+    return True
+
+
+def _process_in_worker(model_label, pk):
+    try:
+        process_image(model_label, pk)
+    finally:
+        # Cada hilo del pool tiene sus propias conexiones a la base de datos
+        connections.close_all()
+
+
+def enqueue_image_processing(instance):
+    """Encola el procesamiento de la foto para cuando se confirme la transacción"""
+    model_label = instance._meta.label
+    pk = instance.pk
+    if settings.IMAGE_PROCESSING_ASYNC:
+        transaction.on_commit(lambda: _get_executor().submit(_process_in_worker, model_label, pk))
+    else:
+        transaction.on_commit(lambda: process_image(model_label, pk))
+
+
+def process_pending_images(statuses=('pending',), stale_after=STALE_AFTER):
+    """
+    Procesa en este hilo las fotos con los estados dados, más las que quedaron
+    colgadas en 'processing'. Retorna (procesadas, con error).
+    """
+    processed = failed = 0
+    for model_label in IMAGE_MODELS:
+        model = apps.get_model(model_label)
+        model.objects.filter(
+            processing_status='processing', processing_started_at__lt=timezone.now() - stale_after
+        ).update(processing_status='pending')
+        pending = list(model.objects.filter(processing_status__in=statuses).values_list('pk', flat=True))
+        for pk in pending:
+            if process_image(model_label, pk, statuses):
+                processed += 1
+            else:
+                failed += 1
+    return processed, failed
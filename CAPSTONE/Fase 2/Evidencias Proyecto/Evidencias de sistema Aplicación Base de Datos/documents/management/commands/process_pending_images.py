@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from documents.image_processing import process_pending_images
+
+
+class Command(BaseCommand):
+    help = 'Reescala y genera miniaturas de las fotos pendientes o que quedaron a medio procesar'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='Reintentar también las fotos que fallaron')
+
+    def handle(self, *args, **options):
+        statuses = ('pending', 'failed') if options['retry_failed'] else ('pending',)
+        processed, failed = process_pending_images(statuses)
+        self.stdout.write(self.style.SUCCESS(f'Fotos procesadas: {processed}'))
+        if failed:
+            self.stdout.write(self.style.WARNING(f'Fotos con error: {failed}'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from documents.vehicle_search import rebuild_vehicle_search_index
+
+
+class Command(BaseCommand):
+    help = 'Regenera el índice de trigramas usado por el autocompletado de vehículos'
+
+    def handle(self, *args, **options):
+        count = rebuild_vehicle_search_index()
+        self.stdout.write(self.style.SUCCESS(f'Índice de búsqueda regenerado para {count} vehículos'))
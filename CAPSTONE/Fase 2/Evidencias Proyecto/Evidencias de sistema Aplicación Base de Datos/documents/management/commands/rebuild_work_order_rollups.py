@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from documents.models import WorkOrder
+from documents.rollups import REBUILD_BATCH_SIZE, rebuild_work_order_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recalcula en bloque los totales guardados de las órdenes de trabajo (pausas, horas estimadas, término tentativo)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=REBUILD_BATCH_SIZE,
+                            help='Cantidad de OTs por transacción')
+        parser.add_argument('--open-only', action='store_true',
+                            help='Solo OTs sin fecha de término')
+
+    def handle(self, *args, **options):
+        queryset = WorkOrder.objects.all()
+        if options['open_only']:
+            queryset = queryset.filter(actual_completion__isnull=True)
+
+        updated = rebuild_work_order_rollups(queryset, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Totales recalculados para {updated} órdenes de trabajo'))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-17 23:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0042_taskassignment_assigned_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='maintenanceschedule',
+            name='start_datetime',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.23 on 2026-10-17 23:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0043_maintenanceschedule_start_datetime_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Holiday',
+            fields=[
+                ('id_holiday', models.AutoField(primary_key=True, serialize=False)),
+                ('date', models.DateField(db_index=True)),
+                ('name', models.CharField(max_length=100)),
+                ('site', models.ForeignKey(blank=True, db_column='site_id', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='holidays', to='documents.site')),
+            ],
+            options={
+                'db_table': 'Holidays',
+            },
+        ),
+        migrations.CreateModel(
+            name='WorkShift',
+            fields=[
+                ('id_shift', models.AutoField(primary_key=True, serialize=False)),
+                ('weekday', models.IntegerField(choices=[(0, 'Lunes'), (1, 'Martes'), (2, 'Miércoles'), (3, 'Jueves'), (4, 'Viernes'), (5, 'Sábado'), (6, 'Domingo')])),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('site', models.ForeignKey(blank=True, db_column='site_id', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='work_shifts', to='documents.site')),
+            ],
+            options={
+                'db_table': 'WorkShifts',
+                'unique_together': {('site', 'weekday')},
+            },
+        ),
+    ]
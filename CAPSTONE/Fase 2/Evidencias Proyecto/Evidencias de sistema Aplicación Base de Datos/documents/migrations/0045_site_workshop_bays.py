@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-17 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0044_workshift_holiday'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='site',
+            name='workshop_bays',
+            field=models.PositiveIntegerField(default=1, help_text='Vehículos que el taller puede atender en paralelo'),
+        ),
+    ]
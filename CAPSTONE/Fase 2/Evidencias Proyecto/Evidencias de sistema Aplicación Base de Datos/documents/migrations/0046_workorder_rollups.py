@@ -0,0 +1,38 @@
+# Generated by Django 4.2.23 on 2026-10-17 23:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0045_site_workshop_bays'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workorder',
+            name='active_mechanic_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='workorder',
+            name='estimated_hours',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=8),
+        ),
+        migrations.AddField(
+            model_name='workorder',
+            name='has_active_pause',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='workorder',
+            name='pause_minutes',
+            field=models.IntegerField(default=0, help_text='Minutos laborales de pausas terminadas'),
+        ),
+        migrations.AddField(
+            model_name='workorder',
+            name='tentative_completion',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
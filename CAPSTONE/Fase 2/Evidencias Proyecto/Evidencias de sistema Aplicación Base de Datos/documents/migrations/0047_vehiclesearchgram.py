@@ -0,0 +1,56 @@
+# Generated by Django 4.2.23 on 2026-10-17 23:46
+
+import unicodedata
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def vehicle_search_grams(patent, brand, model):
+    """
+    Trigramas de las palabras de patente, marca y modelo (copia congelada de
+    documents.vehicle_search al crear el índice; la migración no importa
+    código de la app que puede cambiar)
+    """
+    text = unicodedata.normalize('NFKD', f'{patent} {brand} {model}')
+    text = ''.join(char if char.isalnum() else ' ' for char in text if not unicodedata.combining(char))
+    grams = set()
+    for word in text.upper().split():
+        padded = f' {word}'
+        grams |= {padded[index:index + 3] for index in range(len(padded) - 2)}
+    return grams
+
+
+def index_existing_vehicles(apps, schema_editor):
+    """Indexar los vehículos existentes para el autocompletado"""
+    Vehicle = apps.get_model('documents', 'Vehicle')
+    VehicleSearchGram = apps.get_model('documents', 'VehicleSearchGram')
+    grams = [
+        VehicleSearchGram(vehicle_id=patent, gram=gram)
+        for patent, brand, model in Vehicle.objects.values_list('patent', 'brand', 'model')
+        for gram in vehicle_search_grams(patent, brand, model)
+    ]
+    VehicleSearchGram.objects.bulk_create(grams, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0046_workorder_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VehicleSearchGram',
+            fields=[
+                ('id_gram', models.AutoField(primary_key=True, serialize=False)),
+                ('gram', models.CharField(db_index=True, max_length=3)),
+                ('vehicle', models.ForeignKey(db_column='patent', on_delete=django.db.models.deletion.CASCADE, related_name='search_grams', to='documents.vehicle')),
+            ],
+            options={
+                'db_table': 'VehicleSearchGrams',
+                'unique_together': {('gram', 'vehicle')},
+            },
+        ),
+        migrations.RunPython(index_existing_vehicles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.23 on 2026-10-17 23:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0047_vehiclesearchgram'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingreso',
+            index=models.Index(fields=['-entry_datetime', '-id_ingreso'], name='ingreso_entry_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ingreso',
+            index=models.Index(fields=['exit_datetime', '-entry_datetime', '-id_ingreso'], name='ingreso_exit_entry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ingreso',
+            index=models.Index(fields=['patent', '-entry_datetime'], name='ingreso_patent_entry_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.23 on 2026-10-17 23:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0048_ingreso_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='incidentimage',
+            name='processing_status',
+            field=models.CharField(choices=[('pending', 'Pendiente'), ('ready', 'Procesada'), ('failed', 'Error')], default='pending', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='incidentimage',
+            name='thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to='incident_images/thumbs/'),
+        ),
+        migrations.AddField(
+            model_name='ingresoimage',
+            name='processing_status',
+            field=models.CharField(choices=[('pending', 'Pendiente'), ('ready', 'Procesada'), ('failed', 'Error')], default='pending', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='ingresoimage',
+            name='thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to='ingreso_images/thumbs/'),
+        ),
+        migrations.AddField(
+            model_name='workorderimage',
+            name='processing_status',
+            field=models.CharField(choices=[('pending', 'Pendiente'), ('ready', 'Procesada'), ('failed', 'Error')], default='pending', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='workorderimage',
+            name='thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to='work_order_images/thumbs/'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.23 on 2026-10-18 00:01
+
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+def index_pending_schedules(apps, schema_editor):
+    """Marcar el día de los agendamientos existentes que aún no tienen ingreso"""
+    MaintenanceSchedule = apps.get_model('documents', 'MaintenanceSchedule')
+    MaintenanceSchedule.objects.filter(ingresos__isnull=True).update(pending_day=TruncDate('start_datetime'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0049_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='maintenanceschedule',
+            name='pending_day',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='maintenanceschedule',
+            index=models.Index(fields=['pending_day', 'start_datetime'], name='schedule_pending_day_idx'),
+        ),
+        migrations.RunPython(index_pending_schedules, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.23 on 2026-10-18 00:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0050_pending_schedule_day'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicletype',
+            name='maintenance_interval_days',
+            field=models.PositiveIntegerField(default=180, help_text='Días entre mantenciones preventivas'),
+        ),
+        migrations.AddField(
+            model_name='vehicletype',
+            name='maintenance_interval_km',
+            field=models.PositiveIntegerField(blank=True, help_text='Kilómetros entre mantenciones preventivas', null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.23 on 2026-10-18 00:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0051_vehicletype_maintenance_intervals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='workordermechanic',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
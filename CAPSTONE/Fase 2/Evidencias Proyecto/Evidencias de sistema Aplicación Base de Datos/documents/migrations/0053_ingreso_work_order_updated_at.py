@@ -0,0 +1,23 @@
+# Generated by Django 4.2.23 on 2026-10-18 00:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0052_task_mechanic_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingreso',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='workorder',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
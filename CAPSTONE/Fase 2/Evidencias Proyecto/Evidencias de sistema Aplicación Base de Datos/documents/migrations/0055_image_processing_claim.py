@@ -0,0 +1,43 @@
+# Generated by Django 4.2.23 on 2026-10-18 01:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0054_lookup_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='incidentimage',
+            name='processing_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingresoimage',
+            name='processing_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='workorderimage',
+            name='processing_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='incidentimage',
+            name='processing_status',
+            field=models.CharField(choices=[('pending', 'Pendiente'), ('processing', 'Procesando'), ('ready', 'Procesada'), ('failed', 'Error')], default='pending', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='ingresoimage',
+            name='processing_status',
+            field=models.CharField(choices=[('pending', 'Pendiente'), ('processing', 'Procesando'), ('ready', 'Procesada'), ('failed', 'Error')], default='pending', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='workorderimage',
+            name='processing_status',
+            field=models.CharField(choices=[('pending', 'Pendiente'), ('processing', 'Procesando'), ('ready', 'Procesada'), ('failed', 'Error')], default='pending', max_length=10),
+        ),
+    ]
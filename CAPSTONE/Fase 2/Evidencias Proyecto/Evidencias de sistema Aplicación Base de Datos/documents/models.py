@@ -1,8 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
-from django.dispatch import receiver
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.utils import timezone
 
@@ -11,6 +9,8 @@ class Site(models.Model):
     id_site = models.AutoField(primary_key=True)
     name = models.CharField(max_length=100)
     patent_count = models.IntegerField()
+    workshop_bays = models.PositiveIntegerField(default=1, help_text="Vehículos que el taller puede atender en paralelo")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.id_site} - {self.name}"
@@ -19,6 +19,49 @@ class Site(models.Model):
         db_table = 'Sites'
 
 
+class WorkShift(models.Model):
+    """Jornada del taller para un día de la semana. Sin sucursal aplica a todas las que no definan la suya"""
+    WEEKDAYS = [
+        (0, 'Lunes'),
+        (1, 'Martes'),
+        (2, 'Miércoles'),
+        (3, 'Jueves'),
+        (4, 'Viernes'),
+        (5, 'Sábado'),
+        (6, 'Domingo'),
+    ]
+
+    id_shift = models.AutoField(primary_key=True)
+    site = models.ForeignKey(
+        Site, on_delete=models.CASCADE, db_column='site_id', null=True, blank=True, related_name='work_shifts')
+    weekday = models.IntegerField(choices=WEEKDAYS)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+
+    def __str__(self):
+        site_name = self.site.name if self.site else 'General'
+        return f"{site_name} - {self.get_weekday_display()} {self.start_time:%H:%M}-{self.end_time:%H:%M}"
+
+    class Meta:
+        db_table = 'WorkShifts'
+        unique_together = ('site', 'weekday')
+
+
+class Holiday(models.Model):
+    """Día sin jornada en el taller. Sin sucursal aplica a todas"""
+    id_holiday = models.AutoField(primary_key=True)
+    date = models.DateField(db_index=True)
+    name = models.CharField(max_length=100)
+    site = models.ForeignKey(
+        Site, on_delete=models.CASCADE, db_column='site_id', null=True, blank=True, related_name='holidays')
+
+    def __str__(self):
+        return f"{self.date:%d/%m/%Y} - {self.name}"
+
+    class Meta:
+        db_table = 'Holidays'
+
+
 class SAPEquipment(models.Model):
     id_equipment = models.AutoField(primary_key=True)
     code = models.CharField(max_length=20)
@@ -51,6 +94,11 @@ class VehicleType(models.Model):
     site = models.ForeignKey(
         Site, on_delete=models.CASCADE, db_column='site_id')
     data = models.CharField(max_length=50)
+    # Pauta de mantención preventiva: lo que se cumpla primero
+    maintenance_interval_days = models.PositiveIntegerField(
+        default=180, help_text="Días entre mantenciones preventivas")
+    maintenance_interval_km = models.PositiveIntegerField(
+        null=True, blank=True, help_text="Kilómetros entre mantenciones preventivas")
 
     def __str__(self):
         return f"{self.id_type} - {self.name}"
@@ -99,6 +147,7 @@ class Vehicle(models.Model):
     auction = models.BooleanField()
     status = models.ForeignKey(
         VehicleStatus, on_delete=models.SET_NULL, db_column='status_id', null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.patent
@@ -140,6 +189,21 @@ class Vehicle(models.Model):
         db_table = 'Vehicles'
 
 
+class VehicleSearchGram(models.Model):
+    """Trigramas de patente, marca y modelo para el autocompletado de vehículos"""
+    id_gram = models.AutoField(primary_key=True)
+    gram = models.CharField(max_length=3, db_index=True)
+    vehicle = models.ForeignKey(
+        Vehicle, on_delete=models.CASCADE, db_column='patent', related_name='search_grams')
+
+    def __str__(self):
+        return f"{self.gram} - {self.vehicle_id}"
+
+    class Meta:
+        db_table = 'VehicleSearchGrams'
+        unique_together = ('gram', 'vehicle')
+
+
 class Role(models.Model):
     id_role = models.AutoField(primary_key=True)
     name = models.CharField(max_length=100)
@@ -177,6 +241,7 @@ class FlotaUser(models.Model):
         UserStatus, on_delete=models.CASCADE, db_column='status_id')
     observations = models.TextField()
     gpid = models.CharField(max_length=20)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.id_user} - {self.name}"
@@ -222,6 +287,7 @@ class ServiceType(models.Model):
     description = models.TextField(null=True, blank=True)
     site = models.ForeignKey(
         Site, on_delete=models.CASCADE, db_column='site_id')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.id_service_type} - {self.name}"
@@ -234,7 +300,7 @@ class MaintenanceSchedule(models.Model):
     id_schedule = models.AutoField(primary_key=True)
     patent = models.ForeignKey(
         Vehicle, on_delete=models.CASCADE, db_column='patent')
-    start_datetime = models.DateTimeField()
+    start_datetime = models.DateTimeField(db_index=True)
     assigned_user = models.ForeignKey(
         FlotaUser, on_delete=models.SET_NULL, db_column='assigned_user_id', null=True, blank=True)
     expected_chofer = models.ForeignKey(FlotaUser, on_delete=models.SET_NULL, db_column='expected_chofer_id',
@@ -248,11 +314,19 @@ class MaintenanceSchedule(models.Model):
         'Incident', blank=True, related_name='maintenance_schedules',
         help_text='Incidentes asociados a esta agenda de mantenimiento')
 
+    # Día local del agendamiento mientras no tenga ingreso (NULL una vez registrado),
+    # mantenido por agenda.pending_schedules
+    pending_day = models.DateField(null=True, blank=True, editable=False)
+
     def __str__(self):
         return f"{self.id_schedule} - {self.patent}"
 
     class Meta:
         db_table = 'MaintenanceSchedules'
+        indexes = [
+            # Agendamientos pendientes de un día y fechas con pendientes
+            models.Index(fields=['pending_day', 'start_datetime'], name='schedule_pending_day_idx'),
+        ]
 
 
 class Ingreso(models.Model):
@@ -272,12 +346,19 @@ class Ingreso(models.Model):
     schedule = models.ForeignKey(
         MaintenanceSchedule, on_delete=models.SET_NULL, null=True, blank=True, related_name='ingresos')
     es_ingreso_tecnico = models.BooleanField(default=False, verbose_name='Es ingreso técnico')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.id_ingreso} - {self.patent}"
 
     class Meta:
         db_table = 'Ingresos'
+        indexes = [
+            # Paginación por cursor de la lista de ingresos, con y sin filtro de abiertos/cerrados
+            models.Index(fields=['-entry_datetime', '-id_ingreso'], name='ingreso_entry_keyset_idx'),
+            models.Index(fields=['exit_datetime', '-entry_datetime', '-id_ingreso'], name='ingreso_exit_entry_idx'),
+            models.Index(fields=['patent', '-entry_datetime'], name='ingreso_patent_entry_idx'),
+        ]
 
 
 class WorkOrderStatus(models.Model):
@@ -285,6 +366,7 @@ class WorkOrderStatus(models.Model):
     name = models.CharField(max_length=50)
     description = models.TextField(null=True, blank=True)
     color = models.CharField(max_length=7, default='#6c757d')  # Color para UI
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.id_status} - {self.name}"
@@ -313,6 +395,14 @@ class WorkOrder(models.Model):
     supervisor = models.ForeignKey(
         FlotaUser, on_delete=models.SET_NULL, db_column='supervisor_id', null=True, blank=True, related_name='supervised_work_orders')
 
+    # Totales desnormalizados, mantenidos por documents.rollups al cambiar tareas, mecánicos o pausas
+    pause_minutes = models.IntegerField(default=0, help_text="Minutos laborales de pausas terminadas")
+    estimated_hours = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    tentative_completion = models.DateTimeField(null=True, blank=True)
+    active_mechanic_count = models.PositiveIntegerField(default=0)
+    has_active_pause = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
     def __str__(self):
         if self.ingreso:
             return f"OT-{self.id_work_order} - {self.ingreso.patent}"
@@ -328,58 +418,43 @@ class WorkOrder(models.Model):
 
     @property
     def total_pause_time(self):
-        """Calcula el tiempo total de pausas en minutos"""
-        from pausas.models import WorkOrderPause
-        pauses = WorkOrderPause.objects.filter(work_order=self, is_active=True)
-        total_minutes = 0
-        for pause in pauses:
-            if pause.duration_minutes:
-                total_minutes += pause.duration_minutes
-        return total_minutes
+        """Tiempo total de pausas en minutos"""
+        return self.pause_minutes
+
+    @property
+    def calendar_site_id(self):
+        """Sucursal cuyo calendario laboral aplica a la OT (None usa el calendario general)"""
+        return self.ingreso.patent.site_id if self.ingreso_id else None
 
     @property
     def estimated_work_duration(self):
-        """Calcula la duración estimada del trabajo en horas basado en las tareas asignadas"""
-        from .models import Task
-        from agenda.views import calculate_working_hours_elapsed
-        tasks = Task.objects.filter(work_order=self)
-        
-        if not tasks.exists():
-            # Si no hay tareas, usar las asignaciones de mecánicos como fallback
-            return sum(assignment.hours_worked for assignment in self.mechanic_assignments.filter(is_active=True))
-        
-        total_hours = 0
-        for task in tasks:
-            if task.start_datetime and task.end_datetime:
-                # Para tareas completadas o con fecha final estimada, calcular horas laborales
-                total_hours += calculate_working_hours_elapsed(task.start_datetime, task.end_datetime)
-        
-        return total_hours if total_hours > 0 else sum(assignment.hours_worked for assignment in self.mechanic_assignments.filter(is_active=True))
+        """Duración estimada del trabajo en horas laborales según las tareas (o las horas de los mecánicos)"""
+        return self.estimated_hours
 
     @property
     def tentative_completion_datetime(self):
-        """Calcula la fecha y hora tentativa de finalización considerando solo horas laborales"""
-        if not self.work_started_at:
-            return None
-        
-        # Calcular tiempo total estimado en horas
-        estimated_hours = self.estimated_work_duration
-        if estimated_hours == 0:
-            return None
-            
-        # Convertir a Decimal para consistencia
-        from decimal import Decimal
-        estimated_hours = Decimal(estimated_hours)
-        
-        # Sumar tiempo de pausas en horas (considerando que las pausas ya están calculadas dentro de jornada)
-        total_pause_hours = Decimal(self.total_pause_time) / 60
-        
-        # Tiempo total necesario en horas
-        total_required_hours = estimated_hours + total_pause_hours
-        
-        # Usar la función para calcular fecha considerando solo horas laborales
-        from agenda.views import calculate_completion_datetime
-        return calculate_completion_datetime(self.work_started_at, total_required_hours)
+        """Fecha y hora tentativa de finalización considerando solo horas laborales"""
+        return self.tentative_completion
+
+    def save(self, *args, **kwargs):
+        from .rollups import ROLLUP_FIELDS, refresh_work_order_rollups
+        if self._state.adding:
+            super().save(*args, **kwargs)
+            return
+
+        # Los totales se mantienen aparte: no pisarlos con valores leídos antes de que cambiaran
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ROLLUP_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+        # El término tentativo depende del inicio de los trabajos y del calendario de la sucursal
+        if update_fields is None or {'work_started_at', 'ingreso'} & set(update_fields):
+            for field, value in (refresh_work_order_rollups(self.pk) or {}).items():
+                setattr(self, field, value)
 
     class Meta:
         db_table = 'WorkOrders'
@@ -397,6 +472,8 @@ class Task(models.Model):
         ServiceType, on_delete=models.CASCADE, db_column='service_type_id', null=True, blank=True)
     supervisor = models.ForeignKey(
         FlotaUser, on_delete=models.SET_NULL, db_column='supervisor_id', null=True, blank=True)
+    # Para la sincronización incremental del detalle de OT (`since`)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.id_task} - {self.description[:50]}"
@@ -510,6 +587,7 @@ class WorkOrderMechanic(models.Model):
     assigned_datetime = models.DateTimeField(auto_now_add=True)
     hours_worked = models.DecimalField(max_digits=5, decimal_places=2, default=0)
     is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.work_order} - {self.mechanic.name}"
@@ -730,12 +808,31 @@ class Diagnostics(models.Model):
         db_table = 'Diagnostics'
 
 
-class IncidentImage(models.Model):
+class ImageVariantsMixin:
+    """Variantes de una foto generadas por documents.image_processing"""
+    PROCESSING_STATUS_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('processing', 'Procesando'),
+        ('ready', 'Procesada'),
+        ('failed', 'Error'),
+    ]
+
+    @property
+    def thumbnail_url(self):
+        """Miniatura para listados; mientras no se procesa se usa la foto original"""
+        return self.thumbnail.url if self.thumbnail else self.image.url
+
+
+class IncidentImage(ImageVariantsMixin, models.Model):
     id_image = models.AutoField(primary_key=True)
     incident = models.ForeignKey(
         Incident, on_delete=models.CASCADE, db_column='incident_id', related_name='images')
     name = models.CharField(max_length=100)
     image = models.ImageField(upload_to='incident_images/')
+    thumbnail = models.ImageField(upload_to='incident_images/thumbs/', null=True, blank=True)
+    processing_status = models.CharField(
+        max_length=10, choices=ImageVariantsMixin.PROCESSING_STATUS_CHOICES, default='pending')
+    processing_started_at = models.DateTimeField(null=True, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -745,13 +842,17 @@ class IncidentImage(models.Model):
         db_table = 'IncidentImages'
 
 
-class IngresoImage(models.Model):
+class IngresoImage(ImageVariantsMixin, models.Model):
     id_image = models.AutoField(primary_key=True)
     ingreso = models.ForeignKey(
         Ingreso, on_delete=models.CASCADE, db_column='ingreso_id', related_name='images')
     name = models.CharField(max_length=100)
     description = models.CharField(max_length=200, null=True, blank=True, help_text='Descripción del tipo de foto (ej. "Estado frontal", "Daño en neumático")')
     image = models.ImageField(upload_to='ingreso_images/')
+    thumbnail = models.ImageField(upload_to='ingreso_images/thumbs/', null=True, blank=True)
+    processing_status = models.CharField(
+        max_length=10, choices=ImageVariantsMixin.PROCESSING_STATUS_CHOICES, default='pending')
+    processing_started_at = models.DateTimeField(null=True, blank=True)
     uploaded_by = models.ForeignKey(
         FlotaUser, on_delete=models.SET_NULL, db_column='uploaded_by_id', null=True, blank=True, related_name='uploaded_ingreso_images')
     uploaded_at = models.DateTimeField(auto_now_add=True)
@@ -763,13 +864,17 @@ class IngresoImage(models.Model):
         db_table = 'IngresoImages'
 
 
-class WorkOrderImage(models.Model):
+class WorkOrderImage(ImageVariantsMixin, models.Model):
     id_image = models.AutoField(primary_key=True)
     work_order = models.ForeignKey(
         WorkOrder, on_delete=models.CASCADE, db_column='work_order_id', related_name='images')
     name = models.CharField(max_length=100)
     description = models.CharField(max_length=200, null=True, blank=True, help_text='Descripción del tipo de foto (ej. "Trabajo realizado", "Estado final")')
     image = models.ImageField(upload_to='work_order_images/')
+    thumbnail = models.ImageField(upload_to='work_order_images/thumbs/', null=True, blank=True)
+    processing_status = models.CharField(
+        max_length=10, choices=ImageVariantsMixin.PROCESSING_STATUS_CHOICES, default='pending')
+    processing_started_at = models.DateTimeField(null=True, blank=True)
     uploaded_by = models.ForeignKey(
         FlotaUser, on_delete=models.SET_NULL, db_column='uploaded_by_id', null=True, blank=True, related_name='uploaded_work_order_images')
     uploaded_at = models.DateTimeField(auto_now_add=True)
@@ -787,3 +892,66 @@ def update_vehicle_status_on_incident_save(sender, instance, **kwargs):
     Signal para actualizar el estado del vehículo cuando se guarda una incidencia.
     """
     instance.vehicle.update_status_based_on_incidents()
+
+
+@receiver([post_save, post_delete], sender=WorkShift)
+@receiver([post_save, post_delete], sender=Holiday)
+def invalidate_work_calendar(sender, **kwargs):
+    """
+    Signal para recargar el calendario laboral cuando cambian turnos o feriados.
+    """
+    from agenda.work_calendar import invalidate_work_calendars
+    invalidate_work_calendars()
+
+
+@receiver([post_save, post_delete], sender=Task)
+@receiver([post_save, post_delete], sender=WorkOrderMechanic)
+def update_work_order_rollups(sender, instance, **kwargs):
+    """
+    Signal para recalcular los totales de la OT cuando cambian sus tareas o mecánicos.
+    """
+    if instance.work_order_id:
+        from .rollups import refresh_work_order_rollups
+        refresh_work_order_rollups(instance.work_order_id)
+
+
+@receiver([post_save, post_delete], sender=TaskAssignment)
+def touch_assigned_task(sender, instance, **kwargs):
+    """
+    Signal para marcar la tarea como modificada cuando cambian sus mecánicos (sincronización `since`).
+    """
+    Task.objects.filter(pk=instance.task_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Vehicle)
+def update_vehicle_search_index(sender, instance, **kwargs):
+    """
+    Signal para mantener al día el índice de búsqueda del vehículo guardado.
+    """
+    from .vehicle_search import invalidate_vehicle_search, sync_vehicle_search_grams
+    sync_vehicle_search_grams(instance)
+    invalidate_vehicle_search()
+
+
+@receiver(post_delete, sender=Vehicle)
+@receiver([post_save, post_delete], sender=Route)
+@receiver(m2m_changed, sender=Route.vehicles.through)
+@receiver(post_save, sender=Site)
+def invalidate_vehicle_search_cache(sender, **kwargs):
+    """
+    Signal para descartar el autocompletado cacheado cuando se elimina un vehículo o cambian rutas o sucursales.
+    """
+    from .vehicle_search import invalidate_vehicle_search
+    invalidate_vehicle_search()
+
+
+@receiver(post_save, sender=IncidentImage)
+@receiver(post_save, sender=IngresoImage)
+@receiver(post_save, sender=WorkOrderImage)
+def process_uploaded_image(sender, instance, created, **kwargs):
+    """
+    Signal para reescalar la foto y generar su miniatura fuera de la petición.
+    """
+    if created:
+        from .image_processing import enqueue_image_processing
+        enqueue_image_processing(instance)
@@ -0,0 +1,117 @@
+"""
+Totales desnormalizados de las órdenes de trabajo.
+
+Los minutos de pausa, las horas estimadas, la fecha tentativa de término, los
+mecánicos activos y si hay una pausa en curso se guardan como columnas de la
+OT. Se recalculan dentro de la misma transacción cada vez que cambia una tarea,
+una asignación de mecánico o una pausa de la OT, y el comando
+`rebuild_work_order_rollups` los reconstruye en bloque.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+
+from .models import Task, WorkOrder, WorkOrderMechanic
+
+ROLLUP_FIELDS = [
+    'pause_minutes', 'estimated_hours', 'tentative_completion',
+    'active_mechanic_count', 'has_active_pause',
+]
+REBUILD_BATCH_SIZE = 500
+
+
+def tentative_completion_for(work_started_at, estimated_hours, pause_minutes, site_id=None):
+    """Término tentativo: horas estimadas más las pausas, en horas laborales desde el inicio"""
+    if not work_started_at or not estimated_hours:
+        return None
+    from agenda.work_calendar import completion_datetime
+    total_hours = Decimal(estimated_hours) + Decimal(pause_minutes) / 60
+    return completion_datetime(work_started_at, total_hours, site_id=site_id)
+
+
+def _collect(work_order_ids):
+    """Carga con tres consultas las tareas, asignaciones y pausas de las OTs, agrupadas por OT"""
+    from pausas.models import WorkOrderPause
+
+    data = {work_order_id: {'tasks': [], 'assignments': [], 'pauses': []} for work_order_id in work_order_ids}
+    tasks = Task.objects.filter(work_order_id__in=work_order_ids).values_list(
+        'work_order_id', 'start_datetime', 'end_datetime'
+    )
+    for work_order_id, start, end in tasks:
+        data[work_order_id]['tasks'].append((start, end))
+
+    assignments = WorkOrderMechanic.objects.filter(work_order_id__in=work_order_ids).values_list(
+        'work_order_id', 'hours_worked', 'is_active'
+    )
+    for work_order_id, hours_worked, is_active in assignments:
+        data[work_order_id]['assignments'].append((hours_worked, is_active))
+
+    pauses = WorkOrderPause.objects.filter(work_order_id__in=work_order_ids, is_active=True).values_list(
+        'work_order_id', 'duration_minutes', 'end_datetime'
+    )
+    for work_order_id, duration_minutes, end in pauses:
+        data[work_order_id]['pauses'].append((duration_minutes, end))
+    return data
+
+
+def compute_rollups(work_started_at, site_id, tasks, assignments, pauses):
+    """
+    Calcula los totales de una OT a partir de sus filas:
+    tasks [(inicio, fin)], assignments [(horas trabajadas, activa)] y pauses [(minutos, fin)].
+    """
+    from agenda.work_calendar import get_work_calendar
+
+    calendar = get_work_calendar(site_id)
+    task_hours = sum(calendar.elapsed_many([(start, end) for start, end in tasks if start and end]))
+    if task_hours > 0:
+        estimated_hours = Decimal(str(round(task_hours, 2)))
+    else:
+        # Sin tareas con fechas se usan las horas de los mecánicos activos
+        estimated_hours = sum((hours for hours, is_active in assignments if is_active), Decimal('0'))
+
+    pause_minutes = sum(minutes or 0 for minutes, _ in pauses)
+    return {
+        'pause_minutes': pause_minutes,
+        'estimated_hours': estimated_hours,
+        'tentative_completion': tentative_completion_for(work_started_at, estimated_hours, pause_minutes, site_id),
+        'active_mechanic_count': sum(1 for _, is_active in assignments if is_active),
+        'has_active_pause': any(end is None for _, end in pauses),
+    }
+
+
+def refresh_work_order_rollups(work_order_id):
+    """Recalcula y guarda los totales de una OT, bloqueando su fila mientras dura la transacción"""
+    with transaction.atomic():
+        row = WorkOrder.objects.select_for_update(of=('self',)).filter(pk=work_order_id).values_list(
+            'work_started_at', 'ingreso__patent__site_id'
+        ).first()
+        if row is None:
+            # La OT se está eliminando en cascada
+            return None
+        work_started_at, site_id = row
+        rows = _collect([work_order_id])[work_order_id]
+        rollups = compute_rollups(work_started_at, site_id, **rows)
+        WorkOrder.objects.filter(pk=work_order_id).update(**rollups)
+    return rollups
+
+
+def rebuild_work_order_rollups(queryset=None, batch_size=REBUILD_BATCH_SIZE):
+    """Reconstruye los totales de todas las OTs (o las del queryset) en lotes. Retorna cuántas actualizó"""
+    queryset = WorkOrder.objects.all() if queryset is None else queryset
+    work_order_ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+
+    updated = 0
+    for offset in range(0, len(work_order_ids), batch_size):
+        batch_ids = work_order_ids[offset:offset + batch_size]
+        with transaction.atomic():
+            rows = WorkOrder.objects.select_for_update(of=('self',)).filter(pk__in=batch_ids).values_list(
+                'pk', 'work_started_at', 'ingreso__patent__site_id'
+            )
+            data = _collect(batch_ids)
+            work_orders = [
+                WorkOrder(pk=work_order_id, **compute_rollups(work_started_at, site_id, **data[work_order_id]))
+                for work_order_id, work_started_at, site_id in rows
+            ]
+            WorkOrder.objects.bulk_update(work_orders, ROLLUP_FIELDS)
+        updated += len(work_orders)
+    return updated
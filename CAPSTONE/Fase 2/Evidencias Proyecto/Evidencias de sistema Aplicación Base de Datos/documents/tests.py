@@ -1,3 +1,263 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from agenda.tests import crear_datos_base
+from pausas.models import PauseType, WorkOrderPause
+
+from .image_processing import process_image, process_pending_images
+from .models import (
+    Ingreso, IngresoImage, Route, Task, Vehicle, VehicleSearchGram, WorkOrder, WorkOrderMechanic,
+)
+from .rollups import rebuild_work_order_rollups
+from .vehicle_search import rebuild_vehicle_search_index, search_vehicles
+
+
+class WorkOrderRollupsTestCase(TestCase):
+    """Tests para los totales desnormalizados de las órdenes de trabajo"""
+
+    def setUp(self):
+        self.data = crear_datos_base()
+        self.pause_type = PauseType.objects.create(id_pause_type='STOCK', name='Falta de stock')
+        self.base = timezone.make_aware(datetime(2026, 10, 12, 9, 0))  # Lunes
+        self.work_order = WorkOrder.objects.create(status=self.data['status'], work_started_at=self.base)
+
+    def test_rollups_follow_tasks_mechanics_and_pauses(self):
+        """Las columnas se actualizan al crear, cerrar y eliminar filas relacionadas"""
+        assignment = WorkOrderMechanic.objects.create(
+            work_order=self.work_order, mechanic=self.data['flota_user'], hours_worked=Decimal('3')
+        )
+        self.work_order.refresh_from_db()
+        self.assertEqual(self.work_order.active_mechanic_count, 1)
+        self.assertEqual(self.work_order.estimated_work_duration, Decimal('3'))
+
+        task = Task.objects.create(
+            work_order=self.work_order, description='Frenos', urgency='Alta',
+            start_datetime=self.base, end_datetime=self.base + timedelta(hours=2),
+        )
+        pause = WorkOrderPause.objects.create(
+            work_order=self.work_order, pause_type=self.pause_type, reason='Stock',
+            start_datetime=self.base, end_datetime=None,
+        )
+        self.work_order.refresh_from_db()
+        self.assertEqual(self.work_order.estimated_work_duration, Decimal('2'))
+        self.assertTrue(self.work_order.has_active_pause)
+        self.assertEqual(self.work_order.tentative_completion_datetime, self.base + timedelta(hours=2))
+
+        pause.end_datetime = self.base + timedelta(minutes=30)
+        pause.save()
+        self.work_order.refresh_from_db()
+        self.assertFalse(self.work_order.has_active_pause)
+        self.assertEqual(self.work_order.total_pause_time, 30)
+        self.assertEqual(self.work_order.tentative_completion_datetime, self.base + timedelta(hours=2.5))
+
+        task.delete()
+        assignment.is_active = False
+        assignment.save()
+        self.work_order.refresh_from_db()
+        self.assertEqual(self.work_order.active_mechanic_count, 0)
+        self.assertEqual(self.work_order.estimated_work_duration, 0)
+        self.assertIsNone(self.work_order.tentative_completion_datetime)
+
+    def test_stale_instance_save_keeps_rollups(self):
+        """Guardar una instancia leída antes del cambio no pisa los totales"""
+        stale = WorkOrder.objects.get(pk=self.work_order.pk)
+        WorkOrderMechanic.objects.create(
+            work_order=self.work_order, mechanic=self.data['flota_user'], hours_worked=Decimal('1')
+        )
+        stale.observations = 'Revisar'
+        stale.save()
+
+        self.assertEqual(stale.active_mechanic_count, 1)
+        self.assertEqual(stale.tentative_completion_datetime, self.base + timedelta(hours=1))
+        self.work_order.refresh_from_db()
+        self.assertEqual(self.work_order.active_mechanic_count, 1)
+
+    def test_rebuild_command(self):
+        """El comando reconstruye en bloque totales desactualizados"""
+        WorkOrderMechanic.objects.create(
+            work_order=self.work_order, mechanic=self.data['flota_user'], hours_worked=Decimal('4')
+        )
+        other = WorkOrder.objects.create(status=self.data['status'])
+        WorkOrder.objects.update(active_mechanic_count=9, estimated_hours=0, tentative_completion=None)
+
+        out = StringIO()
+        call_command('rebuild_work_order_rollups', batch_size=1, stdout=out)
+
+        self.assertIn('2 órdenes', out.getvalue())
+        self.work_order.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.work_order.active_mechanic_count, 1)
+        self.assertEqual(self.work_order.estimated_hours, Decimal('4'))
+        self.assertEqual(self.work_order.tentative_completion, self.base + timedelta(hours=4))
+        self.assertEqual(other.active_mechanic_count, 0)
+        self.assertEqual(rebuild_work_order_rollups(WorkOrder.objects.none()), 0)
+
+
+class VehicleAutocompleteTestCase(TestCase):
+    """Tests para el autocompletado de vehículos con índice de trigramas"""
+
+    def setUp(self):
+        cache.clear()
+        self.data = crear_datos_base()
+        self.vehicle = self.data['vehicle']
+        self.other = Vehicle.objects.create(
+            patent='WXYZ98', equipment=self.vehicle.equipment, ceco=self.vehicle.ceco,
+            brand='Mercedes-Benz', model='Actros', year=2018, age=7, useful_life=10, mileage=5000,
+            site=self.data['site'], operational=True, backup=False, out_of_service=False,
+            type=self.data['vehicle_type'], plan=True, sinister=False, observations='',
+            compliance='OK', geotab_confirm=True, auction=False,
+        )
+        self.route = Route.objects.create(route_code='R-10', gtm='GTM', comment='')
+        self.route.vehicles.add(self.vehicle)
+        self.client.force_login(self.data['user'])
+
+    def patents(self, query):
+        return [vehicle['patent'] for vehicle in search_vehicles(query)]
+
+    def test_matches_patent_brand_and_model(self):
+        """Calza subcadenas de 3+ letras, prefijos de 2 letras y varias palabras"""
+        self.assertEqual(self.patents('bcd1'), ['ABCD12'])
+        self.assertEqual(self.patents('vol'), ['ABCD12'])
+        self.assertEqual(self.patents('benz actr'), ['WXYZ98'])
+        self.assertEqual(self.patents('me'), ['WXYZ98'])
+        self.assertEqual(self.patents('tros volvo'), [])
+
+    def test_index_follows_saves(self):
+        """El índice y la caché se actualizan al guardar el vehículo"""
+        self.assertEqual(self.patents('scania'), [])
+        self.other.brand = 'Scania'
+        self.other.save()
+        self.assertEqual(self.patents('scania'), ['WXYZ98'])
+        self.assertEqual(self.patents('benz'), [])
+
+        VehicleSearchGram.objects.all().delete()
+        self.assertEqual(rebuild_vehicle_search_index(), 2)
+        cache.clear()
+        self.assertEqual(self.patents('scan'), ['WXYZ98'])
+
+    def test_autocomplete_endpoint_uses_cache(self):
+        """Las consultas repetidas no tocan la base de datos y las rutas salen en una consulta"""
+        url = reverse('search_vehicles_autocomplete')
+        response = self.client.get(url, {'q': 'ab'})
+        vehicles = response.json()['vehicles']
+        self.assertEqual(vehicles[0]['route_code'], 'R-10')
+        self.assertEqual(vehicles[0]['display_text'], 'ABCD12 - Volvo FH (2020)')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {'q': 'AB'})
+        self.assertEqual([q for q in queries.captured_queries if 'VehicleSearchGrams' in q['sql']], [])
+
+        self.route.vehicles.add(self.other)
+        response = self.client.get(url, {'q': 'wxy'})
+        self.assertEqual(response.json()['vehicles'][0]['route_code'], 'R-10')
+
+    def test_search_vehicle_api(self):
+        """Busca por patente exacta con el código de la primera ruta"""
+        url = reverse('search_vehicle_api')
+        data = self.client.get(url, {'patent': 'abcd12'}).json()
+        self.assertTrue(data['found'])
+        self.assertEqual(data['vehicle']['route_code'], 'R-10')
+        self.assertEqual(data['vehicle']['site_name'], 'Santiago')
+        self.assertFalse(self.client.get(url, {'patent': 'ZZZZ99'}).json()['found'])
+
+
+@override_settings(IMAGE_PROCESSING_ASYNC=False, IMAGE_MAX_DIMENSION=800, IMAGE_THUMBNAIL_SIZE=100)
+class ImageProcessingTestCase(TestCase):
+    """Tests para el reescalado y las miniaturas de fotos subidas"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        self.data = crear_datos_base()
+        self.ingreso = Ingreso.objects.create(
+            patent=self.data['vehicle'], entry_datetime=timezone.now(),
+            chofer=self.data['flota_user'], authorization=False,
+        )
+
+    def foto(self, size=(2400, 1200), fmt='PNG'):
+        buffer = BytesIO()
+        Image.new('RGB', size, (200, 30, 30)).save(buffer, fmt)
+        return SimpleUploadedFile(f'foto.{fmt.lower()}', buffer.getvalue())
+
+    def test_upload_is_resized_with_thumbnail(self):
+        """La foto se recodifica acotada y se genera la miniatura al confirmar la transacción"""
+        with self.captureOnCommitCallbacks(execute=True):
+            image = IngresoImage.objects.create(ingreso=self.ingreso, name='Frontal', image=self.foto())
+            original_path = image.image.path
+            self.assertEqual(image.thumbnail_url, image.image.url)
+
+        image.refresh_from_db()
+        self.assertEqual(image.processing_status, 'ready')
+        self.assertTrue(image.image.name.endswith('.jpg'))
+        with Image.open(image.image.path) as stored:
+            self.assertEqual(stored.size, (800, 400))
+        with Image.open(image.thumbnail.path) as thumbnail:
+            self.assertEqual(thumbnail.size, (100, 50))
+        self.assertEqual(image.thumbnail_url, image.thumbnail.url)
+        self.assertFalse(os.path.exists(original_path))
+
+    def test_pending_and_failed_images(self):
+        """Un archivo que no es imagen queda con error y el comando procesa los pendientes"""
+        with self.assertLogs('documents.image_processing', 'ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                broken = IngresoImage.objects.create(
+                    ingreso=self.ingreso, name='Rota', image=SimpleUploadedFile('rota.jpg', b'no es imagen')
+                )
+        broken.refresh_from_db()
+        self.assertEqual(broken.processing_status, 'failed')
+
+        # Sin captureOnCommitCallbacks el procesamiento queda pendiente
+        pending = IngresoImage.objects.create(ingreso=self.ingreso, name='Lateral', image=self.foto((300, 300)))
+        self.assertEqual(process_pending_images(), (1, 0))
+        pending.refresh_from_db()
+        self.assertEqual(pending.processing_status, 'ready')
+        with self.assertLogs('documents.image_processing', 'ERROR'):
+            self.assertEqual(process_pending_images(('pending', 'failed')), (0, 1))
+
+    def test_image_is_claimed_once(self):
+        """Una segunda corrida sobre la misma foto no la vuelve a procesar ni la marca con error"""
+        image = IngresoImage.objects.create(ingreso=self.ingreso, name='Frontal', image=self.foto())
+        self.assertTrue(process_image('documents.IngresoImage', image.pk))
+        image.refresh_from_db()
+        processed_name = image.image.name
+
+        self.assertFalse(process_image('documents.IngresoImage', image.pk))
+        image.refresh_from_db()
+        self.assertEqual(image.processing_status, 'ready')
+        self.assertEqual(image.image.name, processed_name)
+        self.assertTrue(os.path.exists(image.image.path))
+
+    def test_stale_processing_images_are_requeued(self):
+        """El comando retoma las fotos colgadas en 'processing' pero no las que están en curso"""
+        stuck = IngresoImage.objects.create(ingreso=self.ingreso, name='Frontal', image=self.foto((300, 300)))
+        running = IngresoImage.objects.create(ingreso=self.ingreso, name='Lateral', image=self.foto((300, 300)))
+        IngresoImage.objects.filter(pk=stuck.pk).update(
+            processing_status='processing', processing_started_at=timezone.now() - timedelta(hours=1)
+        )
+        IngresoImage.objects.filter(pk=running.pk).update(
+            processing_status='processing', processing_started_at=timezone.now()
+        )
+
+        self.assertEqual(process_pending_images(), (1, 0))
+        stuck.refresh_from_db()
+        running.refresh_from_db()
+        self.assertEqual(stuck.processing_status, 'ready')
+        self.assertEqual(running.processing_status, 'processing')
@@ -0,0 +1,188 @@
+"""
+Índice de búsqueda de vehículos para el autocompletado.
+
+Cada palabra de la patente, marca y modelo se descompone en trigramas que se
+guardan en VehicleSearchGram (con un espacio inicial, así el trigrama " VO"
+marca el comienzo de "VOLVO"). Una consulta se resuelve buscando en el índice
+los vehículos que tienen todos sus trigramas, en lugar de recorrer la tabla
+con tres `icontains`. Los resultados se cachean por consulta con un TTL corto
+y se invalidan con signals cuando cambian vehículos, rutas o sucursales.
+"""
+import unicodedata
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Route, Vehicle, VehicleSearchGram
+
+AUTOCOMPLETE_LIMIT = 10
+SEARCH_CACHE_TIMEOUT = 60
+REBUILD_BATCH_SIZE = 1000
+
+_VERSION_KEY = 'vehicle_search_version'
+_PAYLOAD_FIELDS = ('patent', 'brand', 'model', 'year', 'site__name')
+
+
+def normalize_words(text):
+    """Palabras en mayúsculas, sin tildes ni signos: 'Mercedes-Benz Actros' -> ['MERCEDES', 'BENZ', 'ACTROS']"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char if char.isalnum() else ' ' for char in text if not unicodedata.combining(char))
+    return text.upper().split()
+
+
+def _word_grams(word):
+    padded = f' {word}'
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+def vehicle_search_grams(patent, brand, model):
+    """Trigramas indexados de un vehículo"""
+    grams = set()
+    for word in normalize_words(f'{patent} {brand} {model}'):
+        grams |= _word_grams(word)
+    return grams
+
+
+def _query_grams(words):
+    """
+    Trigramas que debe tener un vehículo para calzar con la consulta: las
+    palabras de 3 o más letras pueden aparecer en cualquier parte de una
+    palabra y las de 2 letras deben ser su comienzo.
+    """
+    grams = set()
+    for word in words:
+        if len(word) >= 3:
+            grams |= {word[index:index + 3] for index in range(len(word) - 2)}
+        elif len(word) == 2:
+            grams.add(f' {word}')
+    return grams
+
+
+def _matches(words, vehicle_words):
+    """Confirma un candidato del índice (los trigramas pueden calzar en distinto orden)"""
+    for word in words:
+        if len(word) >= 3:
+            found = any(word in vehicle_word for vehicle_word in vehicle_words)
+        else:
+            found = any(vehicle_word.startswith(word) for vehicle_word in vehicle_words)
+        if not found:
+            return False
+    return True
+
+
+def sync_vehicle_search_grams(vehicle):
+    """Deja los trigramas del vehículo al día tocando solo los que cambiaron"""
+    wanted = vehicle_search_grams(vehicle.patent, vehicle.brand, vehicle.model)
+    current = set(VehicleSearchGram.objects.filter(vehicle=vehicle).values_list('gram', flat=True))
+    if current - wanted:
+        VehicleSearchGram.objects.filter(vehicle=vehicle, gram__in=current - wanted).delete()
+    if wanted - current:
+        VehicleSearchGram.objects.bulk_create(
+            [VehicleSearchGram(vehicle=vehicle, gram=gram) for gram in wanted - current]
+        )
+
+
+def rebuild_vehicle_search_index(batch_size=REBUILD_BATCH_SIZE):
+    """
+    Regenera el índice completo en una transacción, así las búsquedas
+    concurrentes nunca ven el índice vacío. Retorna la cantidad de vehículos
+    indexados.
+    """
+    with transaction.atomic():
+        VehicleSearchGram.objects.all().delete()
+        vehicles = Vehicle.objects.values_list('patent', 'brand', 'model')
+        pending = []
+        count = 0
+        for patent, brand, model in vehicles.iterator(chunk_size=batch_size):
+            pending.extend(
+                VehicleSearchGram(vehicle_id=patent, gram=gram)
+                for gram in vehicle_search_grams(patent, brand, model)
+            )
+            count += 1
+            if len(pending) >= batch_size:
+                VehicleSearchGram.objects.bulk_create(pending)
+                pending = []
+        VehicleSearchGram.objects.bulk_create(pending)
+        transaction.on_commit(invalidate_vehicle_search)
+    return count
+
+
+def invalidate_vehicle_search():
+    """Descarta los resultados cacheados del autocompletado"""
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        cache.set(_VERSION_KEY, 1, None)
+
+
+def _cache_key(kind, value):
+    return f'vehicle_search:{cache.get(_VERSION_KEY, 0)}:{kind}:{value}'
+
+
+def route_codes(patents):
+    """Código de la primera ruta de cada vehículo, en una consulta"""
+    codes = {}
+    rows = Route.vehicles.through.objects.filter(vehicle_id__in=patents).order_by('route_id').values_list(
+        'vehicle_id', 'route__route_code'
+    )
+    for patent, route_code in rows:
+        codes.setdefault(patent, route_code)
+    return codes
+
+
+def _payloads(rows):
+    codes = route_codes([row['patent'] for row in rows])
+    return [
+        {
+            'id': row['patent'],
+            'patent': row['patent'],
+            'brand': row['brand'],
+            'model': row['model'],
+            'year': row['year'],
+            'site_name': row['site__name'],
+            'route_code': codes.get(row['patent']),
+            'display_text': f"{row['patent']} - {row['brand']} {row['model']} ({row['year']})",
+        } for row in rows
+    ]
+
+
+def search_vehicles(query, limit=AUTOCOMPLETE_LIMIT):
+    """Vehículos cuya patente, marca o modelo calzan con la consulta, ordenados por patente"""
+    words = normalize_words(query)
+    grams = _query_grams(words)
+    if not grams:
+        return []
+
+    key = _cache_key('q', f"{'+'.join(words)}:{limit}")
+    results = cache.get(key)
+    if results is not None:
+        return results
+
+    candidates = VehicleSearchGram.objects.filter(gram__in=grams).values('vehicle_id').annotate(
+        matches=Count('gram')
+    ).filter(matches=len(grams)).values('vehicle_id')
+    rows = []
+    vehicles = Vehicle.objects.filter(patent__in=candidates).order_by('patent').values(*_PAYLOAD_FIELDS)
+    for row in vehicles.iterator(chunk_size=limit * 5):
+        if _matches(words, normalize_words(f"{row['patent']} {row['brand']} {row['model']}")):
+            rows.append(row)
+            if len(rows) == limit:
+                break
+
+    results = _payloads(rows)
+    cache.set(key, results, SEARCH_CACHE_TIMEOUT)
+    return results
+
+
+def vehicle_by_patent(patent):
+    """Datos de un vehículo por patente exacta (o None), cacheados igual que el autocompletado"""
+    key = _cache_key('patent', patent)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached['vehicle']
+
+    rows = list(Vehicle.objects.filter(patent=patent).values(*_PAYLOAD_FIELDS))
+    vehicle = _payloads(rows)[0] if rows else None
+    cache.set(key, {'vehicle': vehicle}, SEARCH_CACHE_TIMEOUT)
+    return vehicle
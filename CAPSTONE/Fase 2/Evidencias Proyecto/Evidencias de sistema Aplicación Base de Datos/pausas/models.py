@@ -1,5 +1,7 @@
 from django.db import models
 from django.utils import timezone
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from datetime import datetime, time, timedelta
 from documents.models import WorkOrder, WorkOrderMechanic, FlotaUser
 
@@ -86,64 +88,12 @@ class WorkOrderPause(models.Model):
         super().save(*args, **kwargs)
 
     def calculate_working_hours_duration(self):
-        """Calcula la duración de la pausa TOTAL (sin restricción de horario laboral)"""
+        """Calcula la duración de la pausa en minutos dentro del horario laboral del taller"""
         if not self.end_datetime or not self.start_datetime:
             return 0
 
-        # TEMPORALMENTE COMENTADO: Cálculo considerando solo horario laboral (7:30 AM - 4:30 PM)
-        """
-        start = self.start_datetime
-        end = self.end_datetime
-
-        # Horario laboral: 7:30 AM - 4:30 PM
-        work_start = time(7, 30)
-        work_end = time(16, 30)
-
-        total_duration = 0
-
-        # Si la pausa está dentro del mismo día
-        if start.date() == end.date():
-            # Ajustar start y end al horario laboral
-            effective_start = max(start.time(), work_start) if start.time() >= work_start else work_start
-            effective_end = min(end.time(), work_end) if end.time() <= work_end else work_end
-
-            if effective_start < effective_end:
-                duration = datetime.combine(start.date(), effective_end) - datetime.combine(start.date(), effective_start)
-                total_duration = duration.total_seconds() / 60
-        else:
-            # Pausa que cruza días
-            current_date = start.date()
-
-            # Día de inicio
-            if start.time() < work_end:
-                effective_start = max(start.time(), work_start)
-                effective_end = work_end
-                if effective_start < effective_end:
-                    duration = datetime.combine(current_date, effective_end) - datetime.combine(current_date, effective_start)
-                    total_duration += duration.total_seconds() / 60
-
-            # Días completos entre inicio y fin
-            current_date += timedelta(days=1)
-            while current_date < end.date():
-                # Día completo de trabajo
-                duration = datetime.combine(current_date, work_end) - datetime.combine(current_date, work_start)
-                total_duration += duration.total_seconds() / 60
-                current_date += timedelta(days=1)
-
-            # Día de fin
-            if end.time() > work_start:
-                effective_start = work_start
-                effective_end = min(end.time(), work_end)
-                if effective_start < effective_end:
-                    duration = datetime.combine(end.date(), effective_end) - datetime.combine(end.date(), effective_start)
-                    total_duration += duration.total_seconds() / 60
-
-        return int(total_duration)
-        """
-
-        # CÁLCULO TEMPORAL: Duración total sin restricciones de horario laboral
-        duration = self.end_datetime - self.start_datetime
-        return int(duration.total_seconds() / 60)
+        from agenda.work_calendar import working_hours_elapsed
+        return int(working_hours_elapsed(self.start_datetime, self.end_datetime) * 60)
 
     def calculate_working_hours_duration_active(self):
         """Calcula la duración efectiva de una pausa activa dentro del horario laboral"""
@@ -198,3 +148,12 @@ class WorkOrderPause(models.Model):
         verbose_name = 'Pausa de Orden de Trabajo'
         verbose_name_plural = 'Pausas de Órdenes de Trabajo'
         ordering = ['-start_datetime']
+
+
+@receiver([post_save, post_delete], sender=WorkOrderPause)
+def update_work_order_rollups(sender, instance, **kwargs):
+    """
+    Signal para recalcular los totales de la OT cuando cambian sus pausas.
+    """
+    from documents.rollups import refresh_work_order_rollups
+    refresh_work_order_rollups(instance.work_order_id)
@@ -10,8 +10,13 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import sys
 from pathlib import Path
 
+import environ
+
+env = environ.Env()
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -91,6 +96,24 @@ DATABASES = {
     }
 }
 
+# Caché compartida por todos los procesos del servidor. Las versiones que
+# invalidan calendarios, búsquedas, ocupación y contadores de la portada
+# (agenda, documents.vehicle_search) deben verse en todos los workers y los
+# contadores se ajustan con incr, así que en producción CACHE_URL debe apuntar
+# a Redis o Memcached (p. ej. redis://127.0.0.1:6379/1). Sin la variable se usa
+# la LocMemCache, válida sólo para desarrollo con un único proceso.
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# Los tests siempre usan una caché local y aislada
+if sys.argv[1:2] == ['test']:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -138,6 +161,18 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Procesamiento de fotos subidas (documents.image_processing): las fotos se
+# reescalan y se generan miniaturas en un pool de hilos fuera de la petición
+IMAGE_MAX_DIMENSION = 1920
+IMAGE_THUMBNAIL_SIZE = 400
+IMAGE_PROCESSING_WORKERS = 2
+IMAGE_PROCESSING_ASYNC = True
+
+# Reportes Excel pesados (document_upload.report_jobs): se generan en un pool
+# de procesos fuera de la petición y se guardan en MEDIA_ROOT/reports
+REPORT_JOB_WORKERS = 2
+REPORT_JOBS_ASYNC = True
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 